@@ -0,0 +1,25 @@
+import argparse
+import os
+
+from tests.contract import render_models
+from tests.openapi import load_spec
+
+base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
+token = os.getenv("API_TOKEN", "").strip()
+
+headers = {"Accept": "application/json"}
+if token:
+    headers["Authorization"] = f"Bearer {token}"
+
+p = argparse.ArgumentParser(description="render strict pydantic models for every response schema in /openapi.json")
+p.add_argument("--out", help="write to this file instead of stdout")
+args = p.parse_args()
+
+source = render_models(load_spec(base_url, headers=headers))
+
+if args.out:
+    with open(args.out, "w", encoding="utf-8") as f:
+        f.write(source)
+    print(f"Written: {args.out}")
+else:
+    print(source)
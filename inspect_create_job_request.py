@@ -1,8 +1,9 @@
 import os, json
-import httpx
+
+from tests.openapi import load_spec
 
 base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
-spec = httpx.get(f"{base_url}/openapi.json", timeout=30).json()
+index = load_spec(base_url)
 
-schema = spec["components"]["schemas"]["CreateJobRequest"]
+schema = index.schemas["CreateJobRequest"]
 print(json.dumps(schema, indent=2, ensure_ascii=False))
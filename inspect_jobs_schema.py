@@ -1,6 +1,8 @@
 import os, json
 import httpx
 
+from tests.openapi import load_spec
+
 base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
 token = os.getenv("API_TOKEN", "").strip()
 
@@ -8,9 +10,9 @@ headers = {"Accept": "application/json"}
 if token:
     headers["Authorization"] = f"Bearer {token}"
 
-spec = httpx.get(f"{base_url}/openapi.json", headers=headers, timeout=30).json()
+index = load_spec(base_url, headers=headers)
 
-jobs = spec["paths"]["/jobs"]["post"]
+jobs = index.operation("POST", "/jobs")
 
 print("=== POST /jobs summary ===")
 print("operationId:", jobs.get("operationId"))
@@ -25,11 +27,11 @@ print("\n=== requestBody ===")
 print("required:", req.get("required"))
 print("content-types:", list(content.keys()))
 
-schema = app_json.get("schema")
+schema = index.request_schema("POST", "/jobs")
 example = app_json.get("example")
 examples = app_json.get("examples")
 
-print("\n=== schema (raw) ===")
+print("\n=== schema ($ref resolved) ===")
 print(json.dumps(schema, indent=2, ensure_ascii=False))
 
 if example is not None:
@@ -0,0 +1,58 @@
+import argparse
+import json
+import os
+
+from tests.load import config_from_env, run_load
+
+base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
+token = os.getenv("API_TOKEN", "").strip()
+
+headers = {"Accept": "application/json"}
+if token:
+    headers["Authorization"] = f"Bearer {token}"
+
+def ms(v):
+    return f"{v * 1000:7.1f}ms" if v is not None else "       -"
+
+# worker processes re-import this module: everything below runs only in the parent
+if __name__ == "__main__":
+    p = argparse.ArgumentParser(description="presign -> upload -> create job -> status load generator")
+    p.add_argument("--mode", choices=["open", "closed"], help="open: arrival rate, closed: virtual users")
+    p.add_argument("--rate", type=float, help="flows per second (open model)")
+    p.add_argument("--users", type=int, help="virtual users (closed model)")
+    p.add_argument("--duration", type=float, help="seconds")
+    p.add_argument("--processes", type=int, help="worker processes (default 1)")
+    p.add_argument("--size", type=int, help="upload size in bytes")
+    p.add_argument("--no-poll", action="store_true", help="do not wait for jobs to reach a terminal state")
+    p.add_argument("--json", dest="json_out", help="write the report as JSON to this file")
+    p.add_argument("--fake", action="store_true", help="use the in-process fake API (FAKE_API=1)")
+    args = p.parse_args()
+
+    if args.fake:
+        os.environ["FAKE_API"] = "1"  # inherited by worker processes
+
+    cfg = config_from_env(
+        mode=args.mode,
+        rate=args.rate,
+        users=args.users,
+        duration=args.duration,
+        processes=args.processes,
+        size=args.size,
+        poll=False if args.no_poll else None,
+    )
+    report = run_load(cfg, base_url, headers).as_dict()
+
+    print(f"Base URL: {base_url}")
+    print(f"Mode: {cfg.mode}  rate={cfg.rate}/s  users={cfg.users}  duration={cfg.duration}s  processes={cfg.processes}")
+    print(f"Throughput: {report['throughput_flows_per_s']:.2f} flows/s")
+    print(f"{'stage':14} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'err%':>6}  status codes / errors")
+    for stage, row in report["stages"].items():
+        if not row["count"]:
+            continue
+        codes = {**row["status_codes"], **row["errors"]}
+        print(f"{stage:14} {row['count']:>6} {ms(row['p50'])} {ms(row['p95'])} {ms(row['p99'])} "
+              f"{row['error_rate'] * 100:5.1f}%  {codes}")
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,48 @@
+import argparse
+import asyncio
+import os
+
+from tests.client import ClientPool
+from tests.monitor import CHECKS, Monitor, config_from_env, serve_metrics
+
+base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
+token = os.getenv("API_TOKEN", "").strip()
+
+headers = {"Accept": "application/json"}
+if token:
+    headers["Authorization"] = f"Bearer {token}"
+
+p = argparse.ArgumentParser(description="synthetic monitor: health/ready/presign/job checks with Prometheus /metrics")
+p.add_argument("--interval", type=float, help="seconds between check cycles (MONITOR_INTERVAL, default 5)")
+p.add_argument("--job-interval", type=float, help="seconds between job checks (MONITOR_JOB_INTERVAL, default 60)")
+p.add_argument("--checks", help=f"comma separated subset of {','.join(CHECKS)} (MONITOR_CHECKS)")
+p.add_argument("--host", help="address of /metrics (MONITOR_HOST, default 127.0.0.1)")
+p.add_argument("--port", type=int, help="port of /metrics (MONITOR_PORT, default 9464)")
+p.add_argument("--cycles", type=int, help="stop after this many cycles (default: run until Ctrl+C)")
+p.add_argument("--fake", action="store_true", help="use the in-process fake API (FAKE_API=1)")
+args = p.parse_args()
+
+if args.fake:
+    os.environ["FAKE_API"] = "1"
+
+cfg = config_from_env(
+    interval=args.interval,
+    job_interval=args.job_interval,
+    checks=tuple(x.strip() for x in args.checks.split(",") if x.strip()) if args.checks else None,
+    host=args.host,
+    port=args.port,
+)
+pool = ClientPool.from_env(base_url, headers, record_timings=False)
+monitor = Monitor(cfg, pool)
+server = serve_metrics(monitor.registry, cfg.host, cfg.port)
+
+print(f"Base URL: {base_url}")
+print(f"Checks: {','.join(cfg.checks)} every {cfg.interval:g}s (job every {cfg.job_interval:g}s)")
+print(f"Metrics: http://{cfg.host}:{server.server_address[1]}/metrics")
+try:
+    asyncio.run(monitor.run(cycles=args.cycles))
+except KeyboardInterrupt:
+    pass
+finally:
+    server.shutdown()
+    pool.close()
@@ -0,0 +1,56 @@
+import argparse
+import json
+import os
+import sys
+
+from tests.history import CompareSettings, compare_run, connect, format_comparison, history_path, latest_run
+
+base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
+
+defaults = CompareSettings.from_env()
+
+p = argparse.ArgumentParser(description="compare a test run with the rolling baseline from the performance history")
+p.add_argument("--db", default=history_path(), help="SQLite history (PERF_HISTORY_DB)")
+p.add_argument("--run", type=int, help="run id (default: latest run against --base-url)")
+p.add_argument("--base-url", default=base_url, help="stand the run was made against")
+p.add_argument("--baseline", type=int, default=defaults.baseline_runs, help="previous runs in the baseline")
+p.add_argument("--alpha", type=float, default=defaults.alpha, help="significance level")
+p.add_argument("--threshold", type=float, default=defaults.threshold, help="smallest median change that counts")
+p.add_argument("--min-delta-ms", type=float, default=defaults.min_delta * 1000,
+               help="smallest absolute median change of a duration, ms (PERF_MIN_DELTA_MS)")
+p.add_argument("--fail-threshold", type=float, help="exit 1 on a significant regression above this change")
+p.add_argument("--list", action="store_true", help="list recorded runs and exit")
+p.add_argument("--json", dest="json_out", help="write the comparison as JSON to this file")
+args = p.parse_args()
+
+conn = connect(args.db)
+
+if args.list:
+    for run_id, commit, url, started, status, n in conn.execute(
+        "SELECT r.id, r.commit_sha, r.base_url, datetime(r.started_at, 'unixepoch'), r.exitstatus, count(s.run_id) "
+        "FROM runs r LEFT JOIN samples s ON s.run_id = r.id GROUP BY r.id ORDER BY r.id"
+    ):
+        print(f"{run_id:5} {commit[:12]:12} {started} exit={status} samples={n:<6} {url}")
+    sys.exit(0)
+
+run_id = args.run or latest_run(conn, args.base_url)
+if run_id is None:
+    print(f"No runs against {args.base_url} in {args.db}")
+    sys.exit(2)
+
+settings = CompareSettings(
+    baseline_runs=args.baseline, alpha=args.alpha, threshold=args.threshold, min_samples=defaults.min_samples,
+    min_delta=args.min_delta_ms / 1000,
+)
+comparisons = compare_run(conn, run_id, settings)
+
+print(f"Run {run_id} vs up to {args.baseline} previous runs ({len(comparisons)} metric(s) compared)")
+for c in sorted(comparisons, key=lambda c: (not c.regression, -c.change)):
+    print(format_comparison(c))
+
+if args.json_out:
+    with open(args.json_out, "w", encoding="utf-8") as f:
+        json.dump([c.as_dict() for c in comparisons], f, indent=2, ensure_ascii=False)
+
+if args.fail_threshold is not None and any(c.regression and c.change > args.fail_threshold for c in comparisons):
+    sys.exit(1)
@@ -0,0 +1,55 @@
+import argparse
+import json
+import os
+import sys
+
+import httpx
+
+from tests.fake_api import fake_api_enabled, fake_api_from_env
+from tests.impact import coverage_path, load_index, load_snapshot, save_snapshot, select
+from tests.openapi import load_spec
+
+base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
+token = os.getenv("API_TOKEN", "").strip()
+
+headers = {"Accept": "application/json"}
+if token:
+    headers["Authorization"] = f"Bearer {token}"
+
+p = argparse.ArgumentParser(description="select tests hit by OpenAPI changes since the last accepted spec")
+p.add_argument("--out", default=os.path.join("reports", "impact.json"), help="selection file for pytest --impact")
+p.add_argument("--index", default=coverage_path(), help="endpoint coverage index written by pytest with IMPACT_RECORD=1 (IMPACT_DIR)")
+p.add_argument("--accept", action="store_true", help="record the current spec as the baseline and exit")
+p.add_argument("--fake", action="store_true", help="use the in-process fake API (FAKE_API=1)")
+args = p.parse_args()
+
+fake = args.fake or fake_api_enabled()
+# как openapi_cache_key в conftest: спека фейка не смешивается со спекой стенда
+stand = f"fake:{base_url}" if fake else base_url
+transport = fake_api_from_env().transport() if fake else None
+with httpx.Client(base_url=base_url, headers=headers, timeout=30, follow_redirects=True, transport=transport) as c:
+    current = load_spec(base_url, client=c, cache_key=stand)
+
+if args.accept:
+    print(f"Baseline spec for {stand}: {save_snapshot(stand, current.spec)}")
+    sys.exit(0)
+
+index = load_index(args.index)
+selection = select(load_snapshot(stand), current, index)
+
+os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+with open(args.out, "w", encoding="utf-8") as f:
+    json.dump(selection.as_dict(), f, indent=2, ensure_ascii=False)
+
+print(f"Base URL: {stand}")
+print(f"Coverage index: {len(index)} test(s) in {args.index}")
+if selection.full:
+    print(f"Full run: {selection.reason}")
+else:
+    print(f"Changes: {selection.reason}")
+    for change in selection.changes:
+        print(f"  {change}")
+    print(f"Selected {len(selection.selected)} of {len(selection.known)} known test(s) (+ smoke and new tests):")
+    for nodeid in selection.selected:
+        print(f"  {nodeid}")
+print(f"Run: pytest --impact={args.out}; after a green run: python select_tests.py --accept")
@@ -0,0 +1,74 @@
+import argparse
+import json
+import os
+import sys
+
+from tests.soak import SCENARIOS, config_from_env, run_soak, write_summary
+
+base_url = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net").rstrip("/")
+token = os.getenv("API_TOKEN", "").strip()
+
+headers = {"Accept": "application/json"}
+if token:
+    headers["Authorization"] = f"Bearer {token}"
+
+def ms(v):
+    return f"{v * 1000:7.1f}ms" if v is not None else "       -"
+
+def on_window(window, fired):
+    cells = [
+        f"{stage}={row['count']}/{ms(row.get('p95')).strip()}" + (f"/err={row['errors']}" if row["errors"] else "")
+        for stage, row in window["stages"].items()
+        if not stage.startswith("cycle:")
+    ]
+    print(f"[{window['end']:8.1f}s] " + "  ".join(cells), flush=True)
+    for a in fired:
+        print(f"  ALERT {a.kind}: {a.message}", flush=True)
+
+p = argparse.ArgumentParser(description="soak: health/presign/upload/job scenarios at a steady rate for hours")
+p.add_argument("--duration", type=float, help="total seconds, across resumes (SOAK_DURATION)")
+p.add_argument("--rate", type=float, help="scenario runs per second (SOAK_RATE)")
+p.add_argument("--scenarios", help=f"comma separated subset of {','.join(SCENARIOS)} (SOAK_SCENARIOS)")
+p.add_argument("--window", type=float, help="sliding window, seconds (SOAK_WINDOW)")
+p.add_argument("--step", type=float, help="window evaluation interval, seconds (SOAK_STEP)")
+p.add_argument("--drift-threshold", type=float, help="p95 growth vs baseline that alerts (SOAK_DRIFT_THRESHOLD)")
+p.add_argument("--checkpoint", default=os.path.join("reports", "soak", "checkpoint.json"),
+               help="checkpoint rewritten after every window")
+p.add_argument("--resume", action="store_true", help="continue an interrupted run from --checkpoint")
+p.add_argument("--out", default=os.path.join("reports", "soak", "summary.json"), help="chart-ready summary")
+p.add_argument("--csv", default=os.path.join("reports", "soak", "summary.csv"), help="same series as CSV")
+p.add_argument("--fail-on-alert", action="store_true", help="exit 1 if any alert fired")
+p.add_argument("--fake", action="store_true", help="use the in-process fake API (FAKE_API=1)")
+args = p.parse_args()
+
+if args.fake:
+    os.environ["FAKE_API"] = "1"
+
+cfg = config_from_env(
+    duration=args.duration,
+    rate=args.rate,
+    scenarios=tuple(x.strip() for x in args.scenarios.split(",") if x.strip()) if args.scenarios else None,
+    window=args.window,
+    step=args.step,
+    drift_threshold=args.drift_threshold,
+)
+
+print(f"Base URL: {base_url}")
+print(f"Soak: {cfg.duration:g}s at {cfg.rate:g}/s, scenarios={','.join(cfg.scenarios)}, "
+      f"window={cfg.window:g}s step={cfg.step:g}s, checkpoint={args.checkpoint}")
+state = run_soak(cfg, base_url, headers, checkpoint=args.checkpoint, resume=args.resume, on_window=on_window)
+data = write_summary(state, args.out, args.csv)
+
+print(f"{'Finished' if state.finished else 'Interrupted'} after {state.elapsed:.0f}s, {state.cycles} scenario runs")
+for stage, c in sorted(data["totals"].items()):
+    print(f"  {stage:22} {c.get('count', 0):>7} runs {c.get('errors', 0):>5} errors")
+print(f"Alerts: {len(data['alerts'])}")
+for a in data["alerts"]:
+    print(f"  [{a['at']:8.0f}s] {a['kind']}: {a['message']}")
+print(f"Summary: {args.out}" + (f", {args.csv}" if args.csv else ""))
+if not state.finished:
+    print(f"Resume with: python soak.py --resume --checkpoint {args.checkpoint}")
+    sys.exit(130)
+
+if args.fail_on_alert and data["alerts"]:
+    sys.exit(1)
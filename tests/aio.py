@@ -0,0 +1,52 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Optional
+
+# -----------------------
+# общий event loop в фоновом потоке
+# -----------------------
+
+class BackgroundLoop:
+    """
+    One event loop for the whole session, running in a daemon thread.
+    AsyncClients are bound to the loop they first ran in, so session-wide
+    async clients only work if every async test runs on this same loop.
+
+        loop.run(coro)     -> result, blocks the calling thread
+        loop.submit(coro)  -> concurrent.futures.Future
+    """
+
+    def __init__(self, name: str = "api-tests-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._serve, name=name, daemon=True)
+        self._thread.start()
+
+    def _serve(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable) -> concurrent.futures.Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable, timeout: Optional[float] = None) -> Any:
+        return self.submit(coro).result(timeout)
+
+    def close(self) -> None:
+        """Cancels what is still running (tasks a test left behind) and stops the thread."""
+        if self.loop.is_closed():
+            return
+
+        async def drain():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.loop.shutdown_asyncgens()
+
+        try:
+            self.run(drain(), timeout=10)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=10)
+            self.loop.close()
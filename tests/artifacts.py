@@ -0,0 +1,324 @@
+import contextvars
+import glob
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import httpx
+import pytest
+
+from tests.timing import timing_of
+
+# -----------------------
+# текущий тест и id воркера
+# -----------------------
+
+# выставляется в pytest_runtest_protocol (conftest), вместо pytest._current_request
+CURRENT_TEST: contextvars.ContextVar[Optional[pytest.Item]] = contextvars.ContextVar(
+    "api_tests_current_test", default=None
+)
+
+def worker_id() -> str:
+    """'gw0', 'gw1', ... under pytest-xdist, 'main' otherwise."""
+    return os.getenv("PYTEST_XDIST_WORKER", "main")
+
+def is_xdist_worker(config) -> bool:
+    return hasattr(config, "workerinput")
+
+def is_xdist_controller(config) -> bool:
+    return not is_xdist_worker(config) and getattr(config.option, "numprocesses", None) not in (None, 0)
+
+# -----------------------
+# файл артефактов одного процесса
+# -----------------------
+
+def spool_dir(reports_dir: str) -> str:
+    return os.path.join(reports_dir, "artifacts")
+
+def blob_dir(directory: str) -> str:
+    return os.path.join(directory, "blobs")
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    return int(raw) if raw else default
+
+@dataclass
+class ArtifactLimits:
+    """
+    inline_bytes: up to this size an artifact is embedded in the report,
+                  bigger ones become gzip sidecar files the report links to
+    max_bytes:    one artifact is cut to this size (truncation marker appended)
+    run_bytes:    what one run may store in total (inline + new sidecars);
+                  under xdist every worker gets its share
+    preview_chars: how much of a sidecar is shown inline next to the link
+    """
+    inline_bytes: int = 16 * 1024
+    max_bytes: int = 5 * 1024 * 1024
+    run_bytes: int = 200 * 1024 * 1024
+    preview_chars: int = 1000
+
+    @classmethod
+    def from_env(cls) -> "ArtifactLimits":
+        workers = max(_env_int("PYTEST_XDIST_WORKER_COUNT", 1), 1)
+        return cls(
+            inline_bytes=_env_int("ARTIFACT_INLINE_BYTES", cls.inline_bytes),
+            max_bytes=_env_int("ARTIFACT_MAX_BYTES", cls.max_bytes),
+            run_bytes=_env_int("ARTIFACT_RUN_BYTES", cls.run_bytes) // workers,
+            preview_chars=_env_int("ARTIFACT_PREVIEW_CHARS", cls.preview_chars),
+        )
+
+def _truncate(raw: bytes, limit: int) -> Tuple[bytes, bool]:
+    if len(raw) <= limit:
+        return raw, False
+    cut = raw[:limit].decode("utf-8", "ignore").encode("utf-8")
+    return cut + f"\n...[truncated {len(raw) - len(cut)} of {len(raw)} bytes]".encode("utf-8"), True
+
+def _write_blob(directory: str, raw: bytes, ext: str) -> Tuple[str, int]:
+    """Content-addressed gzip file; returns (path relative to the spool dir, bytes written: 0 when it existed)."""
+    rel = os.path.join("blobs", f"{hashlib.sha256(raw).hexdigest()}.{ext}.gz")
+    path = os.path.join(directory, rel)
+    if os.path.exists(path):
+        return rel, 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=6) as f:
+        f.write(raw)
+    os.replace(tmp, path)  # воркеры с одинаковым блобом пишут один и тот же файл
+    return rel, os.path.getsize(path)
+
+class ArtifactSpool:
+    """
+    Append-only JSON lines file of one process (reports/artifacts/<worker>.jsonl).
+    Every artifact goes to disk as soon as it is added; the report only carries
+    (file, offset, length) references, which are small enough to travel from
+    an xdist worker to the controller with the test report.
+
+    Payloads above limits.inline_bytes go to reports/artifacts/blobs/<sha256>.gz
+    instead (identical payloads are stored once); once the run budget is spent
+    only a marker with the size is kept.
+    """
+
+    def __init__(self, directory: str, worker: str, limits: Optional[ArtifactLimits] = None):
+        self.directory = directory
+        self.limits = limits or ArtifactLimits.from_env()
+        self.name = f"{worker}.jsonl"
+        self.path = os.path.join(directory, self.name)
+        self.stored_bytes = 0
+        self.dropped = 0
+        self._f = None
+        self._lock = threading.Lock()
+
+    def _entry(self, kind: str, payload) -> dict:
+        if kind == "json":
+            text = json.dumps(payload, ensure_ascii=False, indent=2, default=str)
+        else:
+            text = str(payload)
+        raw, truncated = _truncate(text.encode("utf-8"), self.limits.max_bytes)
+        size = len(text.encode("utf-8")) if truncated else len(raw)
+
+        if len(raw) <= self.limits.inline_bytes:
+            if not self._spend(len(raw)):
+                return {"kind": "dropped", "size": size}
+            if truncated:
+                return {"kind": "text", "payload": raw.decode("utf-8"), "size": size, "truncated": True}
+            return {"kind": kind, "payload": payload, "size": size}
+
+        ext = kind if kind in ("json", "html") and not truncated else "txt"
+        with self._lock:
+            if self.stored_bytes >= self.limits.run_bytes:
+                self.dropped += 1
+                return {"kind": "dropped", "size": size}
+            rel, written = _write_blob(self.directory, raw, ext)
+            self.stored_bytes += written
+        return {
+            "kind": "blob", "blob": rel, "format": ext, "size": size, "truncated": truncated,
+            "preview": raw[:self.limits.preview_chars * 4].decode("utf-8", "ignore")[:self.limits.preview_chars],
+        }
+
+    def _spend(self, n: int) -> bool:
+        with self._lock:
+            if self.stored_bytes + n > self.limits.run_bytes:
+                self.dropped += 1
+                return False
+            self.stored_bytes += n
+            return True
+
+    def write(self, nodeid: str, kind: str, name: str, payload) -> dict:
+        entry = {"nodeid": nodeid, "name": name, **self._entry(kind, payload)}
+        line = (json.dumps(entry, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+        with self._lock:
+            if self._f is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._f = open(self.path, "ab")
+            offset = self._f.tell()
+            self._f.write(line)
+            self._f.flush()
+        return {"file": self.name, "offset": offset, "length": len(line)}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._f is not None:
+                self._f.close()
+                self._f = None
+
+def read_ref(directory: str, ref: dict) -> dict:
+    with open(os.path.join(directory, ref["file"]), "rb") as f:
+        f.seek(ref["offset"])
+        return json.loads(f.read(ref["length"]))
+
+def clear_spools(directory: str, blobs: bool = False) -> None:
+    for path in glob.glob(os.path.join(directory, "*.jsonl")):
+        os.remove(path)
+    if blobs:
+        shutil.rmtree(blob_dir(directory), ignore_errors=True)
+
+def merge_spools(directory: str, out_path: str) -> int:
+    """Controller side: all worker files -> one artifacts.jsonl ordered by test id."""
+    entries = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.jsonl"))):
+        with open(path, encoding="utf-8") as f:
+            entries += [json.loads(line) for line in f if line.strip()]
+    if not entries:
+        return 0
+    entries.sort(key=lambda e: e["nodeid"])  # sort стабильный: порядок внутри теста сохраняется
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
+        for e in entries:
+            f.write(json.dumps(e, ensure_ascii=False) + "\n")
+    return len(entries)
+
+# -----------------------
+# API артефактов для тестов
+# -----------------------
+
+def _safe_json(obj):
+    try:
+        return json.loads(json.dumps(obj, ensure_ascii=False, default=str))
+    except Exception:
+        return {"repr": repr(obj)}
+
+# JSON больше этого в артефакт идёт текстовым preview, а не разбирается целиком
+JSON_PARSE_LIMIT = 256 * 1024
+
+def _response_body(resp: httpx.Response, limit: int = 2000):
+    try:
+        size = len(resp.content)
+    except httpx.ResponseNotRead:
+        return "<streamed body, not read>"
+    ct = resp.headers.get("content-type", "")
+    if "application/json" in ct and size <= JSON_PARSE_LIMIT:
+        try:
+            return resp.json()
+        except Exception:
+            return resp.text[:limit]
+    try:
+        text = resp.content[:limit * 4].decode(resp.encoding or "utf-8", "replace")[:limit]
+    except Exception:
+        return "<non-text body>"
+    return text if size <= limit else f"{text}\n...[{size} bytes]"
+
+class Artifacts:
+    """
+    artifacts.add_json("name", {...})
+    artifacts.add_text("name", "...")
+    artifacts.add_kv("name", {"a": 1})
+    artifacts.add_http("name", resp) -> meta + body
+    await artifacts.aadd_http("name", resp) -> the same for AsyncClient
+    artifacts.add_html("name", "<div>...</div>") -> rendered as is in report.html
+    """
+
+    def __init__(self, spool: ArtifactSpool, nodeid: str):
+        self.spool = spool
+        self.nodeid = nodeid
+        self.refs: List[dict] = []
+
+    def _add(self, kind: str, name: str, payload) -> None:
+        self.refs.append(self.spool.write(self.nodeid, kind, name, payload))
+
+    def add_json(self, name: str, data):
+        self._add("json", name, _safe_json(data))
+
+    def add_text(self, name: str, text: str):
+        self._add("text", name, str(text))
+
+    def add_kv(self, name: str, data: dict):
+        self._add("json", name, _safe_json(data))
+
+    def add_html(self, name: str, markup: str):
+        self._add("html", name, str(markup))
+
+    def add_http(self, name: str, resp: httpx.Response, body_limit: int = 2000):
+        # meta
+        meta = {
+            "method": resp.request.method if resp.request else None,
+            "url": str(resp.request.url) if resp.request else None,
+            "status_code": resp.status_code,
+            "headers": dict(resp.headers),
+        }
+        timing = timing_of(resp)
+        if timing is not None:
+            meta["timing"] = timing.as_dict()
+        self.add_kv(f"{name}_meta", meta)
+
+        # body
+        body = _response_body(resp, limit=body_limit)
+        if isinstance(body, (dict, list)):
+            self.add_json(f"{name}_body", body)
+        else:
+            self.add_text(f"{name}_body_preview", body)
+
+    async def aadd_http(self, name: str, resp: httpx.Response, body_limit: int = 2000):
+        """add_http for AsyncClient responses (a streamed body is read first)."""
+        await resp.aread()
+        self.add_http(name, resp, body_limit)
+
+    def take_refs(self) -> List[dict]:
+        refs, self.refs = self.refs, []
+        return refs
+
+SPOOL_KEY = pytest.StashKey[ArtifactSpool]()
+ARTIFACTS_KEY = pytest.StashKey[Artifacts]()
+
+def artifacts_for(item: pytest.Item) -> Artifacts:
+    a = item.stash.get(ARTIFACTS_KEY, None)
+    if a is None:
+        a = Artifacts(item.config.stash[SPOOL_KEY], item.nodeid)
+        item.stash[ARTIFACTS_KEY] = a
+    return a
+
+def current_artifacts() -> Optional[Artifacts]:
+    """Artifacts of the running test, also for helpers that do not get the fixture."""
+    item = CURRENT_TEST.get()
+    return artifacts_for(item) if item is not None else None
+
+def html_extras(pytest_html, directory: str, refs: List[dict], report_dir: str) -> List[dict]:
+    """Small artifacts inline, sidecars as a link plus a short preview, dropped ones as a note."""
+    extras = []
+    for ref in refs:
+        e = read_ref(directory, ref)
+        name = e["name"]
+        if e["kind"] == "json":
+            content = json.dumps(e["payload"], ensure_ascii=False, indent=2)
+            extras.append(pytest_html.extras.text(content, name=f"{name}.json"))
+        elif e["kind"] == "text":
+            extras.append(pytest_html.extras.text(e["payload"], name=f"{name}.txt"))
+        elif e["kind"] == "html":
+            extras.append(pytest_html.extras.html(e["payload"]))
+        elif e["kind"] == "blob":
+            href = os.path.relpath(os.path.join(directory, e["blob"]), report_dir).replace(os.sep, "/")
+            note = " (truncated)" if e.get("truncated") else ""
+            extras.append(pytest_html.extras.url(href, name=f"{name}.{e['format']}.gz, {e['size']} bytes{note}"))
+            extras.append(pytest_html.extras.text(
+                f"{e['preview']}\n...[{e['size']} bytes, full payload in {href}]", name=f"{name}_preview.txt",
+            ))
+        else:
+            extras.append(pytest_html.extras.text(
+                f"[{e['size']} bytes not stored: ARTIFACT_RUN_BYTES budget of this run is spent]",
+                name=f"{name}_dropped.txt",
+            ))
+    return extras
@@ -0,0 +1,226 @@
+import base64
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from tests.artifacts import CURRENT_TEST
+
+# -----------------------
+# record/replay HTTP-обмена
+# -----------------------
+
+CASSETTE_VERSION = 1
+
+SECRET_HEADERS = frozenset({
+    "authorization", "proxy-authorization", "cookie", "set-cookie", "x-api-key",
+})
+# заголовки, которые после resp.read() уже не соответствуют сохранённому телу
+_DROP_RESPONSE_HEADERS = frozenset({"content-encoding", "content-length", "transfer-encoding"})
+
+# подписи presigned URL (GCS/S3) в query и в теле ответа /uploads/presigned
+_SIGNED_PARAM = re.compile(
+    r"((?:X-Goog-|X-Amz-)?(?:Signature|Credential|Security-Token|GoogleAccessId)=)[^&\"'\s]+",
+    re.IGNORECASE,
+)
+
+def scrub_text(text: str) -> str:
+    return _SIGNED_PARAM.sub(r"\1REDACTED", text)
+
+def scrub_headers(headers: httpx.Headers) -> Dict[str, str]:
+    return {k: ("REDACTED" if k.lower() in SECRET_HEADERS else v) for k, v in headers.items()}
+
+def body_key(request: httpx.Request) -> str:
+    """
+    JSON bodies compare by canonical form (key order and spacing do not matter),
+    other bodies by sha256; streamed bodies cannot be read without consuming
+    them, so only their declared length takes part.
+    """
+    if not isinstance(request.stream, httpx.ByteStream):
+        return f"stream:{request.headers.get('content-length', '?')}"
+    raw = request.content
+    if not raw:
+        return ""
+    if "json" in request.headers.get("content-type", ""):
+        try:
+            return json.dumps(json.loads(raw), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        except ValueError:
+            pass
+    return "sha256:" + hashlib.sha256(raw).hexdigest()
+
+def request_key(request: httpx.Request) -> Tuple[str, str, str]:
+    # host и query не участвуют: BASE_URL и подписи upload_url меняются от прогона к прогону
+    return (request.method, urlsplit(str(request.url)).path, body_key(request))
+
+class CassetteMiss(httpx.TransportError):
+    """Replay got a request that is not in the cassette."""
+
+# -----------------------
+# кассета
+# -----------------------
+
+def _current_test() -> Optional[str]:
+    item = CURRENT_TEST.get()
+    return item.nodeid if item is not None else None
+
+class Cassette:
+    """
+    Gzipped JSON lines, one exchange per line:
+      {"method", "path", "body_key", "test", "url", "request_headers",
+       "status", "headers", "text" | "b64", "elapsed"}
+
+    Replay looks for the exchange recorded by the same test first, so the
+    answers do not depend on how xdist spread the tests over workers.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: List[dict] = []
+        self.unmatched: List[dict] = []
+        self._index: Dict[tuple, Deque[dict]] = defaultdict(deque)
+        self._lock = threading.Lock()
+
+    # ---- record ----
+
+    def record(self, request: httpx.Request, key: Tuple[str, str, str],
+               response: httpx.Response, elapsed: float) -> None:
+        method, path, bkey = key
+        entry = {
+            "method": method,
+            "path": path,
+            "body_key": bkey,
+            "test": _current_test(),
+            "url": scrub_text(str(request.url)),
+            "request_headers": scrub_headers(request.headers),
+            "status": response.status_code,
+            "headers": {
+                k: v for k, v in scrub_headers(response.headers).items()
+                # у HEAD тела нет, Content-Length — размер объекта, его проверяют
+                if k.lower() not in _DROP_RESPONSE_HEADERS
+                or (method == "HEAD" and k.lower() == "content-length")
+            },
+            "elapsed": round(elapsed, 4),
+        }
+        try:
+            entry["text"] = scrub_text(response.content.decode("utf-8"))
+        except UnicodeDecodeError:
+            entry["b64"] = base64.b64encode(response.content).decode("ascii")
+        with self._lock:
+            self.entries.append(entry)
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with gzip.open(self.path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION, "recorded_at": time.time()}) + "\n")
+            for e in self.entries:
+                f.write(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n")
+
+    # ---- replay ----
+
+    def load(self) -> "Cassette":
+        with gzip.open(self.path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != CASSETTE_VERSION:
+                raise RuntimeError(f"Unsupported cassette version in {self.path}: {header.get('version')}")
+            for line in f:
+                e = json.loads(line)
+                self.entries.append(e)
+                key = (e["method"], e["path"], e["body_key"])
+                self._index[key].append(e)
+                if e.get("test"):
+                    self._index[(e["test"], *key)].append(e)
+        return self
+
+    def play(self, request: httpx.Request, key: Tuple[str, str, str]) -> httpx.Response:
+        with self._lock:
+            queue = self._index.get((_current_test(), *key)) or self._index.get(key)
+            if not queue:
+                self.unmatched.append({"method": key[0], "path": key[1], "body_key": key[2]})
+                raise CassetteMiss(f"No recorded response for {key[0]} {key[1]} body={key[2][:80]!r}", request=request)
+            # повторы (поллинг статуса) идут по порядку записи, последний ответ отдаётся дальше
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+        content = base64.b64decode(entry["b64"]) if "b64" in entry else entry["text"].encode("utf-8")
+        return httpx.Response(entry["status"], headers=entry["headers"], content=content, request=request)
+
+# -----------------------
+# транспорты
+# -----------------------
+
+class RecordingTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Wraps a real transport and writes every exchange into the cassette.
+    The key is taken before the inner transport runs, as ReplayTransport does:
+    a transport that reads a streamed body turns it into a ByteStream.
+    """
+
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        t0 = time.perf_counter()
+        resp = self.inner.handle_request(request)
+        resp.read()
+        self.cassette.record(request, key, resp, time.perf_counter() - t0)
+        return resp
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        t0 = time.perf_counter()
+        resp = await self.inner.handle_async_request(request)
+        await resp.aread()
+        self.cassette.record(request, key, resp, time.perf_counter() - t0)
+        return resp
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Serves responses from a loaded cassette; never touches the network."""
+
+    def __init__(self, cassette: Cassette):
+        self.cassette = cassette
+
+    # ключ считается до чтения тела: read() превращает потоковое тело в ByteStream
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        request.read()
+        return self.cassette.play(request, key)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request)
+        await request.aread()
+        return self.cassette.play(request, key)
+
+def merge_cassettes(path: str) -> int:
+    """Joins per-worker cassettes (<path>.gw0, <path>.gw1, ...) recorded under xdist into `path`."""
+    parts = sorted(glob.glob(f"{glob.escape(path)}.gw*"))
+    if not parts:
+        return 0
+    merged = Cassette(path)
+    for part in parts:
+        merged.entries += Cassette(part).load().entries
+    merged.save()
+    for part in parts:
+        os.remove(part)
+    return len(merged.entries)
+
+def cassette_from_env() -> Tuple[str, Optional[str]]:
+    """CASSETTE_MODE=record|replay, CASSETTE=path (default cassettes/session.jsonl.gz)."""
+    mode = os.getenv("CASSETTE_MODE", "off").strip().lower() or "off"
+    path = os.getenv("CASSETTE", "").strip() or os.path.join("cassettes", "session.jsonl.gz")
+    return mode, path
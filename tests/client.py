@@ -0,0 +1,376 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from tests.fake_api import fake_api_enabled, fake_api_from_env
+from tests.impact import record_request
+from tests.ratelimit import RateLimitedTransport, RateLimiter
+from tests.timing import EndpointTimings, RequestTiming, endpoint_key, timing_of
+from tests.tracing import begin_request, end_request, record_response
+
+# -----------------------
+# настройки пулов соединений
+# -----------------------
+
+def _env_int(name: str, default: int) -> int:
+    raw = os.getenv(name, "").strip()
+    return int(raw) if raw else default
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    return float(raw) if raw else default
+
+def _env_bool(name: str, default: bool = False) -> bool:
+    raw = os.getenv(name, "").strip().lower()
+    if not raw:
+        return default
+    return raw in ("1", "true", "yes", "on")
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+@dataclass(frozen=True)
+class PoolSettings:
+    """
+    Limits of one connection pool.
+
+    PoolSettings.from_env("HTTP")    -> HTTP_HTTP2, HTTP_MAX_CONNECTIONS, ...
+    PoolSettings.from_env("STORAGE") -> STORAGE_HTTP2, STORAGE_MAX_CONNECTIONS, ...
+    """
+    http2: bool = False
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+
+    @classmethod
+    def from_env(cls, prefix: str) -> "PoolSettings":
+        http2 = _env_bool(f"{prefix}_HTTP2")
+        if http2 and not _http2_available():
+            raise RuntimeError(
+                f"{prefix}_HTTP2 is enabled but the 'h2' package is missing. "
+                "Install it with: pip install 'httpx[http2]'"
+            )
+        return cls(
+            http2=http2,
+            max_connections=_env_int(f"{prefix}_MAX_CONNECTIONS", cls.max_connections),
+            max_keepalive_connections=_env_int(f"{prefix}_MAX_KEEPALIVE", cls.max_keepalive_connections),
+            keepalive_expiry=_env_float(f"{prefix}_KEEPALIVE_EXPIRY", cls.keepalive_expiry),
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+# -----------------------
+# статистика переиспользования соединений
+# -----------------------
+
+@dataclass
+class ConnectionStats:
+    """
+    `traced` counts requests that produced httpcore trace events. Reuse is
+    only known for those; a transport without trace events (in-process fakes,
+    MockTransport, cassettes) leaves reused and reuse_ratio at None.
+    """
+    requests: int = 0
+    new_connections: int = 0
+    traced: int = 0
+
+    @property
+    def reused(self) -> Optional[int]:
+        if not self.traced:
+            return None
+        return max(self.traced - self.new_connections, 0)
+
+    @property
+    def reuse_ratio(self) -> Optional[float]:
+        return self.reused / self.traced if self.traced else None
+
+    def merge(self, data: dict) -> None:
+        self.requests += data["requests"]
+        self.new_connections += data["new_connections"]
+        self.traced += data["traced"]
+
+    def as_dict(self) -> dict:
+        ratio = self.reuse_ratio
+        return {
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "traced": self.traced,
+            "reused": self.reused,
+            "reuse_ratio": None if ratio is None else round(ratio, 3),
+        }
+
+class HttpObserver:
+    """
+    Event hooks of one pool. Every request gets a RequestTiming in
+    request.extensions["timing"], filled from httpcore `trace` events,
+    and an http span with traceparent / X-Request-ID (tests/tracing.py).
+    A freshly opened TCP connection shows up as a connect_tcp event;
+    a request without one went over a pooled connection.
+    """
+
+    def __init__(self, stats: ConnectionStats, timings: Optional[EndpointTimings], api_origin: Optional[str]):
+        self.stats = stats
+        self.timings = timings
+        self.api_origin = api_origin
+
+    def _start(self, request: httpx.Request) -> RequestTiming:
+        timing = RequestTiming()
+        request.extensions["timing"] = timing
+        begin_request(request)
+        return timing
+
+    def _finish(self, request: httpx.Request, timing: RequestTiming) -> None:
+        timing.finish(time.perf_counter())
+        end_request(request, timing.finished, timing.phases)
+        if self.timings is not None:
+            self.timings.add(endpoint_key(request.method, str(request.url), self.api_origin), timing)
+
+    def _event(self, request: httpx.Request, timing: RequestTiming, event: str) -> None:
+        timing.on_event(event, time.perf_counter())
+        if event == "connection.connect_tcp.complete":
+            self.stats.new_connections += 1
+        elif event.endswith(("receive_response_body.complete", "receive_response_body.failed")):
+            self._finish(request, timing)
+
+    def _response(self, response: httpx.Response) -> None:
+        self.stats.requests += 1
+        record_request(response.request.method, str(response.request.url), self.api_origin)
+        record_response(response)
+        timing = timing_of(response)
+        if timing is None:
+            return
+        timing.attach(response)
+        if timing.traced:
+            self.stats.traced += 1
+        else:
+            # transport without httpcore trace support (in-process fakes): only total is known
+            self._finish(response.request, timing)
+
+    def hooks(self) -> Dict[str, list]:
+        def on_request(request: httpx.Request) -> None:
+            timing = self._start(request)
+            request.extensions["trace"] = lambda event, info: self._event(request, timing, event)
+
+        def on_response(response: httpx.Response) -> None:
+            self._response(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+    def async_hooks(self) -> Dict[str, list]:
+        """AsyncClient requires coroutine hooks and an async trace callback."""
+        async def on_request(request: httpx.Request) -> None:
+            timing = self._start(request)
+
+            async def trace(event: str, info: dict) -> None:
+                self._event(request, timing, event)
+
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response) -> None:
+            self._response(response)
+
+        return {"request": [on_request], "response": [on_response]}
+
+def origin_of(url: str) -> str:
+    parts = urlsplit(str(url))
+    return f"{parts.scheme}://{parts.netloc}"
+
+# -----------------------
+# пул клиентов на сессию
+# -----------------------
+
+class ClientPool:
+    """
+    Session-wide httpx clients:
+      pool.api               -> client for BASE_URL (auth headers, base_url)
+      pool.storage(url)      -> client for the storage host behind upload_url
+      pool.async_api()       -> new AsyncClient with the same settings (caller closes it)
+      pool.async_clients()   -> `async with` bundle of the async API + storage clients
+      pool.stats()           -> {"api": ConnectionStats, "storage:<origin>": ...}
+      pool.timings           -> per-endpoint RequestTiming roll-up (tests/timing.py);
+                                None with record_timings=False: it keeps every sample,
+                                processes that run for hours or weeks turn it off
+      pool.rate_limiter      -> shared per-host token buckets + 429 retries (tests/ratelimit.py)
+    Every client keeps its own keep-alive pool, so uploads never compete with
+    API calls for connections.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        headers: dict,
+        api_settings: Optional[PoolSettings] = None,
+        storage_settings: Optional[PoolSettings] = None,
+        timeout: float = 30,
+        upload_timeout: float = 60,
+        transport=None,
+        wrappers=(),
+        rate_limiter: Optional[RateLimiter] = None,
+        record_timings: bool = True,
+    ):
+        self.base_url = base_url
+        self.headers = dict(headers)
+        self.api_settings = api_settings or PoolSettings()
+        self.storage_settings = storage_settings or PoolSettings()
+        self.timeout = timeout
+        self.upload_timeout = upload_timeout
+        # один транспорт на все клиенты (FakeTransport и т.п.); None -> сеть
+        self.transport = transport
+        # wrap(inner_transport) -> transport, применяются к каждому клиенту по порядку
+        self.wrappers = list(wrappers)
+        # ближе всех к сети: запись кассет видит уже итоговый ответ после повторов 429
+        self.rate_limiter = rate_limiter
+        self._api: Optional[httpx.Client] = None
+        self._storage: Dict[str, httpx.Client] = {}
+        self._stats: Dict[str, ConnectionStats] = {}
+        self.timings = EndpointTimings() if record_timings else None
+
+    @classmethod
+    def from_env(cls, base_url: str, headers: dict, transport=None, wrappers=(),
+                 record_timings: bool = True) -> "ClientPool":
+        """FAKE_API=1 serves everything from tests/fake_api.py instead of the network."""
+        if transport is None and fake_api_enabled():
+            transport = fake_api_from_env().transport()
+        return cls(
+            base_url,
+            headers,
+            api_settings=PoolSettings.from_env("HTTP"),
+            storage_settings=PoolSettings.from_env("STORAGE"),
+            transport=transport,
+            wrappers=wrappers,
+            rate_limiter=RateLimiter.from_env(origin_of(base_url)),
+            record_timings=record_timings,
+        )
+
+    def _observer(self, name: str) -> HttpObserver:
+        stats = self._stats.setdefault(name, ConnectionStats())
+        return HttpObserver(stats, self.timings, origin_of(self.base_url))
+
+    def _transport(self, settings: PoolSettings, is_async: bool):
+        if self.transport is not None:
+            t = self.transport
+        elif is_async:
+            t = httpx.AsyncHTTPTransport(http2=settings.http2, limits=settings.limits())
+        else:
+            t = httpx.HTTPTransport(http2=settings.http2, limits=settings.limits())
+        if self.rate_limiter is not None:
+            t = RateLimitedTransport(t, self.rate_limiter)
+        for wrap in self.wrappers:
+            t = wrap(t)
+        return t
+
+    def _build(self, name: str, settings: PoolSettings, **kwargs) -> httpx.Client:
+        return httpx.Client(
+            follow_redirects=True,
+            event_hooks=self._observer(name).hooks(),
+            transport=self._transport(settings, is_async=False),
+            **kwargs,
+        )
+
+    @property
+    def api(self) -> httpx.Client:
+        if self._api is None:
+            self._api = self._build(
+                "api",
+                self.api_settings,
+                base_url=self.base_url,
+                headers=self.headers,
+                timeout=self.timeout,
+            )
+        return self._api
+
+    def storage(self, url: str) -> httpx.Client:
+        # presigned URLs carry their own signature: no auth headers here
+        origin = origin_of(url)
+        c = self._storage.get(origin)
+        if c is None:
+            c = self._build(f"storage:{origin}", self.storage_settings, timeout=self.upload_timeout)
+            self._storage[origin] = c
+        return c
+
+    def _build_async(self, name: str, settings: PoolSettings, **kwargs) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            follow_redirects=True,
+            event_hooks=self._observer(name).async_hooks(),
+            transport=self._transport(settings, is_async=True),
+            **kwargs,
+        )
+
+    def async_api(self) -> httpx.AsyncClient:
+        # AsyncClient is bound to the event loop it was first used in,
+        # so it is created per asyncio.run() and not cached here
+        return self._build_async(
+            "api-async",
+            self.api_settings,
+            base_url=self.base_url,
+            headers=self.headers,
+            timeout=self.timeout,
+        )
+
+    def async_storage(self, url: str) -> httpx.AsyncClient:
+        return self._build_async(
+            f"storage-async:{origin_of(url)}", self.storage_settings, timeout=self.upload_timeout
+        )
+
+    def async_clients(self) -> "AsyncClients":
+        return AsyncClients(self)
+
+    def stats(self) -> Dict[str, ConnectionStats]:
+        return dict(self._stats)
+
+    def throttle_stats(self) -> Dict[str, dict]:
+        """origin -> requests/delayed/waited_s/throttled_429/waf_challenges/retries."""
+        return self.rate_limiter.stats_dict() if self.rate_limiter is not None else {}
+
+    def close(self) -> None:
+        for c in [self._api, *self._storage.values()]:
+            if c is not None:
+                c.close()
+        self._api = None
+        self._storage.clear()
+
+class AsyncClients:
+    """
+    Async counterpart of ClientPool for one event loop:
+
+        async with pool.async_clients() as ac:
+            await ac.api.post(...)
+            await ac.storage(upload_url).put(...)
+    """
+
+    def __init__(self, pool: ClientPool):
+        self.pool = pool
+        self.api: Optional[httpx.AsyncClient] = None
+        self._storage: Dict[str, httpx.AsyncClient] = {}
+
+    def storage(self, url: str) -> httpx.AsyncClient:
+        origin = origin_of(url)
+        c = self._storage.get(origin)
+        if c is None:
+            c = self.pool.async_storage(url)
+            self._storage[origin] = c
+        return c
+
+    async def __aenter__(self) -> "AsyncClients":
+        self.api = self.pool.async_api()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        for c in [self.api, *self._storage.values()]:
+            if c is not None:
+                await c.aclose()
+        self.api = None
+        self._storage.clear()
@@ -1,7 +1,42 @@
 import os
 import json
+import html
+import inspect
 import pytest
 import httpx
+from collections import defaultdict
+from typing import Dict, Optional
+
+from tests.aio import BackgroundLoop
+from tests.artifacts import (
+    CURRENT_TEST, SPOOL_KEY, ArtifactSpool, artifacts_for, clear_spools, html_extras,
+    is_xdist_controller, is_xdist_worker, merge_spools, spool_dir, worker_id,
+)
+from tests.cassette import Cassette, RecordingTransport, ReplayTransport, cassette_from_env, merge_cassettes
+from tests.client import AsyncClients, ClientPool, ConnectionStats
+from tests.contract import Contract
+from tests.openapi import SpecIndex, load_spec
+from tests.fake_api import FakeStudioAPI, fake_api_enabled, fake_api_from_env
+from tests.timing import EndpointTimings
+from tests.tracing import (
+    Trace, clear_traces, export_trace, trace_dir, trace_export_enabled, tracing_enabled, use_trace, waterfall_html,
+)
+from tests.impact import COVERAGE_KEY, EndpointCoverage, coverage_enabled, load_selection, save_index, shared_setup
+from tests.history import (
+    PERF_KEY, CompareSettings, PerfSamples, compare_run, connect, current_commit, format_comparison,
+    history_enabled, record_sample, save_run,
+)
+from tests.poller import poll_jobs, terminal_states_from_env
+from tests.ratelimit import ThrottleStats
+from tests.preflight import CAPABILITIES, Verdict, load_cached, preflight_cache_key, run_preflight, save_cached
+
+HTTP_POOL_KEY = pytest.StashKey[ClientPool]()
+CASSETTE_KEY = pytest.StashKey[Cassette]()
+WORKERS_KEY = pytest.StashKey["_WorkerTotals"]()
+PREFLIGHT_KEY = pytest.StashKey["_PreflightState"]()
+PERF_REPORT_KEY = pytest.StashKey[list]()
+IMPACT_KEY = pytest.StashKey["_ImpactState"]()
+ASYNC_KEY = pytest.StashKey[BackgroundLoop]()
 
 # -----------------------
 # базовые фикстуры клиента
@@ -16,53 +51,273 @@ def _validate_base_url(url: str) -> str:
         )
     return url
 
+def _base_url_from_env() -> str:
+    return _validate_base_url(os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net"))
+
+def _api_token_from_env() -> str:
+    return os.getenv("API_TOKEN", "").strip()
+
+def _headers_for(api_token: str) -> dict:
+    h = {"Accept": "application/json"}
+    if api_token:
+        h["Authorization"] = f"Bearer {api_token}"
+    return h
+
 @pytest.fixture(scope="session")
 def base_url() -> str:
-    raw = os.getenv("BASE_URL", "https://dev-plt-studio-api.omniverba.net")
-    return _validate_base_url(raw)
+    return _base_url_from_env()
 
 @pytest.fixture(scope="session")
 def api_token() -> str:
-    return os.getenv("API_TOKEN", "").strip()
+    return _api_token_from_env()
 
 @pytest.fixture(scope="session")
 def headers(api_token: str) -> dict:
-    h = {"Accept": "application/json"}
-    if api_token:
-        h["Authorization"] = f"Bearer {api_token}"
-    return h
+    return _headers_for(api_token)
 
-@pytest.fixture
-def client(base_url: str, headers: dict):
-    with httpx.Client(
-        base_url=base_url,
-        timeout=30,
-        follow_redirects=True,
-        headers=headers,
-    ) as c:
-        yield c
+def pytest_addoption(parser):
+    parser.addoption(
+        "--fake-api",
+        action="store_true",
+        default=False,
+        help="run against the in-process fake studio API (tests/fake_api.py), same as FAKE_API=1",
+    )
+    mode, path = cassette_from_env()
+    parser.addoption(
+        "--cassette-mode",
+        choices=["off", "record", "replay"],
+        default=mode,
+        help="record every HTTP exchange into a cassette, or replay one without network (CASSETTE_MODE)",
+    )
+    parser.addoption(
+        "--cassette",
+        default=path,
+        help="cassette file for --cassette-mode, pass as --cassette=PATH (CASSETTE, default cassettes/session.jsonl.gz)",
+    )
+    parser.addoption(
+        "--preflight",
+        choices=["skip", "fail", "off"],
+        default=os.getenv("PREFLIGHT", "skip").strip().lower() or "skip",
+        help="probe /health, /ready and auth once per session and skip (or fail) tests whose "
+             "capability is unavailable (PREFLIGHT, default skip)",
+    )
+    parser.addoption(
+        "--impact",
+        default=os.getenv("IMPACT_SELECTION", "").strip() or None,
+        help="selection file from select_tests.py: run only tests that hit changed operations, "
+             "smoke tests and tests without recorded coverage (IMPACT_SELECTION)",
+    )
+
+def _fake_api_requested(config) -> bool:
+    return config.getoption("--fake-api") or fake_api_enabled()
+
+@pytest.fixture(scope="session")
+def fake_api(request):
+    """FakeStudioAPI when --fake-api / FAKE_API=1, otherwise None (real stand)."""
+    if _fake_api_requested(request.config):
+        return fake_api_from_env()
+    return None
+
+@pytest.fixture(scope="session")
+def cassette(request):
+    """Cassette for --cassette-mode record/replay, otherwise None."""
+    mode = request.config.getoption("--cassette-mode")
+    if mode == "off":
+        return None
+    path = request.config.getoption("--cassette")
+    if mode == "record" and is_xdist_worker(request.config):
+        # каждый воркер пишет свою кассету, контроллер склеивает их в конце сессии
+        path = f"{path}.{worker_id()}"
+    c = Cassette(path)
+    if mode == "replay":
+        c.load()
+    request.config.stash[CASSETTE_KEY] = c
+    return c
+
+@pytest.fixture(scope="session")
+def http_pool(request, base_url: str, headers: dict, fake_api: FakeStudioAPI, cassette: Cassette):
+    """Один пул соединений на сессию: keep-alive (и HTTP/2 по HTTP_HTTP2=1) для всех тестов."""
+    transport = fake_api.transport() if fake_api is not None else None
+    wrappers = []
+    mode = request.config.getoption("--cassette-mode")
+    if mode == "replay":
+        transport = ReplayTransport(cassette)
+    elif mode == "record":
+        wrappers.append(lambda inner: RecordingTransport(inner, cassette))
+
+    pool = ClientPool.from_env(base_url, headers, transport=transport, wrappers=wrappers)
+    request.config.stash[HTTP_POOL_KEY] = pool
+    yield pool
+    pool.close()
+    if mode == "record":
+        cassette.save()
+
+@pytest.fixture(scope="session")
+def client(http_pool: ClientPool) -> httpx.Client:
+    return http_pool.api
+
+@pytest.fixture(scope="session")
+def storage_client(http_pool: ClientPool):
+    """storage_client(upload_url) -> pooled httpx.Client for the storage host."""
+    return http_pool.storage
 
 # -----------------------
-# артефакты в HTML-отчёт
+# async-клиенты на общем event loop (tests/aio.py)
 # -----------------------
 
-def _safe_json(obj):
-    try:
-        return json.loads(json.dumps(obj, ensure_ascii=False, default=str))
-    except Exception:
-        return {"repr": repr(obj)}
-
-def _response_body(resp: httpx.Response, limit: int = 2000):
-    ct = resp.headers.get("content-type", "")
-    if "application/json" in ct:
-        try:
-            return resp.json()
-        except Exception:
-            return resp.text[:limit]
-    try:
-        return resp.text[:limit]
-    except Exception:
-        return "<non-text body>"
+def _loop(config) -> BackgroundLoop:
+    loop = config.stash.get(ASYNC_KEY, None)
+    if loop is None:
+        loop = config.stash[ASYNC_KEY] = BackgroundLoop()
+    return loop
+
+@pytest.fixture(scope="session")
+def async_clients(request, http_pool: ClientPool) -> AsyncClients:
+    """Session AsyncClients bound to the shared loop every `async def` test runs on."""
+    loop = _loop(request.config)
+    clients = loop.run(AsyncClients(http_pool).__aenter__())
+    yield clients
+    loop.run(clients.__aexit__(None, None, None))
+
+@pytest.fixture(scope="session")
+def async_client(async_clients: AsyncClients) -> httpx.AsyncClient:
+    """Async counterpart of `client`: `r = await async_client.get("/health")`."""
+    return async_clients.api
+
+@pytest.fixture(scope="session")
+def async_storage_client(async_clients: AsyncClients):
+    """async_storage_client(upload_url) -> pooled httpx.AsyncClient for the storage host."""
+    return async_clients.storage
+
+@pytest.fixture(scope="session")
+def openapi_cache_key(base_url: str, fake_api: FakeStudioAPI) -> str:
+    # спека фейка не должна попасть в кеш настоящего стенда
+    return base_url if fake_api is None else f"fake:{base_url}"
+
+# -----------------------
+# preflight: стенд жив, не за WAF, токен принят
+# -----------------------
+
+class _PreflightState:
+    """Verdict of this process and, as a plugin, how many tests each reason kept from running."""
+
+    def __init__(self):
+        self.verdict: Optional[Verdict] = None
+        self.gated: Dict[str, int] = defaultdict(int)
+
+    def pytest_runtest_logreport(self, report):
+        # на контроллере xdist сюда приходят отчёты воркеров
+        if report.when != "setup" or report.passed:
+            return
+        if report.skipped and isinstance(report.longrepr, tuple):
+            text = report.longrepr[2]
+        else:
+            text = report.longreprtext
+        _, found, reason = text.partition("preflight: ")
+        if found:
+            self.gated[reason.strip()] += 1
+
+def _preflight_mode(config) -> str:
+    # в replay сеть не нужна, пробы не записаны в кассету
+    if config.getoption("--cassette-mode") == "replay":
+        return "off"
+    return config.getoption("--preflight")
+
+def _preflight_verdict(config, compute: bool = True) -> Optional[Verdict]:
+    """Once per process; the disk cache (PREFLIGHT_TTL, 60s) is shared with xdist workers."""
+    state = config.stash[PREFLIGHT_KEY]
+    if state.verdict is not None or not compute:
+        return state.verdict
+    base_url = _base_url_from_env()
+    fake = _fake_api_requested(config)
+    token = _api_token_from_env()
+    cache_key = preflight_cache_key(base_url, token, fake)
+    ttl = float(os.getenv("PREFLIGHT_TTL", "60"))
+    verdict = load_cached(cache_key, ttl)
+    if verdict is None:
+        transport = fake_api_from_env().transport() if fake else None
+        pool = ClientPool.from_env(base_url, _headers_for(token), transport=transport)
+        # пробы идут из setup первого теста, но к его покрытию не относятся
+        with shared_setup():
+            verdict = run_preflight(pool, has_token=bool(token), timeout=float(os.getenv("PREFLIGHT_TIMEOUT", "5")))
+        pool.close()
+        save_cached(cache_key, verdict)
+    state.verdict = verdict
+    return verdict
+
+def _required_capabilities(item) -> set:
+    needs = {cap for m in item.iter_markers("requires") for cap in m.args}
+    if "http_pool" in item.fixturenames:
+        needs.add("api")
+    unknown = needs - set(CAPABILITIES)
+    if unknown:
+        raise pytest.UsageError(f"{item.nodeid}: unknown capability {sorted(unknown)}, known: {CAPABILITIES}")
+    return needs
+
+def pytest_sessionstart(session):
+    # контроллер xdist проверяет стенд до старта воркеров, они возьмут вердикт из кеша
+    config = session.config
+    if is_xdist_controller(config) and _preflight_mode(config) != "off":
+        _preflight_verdict(config)
+
+def _preflight_reason(item) -> Optional[str]:
+    if _preflight_mode(item.config) == "off":
+        return None
+    needs = _required_capabilities(item)
+    return _preflight_verdict(item.config).reason_for(needs) if needs else None
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtest_setup(item):
+    # до фикстур: session-фикстуры (openapi и т.п.) иначе ждали бы таймаута мёртвого стенда
+    reason = _preflight_reason(item)
+    if reason is None:
+        return
+    if _preflight_mode(item.config) == "fail":
+        pytest.fail(f"preflight: {reason}", pytrace=False)
+    pytest.skip(f"preflight: {reason}")
+
+@pytest.fixture(scope="session")
+def openapi(request, http_pool: ClientPool, client: httpx.Client, base_url: str, openapi_cache_key: str) -> SpecIndex:
+    """Parsed /openapi.json (disk cache + conditional GET, see tests/openapi.py)."""
+    # при записи кассеты — полный ответ, иначе replay на чистой машине получит 304 без кеша
+    conditional = request.config.getoption("--cassette-mode") != "record"
+    index = load_spec(base_url, client=client, cache_key=openapi_cache_key, conditional=conditional)
+    # тайминги по шаблонам путей спеки: id вида "this-job-does-not-exist" не дробит эндпоинт
+    if http_pool.timings is not None:
+        http_pool.timings.use_templates(index.match)
+    return index
+
+@pytest.fixture(scope="session")
+def contract(openapi: SpecIndex) -> Contract:
+    """contract.validate(resp): strict models generated from the spec (tests/contract.py)."""
+    return Contract(openapi)
+
+@pytest.fixture(scope="session")
+def job_poller(http_pool: ClientPool, openapi: SpecIndex):
+    """
+    job_poller([job_id, ...]) -> {job_id: JobPollResult}
+    Таймаут: JOB_POLL_TIMEOUT (сек), терминальные состояния: JOB_TERMINAL_STATES.
+    Тело статуса проверяется по схеме из /openapi.json, пока читается.
+    """
+    timeout = float(os.getenv("JOB_POLL_TIMEOUT", "30"))
+    terminal = terminal_states_from_env()
+    schema = openapi.response_schema("GET", "/jobs/{job_id}/status", 200)
+
+    def run(job_ids, **kwargs):
+        kwargs.setdefault("timeout", timeout)
+        kwargs.setdefault("terminal_states", terminal)
+        kwargs.setdefault("schema", schema)
+        results = poll_jobs(http_pool, job_ids, **kwargs)
+        for r in results.values():
+            if r.time_to_terminal is not None:
+                record_sample("job_time_to_terminal", "jobs", r.time_to_terminal)
+        return results
+
+    return run
+
+# -----------------------
+# артефакты в HTML-отчёт
+# -----------------------
 
 @pytest.fixture
 def artifacts(request):
@@ -71,57 +326,494 @@ def artifacts(request):
     artifacts.add_text("name", "...")
     artifacts.add_kv("name", {"a": 1})
     artifacts.add_http("name", resp) -> meta + body
+    await artifacts.aadd_http("name", resp) -> the same in `async def` tests
+
+    Written to reports/artifacts/<worker>.jsonl right away (tests/artifacts.py),
+    the HTML report reads them back by reference.
     """
-    store = []
-
-    class Artifacts:
-        def add_json(self, name: str, data):
-            store.append(("json", name, _safe_json(data)))
-
-        def add_text(self, name: str, text: str):
-            store.append(("text", name, str(text)))
-
-        def add_kv(self, name: str, data: dict):
-            store.append(("json", name, _safe_json(data)))
-
-        def add_http(self, name: str, resp: httpx.Response, body_limit: int = 2000):
-            # meta
-            meta = {
-                "method": resp.request.method if resp.request else None,
-                "url": str(resp.request.url) if resp.request else None,
-                "status_code": resp.status_code,
-                "headers": dict(resp.headers),
-            }
-            self.add_kv(f"{name}_meta", meta)
-
-            # body
-            body = _response_body(resp, limit=body_limit)
-            if isinstance(body, (dict, list)):
-                self.add_json(f"{name}_body", body)
-            else:
-                self.add_text(f"{name}_body_preview", body)
-
-    request.node._artifacts = store
-    return Artifacts()
+    return artifacts_for(request.node)
+
+TRACE_KEY = pytest.StashKey[Trace]()
+
+def _trace_for(item) -> Optional[Trace]:
+    """One trace id per test: every request of the test (and of fixtures in its setup) is a span of one tree."""
+    if not tracing_enabled():
+        return None
+    trace = item.stash.get(TRACE_KEY, None)
+    if trace is None:
+        trace = item.stash[TRACE_KEY] = Trace(item.nodeid)
+    return trace
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_protocol(item, nextitem):
+    token = CURRENT_TEST.set(item)
+    trace = _trace_for(item)
+    try:
+        if trace is not None:
+            with use_trace(trace):
+                yield
+            trace.finish()
+        else:
+            yield
+    finally:
+        CURRENT_TEST.reset(token)
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_fixture_setup(fixturedef, request):
+    # фикстура шире function создаётся для всех тестов сразу: её запросы не покрытие этого теста
+    if fixturedef.scope == "function":
+        yield
+        return
+    with shared_setup():
+        yield
+
+# -----------------------
+# async def тесты: на общем loop, где живут session async-клиенты
+# -----------------------
+
+def _async_test_body(item, kwargs: dict):
+    async def run():
+        # задача создаётся в потоке loop'а: контекст теста ставим заново
+        CURRENT_TEST.set(item)
+        trace = item.stash.get(TRACE_KEY, None)
+        if trace is None:
+            return await item.obj(**kwargs)
+        with use_trace(trace):
+            return await item.obj(**kwargs)
+    return run()
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_pyfunc_call(pyfuncitem):
+    if not inspect.iscoroutinefunction(pyfuncitem.obj):
+        return None
+    funcargs = pyfuncitem.funcargs
+    kwargs = {name: funcargs[name] for name in inspect.signature(pyfuncitem.obj).parameters if name in funcargs}
+    _loop(pyfuncitem.config).run(_async_test_body(pyfuncitem, kwargs))
+    return True
+
+def _attach_trace(item) -> None:
+    """Waterfall of the test so far into report.html; with TRACE_EXPORT=1 also a Chrome trace JSON into reports/traces/."""
+    trace = item.stash.get(TRACE_KEY, None)
+    if trace is None or not trace.http_spans:
+        return
+    trace.finish()
+    page = waterfall_html(trace)
+    if trace_export_enabled():
+        path = export_trace(trace, trace_dir(_reports_dir(item.config)))
+        page += f"<p>Perfetto / chrome://tracing: {html.escape(path)}</p>"
+    artifacts = artifacts_for(item)
+    artifacts.add_html("trace_waterfall", page)
+    artifacts.add_json("trace", trace.tree())
 
 @pytest.hookimpl(hookwrapper=True)
 def pytest_runtest_makereport(item, call):
     outcome = yield
     rep = outcome.get_result()
-    if rep.when != "call":
+    if rep.when == "call":
+        item.config.stash[COVERAGE_KEY].ran.add(item.nodeid)
+        _attach_trace(item)
+    # setup тоже: skip из assert_status в фикстуре оставляет свои артефакты
+    if rep.when == "call" or (rep.when == "setup" and not rep.passed):
+        refs = artifacts_for(item).take_refs()
+        if refs:
+            rep.artifact_refs = refs
+
+# -----------------------
+# статистика соединений и тайминги в отчёт
+# -----------------------
+
+class _WorkerTotals:
+    """What xdist workers sent back in workeroutput, summed on the controller."""
+
+    def __init__(self):
+        self.connections = defaultdict(ConnectionStats)
+        self.timings = EndpointTimings()
+        self.cassette_unmatched = []
+        self.throttle = defaultdict(ThrottleStats)
+        self.perf = PerfSamples()
+        self.coverage = EndpointCoverage()
+
+    def merge(self, data: dict) -> None:
+        for name, st in data["connections"].items():
+            self.connections[name].merge(st)
+        self.timings.merge(data["timings"])
+        self.cassette_unmatched += data.get("cassette_unmatched", [])
+        for origin, st in data.get("throttle", {}).items():
+            self.throttle[origin].merge(st)
+        self.perf.merge(data.get("perf", {}))
+        self.coverage.merge(data.get("coverage", {}))
+
+def _connection_summary(config) -> dict:
+    stats = defaultdict(ConnectionStats)
+    pool = config.stash.get(HTTP_POOL_KEY, None)
+    if pool is not None:
+        for name, st in pool.stats().items():
+            stats[name].merge(st.as_dict())
+    workers = config.stash.get(WORKERS_KEY, None)
+    if workers is not None:
+        for name, st in workers.connections.items():
+            stats[name].merge(st.as_dict())
+    return {name: st.as_dict() for name, st in stats.items()}
+
+def _merged_timings(config) -> EndpointTimings:
+    pool = config.stash.get(HTTP_POOL_KEY, None)
+    workers = config.stash.get(WORKERS_KEY, None)
+    if workers is None:
+        return pool.timings if pool is not None else EndpointTimings()
+    timings = EndpointTimings()
+    timings.merge(workers.timings.to_dict())
+    if pool is not None:
+        timings.merge(pool.timings.to_dict())
+    return timings
+
+def _timing_summary(config) -> dict:
+    return _merged_timings(config).summary()
+
+def _throttle_summary(config) -> dict:
+    stats = defaultdict(ThrottleStats)
+    pool = config.stash.get(HTTP_POOL_KEY, None)
+    if pool is not None:
+        for origin, st in pool.throttle_stats().items():
+            stats[origin].merge(st)
+    workers = config.stash.get(WORKERS_KEY, None)
+    if workers is not None:
+        for origin, st in workers.throttle.items():
+            stats[origin].merge(st.as_dict())
+    return {origin: st.as_dict() for origin, st in stats.items()}
+
+def _throttle_line(origin: str, s: dict) -> str:
+    return (
+        f"{origin}: {s['requests']} requests, {s['delayed']} delayed ({s['waited_s']:.1f}s waited), "
+        f"{s['throttled_429']} x 429, {s['waf_challenges']} WAF challenges, {s['retries']} retries"
+    )
+
+def _cassette_unmatched(config) -> list:
+    c = config.stash.get(CASSETTE_KEY, None)
+    workers = config.stash.get(WORKERS_KEY, None)
+    return (c.unmatched if c is not None else []) + (workers.cassette_unmatched if workers is not None else [])
+
+def _reused(s: dict) -> str:
+    return "n/a" if s["reused"] is None else str(s["reused"])
+
+def _reuse_ratio(s: dict) -> str:
+    # транспорт без trace-событий (фейк, кассеты): переиспользование не измерить
+    return "n/a" if s["reuse_ratio"] is None else f"{s['reuse_ratio']:.0%}"
+
+def _ms(v) -> str:
+    return "-" if v is None else f"{v * 1000:.1f}"
+
+def _timing_rows(timings: dict):
+    """endpoint, count, p50, p95, p99, mean connect/tls/ttfb/transfer (ms), bytes"""
+    for key, row in timings.items():
+        total = row["total"]
+        yield (
+            key,
+            row["count"],
+            _ms(total.get("p50")),
+            _ms(total.get("p95")),
+            _ms(total.get("p99")),
+            _ms(row["connect"].get("mean")),
+            _ms(row["tls"].get("mean")),
+            _ms(row["ttfb"].get("mean")),
+            _ms(row["transfer"].get("mean")),
+            "-" if row["bytes_received"] is None else row["bytes_received"],
+        )
+
+_TIMING_HEADER = ("endpoint", "count", "p50 ms", "p95 ms", "p99 ms",
+                  "connect ms", "tls ms", "ttfb ms", "transfer ms", "bytes")
+
+class _HtmlSessionSummary:
+    def __init__(self, config):
+        self.config = config
+
+    @pytest.hookimpl(tryfirst=True)
+    def pytest_runtest_logreport(self, report):
+        # артефакты читаются с диска по ссылкам; под xdist отчёт приходит от воркера
+        refs = getattr(report, "artifact_refs", None)
+        if refs:
+            pytest_html = self.config.pluginmanager.getplugin("html")
+            directory = spool_dir(_reports_dir(self.config))
+            htmlpath = getattr(self.config.option, "htmlpath", None) or "report.html"
+            report_dir = os.path.dirname(os.path.abspath(htmlpath))
+            report.extras = getattr(report, "extras", []) + html_extras(pytest_html, directory, refs, report_dir)
+
+    def pytest_html_results_summary(self, prefix, summary, postfix):
+        preflight = _preflight_lines(self.config)
+        if preflight:
+            items = "".join(f"<li>{html.escape(line)}</li>" for line in preflight)
+            prefix.append(f"<h3>Preflight</h3><ul>{items}</ul>")
+
+        stats = _connection_summary(self.config)
+        if stats:
+            rows = "".join(
+                f"<tr><td>{name}</td><td>{s['requests']}</td><td>{s['new_connections']}</td>"
+                f"<td>{_reused(s)}</td><td>{_reuse_ratio(s)}</td></tr>"
+                for name, s in stats.items()
+            )
+            prefix.append(
+                "<h3>HTTP connection reuse</h3>"
+                "<table><tr><th>pool</th><th>requests</th><th>new connections</th>"
+                f"<th>reused</th><th>reuse ratio</th></tr>{rows}</table>"
+            )
+
+        timings = _timing_summary(self.config)
+        if timings:
+            head = "".join(f"<th>{h}</th>" for h in _TIMING_HEADER)
+            rows = "".join(
+                "<tr>" + "".join(f"<td>{html.escape(str(c))}</td>" for c in r) + "</tr>"
+                for r in _timing_rows(timings)
+            )
+            prefix.append(f"<h3>Latency by endpoint</h3><table><tr>{head}</tr>{rows}</table>")
+
+        throttle = _throttle_summary(self.config)
+        if throttle:
+            items = "".join(f"<li>{html.escape(_throttle_line(o, s))}</li>" for o, s in throttle.items())
+            prefix.append(f"<h3>Rate limiting</h3><ul>{items}</ul>")
+
+def _reports_dir(config) -> str:
+    """Machine-readable outputs go next to --junitxml (reports/ by default)."""
+    xmlpath = getattr(config.option, "xmlpath", None)
+    return os.path.dirname(os.path.abspath(xmlpath)) if xmlpath else "reports"
+
+def pytest_configure(config):
+    directory = spool_dir(_reports_dir(config))
+    if not is_xdist_worker(config):
+        clear_spools(directory, blobs=True)  # остатки прошлого прогона; воркеры стартуют позже
+        if trace_export_enabled():
+            clear_traces(trace_dir(_reports_dir(config)))
+    config.stash[SPOOL_KEY] = ArtifactSpool(directory, worker_id())
+    config.stash[PERF_KEY] = PerfSamples()
+    config.stash[COVERAGE_KEY] = EndpointCoverage()
+    config.stash[IMPACT_KEY] = _ImpactState()
+    if is_xdist_controller(config):
+        config.stash[WORKERS_KEY] = _WorkerTotals()
+    config.stash[PREFLIGHT_KEY] = _PreflightState()
+    config.pluginmanager.register(config.stash[PREFLIGHT_KEY], "api-tests-preflight")
+    if config.pluginmanager.hasplugin("html"):
+        config.pluginmanager.register(_HtmlSessionSummary(config), "api-tests-session-summary")
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_testnodedown(node, error):
+    """xdist controller: collect what the worker put into workeroutput."""
+    data = getattr(node, "workeroutput", {}).get("api_tests")
+    workers = node.config.stash.get(WORKERS_KEY, None)
+    if data and workers is not None:
+        workers.merge(data)
+
+def pytest_sessionfinish(session, exitstatus):
+    config = session.config
+    config.stash[SPOOL_KEY].close()
+    loop = config.stash.get(ASYNC_KEY, None)
+    if loop is not None:
+        loop.close()
+
+    if is_xdist_worker(config):
+        pool = config.stash.get(HTTP_POOL_KEY, None)
+        c = config.stash.get(CASSETTE_KEY, None)
+        config.workeroutput["api_tests"] = {
+            "connections": {name: st.as_dict() for name, st in pool.stats().items()} if pool else {},
+            "timings": pool.timings.to_dict() if pool else {},
+            "cassette_unmatched": c.unmatched if c is not None else [],
+            "throttle": pool.throttle_stats() if pool else {},
+            "perf": config.stash[PERF_KEY].to_dict(),
+            "coverage": config.stash[COVERAGE_KEY].to_dict(),
+        }
         return
 
-    pytest_html = item.config.pluginmanager.getplugin("html")
-    if not pytest_html:
+    directory = spool_dir(_reports_dir(config))
+    merge_spools(directory, os.path.join(_reports_dir(config), "artifacts.jsonl"))
+    clear_spools(directory)
+    if is_xdist_controller(config) and config.getoption("--cassette-mode") == "record":
+        merge_cassettes(config.getoption("--cassette"))
+
+    _record_history(session)
+    _save_coverage(config)
+
+    verdict = _preflight_verdict(config, compute=False)
+    if verdict is not None:
+        os.makedirs(_reports_dir(config), exist_ok=True)
+        with open(os.path.join(_reports_dir(config), "preflight.json"), "w", encoding="utf-8") as f:
+            json.dump({**verdict.as_dict(), "gated": config.stash[PREFLIGHT_KEY].gated}, f, indent=2)
+
+    timings = _timing_summary(config)
+    if not timings:
         return
+    out_dir = _reports_dir(config)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "timings.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "connections": _connection_summary(config),
+            "endpoints": timings,
+            "throttle": _throttle_summary(config),
+        }, f, indent=2)
 
-    extras = getattr(rep, "extras", [])
-    store = getattr(item, "_artifacts", [])
-    for kind, name, payload in store:
-        if kind == "json":
-            content = json.dumps(payload, ensure_ascii=False, indent=2)
-            extras.append(pytest_html.extras.text(content, name=f"{name}.json"))
-        else:
-            extras.append(pytest_html.extras.text(payload, name=f"{name}.txt"))
+# -----------------------
+# выбор тестов по диффу спеки (tests/impact.py)
+# -----------------------
+
+class _ImpactState:
+    def __init__(self):
+        self.selection = None
+        self.kept = 0
+        self.deselected = 0
+
+def pytest_collection_modifyitems(config, items):
+    """--impact: deselect tests that did not touch a changed operation (воркеры xdist выбирают так же)."""
+    path = config.getoption("--impact")
+    if not path:
+        return
+    try:
+        selection = load_selection(path)
+    except (OSError, ValueError, KeyError) as e:
+        raise pytest.UsageError(f"--impact: cannot read selection {path}: {e}")
+    keep, drop = [], []
+    for item in items:
+        smoke = item.get_closest_marker("smoke") is not None
+        (keep if selection.keeps(item.nodeid, smoke) else drop).append(item)
+    if drop:
+        config.hook.pytest_deselected(items=drop)
+        items[:] = keep
+    state = config.stash[IMPACT_KEY]
+    state.selection, state.kept, state.deselected = selection, len(keep), len(drop)
+
+def _save_coverage(config) -> None:
+    """With IMPACT_RECORD=1 tests that ran replace their entry in the endpoint coverage index (IMPACT_DIR)."""
+    if not coverage_enabled():
+        return
+    data = config.stash[COVERAGE_KEY].to_dict()
+    workers = config.stash.get(WORKERS_KEY, None)
+    if workers is not None:
+        data.update(workers.coverage.to_dict())
+    if data:
+        save_index(data)
+
+def _impact_lines(config):
+    state = config.stash[IMPACT_KEY]
+    sel = state.selection
+    path = config.getoption("--impact")
+    if sel is None and path and is_xdist_controller(config):
+        sel = load_selection(path)  # контроллер xdist не собирает тесты, выбирали воркеры
+    if sel is None:
+        return []
+    if sel.full:
+        return [f"full run: {sel.reason}"]
+    if sel is state.selection:
+        lines = [f"{state.kept} test(s) selected, {state.deselected} deselected: {sel.reason}"]
+    else:
+        lines = [f"{len(sel.selected)} affected test(s) + smoke and new tests: {sel.reason}"]
+    lines += [str(c) for c in sel.changes[:20]]
+    if len(sel.changes) > 20:
+        lines.append(f"... and {len(sel.changes) - 20} more change(s)")
+    return lines
+
+# -----------------------
+# история производительности (tests/history.py)
+# -----------------------
+
+def _record_history(session) -> None:
+    """
+    With PERF_HISTORY=1 adds this run to the SQLite history (PERF_HISTORY_DB)
+    and compares it with the previous PERF_BASELINE_RUNS runs against the same
+    stand. With PERF_FAIL_THRESHOLD set, a significant regression above it
+    fails the run.
+    """
+    config = session.config
+    # фейк и replay отвечают из памяти: их тайминги ни с чем не сравнимы
+    if not history_enabled() or _fake_api_requested(config) or config.getoption("--cassette-mode") == "replay":
+        return
+    samples = PerfSamples()
+    samples.merge(config.stash[PERF_KEY].to_dict())
+    workers = config.stash.get(WORKERS_KEY, None)
+    if workers is not None:
+        samples.merge(workers.perf.to_dict())
+    samples.add_timings(_merged_timings(config))
+    if not samples:
+        return
+
+    stand = _base_url_from_env()
+    settings = CompareSettings.from_env()
+    conn = connect()
+    try:
+        run_id = save_run(conn, current_commit(), stand, samples, exitstatus=int(session.exitstatus))
+        comparisons = compare_run(conn, run_id, settings)
+    finally:
+        conn.close()
+    config.stash[PERF_REPORT_KEY] = comparisons
+
+    out_dir = _reports_dir(config)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, "perf.json"), "w", encoding="utf-8") as f:
+        json.dump({"run_id": run_id, "base_url": stand, "comparisons": [c.as_dict() for c in comparisons]}, f, indent=2)
+
+    fail_at = os.getenv("PERF_FAIL_THRESHOLD", "").strip()
+    if fail_at and session.exitstatus == pytest.ExitCode.OK:
+        if any(c.regression and c.change > float(fail_at) for c in comparisons):
+            session.exitstatus = pytest.ExitCode.TESTS_FAILED
+
+def _perf_lines(config):
+    comparisons = config.stash.get(PERF_REPORT_KEY, [])
+    regressions = [c for c in comparisons if c.regression]
+    return [format_comparison(c) for c in regressions], len(comparisons)
+
+def _preflight_lines(config):
+    """Probe results and, once per reason, how many tests it kept from running."""
+    verdict = _preflight_verdict(config, compute=False)
+    gated = config.stash[PREFLIGHT_KEY].gated
+    if verdict is None or not (verdict.blocked or gated):
+        return []
+    lines = [f"{p.label} ({p.elapsed * 1000:.0f}ms)" for p in verdict.probes]
+    lines += [f"{n} test(s) not run: {reason}" for reason, n in gated.items()]
+    return lines
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    preflight = _preflight_lines(config)
+    if preflight:
+        terminalreporter.section("Preflight", red=True)
+        for line in preflight:
+            terminalreporter.write_line(line)
+
+    impact = _impact_lines(config)
+    if impact:
+        terminalreporter.section("Impact selection")
+        for line in impact:
+            terminalreporter.write_line(line)
+
+    regressions, judged = _perf_lines(config)
+    if regressions:
+        terminalreporter.section("Performance regressions vs baseline", red=True)
+        for line in regressions:
+            terminalreporter.write_line(line)
+    elif judged:
+        terminalreporter.section("Performance vs baseline")
+        terminalreporter.write_line(f"{judged} metric(s) compared, no significant regressions")
+
+    unmatched = _cassette_unmatched(config)
+    if unmatched:
+        terminalreporter.section("Cassette: unmatched requests", red=True)
+        for u in unmatched:
+            terminalreporter.write_line(f"{u['method']} {u['path']} body={u['body_key'][:120]!r}")
+
+    throttle = _throttle_summary(config)
+    if throttle:
+        terminalreporter.section("Rate limiting")
+        for origin, s in throttle.items():
+            terminalreporter.write_line(_throttle_line(origin, s))
+
+    stats = _connection_summary(config)
+    if not stats:
+        return
+    terminalreporter.section("HTTP connection reuse")
+    for name, s in stats.items():
+        terminalreporter.write_line(
+            f"{name}: {s['requests']} requests, {s['new_connections']} new connections, "
+            f"{_reused(s)} reused ({_reuse_ratio(s)})"
+        )
 
-    rep.extras = extras
+    timings = _timing_summary(config)
+    if timings:
+        terminalreporter.section("Latency by endpoint")
+        for r in _timing_rows(timings):
+            terminalreporter.write_line(
+                f"{r[0]}: n={r[1]} p50={r[2]}ms p95={r[3]}ms p99={r[4]}ms "
+                f"connect={r[5]}ms tls={r[6]}ms ttfb={r[7]}ms transfer={r[8]}ms bytes={r[9]}"
+            )
@@ -0,0 +1,309 @@
+import hashlib
+import importlib.util
+import json
+import keyword
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from tests.openapi import SpecIndex
+
+# -----------------------
+# генерация pydantic-моделей из OpenAPI
+# -----------------------
+
+GENERATOR_VERSION = 2
+
+def spec_hash(spec: dict) -> str:
+    raw = json.dumps(spec, sort_keys=True, ensure_ascii=False) + f"#v{GENERATOR_VERSION}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+# имена, которые сгенерированный модуль уже занимает: импорты, встроенные типы аннотаций, служебные
+_RESERVED = frozenset({
+    "Annotated", "Any", "Dict", "List", "Literal", "Optional", "Union",
+    "BaseModel", "ConfigDict", "Field", "TypeAdapter", "annotations",
+    "str", "int", "float", "bool", "SPEC_HASH", "RESPONSES", "_m",
+})
+
+def _class_name(name: str) -> str:
+    ident = re.sub(r"\W", "_", name)
+    if ident[:1].isdigit():
+        ident = f"_{ident}"
+    if keyword.iskeyword(ident) or ident in _RESERVED:
+        ident = f"{ident}_"
+    return ident
+
+def _field_name(name: str) -> str:
+    ident = re.sub(r"\W", "_", name)
+    if ident[:1].isdigit() or keyword.iskeyword(ident):
+        ident = f"f_{ident}"
+    if ident.startswith("_") or ident in ("model_config", "model_fields"):
+        ident = f"f{ident}"
+    # поле Field затёрло бы Field(...) у следующих полей класса
+    if ident in _RESERVED:
+        ident = f"{ident}_"
+    return ident
+
+class _Renderer:
+    """
+    JSON Schema (OpenAPI 3.0/3.1 dialect) -> source of strict pydantic models.
+    Classes come first (their annotations are strings until model_rebuild),
+    then the aliases of non-object schemas in dependency order: an alias is
+    evaluated on import and may only use names defined above it.
+    """
+
+    def __init__(self, index: SpecIndex):
+        self.index = index
+        self.raw = index.raw_schemas
+        self.blocks: List[str] = []
+        self.classes: List[str] = []
+        # имя схемы в спеке -> имя в модуле; "Foo-Bar" и "Foo_Bar" не должны слиться
+        self.names: Dict[str, str] = {}
+        self._taken = set(_RESERVED)
+        for n in self.raw:
+            self.names[n] = self._unique(_class_name(n))
+
+    def _unique(self, base: str) -> str:
+        name, n = base, 1
+        while name in self._taken:
+            n += 1
+            name = f"{base}{n}"
+        self._taken.add(name)
+        return name
+
+    def _inline_class(self, hint: str) -> str:
+        return self._unique(_class_name(hint))
+
+    @staticmethod
+    def _constraints(s: dict) -> str:
+        mapping = {
+            "minimum": "ge", "maximum": "le",
+            "exclusiveMinimum": "gt", "exclusiveMaximum": "lt",
+            "minLength": "min_length", "maxLength": "max_length",
+            "minItems": "min_length", "maxItems": "max_length",
+            "pattern": "pattern",
+        }
+        args = [
+            f"{arg}={s[key]!r}" for key, arg in mapping.items()
+            if key in s and not isinstance(s[key], bool)
+        ]
+        return ", ".join(args)
+
+    def annotation(self, s: Any, hint: str) -> str:
+        if not isinstance(s, dict) or not s:
+            return "Any"
+        if "$ref" in s:
+            # $ref на схему, которой нет в components, не проверяется
+            return self.names.get(s["$ref"].rsplit("/", 1)[-1], "Any")
+
+        ann = self._bare(s, hint)
+        if s.get("nullable") and ann != "None":
+            ann = f"Optional[{ann}]"
+        constraints = self._constraints(s)
+        if constraints and not ann.startswith(("Literal", "Optional", "Union")):
+            ann = f"Annotated[{ann}, Field({constraints})]"
+        return ann
+
+    def _bare(self, s: dict, hint: str) -> str:
+        if "const" in s:
+            return f"Literal[{s['const']!r}]"
+        if "enum" in s:
+            values = [v for v in s["enum"] if v is not None]
+            lit = f"Literal[{', '.join(repr(v) for v in values)}]" if values else "None"
+            return f"Optional[{lit}]" if None in s["enum"] and values else lit
+        for key in ("anyOf", "oneOf"):
+            if key in s:
+                parts = list(dict.fromkeys(self.annotation(x, f"{hint}_{i}") for i, x in enumerate(s[key])))
+                return parts[0] if len(parts) == 1 else f"Union[{', '.join(parts)}]"
+        if "allOf" in s:
+            return self._bare(self._merge_all_of(s), hint)
+
+        t = s.get("type")
+        if isinstance(t, list):
+            parts = [self._bare({**s, "type": x}, hint) for x in t]
+            return parts[0] if len(parts) == 1 else f"Union[{', '.join(parts)}]"
+        if t == "string":
+            return "str"
+        if t == "integer":
+            return "int"
+        if t == "number":
+            return "float"
+        if t == "boolean":
+            return "bool"
+        if t == "null":
+            return "None"
+        if t == "array":
+            return f"List[{self.annotation(s.get('items'), f'{hint}_item')}]"
+        if t == "object" or "properties" in s:
+            if s.get("properties"):
+                return self.model(self._inline_class(hint), s)
+            extra = s.get("additionalProperties")
+            if isinstance(extra, dict) and extra:
+                return f"Dict[str, {self.annotation(extra, f'{hint}_value')}]"
+            return "Dict[str, Any]"
+        return "Any"
+
+    def _merge_all_of(self, s: dict) -> dict:
+        merged = {"type": "object", "properties": {}, "required": []}
+        for part in s["allOf"]:
+            part = self.index.resolve(part)
+            merged["properties"].update(part.get("properties") or {})
+            merged["required"] += part.get("required") or []
+            if part.get("additionalProperties") is False:
+                merged["additionalProperties"] = False
+        return merged
+
+    def model(self, name: str, s: dict) -> str:
+        if "allOf" in s:
+            s = self._merge_all_of(s)
+        extra = "forbid" if s.get("additionalProperties") is False else "allow"
+        required = set(s.get("required") or [])
+        lines = [
+            f"class {name}(BaseModel):",
+            f"    model_config = ConfigDict(strict=True, extra={extra!r}, populate_by_name=True)",
+        ]
+        for prop, ps in (s.get("properties") or {}).items():
+            field = _field_name(prop)
+            ann = self.annotation(ps, f"{name}_{field}")
+            alias = f", alias={prop!r}" if field != prop else ""
+            if prop in required:
+                lines.append(f"    {field}: {ann}" + (f" = Field(...{alias})" if alias else ""))
+            else:
+                lines.append(f"    {field}: Optional[{ann}] = Field(None{alias})")
+        self.blocks.append("\n".join(lines))
+        self.classes.append(name)
+        return name
+
+    def _aliases(self, aliases: Dict[str, str]) -> List[str]:
+        """`Name = annotation` lines, each after the aliases it uses; aliases on a cycle become Any."""
+        deps = {name: {t for t in re.findall(r"\w+", ann) if t in aliases} for name, ann in aliases.items()}
+        # рекурсивный псевдоним присваиванием не выразить: такие значения не проверяются
+        cyclic = [name for name in aliases if any(name in _reachable(deps, d) for d in deps[name])]
+        out = [f"{name} = Any  # recursive alias: {aliases[name]}" for name in cyclic]
+        done = set(cyclic)
+
+        def emit(name: str) -> None:
+            if name in done:
+                return
+            done.add(name)
+            for dep in sorted(deps[name]):
+                emit(dep)
+            out.append(f"{name} = {aliases[name]}")
+
+        for name in aliases:
+            emit(name)
+        return out
+
+    def render(self) -> str:
+        aliases: Dict[str, str] = {}
+        for name, schema in self.raw.items():
+            schema = schema if isinstance(schema, dict) else {}
+            if schema.get("type", "object") == "object" and ("properties" in schema or "allOf" in schema):
+                self.model(self.names[name], schema)
+            else:
+                aliases[self.names[name]] = self.annotation(schema, name)
+
+        responses = []
+        for (method, path), op in sorted(self.index.operations.items(), key=lambda x: (x[0][1], x[0][0])):
+            hint = op.get("operationId") or f"{method}_{path}"
+            for status, resp in (op.get("responses") or {}).items():
+                if not str(status).isdigit():
+                    continue
+                schema = (((resp or {}).get("content") or {}).get("application/json") or {}).get("schema")
+                if schema is None:
+                    continue
+                ann = self.annotation(schema, f"{hint}_{status}")
+                responses.append(f"    ({method!r}, {path!r}, {int(status)}): TypeAdapter({ann}),")
+
+        spec = self.index.spec
+        info = spec.get("info") or {}
+        out = [
+            f"# generated by tests/contract.py from {info.get('title', '?')} {info.get('version', '?')}; do not edit",
+            "from __future__ import annotations",
+            "",
+            "from typing import Annotated, Any, Dict, List, Literal, Optional, Union",
+            "",
+            "from pydantic import BaseModel, ConfigDict, Field, TypeAdapter",
+            "",
+            f"SPEC_HASH = {spec_hash(spec)!r}",
+            "",
+            *(b + "\n" for b in self.blocks),
+            *self._aliases(aliases),
+            "",
+            f"for _m in [{', '.join(self.classes)}]:",
+            "    _m.model_rebuild()",
+            "",
+            "# (method, path template, status) -> compiled validator",
+            "RESPONSES = {",
+            *responses,
+            "}",
+            "",
+        ]
+        return "\n".join(out)
+
+def _reachable(deps: Dict[str, set], start: str) -> set:
+    seen, stack = set(), [start]
+    while stack:
+        n = stack.pop()
+        if n not in seen:
+            seen.add(n)
+            stack += deps[n]
+    return seen
+
+def render_models(index: SpecIndex) -> str:
+    return _Renderer(index).render()
+
+# -----------------------
+# кеш сгенерированных модулей
+# -----------------------
+
+def contract_dir() -> str:
+    return os.getenv("CONTRACT_CACHE_DIR", os.path.join(".cache", "contract"))
+
+_MODULES: Dict[str, Any] = {}
+
+def load_models(index: SpecIndex, directory: Optional[str] = None):
+    """
+    Imports the generated module for this exact spec, rendering it first
+    if .cache/contract/models_<spec hash>.py does not exist yet.
+    """
+    h = spec_hash(index.spec)
+    if h in _MODULES:
+        return _MODULES[h]
+    path = os.path.join(directory or contract_dir(), f"models_{h}.py")
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(render_models(index))
+        os.replace(tmp, path)
+
+    spec = importlib.util.spec_from_file_location(f"api_tests_contract_{h}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    _MODULES[h] = module
+    return module
+
+class Contract:
+    """
+    contract.validate(resp) -> validated model, or None when the spec has no
+    JSON schema for this (method, path, status). Raises pydantic.ValidationError
+    on contract violations.
+    """
+
+    def __init__(self, index: SpecIndex):
+        self.index = index
+        self.responses: Dict[Tuple[str, str, int], Any] = load_models(index).RESPONSES
+
+    def adapter(self, method: str, path: str, status: int):
+        method = method.upper()
+        template = self.index.match(method, path)
+        return self.responses.get((method, template, status)) if template else None
+
+    def validate(self, resp: httpx.Response):
+        adapter = self.adapter(resp.request.method, resp.request.url.path, resp.status_code)
+        if adapter is None:
+            return None
+        return adapter.validate_json(resp.content)
@@ -0,0 +1,470 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import posixpath
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+# -----------------------
+# локальная замена studio API
+# -----------------------
+
+FAKE_STORAGE_ORIGIN = "https://storage.fake.local"
+FAKE_BUCKET = "fake-uploads"
+
+@dataclass
+class Faults:
+    """
+    Fault injection, applied to every request before routing:
+      latency      -> extra seconds per request (0.05 = 50ms)
+      rate_429     -> probability of 429 with Retry-After
+      rate_503     -> probability of 503
+      rate_waf     -> probability of a Cloudflare-style 403 challenge
+    FAKE_API_LATENCY / FAKE_API_429 / FAKE_API_503 / FAKE_API_WAF override it from env.
+    """
+    latency: float = 0.0
+    rate_429: float = 0.0
+    rate_503: float = 0.0
+    rate_waf: float = 0.0
+    retry_after: int = 1
+
+    @classmethod
+    def from_env(cls) -> "Faults":
+        def f(name: str) -> float:
+            raw = os.getenv(name, "").strip()
+            return float(raw) if raw else 0.0
+        return cls(
+            latency=f("FAKE_API_LATENCY"),
+            rate_429=f("FAKE_API_429"),
+            rate_503=f("FAKE_API_503"),
+            rate_waf=f("FAKE_API_WAF"),
+        )
+
+@dataclass
+class _Job:
+    job_id: str
+    gcs_url: str
+    created: float
+    fail: bool = False
+
+@dataclass
+class _ResumableUpload:
+    obj: Tuple[str, str]
+    data: bytearray = field(default_factory=bytearray)
+    complete: bool = False
+
+# GCS принимает куски resumable-сессии кратными 256 KiB (кроме последнего)
+_RESUMABLE_ALIGNMENT = 256 * 1024
+
+@dataclass
+class FakeStudioAPI:
+    """
+    In-memory implementation of the studio API contract:
+
+      GET  /health, /ready, /docs, /openapi.json
+      POST /uploads/presigned          -> upload_url on FAKE_STORAGE_ORIGIN
+      PUT|POST <upload_url>            -> fake object store (whole body, or a GCS resumable session
+                                          started with x-goog-resumable: start)
+      POST /jobs                       -> job id (gcs_url must point to an uploaded object)
+      GET  /jobs/{id}/status           -> queued -> processing -> done by `processing_delay`
+
+    Use `transport()` as the transport of httpx.Client/AsyncClient: the handler
+    ignores the host, so BASE_URL may stay whatever it is.
+    """
+    processing_delay: float = 0.2
+    faults: Faults = field(default_factory=Faults)
+    ready: bool = True
+    # сегментов в result готовой джобы: большие ответы для потоковой валидации
+    result_segments: int = 0
+    objects: Dict[Tuple[str, str], bytes] = field(default_factory=dict)
+    uploads: Dict[str, _ResumableUpload] = field(default_factory=dict)
+    jobs: Dict[str, _Job] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def transport(self) -> "FakeTransport":
+        return FakeTransport(self)
+
+    # ---- faults ----
+
+    def _fault(self) -> Optional[httpx.Response]:
+        r = random.random()
+        if r < self.faults.rate_429:
+            return httpx.Response(
+                429, headers={"Retry-After": str(self.faults.retry_after)}, json={"detail": "Too Many Requests"}
+            )
+        r -= self.faults.rate_429
+        if r < self.faults.rate_503:
+            return httpx.Response(503, json={"detail": "Service Unavailable"})
+        r -= self.faults.rate_503
+        if r < self.faults.rate_waf:
+            return httpx.Response(
+                403,
+                headers={"cf-mitigated": "challenge", "content-type": "text/html; charset=UTF-8"},
+                text="<html><title>Just a moment...</title></html>",
+            )
+        return None
+
+    # ---- routing ----
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        fault = self._fault()
+        if fault is not None:
+            return fault
+
+        url = urlsplit(str(request.url))
+        if f"{url.scheme}://{url.netloc}" == FAKE_STORAGE_ORIGIN:
+            return self._storage(request, url.path)
+
+        method, path = request.method, url.path.rstrip("/") or "/"
+        if method == "GET" and path == "/health":
+            return httpx.Response(200, json={"status": "ok"})
+        if method == "GET" and path == "/ready":
+            if self.ready:
+                return httpx.Response(200, json={"status": "ready"})
+            return httpx.Response(503, json={"status": "not ready"})
+        if method == "GET" and path == "/docs":
+            return httpx.Response(200, html="<html><title>Studio API - Swagger UI</title></html>")
+        if method == "GET" and path == "/openapi.json":
+            etag = f'"{hashlib.sha256(json.dumps(OPENAPI_SPEC, sort_keys=True).encode()).hexdigest()[:16]}"'
+            if request.headers.get("if-none-match") == etag:
+                return httpx.Response(304, headers={"ETag": etag})
+            return httpx.Response(200, json=OPENAPI_SPEC, headers={"ETag": etag})
+        if method == "POST" and path == "/uploads/presigned":
+            return self._presign(request)
+        if method == "POST" and path == "/jobs":
+            return self._create_job(request)
+        if method == "GET" and path.startswith("/jobs/") and path.endswith("/status"):
+            return self._job_status(path[len("/jobs/"):-len("/status")])
+        return httpx.Response(404, json={"detail": "Not Found"})
+
+    # ---- handlers ----
+
+    @staticmethod
+    def _json_body(request: httpx.Request):
+        try:
+            return json.loads(request.content or b"null")
+        except ValueError:
+            return None
+
+    @staticmethod
+    def _missing(field_name: str) -> httpx.Response:
+        return httpx.Response(422, json={"detail": [
+            {"loc": ["body", field_name], "msg": "Field required", "type": "missing"}
+        ]})
+
+    @staticmethod
+    def _wrong_type(field_name: str) -> httpx.Response:
+        return httpx.Response(422, json={"detail": [
+            {"loc": ["body", field_name], "msg": "Input should be a valid string", "type": "string_type"}
+        ]})
+
+    def _presign(self, request: httpx.Request) -> httpx.Response:
+        body = self._json_body(request)
+        if not isinstance(body, dict):
+            return httpx.Response(422, json={"detail": [{"loc": ["body"], "msg": "Invalid JSON", "type": "json_invalid"}]})
+        if "filename" not in body:
+            return self._missing("filename")
+        filename = body["filename"]
+        if not isinstance(filename, str):
+            return self._wrong_type("filename")
+        if len(filename) > 255:
+            return httpx.Response(422, json={"detail": [
+                {"loc": ["body", "filename"], "msg": "String should have at most 255 characters", "type": "string_too_long"}
+            ]})
+        content_type = body.get("content_type", "application/octet-stream")
+        if not isinstance(content_type, str):
+            return self._wrong_type("content_type")
+
+        # как у настоящего сервиса: только basename, без ../ и ведущих /
+        name = re.sub(r"[\x00-\x1f\x7f]", "", posixpath.basename(filename.replace("\\", "/"))).lstrip(".") or "upload.bin"
+        key = f"uploads/{uuid.uuid4().hex}/{name}"
+        return httpx.Response(200, json={
+            "bucket": FAKE_BUCKET,
+            "key": key,
+            "upload_url": f"{FAKE_STORAGE_ORIGIN}/{FAKE_BUCKET}/{key}?X-Goog-Signature=fake",
+            "method": "PUT",
+            "expires_in": 900,
+        })
+
+    @staticmethod
+    def _object_headers(data: bytes) -> dict:
+        md5 = hashlib.md5(data)
+        return {
+            "ETag": f'"{md5.hexdigest()}"',
+            "x-goog-hash": f"md5={base64.b64encode(md5.digest()).decode('ascii')}",
+            "x-goog-stored-content-length": str(len(data)),
+        }
+
+    def _storage(self, request: httpx.Request, path: str) -> httpx.Response:
+        bucket, _, key = path.lstrip("/").partition("/")
+        if request.method == "POST" and request.headers.get("x-goog-resumable") == "start":
+            return self._resumable_start(request, (bucket, key))
+        upload_id = request.url.params.get("upload_id")
+        if upload_id is not None and request.method == "PUT":
+            return self._resumable_chunk(upload_id, request.headers.get("content-range", ""), request.read())
+        if request.method in ("PUT", "POST"):
+            data = request.read()
+            with self._lock:
+                self.objects[(bucket, key)] = data
+            return httpx.Response(200, headers=self._object_headers(data))
+        if request.method in ("GET", "HEAD"):
+            data = self.objects.get((bucket, key))
+            if data is None:
+                return httpx.Response(404)
+            headers = {**self._object_headers(data), "Content-Length": str(len(data))}
+            return httpx.Response(200, content=b"" if request.method == "HEAD" else data, headers=headers)
+        return httpx.Response(405)
+
+    def _resumable_start(self, request: httpx.Request, obj: Tuple[str, str]) -> httpx.Response:
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = _ResumableUpload(obj)
+        location = request.url.copy_with(query=f"upload_id={upload_id}".encode("ascii"))
+        return httpx.Response(201, headers={"Location": str(location)})
+
+    def _resumable_chunk(self, upload_id: str, content_range: str, data: bytes) -> httpx.Response:
+        """
+        A chunk of a GCS resumable session: "Content-Range: bytes <start>-<end>/<total>"
+        starting at or before the persisted end, every chunk but the last a multiple
+        of 256 KiB; "bytes */<total>" asks for the status. 308 + Range while bytes are
+        missing (no Range before the first one), 200 once the object is complete.
+        """
+        upload = self.uploads.get(upload_id)
+        if upload is None:
+            return httpx.Response(404, json={"detail": "No such upload"})
+        m = re.fullmatch(r"bytes (?:(\d+)-(\d+)|\*)/(\d+)", content_range.strip())
+        if not m:
+            return httpx.Response(400, json={"detail": f"bad Content-Range: {content_range!r}"})
+        total = int(m.group(3))
+        with self._lock:
+            buf = upload.data
+            if m.group(1) is not None and not upload.complete:
+                start, end = int(m.group(1)), int(m.group(2))
+                if end - start + 1 != len(data) or end >= total:
+                    return httpx.Response(400, json={"detail": "Content-Range does not match body"})
+                if start > len(buf):
+                    return httpx.Response(400, json={"detail": f"chunk starts at {start}, {len(buf)} bytes persisted"})
+                if end + 1 < total and len(data) % _RESUMABLE_ALIGNMENT:
+                    return httpx.Response(400, json={"detail": f"chunk size must be a multiple of {_RESUMABLE_ALIGNMENT}"})
+                del buf[start:]
+                buf += data
+            if not upload.complete and len(buf) < total:
+                headers = {"Range": f"bytes=0-{len(buf) - 1}"} if buf else {}
+                return httpx.Response(308, headers=headers)
+            blob = bytes(buf)
+            upload.complete = True
+            self.objects[upload.obj] = blob
+        return httpx.Response(200, headers=self._object_headers(blob))
+
+    def _create_job(self, request: httpx.Request) -> httpx.Response:
+        body = self._json_body(request)
+        if not isinstance(body, dict) or "gcs_url" not in body:
+            return self._missing("gcs_url")
+        gcs_url = body["gcs_url"]
+        if not isinstance(gcs_url, str):
+            return self._wrong_type("gcs_url")
+        if not re.search(r"^gs://[^/]+/.+$", gcs_url):
+            return httpx.Response(422, json={"detail": [
+                {"loc": ["body", "gcs_url"], "msg": "gcs_url must look like gs://bucket/key", "type": "value_error"}
+            ]})
+        bucket, _, key = gcs_url[len("gs://"):].partition("/")
+        job = _Job(
+            job_id=uuid.uuid4().hex,
+            gcs_url=gcs_url,
+            created=time.monotonic(),
+            fail=(bucket, key) not in self.objects,
+        )
+        with self._lock:
+            self.jobs[job.job_id] = job
+        return httpx.Response(201, json={"job_id": job.job_id, "status": "queued"})
+
+    def _job_status(self, job_id: str) -> httpx.Response:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return httpx.Response(404, json={"detail": "Job not found"})
+        age = time.monotonic() - job.created
+        if age < self.processing_delay / 2:
+            return httpx.Response(200, json={"job_id": job_id, "status": "queued"})
+        if age < self.processing_delay:
+            return httpx.Response(200, json={"job_id": job_id, "status": "processing"})
+        if job.fail:
+            return httpx.Response(200, json={"job_id": job_id, "status": "failed", "error": "object not found"})
+        return httpx.Response(200, json={
+            "job_id": job_id,
+            "status": "done",
+            "result": {"gcs_url": job.gcs_url, "segments": [
+                {"start": float(i), "end": i + 1.0, "text": f"segment {i} of {job.job_id}"}
+                for i in range(self.result_segments)
+            ]},
+        })
+
+def fake_api_enabled() -> bool:
+    return os.getenv("FAKE_API", "").strip().lower() in ("1", "true", "yes", "on")
+
+def fake_api_from_env() -> FakeStudioAPI:
+    delay = os.getenv("FAKE_API_PROCESSING_DELAY", "").strip()
+    return FakeStudioAPI(
+        processing_delay=float(delay) if delay else 0.2,
+        faults=Faults.from_env(),
+        ready=os.getenv("FAKE_API_READY", "1").strip().lower() not in ("0", "false", "no", "off"),
+        result_segments=int(os.getenv("FAKE_API_RESULT_SEGMENTS", "0") or 0),
+    )
+
+class FakeTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Serves FakeStudioAPI to both httpx.Client and httpx.AsyncClient."""
+
+    def __init__(self, api: FakeStudioAPI):
+        self.api = api
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self.api.faults.latency:
+            time.sleep(self.api.faults.latency)
+        request.read()
+        return self._serve(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self.api.faults.latency:
+            await asyncio.sleep(self.api.faults.latency)
+        await request.aread()
+        return self._serve(request)
+
+    def _serve(self, request: httpx.Request) -> httpx.Response:
+        """Like the real API behind its gateway: echoes X-Request-ID and reports handler time in Server-Timing."""
+        t0 = time.perf_counter()
+        resp = self.api.handle(request)
+        if not str(request.url).startswith(FAKE_STORAGE_ORIGIN):
+            resp.headers["Server-Timing"] = f"app;dur={(time.perf_counter() - t0) * 1000:.3f}"
+            resp.headers["X-Request-ID"] = request.headers.get("x-request-id") or uuid.uuid4().hex
+        return resp
+
+# -----------------------
+# спецификация, которую отдаёт /openapi.json
+# -----------------------
+
+def _json_response(schema_ref: str, description: str = "Successful Response") -> dict:
+    return {"description": description, "content": {"application/json": {"schema": {"$ref": schema_ref}}}}
+
+_VALIDATION_ERROR = _json_response("#/components/schemas/HTTPValidationError", "Validation Error")
+
+OPENAPI_SPEC = {
+    "openapi": "3.1.0",
+    "info": {"title": "Studio API (fake)", "version": "0.0.0"},
+    "paths": {
+        "/health": {"get": {"operationId": "health", "responses": {
+            "200": _json_response("#/components/schemas/HealthResponse")}}},
+        "/ready": {"get": {"operationId": "ready", "responses": {
+            "200": _json_response("#/components/schemas/ReadyResponse"),
+            "503": _json_response("#/components/schemas/ReadyResponse", "Not Ready")}}},
+        "/uploads/presigned": {"post": {
+            "operationId": "create_presigned_upload",
+            "requestBody": {"required": True, "content": {"application/json": {
+                "schema": {"$ref": "#/components/schemas/PresignedUploadRequest"}}}},
+            "responses": {
+                "200": _json_response("#/components/schemas/PresignedUploadResponse"),
+                "422": _VALIDATION_ERROR,
+            },
+        }},
+        "/jobs": {"post": {
+            "operationId": "create_job",
+            "requestBody": {"required": True, "content": {"application/json": {
+                "schema": {"$ref": "#/components/schemas/CreateJobRequest"}}}},
+            "responses": {
+                "201": _json_response("#/components/schemas/CreateJobResponse"),
+                "422": _VALIDATION_ERROR,
+            },
+        }},
+        "/jobs/{job_id}/status": {"get": {
+            "operationId": "get_job_status",
+            "parameters": [{"name": "job_id", "in": "path", "required": True, "schema": {"type": "string"}}],
+            "responses": {
+                "200": _json_response("#/components/schemas/JobStatusResponse"),
+                "404": _json_response("#/components/schemas/ErrorResponse", "Not Found"),
+                "422": _VALIDATION_ERROR,
+            },
+        }},
+    },
+    "components": {"schemas": {
+        "HealthResponse": {"type": "object", "properties": {"status": {"type": "string"}}, "required": ["status"]},
+        "ReadyResponse": {"type": "object", "properties": {"status": {"type": "string"}}, "required": ["status"]},
+        "PresignedUploadRequest": {
+            "type": "object",
+            "properties": {
+                "filename": {"type": "string", "maxLength": 255},
+                "content_type": {"type": "string", "default": "application/octet-stream"},
+            },
+            "required": ["filename"],
+        },
+        "PresignedUploadResponse": {
+            "type": "object",
+            "properties": {
+                "bucket": {"type": "string"},
+                "key": {"type": "string"},
+                "upload_url": {"type": "string", "format": "uri"},
+                "method": {"type": "string", "enum": ["PUT", "POST"]},
+                "expires_in": {"type": "integer", "minimum": 1},
+            },
+            "required": ["bucket", "key", "upload_url", "method", "expires_in"],
+        },
+        "CreateJobRequest": {
+            "type": "object",
+            "properties": {"gcs_url": {"type": "string", "pattern": "^gs://[^/]+/.+$"}},
+            "required": ["gcs_url"],
+        },
+        "CreateJobResponse": {
+            "type": "object",
+            "properties": {"job_id": {"type": "string"}, "status": {"type": "string"}},
+            "required": ["job_id"],
+        },
+        "JobStatusResponse": {
+            "type": "object",
+            "properties": {
+                "job_id": {"type": "string"},
+                "status": {"type": "string", "enum": ["queued", "processing", "done", "failed"]},
+                "result": {"anyOf": [{"$ref": "#/components/schemas/JobResult"}, {"type": "null"}]},
+                "error": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+            },
+            "required": ["job_id", "status"],
+        },
+        "JobResult": {
+            "type": "object",
+            "properties": {
+                "gcs_url": {"type": "string"},
+                "segments": {"type": "array", "items": {"$ref": "#/components/schemas/Segment"}},
+            },
+            "required": ["segments"],
+        },
+        "Segment": {
+            "type": "object",
+            "properties": {
+                "start": {"type": "number", "minimum": 0},
+                "end": {"type": "number", "minimum": 0},
+                "text": {"type": "string"},
+            },
+            "required": ["start", "end", "text"],
+        },
+        "ErrorResponse": {"type": "object", "properties": {"detail": {"type": "string"}}, "required": ["detail"]},
+        "ValidationError": {
+            "type": "object",
+            "properties": {
+                "loc": {"type": "array", "items": {"anyOf": [{"type": "string"}, {"type": "integer"}]}},
+                "msg": {"type": "string"},
+                "type": {"type": "string"},
+            },
+            "required": ["loc", "msg", "type"],
+        },
+        "HTTPValidationError": {
+            "type": "object",
+            "properties": {"detail": {"type": "array", "items": {"$ref": "#/components/schemas/ValidationError"}}},
+        },
+    }},
+}
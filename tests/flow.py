@@ -0,0 +1,105 @@
+import time
+from typing import Iterable, Optional
+
+import httpx
+
+from tests.client import AsyncClients
+from tests.poller import JobPoller, TERMINAL_STATES
+from tests.schemas import CreateJobResponse, PresignedUploadResponse
+from tests.stats import LoadStats
+from tests.tracing import span
+from tests.upload import UploadResult, aupload_stream
+
+# -----------------------
+# production pipeline: presign -> upload -> create job -> status
+# -----------------------
+
+class FlowError(Exception):
+    def __init__(self, stage: str, status_code: Optional[int], message: str = ""):
+        super().__init__(f"{stage}: {message or status_code}")
+        self.stage = stage
+        self.status_code = status_code
+
+async def _timed(stats: LoadStats, stage: str, coro, ok: Iterable[int]):
+    """Awaits a request (httpx.Response or UploadResult) in a `stage` span and records its latency."""
+    t0 = time.perf_counter()
+    with span(stage):
+        try:
+            result = await coro
+        except httpx.HTTPError as e:
+            stats.record(stage, time.perf_counter() - t0, error=type(e).__name__)
+            raise FlowError(stage, None, type(e).__name__) from e
+    resp = result.response if isinstance(result, UploadResult) else result
+    stats.record(stage, time.perf_counter() - t0, status_code=resp.status_code)
+    if resp.status_code not in ok:
+        raise FlowError(stage, resp.status_code)
+    return result
+
+async def run_upload_flow(
+    clients: AsyncClients,
+    stats: LoadStats,
+    content: bytes,
+    filename: str = "test.jpg",
+    content_type: str = "image/jpeg",
+    poll: bool = True,
+    poll_timeout: float = 30.0,
+    terminal_states: Iterable[str] = TERMINAL_STATES,
+    until: Optional[str] = None,
+) -> Optional[str]:
+    """
+    One pass of the pipeline the contract tests check one step at a time.
+    Every stage is recorded in `stats`; the first failing stage raises FlowError.
+    Returns the job id; until="presign"/"upload" stops after that stage and returns None.
+    All requests of the pass share one trace (tests/tracing.py).
+    """
+    with span("flow", kind="flow"):
+        return await _run_upload_flow(clients, stats, content, filename, content_type,
+                                      poll, poll_timeout, terminal_states, until)
+
+async def _run_upload_flow(clients, stats, content, filename, content_type, poll, poll_timeout, terminal_states, until):
+    t0 = time.perf_counter()
+    try:
+        pres = await _timed(
+            stats, "presign",
+            clients.api.post("/uploads/presigned", json={"filename": filename, "content_type": content_type}),
+            ok={200, 201},
+        )
+        pres_data = PresignedUploadResponse.model_validate(pres.json())
+        if until == "presign":
+            stats.record("flow", time.perf_counter() - t0)
+            return None
+
+        upload_url = str(pres_data.upload_url)
+        await _timed(
+            stats, "upload",
+            aupload_stream(clients.storage(upload_url), pres_data.method, upload_url, content, content_type),
+            ok={200, 201, 204},
+        )
+        if until == "upload":
+            stats.record("flow", time.perf_counter() - t0)
+            return None
+
+        job = await _timed(
+            stats, "create_job",
+            clients.api.post("/jobs", json={"gcs_url": f"gs://{pres_data.bucket}/{pres_data.key}"}),
+            ok={200, 201},
+        )
+        job_id = CreateJobResponse.model_validate(job.json()).resolved_id()
+
+        if poll:
+            res = (await JobPoller(clients.api, terminal_states=terminal_states, timeout=poll_timeout).wait([job_id]))[job_id]
+            if res.terminal:
+                stats.record("job_terminal", res.time_to_terminal, status_code=res.last_status_code)
+            else:
+                stats.record("job_terminal", time.perf_counter() - t0, error=res.error or "not terminal")
+                raise FlowError("job_terminal", res.last_status_code, res.error or "not terminal")
+    except FlowError:
+        stats.record("flow", time.perf_counter() - t0, error="failed")
+        raise
+    except ValueError as e:
+        # pydantic.ValidationError / JSONDecodeError: the response broke the contract
+        stats.record("flow", time.perf_counter() - t0, error="contract")
+        raise FlowError("contract", None, str(e)) from e
+
+    stats.record("flow", time.perf_counter() - t0)
+    return job_id
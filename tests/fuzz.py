@@ -0,0 +1,474 @@
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import httpx
+
+from tests.cassette import CassetteMiss
+from tests.openapi import SpecIndex, conforms
+from tests.stats import latency_summary, percentile
+
+# -----------------------
+# генерация payload
+# -----------------------
+
+# строки, на которых сервисы обычно ломаются: обход путей, юникод, управляющие символы
+NASTY_STRINGS = [
+    "", " ", ".", "..", "../evil.jpg", "..\\evil.jpg", "/etc/passwd", "a/../../b.jpg",
+    "%2e%2e%2fevil.jpg", "./.hidden", "C:\\windows\\x.jpg", "file\x00.jpg", "line\nbreak.jpg",
+    "tab\t.jpg", "файл.mp4", "画像.png", "emoji-😀.jpg", "\u202egpj.exe", "' OR 1=1 --",
+    "<script>alert(1)</script>", "${jndi:ldap://x}", "{{7*7}}", "null", "true", "0",
+]
+SAFE_FILENAMES = ["test.jpg", "sample.mp4", "a.pdf", "voice.mp3", "archive.zip", "x"]
+CONTENT_TYPES = ["image/jpeg", "video/mp4", "audio/mpeg", "application/pdf", "application/octet-stream"]
+
+def _literal_prefix(pattern: str) -> str:
+    """'^gs://[^/]+/.+$' -> 'gs://': the part a matching value has to start with."""
+    m = re.match(r"\^((?:[^\\\[\](){}.*+?|^$]|\\[/.\-:])*)", pattern)
+    return m.group(1).replace("\\", "") if m else ""
+
+class PayloadGenerator:
+    """
+    Random request bodies for one resolved request schema.
+    valid() respects the schema; invalid() mutates a valid body the way
+    clients get it wrong (missing field, wrong type, too long, bad pattern,
+    not an object at all). Whether a body really conforms is decided by
+    conforms() afterwards, not by which generator produced it.
+    """
+
+    def __init__(self, schema: dict, rng: random.Random):
+        self.schema = schema
+        self.rng = rng
+
+    # ---- valid ----
+
+    def valid(self, schema: Optional[dict] = None, name: str = "") -> Any:
+        s = self.schema if schema is None else schema
+        rng = self.rng
+        if not isinstance(s, dict) or not s:
+            return rng.choice(["x", 1, True, None])
+        if "const" in s:
+            return s["const"]
+        if "enum" in s:
+            return rng.choice(s["enum"])
+        for key in ("anyOf", "oneOf"):
+            if key in s:
+                return self.valid(rng.choice(s[key]), name)
+        if "allOf" in s:
+            merged: dict = {}
+            for part in s["allOf"]:
+                merged.update(part)
+            return self.valid(merged, name)
+
+        t = s.get("type")
+        if isinstance(t, list):
+            t = rng.choice(t)
+        if t == "object" or "properties" in s:
+            props = s.get("properties") or {}
+            required = set(s.get("required") or [])
+            return {
+                k: self.valid(ps, k) for k, ps in props.items()
+                if k in required or rng.random() < 0.5
+            }
+        if t == "array":
+            n = rng.randint(s.get("minItems", 0), min(s.get("maxItems", 3), 3))
+            return [self.valid(s.get("items"), name) for _ in range(n)]
+        if t == "integer":
+            return rng.randint(int(s.get("minimum", 0)), int(s.get("maximum", 1000)))
+        if t == "number":
+            return rng.uniform(float(s.get("minimum", 0)), float(s.get("maximum", 1000)))
+        if t == "boolean":
+            return rng.random() < 0.5
+        if t == "null":
+            return None
+        return self._string(s, name)
+
+    def _string(self, s: dict, name: str) -> str:
+        rng = self.rng
+        lo, hi = s.get("minLength", 0), s.get("maxLength", 1024)
+        pool = list(NASTY_STRINGS)
+        if "filename" in name:
+            pool += SAFE_FILENAMES * 3 + [f"{c}.jpg" for c in NASTY_STRINGS[:8]]
+        if "content_type" in name or "mime" in name:
+            pool += CONTENT_TYPES * 3
+        if s.get("format") == "uri":
+            pool += ["https://example.com/x", "gs://bucket/key"]
+        pool += ["a" * hi] if hi <= 4096 else ["a" * 4096]
+        if "pattern" in s:
+            prefix = _literal_prefix(s["pattern"])
+            pool += [f"{prefix}fuzz-bucket/{rng.choice(SAFE_FILENAMES + NASTY_STRINGS)}" for _ in range(4)]
+            pool = [x for x in pool if re.search(s["pattern"], x)] or pool
+        pool = [x for x in pool if lo <= len(x) <= hi] or ["a" * max(lo, 1)]
+        return rng.choice(pool)
+
+    # ---- invalid ----
+
+    def invalid(self) -> Any:
+        rng = self.rng
+        body = self.valid()
+        if not isinstance(body, dict) or rng.random() < 0.1:
+            return rng.choice([None, [], "", 0, "{}", [body]])
+
+        props = self.schema.get("properties") or {}
+        required = list(self.schema.get("required") or [])
+        mutation = rng.choice(["drop", "type", "null", "long", "pattern", "enum", "extra"])
+
+        if mutation == "drop" and required:
+            body.pop(rng.choice(required), None)
+            return body
+        if not props:
+            body[rng.choice(NASTY_STRINGS) or "_"] = rng.choice(NASTY_STRINGS)
+            return body
+
+        name = rng.choice(list(props))
+        ps = props[name]
+        if mutation == "type":
+            body[name] = rng.choice([123, -1, 1.5, True, [], {}, ["x"], {"x": 1}])
+        elif mutation == "null":
+            body[name] = None
+        elif mutation == "long":
+            n = ps.get("maxLength", 4096) + rng.choice([1, 10, 10_000])
+            body[name] = "a" * n
+        elif mutation == "pattern" and "pattern" in ps:
+            prefix = _literal_prefix(ps["pattern"])
+            body[name] = rng.choice(["", prefix, f"{prefix}/", f"{prefix}//x", "http://x/y", "gs:/x", prefix.upper() + "b/k"])
+        elif mutation == "enum" and "enum" in ps:
+            body[name] = f"not-{ps['enum'][0]}"
+        else:
+            body[rng.choice(NASTY_STRINGS) or "_"] = rng.choice([None, 1, "x", {"nested": [1, 2]}])
+        return body
+
+    def cases(self, n: int, invalid_ratio: float = 0.5) -> Iterator[Any]:
+        for _ in range(n):
+            yield self.invalid() if self.rng.random() < invalid_ratio else self.valid()
+
+# -----------------------
+# классификация ответов
+# -----------------------
+
+SERVER_ERROR = "server_error"
+UNEXPECTED_2XX = "unexpected_2xx"
+UNSANITIZED_KEY = "unsanitized_key"
+TRANSPORT_ERROR = "transport_error"
+LATENCY_OUTLIER = "latency_outlier"
+# эти виды — баги и уходят в регрессии; выбросы по латентности только в отчёт
+BUG_KINDS = (SERVER_ERROR, UNEXPECTED_2XX, UNSANITIZED_KEY, TRANSPORT_ERROR)
+
+_CONTROL = re.compile(r"[\x00-\x1f\x7f]")
+
+def unsafe_key(key: str) -> Optional[str]:
+    if key.startswith("/") or "\\" in key:
+        return "absolute path or backslash"
+    if ".." in key.split("/"):
+        return "'..' path segment"
+    if _CONTROL.search(key):
+        return "control character"
+    return None
+
+def classify(resp: Optional[httpx.Response], expect_valid: bool) -> Optional[Tuple[str, str]]:
+    """(kind, detail) when the exchange shows a bug, None when the answer is acceptable."""
+    if resp is None:
+        return TRANSPORT_ERROR, "no response"
+    code = resp.status_code
+    if code >= 500:
+        return SERVER_ERROR, f"HTTP {code}"
+    if 200 <= code < 300:
+        if not expect_valid:
+            return UNEXPECTED_2XX, f"HTTP {code} for a body that violates the request schema"
+        try:
+            data = resp.json()
+        except ValueError:
+            return None
+        if isinstance(data, dict) and isinstance(data.get("key"), str):
+            why = unsafe_key(data["key"])
+            if why:
+                return UNSANITIZED_KEY, f"{why}: {data['key']!r}"
+    return None
+
+# -----------------------
+# прогон
+# -----------------------
+
+@dataclass
+class FuzzFinding:
+    method: str
+    path: str
+    kind: str
+    detail: str
+    status_code: Optional[int]
+    payload: Any
+    original: Any = None
+    shrink_steps: int = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "kind": self.kind,
+            "detail": self.detail,
+            "status_code": self.status_code,
+            "payload": self.payload,
+            "original_size": len(json.dumps(self.original, ensure_ascii=False)) if self.original is not None else None,
+            "shrink_steps": self.shrink_steps,
+        }
+
+@dataclass
+class FuzzReport:
+    seed: int
+    sent: int = 0
+    valid: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    findings: List[FuzzFinding] = field(default_factory=list)
+    outliers: List[dict] = field(default_factory=list)
+    latencies: List[float] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def bugs(self) -> List[FuzzFinding]:
+        return [f for f in self.findings if f.kind in BUG_KINDS]
+
+    def as_dict(self) -> dict:
+        return {
+            "seed": self.seed,
+            "sent": self.sent,
+            "valid": self.valid,
+            "invalid": self.sent - self.valid,
+            "elapsed_s": round(self.elapsed, 3),
+            "rps": round(self.sent / self.elapsed, 1) if self.elapsed > 0 else None,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items(), key=lambda x: str(x[0]))},
+            "findings": dict(Counter(f.kind for f in self.findings)),
+            "latency": latency_summary(self.latencies),
+            "bugs": [f.as_dict() for f in self.bugs],
+            "outliers": self.outliers[:20],
+        }
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False))
+
+def shrink_candidates(value: Any) -> Iterator[Any]:
+    """Smaller variants of a JSON value, roughly from biggest to smallest cut."""
+    if isinstance(value, dict):
+        for k in value:
+            yield {x: v for x, v in value.items() if x != k}
+        for k, v in value.items():
+            for smaller in shrink_candidates(v):
+                yield {**value, k: smaller}
+    elif isinstance(value, list):
+        if value:
+            yield []
+            half = len(value) // 2
+            if half:
+                yield value[:half]
+                yield value[half:]
+            for i in range(len(value)):
+                yield value[:i] + value[i + 1:]
+            for i, v in enumerate(value):
+                for smaller in shrink_candidates(v):
+                    yield value[:i] + [smaller] + value[i + 1:]
+    elif isinstance(value, str):
+        if value:
+            yield ""
+            half = len(value) // 2
+            if half:
+                yield value[:half]
+                yield value[half:]
+            if len(value) <= 16:
+                for i in range(len(value)):
+                    yield value[:i] + value[i + 1:]
+    elif isinstance(value, bool):
+        if value:
+            yield False
+    elif isinstance(value, (int, float)):
+        if value != 0:
+            yield 0
+            if abs(value) > 1:
+                yield type(value)(value / 2)
+
+# одинаковый по умолчанию: прогон воспроизводим и совпадает с записанной кассетой
+DEFAULT_SEED = 0
+
+def fuzz_seed_from_env() -> int:
+    """FUZZ_SEED: integer, default 0; FUZZ_SEED=random draws a new one (printed in the report)."""
+    raw = os.getenv("FUZZ_SEED", "").strip().lower()
+    if raw == "random":
+        return random.randrange(2 ** 32)
+    return int(raw) if raw else DEFAULT_SEED
+
+class Fuzzer:
+    """
+    Sends generated bodies to JSON operations with up to `concurrency`
+    requests in flight, classifies every answer and shrinks each failing
+    body to a minimal one that still reproduces the same kind of failure.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        index: SpecIndex,
+        concurrency: int = 20,
+        seed: int = DEFAULT_SEED,
+        shrink_steps: int = 200,
+        outlier_floor: float = 1.0,
+    ):
+        self.client = client
+        self.index = index
+        self.concurrency = concurrency
+        self.seed = seed
+        self.shrink_steps = shrink_steps
+        self.outlier_floor = outlier_floor
+
+    async def send(self, method: str, path: str, payload: Any) -> Tuple[Optional[httpx.Response], float]:
+        t0 = time.perf_counter()
+        try:
+            resp = await self.client.request(method, path, json=payload)
+        except CassetteMiss:
+            raise                   # не ответ стенда: кассета записана с другим сидом или без фаззинга
+        except httpx.TransportError:
+            resp = None
+        return resp, time.perf_counter() - t0
+
+    def check(self, schema: dict, payload: Any, resp: Optional[httpx.Response]) -> Optional[Tuple[str, str]]:
+        return classify(resp, conforms(schema, payload))
+
+    async def shrink(self, method: str, path: str, schema: dict, payload: Any, kind: str) -> Tuple[Any, int]:
+        current, steps = payload, 0
+        progress = True
+        while progress and steps < self.shrink_steps:
+            progress = False
+            for cand in shrink_candidates(current):
+                if steps >= self.shrink_steps:
+                    break
+                if _size(cand) >= _size(current):
+                    continue
+                steps += 1
+                resp, _ = await self.send(method, path, cand)
+                found = self.check(schema, cand, resp)
+                if found and found[0] == kind:
+                    current, progress = cand, True
+                    break
+        return current, steps
+
+    async def run(self, operations: Sequence[Tuple[str, str]], cases: int, invalid_ratio: float = 0.5) -> FuzzReport:
+        report = FuzzReport(seed=self.seed)
+        rng = random.Random(self.seed)
+        plan = []
+        for method, path in operations:
+            schema = self.index.request_schema(method, path)
+            if schema is None:
+                continue
+            gen = PayloadGenerator(schema, random.Random(rng.random()))
+            plan += [(method, path, schema, p) for p in gen.cases(cases, invalid_ratio)]
+        rng.shuffle(plan)
+
+        sem = asyncio.Semaphore(self.concurrency)
+        # по номеру кейса, а не по порядку ответов: какой пример сжимается, зависит только от сида
+        raw: List[Tuple[str, str, dict, Any, Optional[Tuple[str, str]], Optional[int], float]] = [None] * len(plan)
+
+        async def one(i: int, method: str, path: str, schema: dict, payload: Any):
+            async with sem:
+                resp, elapsed = await self.send(method, path, payload)
+            expect_valid = conforms(schema, payload)
+            report.valid += expect_valid
+            report.statuses[resp.status_code if resp is not None else "error"] += 1
+            raw[i] = (method, path, schema, payload, classify(resp, expect_valid),
+                      resp.status_code if resp is not None else None, elapsed)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i, *x) for i, x in enumerate(plan)))
+        report.elapsed = time.perf_counter() - t0
+        report.sent = len(plan)
+        report.latencies = [x[-1] for x in raw]
+
+        # один минимальный пример на (операция, вид бага) — остальные обычно дубли
+        seen = set()
+        for method, path, schema, payload, found, status, _ in raw:
+            if not found or (method, path, found[0]) in seen:
+                continue
+            seen.add((method, path, found[0]))
+            small, steps = await self.shrink(method, path, schema, payload, found[0])
+            report.findings.append(FuzzFinding(method, path, found[0], found[1], status, small, payload, steps))
+
+        lat = sorted(report.latencies)
+        q1, q3 = percentile(lat, 25), percentile(lat, 75)
+        if q1 is not None and len(lat) >= 20:
+            limit = max(q3 + 3 * (q3 - q1), self.outlier_floor)
+            for method, path, _, payload, _, status, elapsed in raw:
+                if elapsed > limit:
+                    report.outliers.append({
+                        "method": method, "path": path, "status_code": status,
+                        "elapsed_s": round(elapsed, 4), "limit_s": round(limit, 4),
+                        "payload_size": _size(payload),
+                    })
+            if report.outliers:
+                report.findings.append(FuzzFinding(
+                    "*", "*", LATENCY_OUTLIER, f"{len(report.outliers)} requests slower than {limit:.3f}s",
+                    None, None,
+                ))
+        return report
+
+# -----------------------
+# регрессии
+# -----------------------
+
+def regressions_path() -> str:
+    return os.getenv("FUZZ_REGRESSIONS", os.path.join("tests", "regressions", "fuzz.jsonl"))
+
+def save_regressions_enabled() -> bool:
+    """FUZZ_SAVE_REGRESSIONS=1: append new reproducers to the (tracked) regression file."""
+    return os.getenv("FUZZ_SAVE_REGRESSIONS", "0").strip().lower() in ("1", "true", "yes", "on")
+
+def load_regressions(path: Optional[str] = None) -> List[dict]:
+    path = path or regressions_path()
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _regression_key(entry: dict) -> Tuple[str, str, str, str]:
+    return (entry["method"], entry["path"], entry["kind"], json.dumps(entry["payload"], sort_keys=True))
+
+def save_regressions(findings: Sequence[FuzzFinding], path: Optional[str] = None) -> int:
+    """Appends new minimal reproducers; returns how many were not in the file yet."""
+    path = path or regressions_path()
+    known = {_regression_key(e) for e in load_regressions(path)}
+    new = []
+    for f in findings:
+        if f.kind not in BUG_KINDS:
+            continue
+        entry = {
+            "method": f.method, "path": f.path, "kind": f.kind, "payload": f.payload,
+            "detail": f.detail, "found_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        if _regression_key(entry) not in known:
+            known.add(_regression_key(entry))
+            new.append(entry)
+    if new:
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as fh:
+            for e in new:
+                fh.write(json.dumps(e, ensure_ascii=False) + "\n")
+    return len(new)
+
+def fuzz_operations_from_env() -> List[Tuple[str, str]]:
+    raw = os.getenv("FUZZ_OPERATIONS", "POST /uploads/presigned,POST /jobs")
+    ops = []
+    for item in raw.split(","):
+        method, _, path = item.strip().partition(" ")
+        if path:
+            ops.append((method.upper(), path.strip()))
+    return ops
+
+def run_fuzz(pool, index: SpecIndex, operations: Sequence[Tuple[str, str]], cases: int,
+             invalid_ratio: float = 0.5, **kwargs) -> FuzzReport:
+    """Sync entry point: one event loop, one AsyncClient from the pool."""
+    async def run():
+        async with pool.async_api() as c:
+            return await Fuzzer(c, index, **kwargs).run(operations, cases, invalid_ratio)
+
+    return asyncio.run(run())
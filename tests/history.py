@@ -0,0 +1,286 @@
+import math
+import os
+import sqlite3
+import subprocess
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+
+import pytest
+
+from tests.artifacts import CURRENT_TEST
+from tests.stats import percentile
+from tests.timing import EndpointTimings
+
+# -----------------------
+# выборки текущего прогона
+# -----------------------
+
+# metric -> направление: больше = хуже (latency) или меньше = хуже (throughput)
+METRICS = {
+    "latency": "higher_is_worse",            # секунды, ключ — эндпоинт
+    "job_time_to_terminal": "higher_is_worse",  # секунды от создания до терминального статуса
+    "upload_throughput": "lower_is_worse",   # MiB/s, ключ — метод + хост + размер
+}
+
+class PerfSamples:
+    """
+    metric -> key -> values of one process.
+    to_dict()/merge() carry worker samples to the xdist controller.
+    """
+
+    def __init__(self):
+        self.values: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+
+    def add(self, metric: str, key: str, value: float) -> None:
+        self.values[metric][key].append(value)
+
+    def add_timings(self, timings: EndpointTimings) -> None:
+        for key, items in timings.endpoints().items():
+            self.values["latency"][key] += [t.total for t in items if t.total is not None]
+
+    def to_dict(self) -> Dict[str, Dict[str, List[float]]]:
+        return {metric: dict(keys) for metric, keys in self.values.items()}
+
+    def merge(self, data: Dict[str, Dict[str, List[float]]]) -> None:
+        for metric, keys in data.items():
+            for key, values in keys.items():
+                self.values[metric][key] += values
+
+    def __bool__(self) -> bool:
+        return any(v for keys in self.values.values() for v in keys.values())
+
+PERF_KEY = pytest.StashKey[PerfSamples]()
+
+def record_sample(metric: str, key: str, value: float) -> None:
+    """Adds a sample to the running session; a no-op outside pytest (loadgen, scripts)."""
+    item = CURRENT_TEST.get()
+    samples = item.config.stash.get(PERF_KEY, None) if item is not None else None
+    if samples is not None:
+        samples.add(metric, key, value)
+
+def size_bucket(n: int) -> str:
+    # пропускная способность 10 КБ и 100 МБ несравнима: сравниваем внутри корзины
+    mib = 1024 * 1024
+    if n < mib:
+        return "<1MiB"
+    if n < 16 * mib:
+        return "1-16MiB"
+    return ">=16MiB"
+
+# -----------------------
+# SQLite-история
+# -----------------------
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    commit_sha TEXT NOT NULL,
+    base_url TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    exitstatus INTEGER
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS samples_by_metric ON samples (metric, key, run_id);
+CREATE INDEX IF NOT EXISTS runs_by_url ON runs (base_url, id);
+"""
+
+def history_path() -> str:
+    return os.getenv("PERF_HISTORY_DB", os.path.join(".cache", "perf", "history.sqlite"))
+
+def history_enabled() -> bool:
+    """PERF_HISTORY=1 (CI): off by default, so laptop runs do not become the baseline."""
+    return os.getenv("PERF_HISTORY", "0").strip().lower() in ("1", "true", "yes", "on")
+
+def current_commit() -> str:
+    """GIT_COMMIT / GITHUB_SHA in CI, `git rev-parse HEAD` locally."""
+    for name in ("GIT_COMMIT", "GITHUB_SHA"):
+        if os.getenv(name, "").strip():
+            return os.environ[name].strip()
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5)
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+    return out.stdout.strip() or "unknown"
+
+def connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or history_path()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    # несколько CI-джобов на одном раннере: ждём блокировку, а не падаем
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+def save_run(conn: sqlite3.Connection, commit: str, base_url: str, samples: PerfSamples,
+             exitstatus: Optional[int] = None) -> int:
+    with conn:
+        cur = conn.execute(
+            "INSERT INTO runs (commit_sha, base_url, started_at, exitstatus) VALUES (?, ?, ?, ?)",
+            (commit, base_url, time.time(), exitstatus),
+        )
+        run_id = cur.lastrowid
+        conn.executemany(
+            "INSERT INTO samples (run_id, metric, key, value) VALUES (?, ?, ?, ?)",
+            [
+                (run_id, metric, key, v)
+                for metric, keys in samples.values.items()
+                for key, values in keys.items()
+                for v in values
+            ],
+        )
+    return run_id
+
+def latest_run(conn: sqlite3.Connection, base_url: Optional[str] = None) -> Optional[int]:
+    if base_url is None:
+        row = conn.execute("SELECT max(id) FROM runs").fetchone()
+    else:
+        row = conn.execute("SELECT max(id) FROM runs WHERE base_url = ?", (base_url,)).fetchone()
+    return row[0]
+
+def _samples(conn: sqlite3.Connection, run_ids: Sequence[int]) -> Dict[tuple, List[float]]:
+    out: Dict[tuple, List[float]] = defaultdict(list)
+    if not run_ids:
+        return out
+    marks = ",".join("?" * len(run_ids))
+    for metric, key, value in conn.execute(
+        f"SELECT metric, key, value FROM samples WHERE run_id IN ({marks})", list(run_ids)
+    ):
+        out[(metric, key)].append(value)
+    return out
+
+# -----------------------
+# сравнение с базовой линией
+# -----------------------
+
+def mann_whitney_u(a: Sequence[float], b: Sequence[float]) -> float:
+    """
+    One-sided p-value that values in `b` tend to be larger than in `a`
+    (normal approximation with tie correction; fine from ~5 samples a side).
+    """
+    n1, n2 = len(a), len(b)
+    ranked = sorted([(v, 0) for v in a] + [(v, 1) for v in b])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    i = 0
+    while i < len(ranked):
+        j = i
+        while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t ** 3 - t
+        i = j + 1
+    r2 = sum(r for r, (_, side) in zip(ranks, ranked) if side == 1)
+    u2 = r2 - n2 * (n2 + 1) / 2
+    n = n1 + n2
+    var = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if var <= 0:
+        return 1.0
+    z = (u2 - n1 * n2 / 2 - 0.5) / math.sqrt(var)  # поправка на непрерывность
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+@dataclass
+class Comparison:
+    metric: str
+    key: str
+    baseline_n: int
+    current_n: int
+    baseline_p50: float
+    current_p50: float
+    change: float       # относительное ухудшение медианы: +0.25 = на 25% хуже
+    p_value: float
+    regression: bool
+
+    def as_dict(self) -> dict:
+        return {
+            "metric": self.metric,
+            "key": self.key,
+            "baseline_n": self.baseline_n,
+            "current_n": self.current_n,
+            "baseline_p50": self.baseline_p50,
+            "current_p50": self.current_p50,
+            "change": round(self.change, 4),
+            "p_value": round(self.p_value, 6),
+            "regression": self.regression,
+        }
+
+@dataclass
+class CompareSettings:
+    """
+    baseline_runs: how many previous runs against the same base URL form the baseline
+    alpha:         significance level of the one-sided Mann-Whitney U test
+    threshold:     smallest median change that counts (0.2 = 20% worse)
+    min_samples:   keys with fewer samples on either side are not judged
+    min_delta:     for durations, smallest absolute median change in seconds
+                   (+30% of 0.2ms is noise, not a regression)
+    """
+    baseline_runs: int = 10
+    alpha: float = 0.01
+    threshold: float = 0.2
+    min_samples: int = 5
+    min_delta: float = 0.005
+
+    @classmethod
+    def from_env(cls) -> "CompareSettings":
+        def f(name: str, default):
+            raw = os.getenv(name, "").strip()
+            return type(default)(raw) if raw else default
+        return cls(
+            baseline_runs=f("PERF_BASELINE_RUNS", cls.baseline_runs),
+            alpha=f("PERF_ALPHA", cls.alpha),
+            threshold=f("PERF_REGRESSION_THRESHOLD", cls.threshold),
+            min_samples=f("PERF_MIN_SAMPLES", cls.min_samples),
+            min_delta=f("PERF_MIN_DELTA_MS", cls.min_delta * 1000) / 1000,
+        )
+
+def compare_run(conn: sqlite3.Connection, run_id: int, settings: Optional[CompareSettings] = None) -> List[Comparison]:
+    """Run `run_id` against the pooled samples of the previous runs with the same base URL."""
+    settings = settings or CompareSettings()
+    row = conn.execute("SELECT base_url FROM runs WHERE id = ?", (run_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"no run with id {run_id}")
+    baseline_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM runs WHERE base_url = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        (row[0], run_id, settings.baseline_runs),
+    )]
+    baseline = _samples(conn, baseline_ids)
+    current = _samples(conn, [run_id])
+
+    out = []
+    for (metric, key), cur in sorted(current.items()):
+        base = baseline.get((metric, key), [])
+        if len(base) < settings.min_samples or len(cur) < settings.min_samples:
+            continue
+        b50, c50 = percentile(sorted(base), 50), percentile(sorted(cur), 50)
+        if METRICS.get(metric) == "lower_is_worse":
+            # хуже = меньше: сравниваем с обратным знаком
+            p = mann_whitney_u([-v for v in base], [-v for v in cur])
+            change = (b50 - c50) / b50 if b50 else 0.0
+            large = True
+        else:
+            p = mann_whitney_u(base, cur)
+            change = (c50 - b50) / b50 if b50 else 0.0
+            large = c50 - b50 >= settings.min_delta
+        out.append(Comparison(
+            metric, key, len(base), len(cur), b50, c50, change, p,
+            regression=p < settings.alpha and change > settings.threshold and large,
+        ))
+    return out
+
+def format_comparison(c: Comparison) -> str:
+    """One line per key; the sign of the change is "worse" for every metric."""
+    unit = "MiB/s" if METRICS.get(c.metric) == "lower_is_worse" else "ms"
+    scale = 1 if unit == "MiB/s" else 1000
+    flag = "REGRESSION " if c.regression else ""
+    return (
+        f"{flag}{c.metric} {c.key}: p50 {c.baseline_p50 * scale:.1f} -> {c.current_p50 * scale:.1f}{unit} "
+        f"({c.change:+.0%}, p={c.p_value:.4f}, n={c.baseline_n}/{c.current_n})"
+    )
@@ -0,0 +1,256 @@
+import contextvars
+import hashlib
+import json
+import os
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional, Set
+
+import pytest
+
+from tests.artifacts import CURRENT_TEST
+from tests.openapi import SpecIndex
+from tests.timing import endpoint_key
+
+# -----------------------
+# какие эндпоинты дёргает каждый тест
+# -----------------------
+
+def impact_dir() -> str:
+    return os.getenv("IMPACT_DIR", os.path.join(".cache", "impact"))
+
+def coverage_path() -> str:
+    return os.path.join(impact_dir(), "coverage.json")
+
+def spec_snapshot_path(stand: str) -> str:
+    name = hashlib.sha256(stand.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(impact_dir(), f"spec-{name}.json")
+
+class EndpointCoverage:
+    """
+    nodeid -> endpoint keys ("GET /jobs/{id}/status") of the requests made
+    while the test ran. Only tests whose call phase ran are exported: a
+    skipped test keeps whatever an earlier run recorded for it.
+    """
+
+    def __init__(self):
+        self.endpoints: Dict[str, Set[str]] = defaultdict(set)
+        self.ran: Set[str] = set()
+
+    def add(self, nodeid: str, key: str) -> None:
+        self.endpoints[nodeid].add(key)
+
+    def to_dict(self) -> Dict[str, List[str]]:
+        return {nodeid: sorted(self.endpoints.get(nodeid, ())) for nodeid in sorted(self.ran)}
+
+    def merge(self, data: Dict[str, List[str]]) -> None:
+        for nodeid, keys in data.items():
+            self.ran.add(nodeid)
+            self.endpoints[nodeid].update(keys)
+
+COVERAGE_KEY = pytest.StashKey[EndpointCoverage]()
+
+# preflight и session-фикстуры (загрузка спеки и т.п.) общие для всех тестов:
+# их запросы не приписываются тесту, который первым их вызвал
+_SHARED_SETUP: contextvars.ContextVar[bool] = contextvars.ContextVar("api_tests_shared_setup", default=False)
+
+@contextmanager
+def shared_setup():
+    """Requests made inside are not attributed to the running test."""
+    token = _SHARED_SETUP.set(True)
+    try:
+        yield
+    finally:
+        _SHARED_SETUP.reset(token)
+
+def coverage_enabled() -> bool:
+    """IMPACT_RECORD=1 (CI) writes the index; off by default, so partial local runs do not rewrite it."""
+    return os.getenv("IMPACT_RECORD", "0").strip().lower() in ("1", "true", "yes", "on")
+
+def record_request(method: str, url: str, api_origin: Optional[str]) -> None:
+    """Attributes an API request to the running test; a no-op outside pytest and in shared setup."""
+    if _SHARED_SETUP.get():
+        return
+    item = CURRENT_TEST.get()
+    cov = item.config.stash.get(COVERAGE_KEY, None) if item is not None else None
+    if cov is None:
+        return
+    key = endpoint_key(method, url, api_origin)
+    # presigned-хранилище схлопывается в origin: это не операция спеки
+    if key.split(" ", 1)[1].startswith("/"):
+        cov.add(item.nodeid, key)
+
+def load_index(path: Optional[str] = None) -> Dict[str, List[str]]:
+    try:
+        with open(path or coverage_path(), encoding="utf-8") as f:
+            return json.load(f)["tests"]
+    except (OSError, ValueError, KeyError):
+        return {}
+
+def save_index(data: Dict[str, List[str]], path: Optional[str] = None) -> Dict[str, List[str]]:
+    """Merges this session into the index on disk: tests that ran replace their old entry."""
+    path = path or coverage_path()
+    index = {**load_index(path), **data}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"tests": dict(sorted(index.items()))}, f, indent=1)
+    os.replace(tmp, path)
+    return index
+
+# -----------------------
+# дифф спеки
+# -----------------------
+
+# описания и примеры не меняют контракт
+_COSMETIC = {"description", "summary", "example", "examples", "title", "externalDocs", "tags", "operationId"}
+
+def _canonical(value) -> str:
+    def strip(v):
+        if isinstance(v, dict):
+            return {k: strip(x) for k, x in v.items() if k not in _COSMETIC}
+        if isinstance(v, list):
+            return [strip(x) for x in v]
+        return v
+    return json.dumps(strip(value), sort_keys=True)
+
+def _parameters(index: SpecIndex, method: str, path: str) -> Dict[str, str]:
+    item = (index.spec.get("paths") or {}).get(path) or {}
+    params = list(item.get("parameters") or []) + list((index.operation(method, path) or {}).get("parameters") or [])
+    out = {}
+    for p in index.resolve(params):
+        out[f"{p.get('in')}:{p.get('name')}"] = _canonical(p)
+    return out
+
+def _request(index: SpecIndex, method: str, path: str) -> str:
+    return _canonical(index.resolve((index.operation(method, path) or {}).get("requestBody")))
+
+def _responses(index: SpecIndex, method: str, path: str) -> Dict[str, str]:
+    responses = (index.operation(method, path) or {}).get("responses") or {}
+    return {str(status): _canonical(index.resolve(r)) for status, r in responses.items()}
+
+@dataclass
+class Change:
+    method: str
+    path: str
+    kind: str       # added | removed | parameters | request | responses
+    detail: str = ""
+
+    @property
+    def operation(self) -> str:
+        return f"{self.method} {self.path}"
+
+    def __str__(self) -> str:
+        return f"{self.operation}: {self.kind}" + (f" ({self.detail})" if self.detail else "")
+
+def _changed_keys(old: Dict[str, str], new: Dict[str, str]) -> List[str]:
+    return sorted(k for k in set(old) | set(new) if old.get(k) != new.get(k))
+
+def diff_specs(old: SpecIndex, new: SpecIndex) -> List[Change]:
+    """
+    Operation-level diff with $refs resolved, so an edited component schema
+    shows up on every operation that uses it.
+    """
+    changes = []
+    for method, path in sorted(set(old.operations) | set(new.operations), key=lambda x: (x[1], x[0])):
+        if (method, path) not in old.operations:
+            changes.append(Change(method, path, "added"))
+            continue
+        if (method, path) not in new.operations:
+            changes.append(Change(method, path, "removed"))
+            continue
+        params = _changed_keys(_parameters(old, method, path), _parameters(new, method, path))
+        if params:
+            changes.append(Change(method, path, "parameters", ", ".join(params)))
+        if _request(old, method, path) != _request(new, method, path):
+            changes.append(Change(method, path, "request"))
+        statuses = _changed_keys(_responses(old, method, path), _responses(new, method, path))
+        if statuses:
+            changes.append(Change(method, path, "responses", ", ".join(statuses)))
+    return changes
+
+# -----------------------
+# выбор тестов
+# -----------------------
+
+@dataclass
+class Selection:
+    """
+    full:     no baseline spec or no coverage index -> run everything
+    selected: nodeids that hit a changed operation
+    known:    every nodeid in the coverage index; tests outside it are new and always run
+    """
+    full: bool
+    reason: str
+    changes: List[Change]
+    selected: List[str]
+    known: List[str]
+
+    def as_dict(self) -> dict:
+        return {
+            "full": self.full,
+            "reason": self.reason,
+            "changes": [{**asdict(c), "operation": c.operation} for c in self.changes],
+            "selected": self.selected,
+            "known": self.known,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Selection":
+        return cls(
+            full=data["full"],
+            reason=data["reason"],
+            changes=[Change(c["method"], c["path"], c["kind"], c.get("detail", "")) for c in data["changes"]],
+            selected=data["selected"],
+            known=data["known"],
+        )
+
+    def keeps(self, nodeid: str, smoke: bool) -> bool:
+        return self.full or smoke or nodeid in self.selected or nodeid not in self.known
+
+def affected_tests(changes: Iterable[Change], index: Dict[str, List[str]], old: SpecIndex, new: SpecIndex) -> List[str]:
+    changed = {c.operation for c in changes}
+    out = []
+    for nodeid, keys in index.items():
+        for key in keys:
+            method, _, path = key.partition(" ")
+            template = new.match(method, path) or old.match(method, path)
+            if template is not None and f"{method} {template}" in changed:
+                out.append(nodeid)
+                break
+    return sorted(out)
+
+def select(old: Optional[SpecIndex], new: SpecIndex, index: Dict[str, List[str]]) -> Selection:
+    if old is None:
+        return Selection(True, "no recorded spec to compare with", [], [], sorted(index))
+    if not index:
+        return Selection(True, "no endpoint coverage index yet", [], [], [])
+    changes = diff_specs(old, new)
+    return Selection(
+        full=False,
+        reason=f"{len(changes)} changed operation(s)" if changes else "spec unchanged",
+        changes=changes,
+        selected=affected_tests(changes, index, old, new),
+        known=sorted(index),
+    )
+
+def load_snapshot(stand: str) -> Optional[SpecIndex]:
+    try:
+        with open(spec_snapshot_path(stand), encoding="utf-8") as f:
+            return SpecIndex(json.load(f))
+    except (OSError, ValueError):
+        return None
+
+def save_snapshot(stand: str, spec: dict) -> str:
+    path = spec_snapshot_path(stand)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(spec, f, ensure_ascii=False)
+    os.replace(tmp, path)
+    return path
+
+def load_selection(path: str) -> Selection:
+    with open(path, encoding="utf-8") as f:
+        return Selection.from_dict(json.load(f))
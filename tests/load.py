@@ -0,0 +1,165 @@
+import asyncio
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from typing import List, Optional
+
+from tests.client import ClientPool
+from tests.flow import FlowError, run_upload_flow
+from tests.stats import LoadStats
+
+# -----------------------
+# конфигурация нагрузки
+# -----------------------
+
+@dataclass(frozen=True)
+class LoadConfig:
+    """
+    mode="open"   -> new flows arrive at `rate` per second (Poisson arrivals),
+                     regardless of how fast the API answers;
+    mode="closed" -> `users` virtual users, each starts the next flow when
+                     the previous one finishes (+ optional think time).
+    """
+    mode: str = "open"
+    rate: float = 1.0
+    users: int = 1
+    duration: float = 30.0
+    processes: int = 1
+    max_in_flight: int = 200
+    think_time: float = 0.0
+    poll: bool = True
+    poll_timeout: float = 30.0
+    filename: str = "test.jpg"
+    content_type: str = "image/jpeg"
+    size: int = 4
+
+    def split(self) -> List["LoadConfig"]:
+        """
+        Shares of the load for the worker processes: the rate is divided evenly,
+        users are dealt out so that their total stays `users` (the first
+        users % n processes get one more). A closed model never starts more
+        processes than users.
+        """
+        n = max(self.processes, 1)
+        if self.mode == "closed":
+            n = min(n, max(self.users, 1))
+        base, extra = divmod(self.users, n)
+        return [replace(self, rate=self.rate / n, users=base + (i < extra), processes=1) for i in range(n)]
+
+def _payload(size: int) -> bytes:
+    jpg = b"\xFF\xD8\xFF\xD9"
+    if size <= len(jpg):
+        return jpg
+    # padding between SOI and EOI keeps the magic bytes intact
+    return jpg[:2] + b"\x00" * (size - len(jpg)) + jpg[2:]
+
+# -----------------------
+# модели нагрузки
+# -----------------------
+
+async def _one_flow(clients, stats: LoadStats, cfg: LoadConfig, content: bytes) -> None:
+    try:
+        await run_upload_flow(
+            clients, stats, content,
+            filename=cfg.filename,
+            content_type=cfg.content_type,
+            poll=cfg.poll,
+            poll_timeout=cfg.poll_timeout,
+        )
+    except FlowError:
+        pass  # already recorded per stage
+
+async def _open_model(clients, stats: LoadStats, cfg: LoadConfig, content: bytes) -> None:
+    in_flight = set()
+    deadline = time.monotonic() + cfg.duration
+    next_at = time.monotonic()
+    while True:
+        next_at += random.expovariate(cfg.rate)
+        if next_at >= deadline:
+            break
+        await asyncio.sleep(max(next_at - time.monotonic(), 0))
+        if len(in_flight) >= cfg.max_in_flight:
+            # the API is slower than the arrival rate: count it instead of queueing forever
+            stats.record("dropped", 0.0, error="max_in_flight")
+            continue
+        t = asyncio.create_task(_one_flow(clients, stats, cfg, content))
+        in_flight.add(t)
+        t.add_done_callback(in_flight.discard)
+    if in_flight:
+        await asyncio.gather(*in_flight)
+
+async def _closed_model(clients, stats: LoadStats, cfg: LoadConfig, content: bytes) -> None:
+    deadline = time.monotonic() + cfg.duration
+
+    async def user():
+        while time.monotonic() < deadline:
+            await _one_flow(clients, stats, cfg, content)
+            if cfg.think_time:
+                await asyncio.sleep(cfg.think_time)
+
+    await asyncio.gather(*(user() for _ in range(cfg.users)))
+
+async def _run_async(cfg: LoadConfig, pool: ClientPool) -> LoadStats:
+    stats = LoadStats()
+    content = _payload(cfg.size)
+    async with pool.async_clients() as clients:
+        if cfg.mode == "open":
+            await _open_model(clients, stats, cfg, content)
+        elif cfg.mode == "closed":
+            await _closed_model(clients, stats, cfg, content)
+        else:
+            raise ValueError(f"Unknown load mode: {cfg.mode!r}")
+    return stats
+
+def _worker(cfg_dict: dict, base_url: str, headers: dict) -> dict:
+    cfg = LoadConfig(**cfg_dict)
+    pool = ClientPool.from_env(base_url, headers)
+    return asyncio.run(_run_async(cfg, pool)).to_dict()
+
+# -----------------------
+# точка входа
+# -----------------------
+
+@dataclass
+class LoadReport:
+    config: LoadConfig
+    duration: float
+    stats: LoadStats
+
+    def as_dict(self) -> dict:
+        flows = self.stats.stages.get("flow")
+        return {
+            "config": asdict(self.config),
+            "duration": self.duration,
+            "throughput_flows_per_s": (flows.count - flows.failed) / self.duration if flows and self.duration else 0.0,
+            "stages": self.stats.summary(self.duration),
+        }
+
+def run_load(cfg: LoadConfig, base_url: str, headers: dict, pool: Optional[ClientPool] = None) -> LoadReport:
+    """Runs the load in this process or in `cfg.processes` worker processes."""
+    started = time.perf_counter()
+    if cfg.processes <= 1:
+        stats = asyncio.run(_run_async(cfg, pool or ClientPool.from_env(base_url, headers)))
+    else:
+        stats = LoadStats()
+        parts = cfg.split()
+        with ProcessPoolExecutor(max_workers=len(parts)) as ex:
+            futures = [ex.submit(_worker, asdict(part), base_url, headers) for part in parts]
+            for f in futures:
+                stats.merge(f.result())
+    return LoadReport(config=cfg, duration=time.perf_counter() - started, stats=stats)
+
+def config_from_env(**overrides) -> LoadConfig:
+    env = {
+        "mode": os.getenv("LOAD_MODE"),
+        "rate": os.getenv("LOAD_RATE"),
+        "users": os.getenv("LOAD_USERS"),
+        "duration": os.getenv("LOAD_DURATION"),
+        "processes": os.getenv("LOAD_PROCESSES"),
+    }
+    types = {"mode": str, "rate": float, "users": int, "duration": float, "processes": int}
+    kwargs = {k: types[k](v) for k, v in env.items() if v}
+    kwargs.update({k: v for k, v in overrides.items() if v is not None})
+    return LoadConfig(**kwargs)
@@ -0,0 +1,380 @@
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import struct
+import zipfile
+from dataclasses import asdict, dataclass
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+# -----------------------
+# синтетические медиафайлы без внешних утилит
+# -----------------------
+
+GENERATOR_VERSION = 1
+CHUNK = 1024 * 1024
+
+# kind -> (extension, content type)
+KINDS: Dict[str, Tuple[str, str]] = {
+    "mp4": ("mp4", "video/mp4"),
+    "mp3": ("mp3", "audio/mpeg"),
+    "wav": ("wav", "audio/wav"),
+    "pdf": ("pdf", "application/pdf"),
+    "zip": ("zip", "application/zip"),
+    "jpeg": ("jpg", "image/jpeg"),
+}
+
+def _repeat(block: bytes, n: int) -> Iterator[bytes]:
+    """`n` bytes of `block` repeated, at most CHUNK at a time."""
+    if not block or n <= 0:
+        return
+    big = block * max(CHUNK // len(block), 1)
+    while n > 0:
+        yield big[:min(n, len(big))]
+        n -= len(big)
+
+def _noise(seed: int) -> bytes:
+    # несжимаемый, но воспроизводимый блок: один и тот же seed -> те же байты
+    return random.Random(seed).randbytes(64 * 1024)
+
+def _write(f: BinaryIO, *parts) -> None:
+    for p in parts:
+        if isinstance(p, (bytes, bytearray)):
+            f.write(p)
+        else:
+            for chunk in p:
+                f.write(chunk)
+
+# форматы, у которых длительность задаёт содержимое; у остальных её нет
+TIMED_KINDS = frozenset({"mp4", "mp3", "wav"})
+
+def _too_small(kind: str, size: int, minimum: int) -> ValueError:
+    return ValueError(f"{kind}: {size} bytes requested, the smallest valid file here is {minimum} bytes")
+
+def _contradicts(kind: str, size: int, duration: float, detail: str) -> ValueError:
+    return ValueError(f"{kind}: {size} bytes and {duration:g}s contradict each other, {detail}")
+
+# ---- WAV: PCM 8 bit mono 8 kHz, синус 440 Гц ----
+
+WAV_RATE = 8000
+
+def _write_wav(f: BinaryIO, size: Optional[int], duration: Optional[float], seed: int) -> None:
+    head_len = 44
+    if size is None or duration is not None:
+        n = int(round((duration or 1.0) * WAV_RATE))
+        if size is not None and size != head_len + n:
+            raise _contradicts("wav", size, duration, f"a {duration:g}s file is exactly {head_len + n} bytes")
+    else:
+        if size < head_len:
+            raise _too_small("wav", size, head_len)
+        n = size - head_len
+    second = bytes(128 + int(100 * math.sin(2 * math.pi * 440 * i / WAV_RATE)) for i in range(WAV_RATE))
+    fmt = struct.pack("<HHIIHH", 1, 1, WAV_RATE, WAV_RATE, 1, 8)
+    # последний чанк нечётной длины без pad-байта: размер файла ровно как просили
+    head = b"RIFF" + struct.pack("<I", 36 + n) + b"WAVE" + b"fmt " + struct.pack("<I", 16) + fmt
+    _write(f, head, b"data" + struct.pack("<I", n), _repeat(second, n))
+
+# ---- MP3: ID3v2 + кадры MPEG-1 Layer III 128 kbit/s 44.1 kHz (тишина) ----
+
+MP3_FRAME = 417                     # 144 * 128000 / 44100, без padding-бита
+MP3_FRAME_SECONDS = 1152 / 44100
+
+def _syncsafe(n: int) -> bytes:
+    return bytes([(n >> 21) & 0x7F, (n >> 14) & 0x7F, (n >> 7) & 0x7F, n & 0x7F])
+
+def _write_mp3(f: BinaryIO, size: Optional[int], duration: Optional[float], seed: int) -> None:
+    title = b"\x03api-tests synthetic mp3"
+    tit2 = b"TIT2" + _syncsafe(len(title)) + b"\x00\x00" + title
+    tag_min = 10 + len(tit2)
+    if size is None or duration is not None:
+        frames = max(int(math.ceil((duration or 1.0) / MP3_FRAME_SECONDS)), 1)
+        # размер больше нужного — остаток в padding ID3-тега, длительность та же
+        padding = 0 if size is None else size - tag_min - frames * MP3_FRAME
+        if padding < 0:
+            raise _contradicts("mp3", size, duration, f"{duration:g}s need at least {tag_min + frames * MP3_FRAME} bytes")
+    else:
+        if size < tag_min + MP3_FRAME:
+            raise _too_small("mp3", size, tag_min + MP3_FRAME)
+        frames = (size - tag_min) // MP3_FRAME
+        padding = size - tag_min - frames * MP3_FRAME  # остаток уходит в padding ID3-тега
+    header = b"ID3\x04\x00\x00" + _syncsafe(len(tit2) + padding)
+    # 0xFFFB90C4: sync, MPEG-1, Layer III, без CRC, 128 kbit/s, 44.1 kHz, mono; нулевые side info = тишина
+    frame = b"\xff\xfb\x90\xc4" + b"\x00" * (MP3_FRAME - 4)
+    _write(f, header, tit2, b"\x00" * padding, _repeat(frame, frames * MP3_FRAME))
+
+# ---- MP4: ftyp + moov (mvhd/trak) + mdat ----
+
+def _box(kind: bytes, *payload: bytes) -> bytes:
+    body = b"".join(payload)
+    return struct.pack(">I", 8 + len(body)) + kind + body
+
+def _full_box(kind: bytes, version: int, flags: int, *payload: bytes) -> bytes:
+    return _box(kind, struct.pack(">I", (version << 24) | flags), *payload)
+
+_MATRIX = struct.pack(">9I", 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+def _mp4_header(duration_ms: int) -> bytes:
+    empty_table = struct.pack(">I", 0)
+    stbl = _box(
+        b"stbl",
+        _full_box(b"stsd", 0, 0, empty_table),
+        _full_box(b"stts", 0, 0, empty_table),
+        _full_box(b"stsc", 0, 0, empty_table),
+        _full_box(b"stsz", 0, 0, struct.pack(">II", 0, 0)),
+        _full_box(b"stco", 0, 0, empty_table),
+    )
+    dinf = _box(b"dinf", _full_box(b"dref", 0, 0, struct.pack(">I", 1), _full_box(b"url ", 0, 1)))
+    minf = _box(b"minf", _full_box(b"smhd", 0, 0, struct.pack(">HH", 0, 0)), dinf, stbl)
+    hdlr = _full_box(b"hdlr", 0, 0, struct.pack(">I4s12x", 0, b"soun"), b"api-tests\x00")
+    mdhd = _full_box(b"mdhd", 0, 0, struct.pack(">IIIIHH", 0, 0, 1000, duration_ms, 0x55C4, 0))
+    tkhd = _full_box(b"tkhd", 0, 3, struct.pack(">IIIII", 0, 0, 1, 0, duration_ms), b"\x00" * 8,
+                     struct.pack(">hhhH", 0, 0, 0x0100, 0), _MATRIX, struct.pack(">II", 0, 0))
+    mvhd = _full_box(b"mvhd", 0, 0, struct.pack(">IIII", 0, 0, 1000, duration_ms), struct.pack(">iH", 0x10000, 0x0100),
+                     b"\x00" * 10, _MATRIX, b"\x00" * 24, struct.pack(">I", 2))
+    ftyp = _box(b"ftyp", b"isom", struct.pack(">I", 512), b"isomiso2mp41")
+    return ftyp + _box(b"moov", mvhd, _box(b"trak", tkhd, _box(b"mdia", mdhd, hdlr, minf)))
+
+def _write_mp4(f: BinaryIO, size: Optional[int], duration: Optional[float], seed: int) -> None:
+    head = _mp4_header(int(round((duration or 1.0) * 1000)))
+    n = (size - len(head) - 8) if size is not None else 64 * 1024
+    if n < 0:
+        raise _too_small("mp4", size, len(head) + 8)
+    _write(f, head, struct.pack(">I", 8 + n) + b"mdat", _repeat(_noise(seed), n))
+
+# ---- PDF: одна страница, объём добирается комментариями в потоке содержимого ----
+
+def _pdf_parts(stream_len: int) -> Tuple[bytes, bytes]:
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 5 0 R >> >> >>",
+        None,  # поток содержимого
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    head = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    offsets, out = [], bytearray(head)
+    for i, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        if body is None:
+            out += b"%d 0 obj\n<< /Length %d >>\nstream\n" % (i, stream_len)
+            split = len(out)
+            out += b"\nendstream\nendobj\n"
+            continue
+        out += b"%d 0 obj\n%s\nendobj\n" % (i, body)
+    xref_at = len(out) + stream_len
+    tail = bytearray(out[split:])
+    tail += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        tail += b"%010d 00000 n \n" % (off if off < split else off + stream_len)
+    tail += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_at)
+    return bytes(out[:split]), bytes(tail)
+
+PDF_TEXT = b"BT /F1 24 Tf 72 720 Td (api-tests synthetic pdf) Tj ET\n"
+
+def _pdf_padding(n: int, seed: int) -> Iterator[bytes]:
+    # строки-комментарии "% <hex>\n": поток остаётся корректным содержимым страницы
+    rng = random.Random(seed)
+    line = b"% " + rng.randbytes(38).hex().encode() + b"\n"
+    yield PDF_TEXT[:n]
+    yield from _repeat(line, n - len(PDF_TEXT))
+
+def _write_pdf(f: BinaryIO, size: Optional[int], duration: Optional[float], seed: int) -> None:
+    if size is None:
+        stream_len = len(PDF_TEXT)
+    else:
+        stream_len = max(size - sum(map(len, _pdf_parts(0))), 0)
+        for _ in range(4):  # длина числа в /Length и startxref влияет на размер: пара итераций до точки
+            stream_len = size - sum(map(len, _pdf_parts(stream_len)))
+        if stream_len < len(PDF_TEXT):
+            raise _too_small("pdf", size, sum(map(len, _pdf_parts(len(PDF_TEXT)))) + len(PDF_TEXT))
+    head, tail = _pdf_parts(stream_len)
+    _write(f, head, _pdf_padding(stream_len, seed), tail)
+
+# ---- ZIP: stored-запись с несжимаемыми данными ----
+
+ZIP_ENTRY = "payload.bin"
+
+def _write_zip(f: BinaryIO, size: Optional[int], duration: Optional[float], seed: int) -> None:
+    overhead = 30 + 46 + 2 * len(ZIP_ENTRY) + 22   # local header + central directory + EOCD
+    if size is not None and size < overhead:
+        raise _too_small("zip", size, overhead)
+    n = size - overhead if size is not None else 64 * 1024
+    info = zipfile.ZipInfo(ZIP_ENTRY, date_time=(2024, 1, 1, 0, 0, 0))
+    info.compress_type = zipfile.ZIP_STORED
+    info.file_size = n
+    with zipfile.ZipFile(f, "w") as z, z.open(info, "w") as out:
+        _write(out, _repeat(_noise(seed), n))
+
+# ---- JPEG: baseline, серое изображение, все блоки с DC=0 и сразу EOB ----
+
+# стандартные таблицы Хаффмана (ITU T.81, K.3) для яркости
+_DC_BITS = bytes([0, 1, 5, 1, 1, 1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0])
+_DC_VALS = bytes(range(12))
+_AC_BITS = bytes([0, 2, 1, 3, 3, 2, 4, 3, 5, 5, 4, 4, 0, 0, 1, 0x7D])
+_AC_VALS = bytes.fromhex(
+    "01020300041105122131410613516107227114328191a1082342b1c11552d1f02433627282090a161718191a25262728292a3435363738"
+    "393a434445464748494a535455565758595a636465666768696a737475767778797a838485868788898a92939495969798999aa2a3a4a5"
+    "a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9fa"
+)
+
+def _segment(marker: int, payload: bytes) -> bytes:
+    return struct.pack(">BBH", 0xFF, marker, len(payload) + 2) + payload
+
+def _jpeg_parts(width: int, height: int) -> Tuple[bytes, bytes]:
+    head = b"\xff\xd8" + _segment(0xE0, b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00")
+    head += _segment(0xDB, b"\x00" + bytes([16] * 64))
+    head += _segment(0xC0, struct.pack(">BHHB", 8, height, width, 1) + b"\x01\x11\x00")
+    head += _segment(0xC4, b"\x00" + _DC_BITS + _DC_VALS + b"\x10" + _AC_BITS + _AC_VALS)
+    scan = _segment(0xDA, b"\x01\x01\x00\x00\x3f\x00")
+    # блок = DC категории 0 ("00") + EOB ("1010"): 6 бит, 4 блока = 3 байта без 0xFF
+    blocks = math.ceil(width / 8) * math.ceil(height / 8)
+    bits = "001010" * blocks
+    bits += "1" * (-len(bits) % 8)
+    data = int(bits, 2).to_bytes(len(bits) // 8, "big")
+    return head, scan + data + b"\xff\xd9"
+
+def _write_jpeg(f: BinaryIO, size: Optional[int], duration: Optional[float], seed: int,
+                width: int = 64, height: int = 64) -> None:
+    head, tail = _jpeg_parts(width, height)
+    pad = 0 if size is None else size - len(head) - len(tail)
+    if pad < 0 or 0 < pad < 4:
+        raise _too_small("jpeg", size, len(head) + len(tail) + (4 if pad > 0 else 0))
+    f.write(head)
+    # объём добирается COM-сегментами (до 65533 байт полезной нагрузки каждый)
+    text = random.Random(seed).randbytes(32).hex().encode()
+    while pad > 0:
+        n = min(pad, 65535 + 2)
+        if 0 < pad - n < 4:
+            n = pad - 4
+        f.write(_segment(0xFE, (text * (n // len(text) + 1))[:n - 4]))
+        pad -= n
+    f.write(tail)
+
+_WRITERS: Dict[str, Callable[..., None]] = {
+    "mp4": _write_mp4,
+    "mp3": _write_mp3,
+    "wav": _write_wav,
+    "pdf": _write_pdf,
+    "zip": _write_zip,
+    "jpeg": _write_jpeg,
+}
+
+# -----------------------
+# кеш на диске
+# -----------------------
+
+def media_dir() -> str:
+    return os.getenv("MEDIA_CACHE_DIR", os.path.join(".cache", "media"))
+
+@dataclass(frozen=True)
+class MediaFile:
+    """
+    One corpus entry; the file is generated on first access to `path` and
+    cached as .cache/media/<kind>-<hash of the parameters>.<ext>, so repeated
+    runs and xdist workers reuse it. os.PathLike: pass it straight to
+    upload_stream().
+    """
+    kind: str
+    size: Optional[int] = None
+    duration: Optional[float] = None
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.kind not in KINDS:
+            raise ValueError(f"unknown media kind {self.kind!r}, known: {sorted(KINDS)}")
+        if self.duration is not None and self.kind not in TIMED_KINDS:
+            raise ValueError(f"{self.kind} has no duration, only {sorted(TIMED_KINDS)} do")
+
+    @property
+    def ext(self) -> str:
+        return KINDS[self.kind][0]
+
+    @property
+    def content_type(self) -> str:
+        return KINDS[self.kind][1]
+
+    @property
+    def key(self) -> str:
+        raw = json.dumps({**asdict(self), "v": GENERATOR_VERSION}, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+    @property
+    def filename(self) -> str:
+        return f"{self.kind}-{self.key}.{self.ext}"
+
+    @property
+    def label(self) -> str:
+        parts = [self.kind]
+        if self.size is not None:
+            parts.append(format_size(self.size))
+        if self.duration is not None:
+            parts.append(f"{self.duration:g}s")
+        return "-".join(parts)
+
+    @property
+    def path(self) -> str:
+        path = os.path.join(media_dir(), self.filename)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            tmp = f"{path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, "wb") as f:
+                    _WRITERS[self.kind](f, self.size, self.duration, self.seed)
+                os.replace(tmp, path)  # параллельные воркеры пишут одинаковые байты в одно имя
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+        return path
+
+    def __fspath__(self) -> str:
+        return self.path
+
+    def head(self, n: int = 16) -> bytes:
+        with open(self.path, "rb") as f:
+            return f.read(n)
+
+# -----------------------
+# корпус для параметризации
+# -----------------------
+
+_SIZE = re.compile(r"^(\d+(?:\.\d+)?)\s*(b|kib|kb|mib|mb|gib|gb)?$", re.IGNORECASE)
+_UNITS = {None: 1, "b": 1, "kb": 1024, "kib": 1024, "mb": 1024 ** 2, "mib": 1024 ** 2, "gb": 1024 ** 3, "gib": 1024 ** 3}
+
+def parse_size(raw: str) -> int:
+    m = _SIZE.match(raw.strip())
+    if not m:
+        raise ValueError(f"bad size {raw!r}, expected e.g. 512KiB or 8MiB")
+    return int(float(m.group(1)) * _UNITS[(m.group(2) or "").lower() or None])
+
+def format_size(n: int) -> str:
+    for unit, factor in (("GiB", 1024 ** 3), ("MiB", 1024 ** 2), ("KiB", 1024)):
+        if n >= factor and n % factor == 0:
+            return f"{n // factor}{unit}"
+    return f"{n}B"
+
+def parse_corpus(raw: str) -> List[MediaFile]:
+    """
+    "mp4:8MiB,wav:30s,mp3:5s:1MiB" -> kind, then a size and/or a duration
+    in any order; a duration ends with "s". With both, mp3 pads up to the
+    size and keeps the duration; a wav of another size is a ValueError.
+    """
+    out = []
+    for item in filter(None, (x.strip() for x in raw.split(","))):
+        kind, *params = item.split(":")
+        size = duration = None
+        for p in params:
+            if p.lower().endswith("s") and not p.lower().endswith(("b", "ib")):
+                duration = float(p[:-1])
+            else:
+                size = parse_size(p)
+        out.append(MediaFile(kind.strip().lower(), size=size, duration=duration))
+    return out
+
+DEFAULT_CORPUS = "mp4:256KiB:2s,mp3:3s,wav:1s,pdf:64KiB,zip:256KiB,jpeg:32KiB"
+
+def corpus_from_env() -> List[MediaFile]:
+    """MEDIA_CORPUS overrides the default set of generated files."""
+    return parse_corpus(os.getenv("MEDIA_CORPUS", "").strip() or DEFAULT_CORPUS)
@@ -0,0 +1,314 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from pydantic import ValidationError
+
+from tests.client import AsyncClients, ClientPool
+from tests.flow import FlowError, run_upload_flow
+from tests.schemas import HealthResponse, ReadyResponse
+
+# -----------------------
+# метрики в текстовом формате Prometheus (без prometheus_client)
+# -----------------------
+
+# от 5 мс до 30 с: и быстрые пробы, и джоба на медленном стенде
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels: Labels, le: Optional[str] = None) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in labels]
+    if le is not None:
+        parts.append(f'le="{le}"')
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, v: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if v <= bound:
+                self.counts[i] += 1
+        self.sum += v
+        self.count += 1
+
+class Registry:
+    """
+    Counters, gauges and histograms keyed by (name, labels); render() is the
+    /metrics body. Checks run on the event loop, the HTTP server reads from
+    its own thread: everything goes through one lock.
+    """
+
+    def __init__(self, prefix: str = "api_monitor"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        self._gauges: Dict[str, Dict[Labels, float]] = defaultdict(dict)
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = defaultdict(dict)
+
+    def describe(self, name: str, kind: str, text: str) -> None:
+        self._help[f"{self.prefix}_{name}"] = (kind, text)
+
+    def inc(self, name: str, value: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[f"{self.prefix}_{name}"]
+            series[key] = series.get(key, 0.0) + value
+
+    def set_total(self, name: str, value: float, **labels: str) -> None:
+        """Counter mirrored from a cumulative source (ConnectionStats of the pool)."""
+        with self._lock:
+            self._counters[f"{self.prefix}_{name}"][tuple(sorted(labels.items()))] = value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self._gauges[f"{self.prefix}_{name}"][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms[f"{self.prefix}_{name}"]
+            series.setdefault(key, _Histogram()).observe(value)
+
+    def value(self, name: str, **labels: str) -> Optional[float]:
+        key = tuple(sorted(labels.items()))
+        full = f"{self.prefix}_{name}"
+        with self._lock:
+            for kind in (self._counters, self._gauges):
+                if key in kind.get(full, {}):
+                    return kind[full][key]
+            h = self._histograms.get(full, {}).get(key)
+            return float(h.count) if h is not None else None
+
+    def render(self) -> str:
+        out: List[str] = []
+        with self._lock:
+            for kind, store in (("counter", self._counters), ("gauge", self._gauges), ("histogram", self._histograms)):
+                for name in sorted(store):
+                    out.append(f"# HELP {name} {self._help.get(name, (kind, name))[1]}")
+                    out.append(f"# TYPE {name} {kind}")
+                    for labels, v in sorted(store[name].items()):
+                        if kind != "histogram":
+                            out.append(f"{name}{_labels(labels)} {_num(v)}")
+                            continue
+                        for bound, n in zip(BUCKETS, v.counts):
+                            out.append(f"{name}_bucket{_labels(labels, _num(bound))} {n}")
+                        out.append(f"{name}_bucket{_labels(labels, '+Inf')} {v.count}")
+                        out.append(f"{name}_sum{_labels(labels)} {_num(v.sum)}")
+                        out.append(f"{name}_count{_labels(labels)} {v.count}")
+        return "\n".join(out) + "\n"
+
+def _describe(reg: Registry) -> None:
+    reg.describe("checks_total", "counter", "Synthetic checks by outcome")
+    reg.describe("check_failures_total", "counter", "Failed synthetic checks by stage and status code or error")
+    reg.describe("check_up", "gauge", "1 if the last run of the check succeeded")
+    reg.describe("check_duration_seconds", "histogram", "Wall time of one synthetic check")
+    reg.describe("request_duration_seconds", "histogram", "Latency of single API/storage requests by stage")
+    reg.describe("job_time_to_terminal_seconds", "gauge", "Time from job creation to a terminal status, last job")
+    reg.describe("last_success_timestamp_seconds", "gauge", "Unix time of the last successful run of the check")
+    reg.describe("cycle_duration_seconds", "gauge", "Wall time of the last monitoring cycle")
+    reg.describe("http_requests_total", "counter", "Requests sent by the pooled clients since start")
+    reg.describe("http_new_connections_total", "counter", "TCP connections opened by the pooled clients since start")
+
+# -----------------------
+# проверки
+# -----------------------
+
+CHECKS = ("health", "ready", "presign", "job")
+
+@dataclass(frozen=True)
+class MonitorConfig:
+    """
+    interval:     seconds between cycles of the cheap checks (health, ready, presign)
+    job_interval: the job check (upload + create + poll) runs at most this often
+    timeout:      per request; a hung stand costs one timeout per cycle, not more
+    """
+    interval: float = 5.0
+    job_interval: float = 60.0
+    checks: Tuple[str, ...] = CHECKS
+    timeout: float = 5.0
+    job_timeout: float = 60.0
+    host: str = "127.0.0.1"
+    port: int = 9464
+    size: int = 1024
+
+    def __post_init__(self):
+        unknown = set(self.checks) - set(CHECKS)
+        if unknown or not self.checks:
+            raise ValueError(f"unknown monitor checks {sorted(unknown)}, known: {list(CHECKS)}")
+
+def config_from_env(**overrides) -> MonitorConfig:
+    env = {
+        "interval": os.getenv("MONITOR_INTERVAL"),
+        "job_interval": os.getenv("MONITOR_JOB_INTERVAL"),
+        "checks": os.getenv("MONITOR_CHECKS"),
+        "timeout": os.getenv("MONITOR_TIMEOUT"),
+        "host": os.getenv("MONITOR_HOST"),
+        "port": os.getenv("MONITOR_PORT"),
+    }
+    types = {
+        "interval": float, "job_interval": float, "timeout": float, "host": str, "port": int,
+        "checks": lambda v: tuple(x.strip() for x in v.split(",") if x.strip()),
+    }
+    kwargs = {k: types[k](v) for k, v in env.items() if v}
+    kwargs.update({k: v for k, v in overrides.items() if v is not None})
+    return MonitorConfig(**kwargs)
+
+class _Recorder:
+    """LoadStats-compatible sink for run_upload_flow: every stage becomes a histogram sample."""
+
+    def __init__(self, reg: Registry):
+        self.reg = reg
+
+    def record(self, stage: str, latency: float, status_code: Optional[int] = None, error: Optional[str] = None) -> None:
+        if stage == "flow":
+            return  # длительность всей проверки пишет _run_check
+        if stage == "job_terminal":
+            if error is None:
+                self.reg.set("job_time_to_terminal_seconds", latency)
+            return
+        self.reg.observe("request_duration_seconds", latency, stage=stage)
+
+async def _probe(clients: AsyncClients, reg: Registry, stage: str, path: str, model, ok: Iterable[int]) -> None:
+    t0 = time.perf_counter()
+    resp = await clients.api.get(path)
+    reg.observe("request_duration_seconds", time.perf_counter() - t0, stage=stage)
+    if resp.status_code not in ok:
+        raise FlowError(stage, resp.status_code)
+    model.model_validate(resp.json())
+
+class Monitor:
+    """
+    One warm process: a single ClientPool (keep-alive, rate limiter, fake API
+    under FAKE_API=1) serves every cycle; cycle() runs the due checks
+    concurrently and only updates the registry. Build the pool with
+    record_timings=False: the registry already has the latencies, and the
+    pool's roll-up would keep every sample for as long as the process lives.
+    """
+
+    def __init__(self, cfg: MonitorConfig, pool: ClientPool, registry: Optional[Registry] = None):
+        self.cfg = cfg
+        self.pool = pool
+        self.registry = registry or Registry()
+        _describe(self.registry)
+        self.content = b"\xFF\xD8" + b"\x00" * max(cfg.size - 4, 0) + b"\xFF\xD9"
+        self._job: Optional[asyncio.Task] = None
+        self._job_started = -math.inf
+
+    async def _check(self, clients: AsyncClients, name: str) -> None:
+        if name == "health":
+            await _probe(clients, self.registry, "health", "/health", HealthResponse, ok={200})
+        elif name == "ready":
+            await _probe(clients, self.registry, "ready", "/ready", ReadyResponse, ok={200})
+        else:
+            await run_upload_flow(
+                clients, _Recorder(self.registry), self.content,
+                poll=name == "job",
+                poll_timeout=self.cfg.job_timeout,
+                until="presign" if name == "presign" else None,
+            )
+
+    async def _run_check(self, clients: AsyncClients, name: str) -> bool:
+        reg = self.registry
+        t0 = time.perf_counter()
+        try:
+            await self._check(clients, name)
+            ok, reason = True, None
+        except FlowError as e:
+            ok, reason = False, e.stage if e.status_code is None else f"{e.stage}_{e.status_code}"
+        except httpx.HTTPError as e:
+            ok, reason = False, type(e).__name__
+        except (ValidationError, ValueError):
+            ok, reason = False, "contract"
+        reg.observe("check_duration_seconds", time.perf_counter() - t0, check=name)
+        reg.inc("checks_total", check=name, result="success" if ok else "failure")
+        if reason is not None:
+            reg.inc("check_failures_total", check=name, reason=reason)
+        reg.set("check_up", 1.0 if ok else 0.0, check=name)
+        if ok:
+            reg.set("last_success_timestamp_seconds", time.time(), check=name)
+        return ok
+
+    async def cycle(self, clients: AsyncClients) -> Dict[str, bool]:
+        """Runs the cheap checks and waits for them; the job check runs in the background."""
+        t0 = time.perf_counter()
+        names = [c for c in self.cfg.checks if c != "job"]
+        results = dict(zip(names, await asyncio.gather(*(self._run_check(clients, n) for n in names))))
+        now = time.monotonic()
+        due = now - self._job_started >= self.cfg.job_interval
+        if "job" in self.cfg.checks and due and (self._job is None or self._job.done()):
+            self._job_started = now
+            self._job = asyncio.create_task(self._run_check(clients, "job"))
+        self.registry.set("cycle_duration_seconds", time.perf_counter() - t0)
+        for name, st in self.pool.stats().items():
+            self.registry.set_total("http_requests_total", st.requests, pool=name)
+            self.registry.set_total("http_new_connections_total", st.new_connections, pool=name)
+        return results
+
+    async def run(self, cycles: Optional[int] = None) -> None:
+        """Every cfg.interval seconds until cancelled (or `cycles` cycles, for tests)."""
+        async with self.pool.async_clients() as clients:
+            clients.api.timeout = httpx.Timeout(self.cfg.timeout)
+            n = 0
+            next_at = time.monotonic()
+            try:
+                while cycles is None or n < cycles:
+                    await self.cycle(clients)
+                    n += 1
+                    next_at += self.cfg.interval
+                    # отстали (медленный стенд) -> следующий цикл сразу, без накопленного долга
+                    next_at = max(next_at, time.monotonic())
+                    await asyncio.sleep(next_at - time.monotonic())
+                if self._job is not None:
+                    await self._job
+            finally:
+                if self._job is not None and not self._job.done():
+                    self._job.cancel()
+
+# -----------------------
+# /metrics
+# -----------------------
+
+def serve_metrics(registry: Registry, host: str, port: int) -> ThreadingHTTPServer:
+    """GET /metrics from a daemon thread; server.shutdown() stops it."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # скрейп каждые 15 с не должен засорять вывод
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,299 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass
+from typing import Optional, Union
+
+import httpx
+
+from tests.client import ClientPool
+from tests.poller import Backoff, retry_after_seconds
+from tests.upload import Buffer, DEFAULT_CHUNK_SIZE
+
+# -----------------------
+# загрузка с докачкой: resumable session GCS
+# -----------------------
+
+# каждый кусок, кроме последнего, кратен 256 KiB — иначе GCS отвечает 400
+CHUNK_ALIGNMENT = 256 * 1024
+DEFAULT_PART_SIZE = 32 * CHUNK_ALIGNMENT
+# 308 = кусок принят, объект ещё не собран; Range говорит, сколько байт сохранено
+INCOMPLETE = 308
+COMPLETE = frozenset({200, 201})
+
+Source = Union[str, os.PathLike, Buffer]
+
+def content_range(start: int, length: int, total: int) -> str:
+    """'bytes 0-262143/1000000' for a chunk, 'bytes */1000000' for a status query (length 0)."""
+    if length == 0:
+        return f"bytes */{total}"
+    return f"bytes {start}-{start + length - 1}/{total}"
+
+def persisted_bytes(resp: httpx.Response) -> int:
+    """Bytes the session has stored, from the Range of a 308 ('bytes=0-N'); no Range means none."""
+    raw = resp.headers.get("range", "").strip()
+    _, _, last = raw.partition("-")
+    return int(last) + 1 if last.isdigit() else 0
+
+@dataclass
+class UploadSession:
+    """
+    State of one resumable upload. `session_uri` comes from the start request
+    (POST <signed url> with "x-goog-resumable: start"); chunks go to it one
+    after another. With `path` set the state is saved after every chunk, so an
+    interrupted upload asks the session where it stopped and continues there:
+
+        session = UploadSession.resume(path) or UploadSession.create(url, size, path=path)
+    """
+    upload_url: str
+    size: int
+    part_size: int
+    session_uri: Optional[str] = None
+    offset: int = 0
+    finished: bool = False
+    path: Optional[str] = None
+
+    @classmethod
+    def create(cls, upload_url: str, size: int,
+               part_size: int = DEFAULT_PART_SIZE, path: Optional[str] = None) -> "UploadSession":
+        if part_size <= 0 or part_size % CHUNK_ALIGNMENT:
+            raise ValueError(f"part_size must be a positive multiple of {CHUNK_ALIGNMENT} bytes, got {part_size}")
+        s = cls(upload_url=upload_url, size=size, part_size=part_size, path=path)
+        s.save()
+        return s
+
+    @classmethod
+    def resume(cls, path: str) -> Optional["UploadSession"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["path"] = path
+        return cls(**data)
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        data = asdict(self)
+        data.pop("path")
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+@dataclass
+class ResumableResult:
+    session: UploadSession
+    uploaded_chunks: int = 0
+    retried_chunks: int = 0
+    resumed_at: Optional[int] = None
+    error: Optional[str] = None
+    verified: Optional[bool] = None
+    remote_size: Optional[int] = None
+    remote_md5: Optional[str] = None
+    local_md5: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "size": self.session.size,
+            "part_size": self.session.part_size,
+            "offset": self.session.offset,
+            "finished": self.session.finished,
+            "uploaded_chunks": self.uploaded_chunks,
+            "retried_chunks": self.retried_chunks,
+            "resumed_at": self.resumed_at,
+            "error": self.error,
+            "verified": self.verified,
+            "remote_size": self.remote_size,
+            "remote_md5": self.remote_md5,
+            "local_md5": self.local_md5,
+        }
+
+# -----------------------
+# чтение кусков и контрольные суммы
+# -----------------------
+
+def read_range(source: Source, start: int, length: int) -> bytes:
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            f.seek(start)
+            return f.read(length)
+    return bytes(memoryview(source)[start:start + length])
+
+def source_md5(source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE) -> str:
+    h = hashlib.md5()
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                h.update(chunk)
+    else:
+        view = memoryview(source)
+        for start in range(0, len(view), chunk_size):
+            h.update(view[start:start + chunk_size])
+    return h.hexdigest()
+
+def remote_md5(resp: httpx.Response) -> Optional[str]:
+    """md5 from x-goog-hash (base64) or a plain md5 ETag."""
+    for item in resp.headers.get_list("x-goog-hash", split_commas=True):
+        algo, _, value = item.strip().partition("=")
+        if algo == "md5":
+            return base64.b64decode(value).hex()
+    etag = resp.headers.get("etag", "").strip('"')
+    if len(etag) == 32 and all(c in "0123456789abcdef" for c in etag.lower()):
+        return etag.lower()
+    return None
+
+# -----------------------
+# загрузчик
+# -----------------------
+
+class ResumableUploader:
+    """
+    GCS resumable upload through a signed URL:
+
+      start   POST <upload_url>, x-goog-resumable: start  -> 201, Location = session URI
+      chunk   PUT <session URI>, Content-Range: bytes a-b/total -> 308 + Range, 200/201 at the end
+      status  PUT <session URI>, Content-Range: bytes */total   -> the same answers, no data
+
+    Chunks are sequential: the next one starts where the session says it
+    stopped, which may be before the end of the chunk just sent. After a 429,
+    5xx or a dropped connection the session is asked for its status and the
+    upload continues from there.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        retries: int = 3,
+        backoff: Backoff = Backoff(initial=0.5, max_delay=10.0),
+        content_type: str = "application/octet-stream",
+    ):
+        self.client = client
+        self.retries = retries
+        self.backoff = backoff
+        self.content_type = content_type
+
+    async def _send(self, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """One request, repeated on 429/5xx/transport errors; None if it never got an answer."""
+        resp = None
+        for attempt in range(self.retries + 1):
+            delay = None
+            try:
+                resp = await self.client.request(method, url, **kwargs)
+                if resp.status_code < 500 and resp.status_code != 429:
+                    return resp
+                delay = retry_after_seconds(resp)
+            except httpx.TransportError:
+                resp = None
+            if attempt < self.retries:
+                await asyncio.sleep(delay if delay is not None else self.backoff.delay(attempt))
+        return resp
+
+    @staticmethod
+    def _advance(session: UploadSession, resp: httpx.Response) -> bool:
+        if resp.status_code in COMPLETE:
+            session.offset, session.finished = session.size, True
+        elif resp.status_code == INCOMPLETE:
+            session.offset = persisted_bytes(resp)
+        else:
+            return False
+        session.save()
+        return True
+
+    async def start(self, session: UploadSession, result: ResumableResult) -> bool:
+        resp = await self._send("POST", session.upload_url, content=b"",
+                                headers={"x-goog-resumable": "start", "Content-Type": self.content_type})
+        location = resp.headers.get("location") if resp is not None else None
+        if resp is None or resp.status_code not in COMPLETE or not location:
+            result.error = f"start: {resp.status_code if resp is not None else 'no response'}"
+            return False
+        session.session_uri = location
+        session.save()
+        return True
+
+    async def status(self, session: UploadSession, result: ResumableResult) -> Optional[httpx.Response]:
+        resp = await self._send("PUT", session.session_uri, content=b"",
+                                headers={"Content-Range": content_range(0, 0, session.size)})
+        if resp is not None and self._advance(session, resp):
+            return resp
+        # 404/410: сессия истекла (GCS держит её неделю) — начинать заново
+        result.error = f"status: {resp.status_code if resp is not None else 'no response'}"
+        return None
+
+    async def upload(self, session: UploadSession, source: Source,
+                     max_chunks: Optional[int] = None) -> ResumableResult:
+        """Sends chunks from the persisted offset (at most `max_chunks`) and verifies a finished object."""
+        result = ResumableResult(session=session)
+        last = None
+        if session.session_uri is None:
+            if not await self.start(session, result):
+                return result
+        else:
+            last = await self.status(session, result)
+            if last is None:
+                return result
+            result.resumed_at = session.offset
+
+        failures = 0
+        while not session.finished and (max_chunks is None or result.uploaded_chunks < max_chunks):
+            length = min(session.part_size, session.size - session.offset)
+            data = read_range(source, session.offset, length)
+            try:
+                resp = await self.client.put(session.session_uri, content=data,
+                                             headers={"Content-Range": content_range(session.offset, length, session.size)})
+            except httpx.TransportError:
+                resp = None
+            if resp is not None and self._advance(session, resp):
+                result.uploaded_chunks += 1
+                last = resp
+                continue
+            if resp is not None and resp.status_code < 500 and resp.status_code != 429:
+                result.error = f"chunk at {session.offset}: {resp.status_code}"
+                return result
+            failures += 1
+            if failures > self.retries:
+                result.error = f"chunk at {session.offset}: {resp.status_code if resp is not None else 'no response'}"
+                return result
+            delay = retry_after_seconds(resp) if resp is not None else None
+            await asyncio.sleep(delay if delay is not None else self.backoff.delay(failures - 1))
+            result.retried_chunks += 1
+            last = await self.status(session, result)
+            if last is None:
+                return result
+
+        if session.finished:
+            await self.verify(result, source, last)
+        return result
+
+    async def verify(self, result: ResumableResult, source: Source, final: Optional[httpx.Response]) -> None:
+        """Size and md5 from the final answer (x-goog-stored-content-length, x-goog-hash), else from a HEAD."""
+        resp = final
+        if resp is None or remote_md5(resp) is None:
+            resp = await self._send("HEAD", result.session.upload_url)
+        if resp is None or resp.status_code not in COMPLETE:
+            result.verified = False
+            return
+        stored = resp.headers.get("x-goog-stored-content-length")
+        if stored is None and resp.request.method == "HEAD":
+            stored = resp.headers.get("content-length")
+        result.remote_size = int(stored) if stored else None
+        result.remote_md5 = remote_md5(resp)
+        result.local_md5 = source_md5(source)
+        if result.remote_size is None and result.remote_md5 is None:
+            return
+        result.verified = (
+            result.remote_size in (None, result.session.size)
+            and result.remote_md5 in (None, result.local_md5)
+        )
+
+def upload_resumable(pool: ClientPool, session: UploadSession, source: Source, **kwargs) -> ResumableResult:
+    """Sync entry point: runs ResumableUploader on the storage pool in a fresh event loop."""
+    max_chunks = kwargs.pop("max_chunks", None)
+
+    async def run():
+        async with pool.async_storage(session.upload_url) as c:
+            return await ResumableUploader(c, **kwargs).upload(session, source, max_chunks=max_chunks)
+
+    return asyncio.run(run())
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+# -----------------------
+# загрузка спеки с кешем на диске
+# -----------------------
+
+HTTP_METHODS = ("get", "put", "post", "delete", "options", "head", "patch", "trace")
+
+def cache_dir() -> str:
+    return os.getenv("OPENAPI_CACHE_DIR", os.path.join(".cache", "openapi"))
+
+def _cache_paths(cache_key: str, directory: str) -> Tuple[str, str]:
+    name = hashlib.sha256(cache_key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(directory, f"{name}.json"), os.path.join(directory, f"{name}.meta.json")
+
+def _read_json(path: str):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_json(path: str, data) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"  # xdist-воркеры пишут кеш одновременно
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def fetch_spec(client: httpx.Client, cache_key: str, directory: Optional[str] = None,
+               conditional: bool = True) -> Tuple[dict, bool]:
+    """
+    GET /openapi.json with If-None-Match / If-Modified-Since from the last download.
+    Returns (spec, from_cache): from_cache=True means the server answered 304.
+    conditional=False always downloads (a recorded cassette must hold the full spec).
+    """
+    directory = directory or cache_dir()
+    spec_path, meta_path = _cache_paths(cache_key, directory)
+    meta = {}
+    if conditional and os.path.exists(meta_path) and os.path.exists(spec_path):
+        meta = _read_json(meta_path)
+
+    cond = {}
+    if meta.get("etag"):
+        cond["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"):
+        cond["If-Modified-Since"] = meta["last_modified"]
+
+    r = client.get("/openapi.json", headers=cond)
+    if r.status_code == 304 and meta:
+        return _read_json(spec_path), True
+    r.raise_for_status()
+    spec = r.json()
+
+    _write_json(spec_path, spec)
+    _write_json(meta_path, {
+        "cache_key": cache_key,
+        "etag": r.headers.get("etag"),
+        "last_modified": r.headers.get("last-modified"),
+    })
+    return spec, False
+
+# -----------------------
+# индекс операций и схем
+# -----------------------
+
+class SpecIndex:
+    """
+    Parsed OpenAPI document with lookups built once:
+      index.operations[("POST", "/jobs")]           -> operation object
+      index.schemas["CreateJobRequest"]             -> schema with $ref resolved
+      index.request_schema("POST", "/jobs")         -> resolved request body schema
+      index.response_schema("GET", "/jobs/{job_id}/status", 200)
+      index.match("GET", "/jobs/abc/status")        -> "/jobs/{job_id}/status"
+    """
+
+    def __init__(self, spec: dict):
+        self.spec = spec
+        self.operations: Dict[Tuple[str, str], dict] = {}
+        for path, item in (spec.get("paths") or {}).items():
+            for method, op in item.items():
+                if method in HTTP_METHODS:
+                    self.operations[(method.upper(), path)] = op
+        self.raw_schemas = (spec.get("components") or {}).get("schemas") or {}
+        self.schemas: Dict[str, dict] = {name: self.resolve(s) for name, s in self.raw_schemas.items()}
+        self._patterns = [
+            (method, path, re.compile("^" + re.sub(r"\\\{[^/]+?\\\}", "[^/]+", re.escape(path)) + "$"))
+            for method, path in self.operations
+        ]
+
+    def resolve(self, schema, _seen: Tuple[str, ...] = ()):
+        """Inlines local $refs; a recursive reference is left as {"$ref": ...}."""
+        if isinstance(schema, list):
+            return [self.resolve(s, _seen) for s in schema]
+        if not isinstance(schema, dict):
+            return schema
+        ref = schema.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#/components/schemas/"):
+            name = ref.rsplit("/", 1)[-1]
+            if name in _seen or name not in self.raw_schemas:
+                return schema
+            return self.resolve(self.raw_schemas[name], _seen + (name,))
+        return {k: self.resolve(v, _seen) for k, v in schema.items()}
+
+    def operation(self, method: str, path: str) -> Optional[dict]:
+        return self.operations.get((method.upper(), path))
+
+    def request_schema(self, method: str, path: str, content_type: str = "application/json") -> Optional[dict]:
+        op = self.operation(method, path) or {}
+        content = (op.get("requestBody") or {}).get("content") or {}
+        schema = (content.get(content_type) or {}).get("schema")
+        return self.resolve(schema) if schema is not None else None
+
+    def response_schema(self, method: str, path: str, status: int,
+                        content_type: str = "application/json") -> Optional[dict]:
+        responses = (self.operation(method, path) or {}).get("responses") or {}
+        resp = responses.get(str(status)) or responses.get(f"{str(status)[0]}XX") or responses.get("default")
+        schema = (((resp or {}).get("content") or {}).get(content_type) or {}).get("schema")
+        return self.resolve(schema) if schema is not None else None
+
+    def match(self, method: str, path: str) -> Optional[str]:
+        """Path template of the operation a concrete request path belongs to."""
+        method = method.upper()
+        if (method, path) in self.operations:
+            return path
+        for m, template, rx in self._patterns:
+            if m == method and rx.match(path):
+                return template
+        return None
+
+# -----------------------
+# проверка значения по схеме (тела запросов фаззера, поля потоковых ответов)
+# -----------------------
+
+_TYPES = {
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "array": lambda v: isinstance(v, list),
+    "object": lambda v: isinstance(v, dict),
+    "null": lambda v: v is None,
+}
+
+def conforms(schema: Any, value: Any) -> bool:
+    """
+    Subset of JSON Schema validation that the bodies of this API use:
+    type/nullable, enum/const, required/properties/additionalProperties,
+    string length and pattern, numeric bounds, items, anyOf/oneOf/allOf.
+    Expects a resolved schema (SpecIndex.request_schema).
+    """
+    if not isinstance(schema, dict) or not schema:
+        return True
+    if value is None and schema.get("nullable"):
+        return True
+    if "const" in schema and value != schema["const"]:
+        return False
+    if "enum" in schema and value not in schema["enum"]:
+        return False
+    if "anyOf" in schema and not any(conforms(s, value) for s in schema["anyOf"]):
+        return False
+    if "oneOf" in schema and sum(conforms(s, value) for s in schema["oneOf"]) != 1:
+        return False
+    if "allOf" in schema and not all(conforms(s, value) for s in schema["allOf"]):
+        return False
+
+    t = schema.get("type")
+    if t is not None:
+        types = t if isinstance(t, list) else [t]
+        if not any(_TYPES.get(x, lambda v: True)(value) for x in types):
+            return False
+
+    if isinstance(value, str):
+        if len(value) < schema.get("minLength", 0):
+            return False
+        if "maxLength" in schema and len(value) > schema["maxLength"]:
+            return False
+        if "pattern" in schema and not re.search(schema["pattern"], value):
+            return False
+    if _TYPES["number"](value):
+        if "minimum" in schema and value < schema["minimum"]:
+            return False
+        if "maximum" in schema and value > schema["maximum"]:
+            return False
+    if isinstance(value, list):
+        if len(value) < schema.get("minItems", 0):
+            return False
+        if "maxItems" in schema and len(value) > schema["maxItems"]:
+            return False
+        if not all(conforms(schema.get("items"), x) for x in value):
+            return False
+    if isinstance(value, dict):
+        props = schema.get("properties") or {}
+        if any(name not in value for name in schema.get("required") or []):
+            return False
+        extra = schema.get("additionalProperties", True)
+        for name, v in value.items():
+            if name in props:
+                if not conforms(props[name], v):
+                    return False
+            elif extra is False or (isinstance(extra, dict) and not conforms(extra, v)):
+                return False
+    return True
+
+# -----------------------
+# точка входа
+# -----------------------
+
+_MEMO: Dict[str, SpecIndex] = {}
+
+def load_spec(
+    base_url: str,
+    headers: Optional[dict] = None,
+    client: Optional[httpx.Client] = None,
+    cache_key: Optional[str] = None,
+    revalidate: bool = False,
+    conditional: bool = True,
+) -> SpecIndex:
+    """
+    Parsed spec of `base_url`, at most one download per process and a
+    conditional GET against the on-disk cache otherwise.
+    revalidate=True asks the server again even if the process already has it.
+    """
+    key = cache_key or base_url
+    if key in _MEMO and not revalidate:
+        return _MEMO[key]
+
+    if client is None:
+        with httpx.Client(base_url=base_url, headers=headers or {}, timeout=30, follow_redirects=True) as c:
+            spec, _ = fetch_spec(c, key, conditional=conditional)
+    else:
+        spec, _ = fetch_spec(client, key, conditional=conditional)
+
+    index = _MEMO.get(key)
+    if index is None or index.spec != spec:
+        index = SpecIndex(spec)
+    _MEMO[key] = index
+    return index
@@ -0,0 +1,190 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+import httpx
+
+from tests.client import ClientPool
+from tests.ratelimit import Backoff, retry_after_seconds
+from tests.schemas import JobStatusResponse
+from tests.streaming import StreamResult, avalidate_stream
+from tests.tracing import span
+
+# -----------------------
+# состояния джобы
+# -----------------------
+
+SUCCESS_STATES = frozenset({"done", "completed", "finished", "success"})
+FAILURE_STATES = frozenset({"failed", "error"})
+TERMINAL_STATES = SUCCESS_STATES | FAILURE_STATES
+
+# статусы, при которых имеет смысл подождать и спросить ещё раз
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+def terminal_states_from_env(default: FrozenSet[str] = TERMINAL_STATES) -> FrozenSet[str]:
+    """JOB_TERMINAL_STATES="done,failed" overrides the default terminal set."""
+    raw = os.getenv("JOB_TERMINAL_STATES", "").strip()
+    if not raw:
+        return default
+    return frozenset(s.strip().lower() for s in raw.split(",") if s.strip())
+
+def job_state(status: JobStatusResponse) -> str:
+    return (status.status or status.state or "").lower()
+
+# -----------------------
+# результат опроса
+# -----------------------
+
+@dataclass
+class JobPollResult:
+    job_id: str
+    state: str = ""
+    terminal: bool = False
+    polls: int = 0
+    time_to_terminal: Optional[float] = None
+    last: Optional[JobStatusResponse] = None
+    last_status_code: Optional[int] = None
+    error: Optional[str] = None
+    states_seen: list = field(default_factory=list)
+    # последнее тело 200: захваченные поля, размер и ограниченный preview, а не весь result
+    last_body: Optional[StreamResult] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.terminal and self.state in SUCCESS_STATES
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "state": self.state,
+            "terminal": self.terminal,
+            "polls": self.polls,
+            "time_to_terminal": self.time_to_terminal,
+            "last_status_code": self.last_status_code,
+            "error": self.error,
+            "states_seen": self.states_seen,
+            "last_body": self.last_body.as_dict() if self.last_body is not None else None,
+        }
+
+# -----------------------
+# асинхронный поллер
+# -----------------------
+
+class JobPoller:
+    """
+    Watches many jobs at once over one AsyncClient:
+
+        async with pool.async_api() as c:
+            results = await JobPoller(c, timeout=60).wait(job_ids)
+
+    Every job is polled by its own task. The delay grows exponentially while
+    the state stays the same and drops back to `backoff.initial` as soon as
+    the job moves on, so short jobs are noticed quickly and long ones do not
+    hammer the API. 429/503 responses wait for Retry-After when it is given.
+
+    Status bodies are validated against `schema` while they stream in
+    (tests/streaming.py), and the first contract violation ends the watch
+    without reading the rest. A terminal body up to `result_bytes` is parsed
+    whole, so `last.result` is there; a larger one keeps only the status
+    fields, and a large `result` is never held in memory.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        terminal_states: Iterable[str] = TERMINAL_STATES,
+        backoff: Backoff = Backoff(),
+        timeout: float = 30.0,
+        max_concurrency: int = 20,
+        schema: Optional[Any] = None,
+        preview_bytes: int = 2048,
+        result_bytes: int = 256 * 1024,
+    ):
+        self.client = client
+        self.schema = schema if schema is not None else JobStatusResponse.model_json_schema()
+        self.preview_bytes = preview_bytes
+        self.result_bytes = result_bytes
+        self.terminal_states = frozenset(s.lower() for s in terminal_states)
+        self.backoff = backoff
+        self.timeout = timeout
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    async def wait(self, job_ids: Iterable[str]) -> Dict[str, JobPollResult]:
+        ids = list(dict.fromkeys(job_ids))
+        with span("poll_jobs", jobs=len(ids)):
+            results = await asyncio.gather(*(self._watch(jid) for jid in ids))
+        return {r.job_id: r for r in results}
+
+    async def _get_status(self, job_id: str) -> Tuple[httpx.Response, Optional[StreamResult]]:
+        async with self._sem:
+            async with self.client.stream("GET", f"/jobs/{job_id}/status") as resp:
+                if resp.status_code != 200:
+                    await resp.aread()  # ошибки маленькие, Retry-After и detail нужны целиком
+                    return resp, None
+                return resp, await avalidate_stream(
+                    resp, self.schema, preview_bytes=self.preview_bytes, keep_bytes=self.result_bytes,
+                )
+
+    async def _watch(self, job_id: str) -> JobPollResult:
+        with span("poll", job_id=job_id) as s:
+            res = await self._watch_job(job_id)
+            if s is not None:
+                s.attrs.update(polls=res.polls, state=res.state)
+            return res
+
+    async def _watch_job(self, job_id: str) -> JobPollResult:
+        res = JobPollResult(job_id=job_id)
+        started = time.monotonic()
+        deadline = started + self.timeout
+        attempt = 0
+
+        while True:
+            resp, body = await self._get_status(job_id)
+            res.polls += 1
+            res.last_status_code = resp.status_code
+            delay = None
+
+            if body is not None:
+                res.last_body = body
+                if not body.ok:
+                    res.error = f"status body violates the contract at {body.violation}"
+                    return res
+                # сырое тело нужно только терминальному ответу, в last_body его не держим
+                raw, body.body = body.body, None
+                res.last = JobStatusResponse.model_validate(body.captured)
+                st = job_state(res.last)
+                if st != res.state:
+                    res.state = st
+                    res.states_seen.append(st)
+                    attempt = 0
+                if st in self.terminal_states:
+                    if raw is not None:
+                        res.last = JobStatusResponse.model_validate_json(raw)
+                    res.terminal = True
+                    res.time_to_terminal = time.monotonic() - started
+                    return res
+            elif resp.status_code in RETRYABLE_STATUS:
+                delay = retry_after_seconds(resp)
+            else:
+                res.error = f"unexpected status {resp.status_code}"
+                return res
+
+            if delay is None:
+                delay = self.backoff.delay(attempt)
+            attempt += 1
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                res.error = f"timeout after {self.timeout}s"
+                return res
+            await asyncio.sleep(min(delay, remaining))
+
+def poll_jobs(pool: ClientPool, job_ids: Iterable[str], **kwargs) -> Dict[str, JobPollResult]:
+    """Sync entry point for tests: runs a JobPoller in a fresh event loop."""
+    async def run():
+        async with pool.async_api() as c:
+            return await JobPoller(c, **kwargs).wait(job_ids)
+
+    return asyncio.run(run())
@@ -0,0 +1,162 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import httpx
+
+from tests.client import ClientPool
+from tests.utils import is_cloudflare_challenge
+
+# -----------------------
+# проверка стенда до первого теста
+# -----------------------
+
+# что может понадобиться тесту; "api" неявно нужен всем, кто ходит через http_pool
+CAPABILITIES = ("api", "auth", "uploads", "jobs")
+
+# (name, method, path); auth-проба — защищённый эндпоинт с заведомо несуществующим id
+PROBES = (
+    ("health", "GET", "/health"),
+    ("ready", "GET", "/ready"),
+    ("auth", "GET", "/jobs/preflight-probe/status"),
+)
+
+@dataclass
+class Probe:
+    name: str
+    method: str
+    path: str
+    status_code: Optional[int] = None
+    elapsed: float = 0.0
+    error: Optional[str] = None
+    waf: bool = False
+
+    @property
+    def label(self) -> str:
+        outcome = self.error or f"HTTP {self.status_code}"
+        return f"{self.method} {self.path} -> {outcome}"
+
+@dataclass
+class Verdict:
+    """
+    blocked: capability -> reason. Empty means the stand looks usable;
+    a blocked "api" takes every other capability down with it.
+    """
+    base_url: str
+    checked_at: float
+    probes: List[Probe] = field(default_factory=list)
+    blocked: Dict[str, str] = field(default_factory=dict)
+
+    def reason_for(self, needs: Iterable[str]) -> Optional[str]:
+        if "api" in self.blocked:
+            return f"api unavailable: {self.blocked['api']}"
+        for cap in needs:
+            if cap in self.blocked:
+                return f"{cap} unavailable: {self.blocked[cap]}"
+        return None
+
+    def as_dict(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "checked_at": self.checked_at,
+            "probes": [asdict(p) for p in self.probes],
+            "blocked": self.blocked,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Verdict":
+        return cls(
+            base_url=data["base_url"],
+            checked_at=data["checked_at"],
+            probes=[Probe(**p) for p in data["probes"]],
+            blocked=data["blocked"],
+        )
+
+def evaluate(probes: Dict[str, Probe], has_token: bool) -> Dict[str, str]:
+    blocked: Dict[str, str] = {}
+    waf = [p for p in probes.values() if p.waf]
+    if waf:
+        blocked["api"] = f"blocked by Cloudflare/WAF ({waf[0].label}, cf-mitigated challenge)"
+        return blocked
+
+    health = probes["health"]
+    if health.error is not None or (health.status_code or 0) >= 500:
+        blocked["api"] = f"stand is down ({health.label})"
+        return blocked
+
+    ready = probes["ready"]
+    if ready.error is not None or ready.status_code == 503:
+        # зависимости (хранилище, очередь) не готовы: загрузки и джобы упадут по таймауту
+        blocked["uploads"] = blocked["jobs"] = f"stand is not ready ({ready.label})"
+
+    auth = probes["auth"]
+    if auth.status_code in (401, 403):
+        blocked["auth"] = (
+            f"API_TOKEN rejected ({auth.label})" if has_token else f"API_TOKEN is not set ({auth.label})"
+        )
+    return blocked
+
+async def _probe(client: httpx.AsyncClient, name: str, method: str, path: str) -> Probe:
+    p = Probe(name, method, path)
+    t0 = time.perf_counter()
+    try:
+        resp = await client.request(method, path)
+        p.status_code = resp.status_code
+        p.waf = is_cloudflare_challenge(resp)
+    except httpx.HTTPError as e:
+        p.error = type(e).__name__
+    p.elapsed = round(time.perf_counter() - t0, 4)
+    return p
+
+def run_preflight(pool: ClientPool, has_token: bool, timeout: float = 5.0) -> Verdict:
+    """All probes at once with a short timeout: a dead stand costs `timeout`, not 30s per test."""
+    async def run():
+        async with pool.async_api() as c:
+            c.timeout = httpx.Timeout(timeout)
+            return await asyncio.gather(*(_probe(c, *x) for x in PROBES))
+
+    probes = {p.name: p for p in asyncio.run(run())}
+    return Verdict(
+        base_url=pool.base_url,
+        checked_at=time.time(),
+        probes=list(probes.values()),
+        blocked=evaluate(probes, has_token),
+    )
+
+# -----------------------
+# кеш вердикта (общий для xdist-воркеров)
+# -----------------------
+
+def preflight_cache_key(base_url: str, token: Optional[str], fake: bool) -> str:
+    """
+    Base URL + fake/real mode + a hash of the token: the auth verdict belongs
+    to the token it was taken with, so a rotated or newly set API_TOKEN is
+    probed again instead of inheriting "API_TOKEN rejected" from the cache.
+    """
+    token_id = hashlib.sha256(token.encode("utf-8")).hexdigest()[:16] if token else "no-token"
+    return f"{'fake' if fake else 'real'}:{base_url}:{token_id}"
+
+def _cache_path(cache_key: str) -> str:
+    directory = os.getenv("PREFLIGHT_CACHE_DIR", os.path.join(".cache", "preflight"))
+    return os.path.join(directory, hashlib.sha256(cache_key.encode("utf-8")).hexdigest()[:16] + ".json")
+
+def load_cached(cache_key: str, ttl: float) -> Optional[Verdict]:
+    path = _cache_path(cache_key)
+    try:
+        with open(path, encoding="utf-8") as f:
+            v = Verdict.from_dict(json.load(f))
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return v if time.time() - v.checked_at <= ttl else None
+
+def save_cached(cache_key: str, verdict: Verdict) -> None:
+    path = _cache_path(cache_key)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(verdict.as_dict(), f)
+    os.replace(tmp, path)
@@ -0,0 +1,373 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from tests.utils import is_cloudflare_challenge
+
+try:
+    import fcntl
+except ImportError:  # Windows: только внутри процесса
+    fcntl = None
+
+# -----------------------
+# Retry-After и backoff (общие для лимитера, поллера и multipart)
+# -----------------------
+
+def retry_after_seconds(resp: httpx.Response) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP-date."""
+    raw = resp.headers.get("retry-after")
+    if not raw:
+        return None
+    raw = raw.strip()
+    if raw.isdigit():
+        return float(raw)
+    try:
+        return max(parsedate_to_datetime(raw).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+@dataclass(frozen=True)
+class Backoff:
+    """
+    Exponential backoff with proportional jitter:
+    delay(n) = min(initial * factor**n, max_delay) * (1 ± jitter)
+    """
+    initial: float = 0.25
+    factor: float = 2.0
+    max_delay: float = 5.0
+    jitter: float = 0.2
+
+    def delay(self, attempt: int) -> float:
+        base = min(self.initial * (self.factor ** attempt), self.max_delay)
+        return max(base * (1 + random.uniform(-self.jitter, self.jitter)), 0.0)
+
+    def after(self, retry_after: float) -> float:
+        """Retry-After plus up to `jitter` of it: never earlier than asked, and not everyone at once."""
+        return retry_after * (1 + random.uniform(0, self.jitter))
+
+# -----------------------
+# бюджеты
+# -----------------------
+
+def _env_float(name: str, default: float) -> float:
+    raw = os.getenv(name, "").strip()
+    return float(raw) if raw else default
+
+@dataclass(frozen=True)
+class Budget:
+    """
+    Token bucket of one host: `rate` requests per second, bursts up to `burst`.
+    After a 429 or a WAF challenge the rate is halved (not below `min_rate`)
+    and grows back by `recovery` req/s every second.
+    """
+    rate: float
+    burst: float
+    min_rate: float = 0.5
+    recovery: float = 0.5
+
+    @classmethod
+    def from_env(cls, prefix: str) -> Optional["Budget"]:
+        """RATE_LIMIT_API=20 -> 20 req/s; RATE_LIMIT_API_BURST, RATE_LIMIT_MIN, RATE_LIMIT_RECOVERY."""
+        rate = _env_float(prefix, 0.0)
+        if rate <= 0:
+            return None
+        return cls(
+            rate=rate,
+            burst=_env_float(f"{prefix}_BURST", max(rate, 1.0)),
+            min_rate=min(_env_float("RATE_LIMIT_MIN", cls.min_rate), rate),
+            recovery=_env_float("RATE_LIMIT_RECOVERY", cls.recovery),
+        )
+
+# -----------------------
+# общее состояние ведра (файл + flock)
+# -----------------------
+
+# повторные 429 в пределах окна не снижают темп ещё раз
+THROTTLE_WINDOW = 1.0
+# ожидающие blocked_until просыпаются вразброс: до +20% от оставшегося ожидания
+BLOCK_JITTER = 0.2
+
+def state_dir() -> str:
+    return os.getenv("RATE_LIMIT_STATE_DIR", os.path.join(".cache", "ratelimit"))
+
+class SharedBucket:
+    """
+    Bucket state in a small JSON file, read-modify-written under an exclusive
+    flock, so pytest-xdist workers and loadgen processes share one budget:
+      {"tokens", "updated", "rate", "throttled_at", "blocked_until"}
+    Tokens may go negative: a caller that finds the bucket empty still takes
+    its token and sleeps off the debt outside the lock, which keeps the order
+    of arrival fair.
+    """
+
+    _local_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+
+    def __init__(self, origin: str, budget: Budget, directory: Optional[str] = None):
+        self.origin = origin
+        self.budget = budget
+        name = hashlib.sha256(origin.encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(directory or state_dir(), f"{name}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with self._local_locks[self.path]:
+            with open(self.path, "a+", encoding="utf-8") as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    state = json.loads(raw) if raw.strip() else {}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    json.dump(state, f)
+                    f.flush()
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _rate(self, state: dict, now: float) -> float:
+        throttled = state.get("rate")
+        if throttled is None:
+            return self.budget.rate
+        recovered = throttled + self.budget.recovery * (now - state.get("throttled_at", now))
+        return min(recovered, self.budget.rate)
+
+    def acquire(self) -> float:
+        """Takes one token; returns how long the caller has to wait before sending."""
+        now = time.time()
+        with self._locked() as state:
+            rate = self._rate(state, now)
+            tokens = state.get("tokens", self.budget.burst)
+            elapsed = max(now - state.get("updated", now), 0.0)
+            tokens = min(tokens + elapsed * rate, self.budget.burst) - 1
+            state.update(tokens=tokens, updated=now)
+            wait = -tokens / rate if tokens < 0 else 0.0
+            blocked = state.get("blocked_until", 0.0) - now
+            if blocked > 0:
+                blocked *= 1 + random.uniform(0, BLOCK_JITTER)
+            return max(wait, blocked, 0.0)
+
+    def throttled(self, retry_after: Optional[float]) -> None:
+        """429 / WAF challenge: halve the rate and, with Retry-After, block the host until then."""
+        now = time.time()
+        with self._locked() as state:
+            # пачка 429 от параллельных запросов — один сигнал, а не десять снижений подряд
+            if now - state.get("throttled_at", 0.0) >= THROTTLE_WINDOW:
+                state["rate"] = max(self._rate(state, now) / 2, self.budget.min_rate)
+                state["throttled_at"] = now
+            if retry_after is not None:
+                state["blocked_until"] = max(state.get("blocked_until", 0.0), now + retry_after)
+
+# -----------------------
+# счётчики
+# -----------------------
+
+@dataclass
+class ThrottleStats:
+    requests: int = 0
+    delayed: int = 0
+    waited: float = 0.0
+    throttled_429: int = 0
+    waf_challenges: int = 0
+    retries: int = 0
+
+    def merge(self, data: dict) -> None:
+        self.requests += data["requests"]
+        self.delayed += data["delayed"]
+        self.waited += data["waited_s"]
+        self.throttled_429 += data["throttled_429"]
+        self.waf_challenges += data["waf_challenges"]
+        self.retries += data["retries"]
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "delayed": self.delayed,
+            "waited_s": round(self.waited, 3),
+            "throttled_429": self.throttled_429,
+            "waf_challenges": self.waf_challenges,
+            "retries": self.retries,
+        }
+
+# -----------------------
+# лимитер и транспорт
+# -----------------------
+
+def _origin(url: httpx.URL) -> str:
+    parts = urlsplit(str(url))
+    return f"{parts.scheme}://{parts.netloc}"
+
+class RateLimiter:
+    """
+    Per-host budgets: the API origin uses `api`, every other origin (storage
+    hosts behind presigned URLs) gets its own bucket with the `storage` budget.
+    A host without a budget is not limited, but its 429s are still retried.
+    """
+
+    def __init__(
+        self,
+        api_origin: str,
+        api: Optional[Budget],
+        storage: Optional[Budget],
+        retries: int = 3,
+        backoff: Backoff = Backoff(initial=0.5, max_delay=10.0),
+        directory: Optional[str] = None,
+    ):
+        self.api_origin = api_origin
+        self.api = api
+        self.storage = storage
+        self.retries = retries
+        self.backoff = backoff
+        self.directory = directory
+        self.stats: Dict[str, ThrottleStats] = defaultdict(ThrottleStats)
+        self._buckets: Dict[str, Optional[SharedBucket]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, api_origin: str) -> "RateLimiter":
+        """
+        RATE_LIMIT_API / RATE_LIMIT_STORAGE in req/s; without them no host is
+        limited, but 429s are still retried (RATE_LIMIT_RETRIES, 0 turns it off).
+        """
+        return cls(
+            api_origin,
+            Budget.from_env("RATE_LIMIT_API"),
+            Budget.from_env("RATE_LIMIT_STORAGE"),
+            retries=int(_env_float("RATE_LIMIT_RETRIES", 3)),
+        )
+
+    def bucket(self, origin: str) -> Optional[SharedBucket]:
+        with self._lock:
+            if origin not in self._buckets:
+                budget = self.api if origin == self.api_origin else self.storage
+                self._buckets[origin] = SharedBucket(origin, budget, self.directory) if budget else None
+            return self._buckets[origin]
+
+    def _count(self, origin: str, attempt: int, wait: float) -> float:
+        st = self.stats[origin]
+        # повтор после 429 — тот же запрос, он учтён в retries
+        if attempt == 0:
+            st.requests += 1
+        if wait > 0:
+            st.delayed += 1
+            st.waited += wait
+        return wait
+
+    def before(self, origin: str, attempt: int = 0) -> float:
+        bucket = self.bucket(origin)
+        return self._count(origin, attempt, bucket.acquire() if bucket is not None else 0.0)
+
+    async def before_async(self, origin: str, attempt: int = 0) -> float:
+        """before() for the event loop: flock and the state file are touched in a worker thread."""
+        bucket = self.bucket(origin)
+        wait = await asyncio.to_thread(bucket.acquire) if bucket is not None else 0.0
+        return self._count(origin, attempt, wait)
+
+    def _judge(self, origin: str, resp: httpx.Response, attempt: int,
+               can_retry: bool) -> Optional[Tuple[Optional[float], Optional[float]]]:
+        """(retry_after, retry delay or None) when the host throttled us, None when the response stands."""
+        waf = is_cloudflare_challenge(resp)
+        if resp.status_code != 429 and not waf:
+            return None
+        st = self.stats[origin]
+        retry_after = retry_after_seconds(resp)
+        if waf:
+            st.waf_challenges += 1
+        else:
+            st.throttled_429 += 1
+        # WAF-челлендж повтором не снимается: только снижаем темп для следующих запросов
+        if waf or not can_retry or attempt >= self.retries:
+            return retry_after, None
+        st.retries += 1
+        return retry_after, self.backoff.after(retry_after) if retry_after is not None else self.backoff.delay(attempt)
+
+    def after(self, origin: str, resp: httpx.Response, attempt: int, can_retry: bool = True) -> Optional[float]:
+        """Delay before a retry when the host throttled us, None when the response stands."""
+        verdict = self._judge(origin, resp, attempt, can_retry)
+        if verdict is None:
+            return None
+        bucket = self.bucket(origin)
+        if bucket is not None:
+            bucket.throttled(verdict[0])
+        return verdict[1]
+
+    async def after_async(self, origin: str, resp: httpx.Response, attempt: int,
+                          can_retry: bool = True) -> Optional[float]:
+        verdict = self._judge(origin, resp, attempt, can_retry)
+        if verdict is None:
+            return None
+        bucket = self.bucket(origin)
+        if bucket is not None:
+            await asyncio.to_thread(bucket.throttled, verdict[0])
+        return verdict[1]
+
+    def stats_dict(self) -> Dict[str, dict]:
+        return {origin: st.as_dict() for origin, st in self.stats.items()}
+
+def _replayable(request: httpx.Request) -> bool:
+    # потоковое тело (загрузка файла) второй раз не отправить; проверяется до отправки,
+    # потому что транспорт, прочитавший тело целиком, подменяет его на ByteStream
+    return isinstance(request.stream, httpx.ByteStream)
+
+class RateLimitedTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Waits for the host budget before each request and retries 429 with Retry-After/backoff."""
+
+    def __init__(self, inner, limiter: RateLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        origin, replayable = _origin(request.url), _replayable(request)
+        attempt = 0
+        while True:
+            wait = self.limiter.before(origin, attempt)
+            if wait > 0:
+                time.sleep(wait)
+            resp = self.inner.handle_request(request)
+            if resp.status_code == 403:
+                # HTML челленджа WAF в теле, а ответ транспорта ещё не прочитан; тело 403 маленькое
+                resp.read()
+            delay = self.limiter.after(origin, resp, attempt, replayable)
+            if delay is None:
+                return resp
+            resp.close()
+            time.sleep(delay)
+            attempt += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        origin, replayable = _origin(request.url), _replayable(request)
+        attempt = 0
+        while True:
+            wait = await self.limiter.before_async(origin, attempt)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            resp = await self.inner.handle_async_request(request)
+            if resp.status_code == 403:
+                await resp.aread()
+            delay = await self.limiter.after_async(origin, resp, attempt, replayable)
+            if delay is None:
+                return resp
+            await resp.aclose()
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self.inner.close()
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
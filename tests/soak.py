@@ -0,0 +1,455 @@
+import asyncio
+import csv
+import json
+import os
+import statistics
+import time
+from collections import Counter, deque
+from dataclasses import asdict, dataclass, fields
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from tests.client import AsyncClients, ClientPool
+from tests.flow import FlowError, run_upload_flow
+from tests.media import MediaFile
+from tests.stats import latency_summary
+
+# -----------------------
+# soak: те же сценарии часами с постоянной частотой
+# -----------------------
+
+# health -> GET /health; presign/upload/job -> run_upload_flow до соответствующей стадии
+SCENARIOS = ("health", "presign", "upload", "job")
+
+@dataclass(frozen=True)
+class SoakConfig:
+    """
+    rate:             scenario runs per second, evenly spaced; scenarios take turns
+    window / step:    sliding window length and how often it is evaluated (seconds)
+    baseline_windows: first full windows whose median p95 becomes the per-stage baseline
+    drift_threshold:  p95 above baseline * (1 + threshold) raises latency_drift,
+                      if it is also more than `min_delta` seconds above it
+    error_burst:      errors in one window that raise error_burst (with error_rate)
+    trend_threshold:  projected growth of job time-to-terminal over the run that raises job_trend
+    """
+    duration: float = 3600.0
+    rate: float = 1.0
+    scenarios: Tuple[str, ...] = SCENARIOS
+    window: float = 300.0
+    step: float = 60.0
+    baseline_windows: int = 3
+    min_samples: int = 5
+    drift_threshold: float = 0.5
+    min_delta: float = 0.005
+    error_burst: int = 5
+    error_rate: float = 0.05
+    trend_threshold: float = 0.3
+    max_in_flight: int = 50
+    size: int = 64 * 1024
+    poll_timeout: float = 60.0
+
+    def __post_init__(self):
+        unknown = set(self.scenarios) - set(SCENARIOS)
+        if unknown or not self.scenarios:
+            raise ValueError(f"unknown soak scenarios {sorted(unknown)}, known: {list(SCENARIOS)}")
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SoakConfig":
+        known = {f.name for f in fields(cls)}
+        kwargs = {k: v for k, v in data.items() if k in known}
+        if "scenarios" in kwargs:
+            kwargs["scenarios"] = tuple(kwargs["scenarios"])
+        return cls(**kwargs)
+
+def config_from_env(**overrides) -> SoakConfig:
+    env = {
+        "duration": os.getenv("SOAK_DURATION"),
+        "rate": os.getenv("SOAK_RATE"),
+        "scenarios": os.getenv("SOAK_SCENARIOS"),
+        "window": os.getenv("SOAK_WINDOW"),
+        "step": os.getenv("SOAK_STEP"),
+        "drift_threshold": os.getenv("SOAK_DRIFT_THRESHOLD"),
+        "error_burst": os.getenv("SOAK_ERROR_BURST"),
+        "trend_threshold": os.getenv("SOAK_TREND_THRESHOLD"),
+    }
+    types = {
+        "duration": float, "rate": float, "window": float, "step": float,
+        "drift_threshold": float, "error_burst": int, "trend_threshold": float,
+        "scenarios": lambda v: tuple(x.strip() for x in v.split(",") if x.strip()),
+    }
+    kwargs = {k: types[k](v) for k, v in env.items() if v}
+    kwargs.update({k: v for k, v in overrides.items() if v is not None})
+    return SoakConfig(**kwargs)
+
+# -----------------------
+# скользящие окна и алерты
+# -----------------------
+
+@dataclass
+class Alert:
+    kind: str          # latency_drift | error_burst | job_trend
+    stage: str
+    at: float          # секунды от начала прогона
+    value: float
+    baseline: Optional[float]
+    message: str
+
+def _slope(points: List[Tuple[float, float]]) -> Tuple[float, float]:
+    """Least squares y = a + b*t -> (a, b)."""
+    n = len(points)
+    mt = sum(t for t, _ in points) / n
+    my = sum(y for _, y in points) / n
+    var = sum((t - mt) ** 2 for t, _ in points)
+    b = sum((t - mt) * (y - my) for t, y in points) / var if var else 0.0
+    return my - b * mt, b
+
+class DriftMonitor:
+    """
+    Keeps samples of the last `window` seconds only; roll(now) every `step`
+    seconds turns them into one window row (percentiles and errors per stage)
+    and compares it with the baseline from the first full windows.
+
+    An alert fires once when its condition starts and again only after the
+    condition has cleared; to_dict()/from_dict() carry everything but the raw
+    samples across a checkpoint.
+    """
+
+    def __init__(self, cfg: SoakConfig):
+        self.cfg = cfg
+        self.samples: Deque[Tuple[float, str, float, bool]] = deque()
+        self.windows: List[dict] = []
+        self.alerts: List[Alert] = []
+        self.totals: Dict[str, Counter] = {}
+        self.baseline: Dict[str, float] = {}
+        self._early_p95: Dict[str, List[float]] = {}
+        self._full_windows = 0
+        self._job_points: List[Tuple[float, float]] = []
+        self._active: set = set()
+
+    def record(self, at: float, stage: str, latency: float, ok: bool) -> None:
+        self.samples.append((at, stage, latency, ok))
+        c = self.totals.setdefault(stage, Counter())
+        c["count"] += 1
+        if not ok:
+            c["errors"] += 1
+
+    def _fire(self, key: Tuple[str, str], active: bool, make: Callable[[], Alert], fired: List[Alert]) -> None:
+        if active and key not in self._active:
+            alert = make()
+            self.alerts.append(alert)
+            fired.append(alert)
+            self._active.add(key)
+        elif not active:
+            self._active.discard(key)
+
+    def roll(self, now: float) -> List[Alert]:
+        cfg = self.cfg
+        while self.samples and self.samples[0][0] < now - cfg.window:
+            self.samples.popleft()
+        full = now >= cfg.window
+
+        by_stage: Dict[str, List[Tuple[float, bool]]] = {}
+        for _, stage, latency, ok in self.samples:
+            by_stage.setdefault(stage, []).append((latency, ok))
+        stages = {}
+        for stage, rows in sorted(by_stage.items()):
+            row = latency_summary(lat for lat, ok in rows if ok)
+            row["count"] = len(rows)
+            row["errors"] = sum(1 for _, ok in rows if not ok)
+            row["error_rate"] = row["errors"] / len(rows)
+            stages[stage] = row
+
+        fired: List[Alert] = []
+        if full:
+            self._full_windows += 1
+        for stage, row in stages.items():
+            p95 = row.get("p95")
+            enough = p95 is not None and row["count"] - row["errors"] >= cfg.min_samples
+            if full and enough and self._full_windows <= cfg.baseline_windows:
+                self._early_p95.setdefault(stage, []).append(p95)
+                self.baseline[stage] = statistics.median(self._early_p95[stage])
+            base = self.baseline.get(stage)
+            drift = (
+                full and enough and base is not None and self._full_windows > cfg.baseline_windows
+                and p95 > base * (1 + cfg.drift_threshold) and p95 - base > cfg.min_delta
+            )
+            self._fire(("latency_drift", stage), drift, lambda: Alert(
+                "latency_drift", stage, now, p95, base,
+                f"{stage} p95 {p95 * 1000:.1f}ms is {(p95 / base - 1) * 100:+.0f}% vs baseline {base * 1000:.1f}ms",
+            ), fired)
+            burst = row["errors"] >= cfg.error_burst and row["error_rate"] >= cfg.error_rate
+            self._fire(("error_burst", stage), burst, lambda: Alert(
+                "error_burst", stage, now, row["errors"], None,
+                f"{stage}: {row['errors']} errors ({row['error_rate'] * 100:.1f}%) in the last {cfg.window:g}s",
+            ), fired)
+
+        job = stages.get("job_terminal", {})
+        trend = None
+        if full and job.get("p50") is not None:
+            self._job_points.append((now, job["p50"]))
+        if len(self._job_points) >= 2 * cfg.baseline_windows:
+            a, b = _slope(self._job_points)
+            t0, t1 = self._job_points[0][0], self._job_points[-1][0]
+            start = a + b * t0
+            trend = {"slope_s_per_hour": b * 3600, "projected_change": (b * (t1 - t0)) / start if start > 0 else 0.0}
+            growing = trend["projected_change"] > cfg.trend_threshold
+            self._fire(("job_trend", "job_terminal"), growing, lambda: Alert(
+                "job_trend", "job_terminal", now, a + b * t1, start,
+                f"job time-to-terminal grows {trend['slope_s_per_hour']:+.2f}s/hour "
+                f"({trend['projected_change'] * 100:+.0f}% since {t0:.0f}s)",
+            ), fired)
+
+        self.windows.append({
+            "index": len(self.windows),
+            "end": round(now, 3),
+            "full": full,
+            "stages": stages,
+            "job_trend": trend,
+            "alerts": [a.kind + ":" + a.stage for a in fired],
+        })
+        return fired
+
+    def to_dict(self) -> dict:
+        return {
+            "windows": self.windows,
+            "alerts": [asdict(a) for a in self.alerts],
+            "totals": {k: dict(v) for k, v in self.totals.items()},
+            "baseline": self.baseline,
+            "early_p95": self._early_p95,
+            "full_windows": self._full_windows,
+            "job_points": self._job_points,
+            "active": sorted(list(k) for k in self._active),
+        }
+
+    @classmethod
+    def from_dict(cls, cfg: SoakConfig, data: dict) -> "DriftMonitor":
+        m = cls(cfg)
+        m.windows = data["windows"]
+        m.alerts = [Alert(**a) for a in data["alerts"]]
+        m.totals = {k: Counter(v) for k, v in data["totals"].items()}
+        m.baseline = data["baseline"]
+        m._early_p95 = data["early_p95"]
+        m._full_windows = data["full_windows"]
+        m._job_points = [tuple(p) for p in data["job_points"]]
+        m._active = {tuple(k) for k in data["active"]}
+        return m
+
+# -----------------------
+# чекпоинт и итоговый датасет
+# -----------------------
+
+@dataclass
+class SoakState:
+    """Everything a resumed run needs; `elapsed` is the time already soaked."""
+    config: SoakConfig
+    base_url: str
+    started_at: float
+    monitor: DriftMonitor
+    elapsed: float = 0.0
+    cycles: int = 0
+    finished: bool = False
+    interrupted: bool = False
+
+    def as_dict(self) -> dict:
+        return {
+            "config": asdict(self.config),
+            "base_url": self.base_url,
+            "started_at": self.started_at,
+            "elapsed": round(self.elapsed, 3),
+            "cycles": self.cycles,
+            "finished": self.finished,
+            "interrupted": self.interrupted,
+            "monitor": self.monitor.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SoakState":
+        cfg = SoakConfig.from_dict(data["config"])
+        return cls(
+            config=cfg,
+            base_url=data["base_url"],
+            started_at=data["started_at"],
+            monitor=DriftMonitor.from_dict(cfg, data["monitor"]),
+            elapsed=data["elapsed"],
+            cycles=data["cycles"],
+            finished=data["finished"],
+            interrupted=data["interrupted"],
+        )
+
+def save_checkpoint(path: str, state: SoakState) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state.as_dict(), f, ensure_ascii=False)
+    os.replace(tmp, path)  # прерывание посреди записи оставляет предыдущий чекпоинт целым
+
+def load_checkpoint(path: str) -> SoakState:
+    with open(path, encoding="utf-8") as f:
+        return SoakState.from_dict(json.load(f))
+
+SERIES_METRICS = ("count", "errors", "p50", "p95", "p99")
+
+def summary_dataset(state: SoakState) -> dict:
+    """
+    Column-oriented series (one point per window) for plotting:
+    {"t": [...], "series": {"presign.p95": [...], ...}, "alerts": [...]}.
+    """
+    windows = state.monitor.windows
+    stages = sorted({s for w in windows for s in w["stages"]})
+    series: Dict[str, list] = {}
+    for stage in stages:
+        for metric in SERIES_METRICS:
+            series[f"{stage}.{metric}"] = [w["stages"].get(stage, {}).get(metric) for w in windows]
+    series["job_terminal.slope_s_per_hour"] = [(w["job_trend"] or {}).get("slope_s_per_hour") for w in windows]
+    return {
+        "base_url": state.base_url,
+        "config": asdict(state.config),
+        "elapsed": state.elapsed,
+        "cycles": state.cycles,
+        "finished": state.finished,
+        "t": [w["end"] for w in windows],
+        "series": series,
+        "baseline_p95": state.monitor.baseline,
+        "totals": {k: dict(v) for k, v in state.monitor.totals.items()},
+        "alerts": [asdict(a) for a in state.monitor.alerts],
+    }
+
+def write_summary(state: SoakState, json_path: str, csv_path: Optional[str] = None) -> dict:
+    data = summary_dataset(state)
+    for path in filter(None, (json_path, csv_path)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    if csv_path:
+        names = list(data["series"])
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            w = csv.writer(f)
+            w.writerow(["t"] + names)
+            for i, t in enumerate(data["t"]):
+                w.writerow([t] + ["" if data["series"][n][i] is None else data["series"][n][i] for n in names])
+    return data
+
+# -----------------------
+# прогон
+# -----------------------
+
+class _Recorder:
+    """LoadStats-compatible sink for run_upload_flow: stages go to the monitor with a timestamp."""
+
+    def __init__(self, monitor: DriftMonitor, clock: Callable[[], float], scenario: str):
+        self.monitor = monitor
+        self.clock = clock
+        self.scenario = scenario
+
+    def record(self, stage: str, latency: float, status_code: Optional[int] = None, error: Optional[str] = None) -> None:
+        if stage == "flow":
+            stage = f"cycle:{self.scenario}"  # у сценариев разная длина, в одну серию их не смешиваем
+        ok = error is None and (status_code is None or status_code < 400)
+        self.monitor.record(self.clock(), stage, latency, ok)
+
+async def _health(clients: AsyncClients, rec: _Recorder) -> None:
+    t0 = time.perf_counter()
+    try:
+        resp = await clients.api.get("/health")
+    except httpx.HTTPError as e:
+        rec.record("health", time.perf_counter() - t0, error=type(e).__name__)
+        return
+    rec.record("health", time.perf_counter() - t0, status_code=resp.status_code)
+
+async def _scenario(clients: AsyncClients, rec: _Recorder, cfg: SoakConfig, content: bytes) -> None:
+    if rec.scenario == "health":
+        await _health(clients, rec)
+        return
+    try:
+        await run_upload_flow(
+            clients, rec, content,
+            poll=rec.scenario == "job",
+            poll_timeout=cfg.poll_timeout,
+            until=None if rec.scenario == "job" else rec.scenario,
+        )
+    except FlowError:
+        pass  # стадия уже записана
+
+async def _soak(state: SoakState, pool: ClientPool, checkpoint: Optional[str], on_window) -> None:
+    cfg = state.config
+    offset = state.elapsed
+    started = time.monotonic()
+
+    def clock() -> float:
+        return offset + time.monotonic() - started
+
+    content = MediaFile("jpeg", size=cfg.size)   # сценарии грузят test.jpg, файл из медиакорпуса
+    in_flight = set()
+    next_roll = (int(offset // cfg.step) + 1) * cfg.step
+
+    def roll(now: float) -> None:
+        state.elapsed = now
+        fired = state.monitor.roll(now)
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+        if on_window:
+            on_window(state.monitor.windows[-1], fired)
+
+    async with pool.async_clients() as clients:
+        try:
+            next_at = time.monotonic()
+            while clock() < cfg.duration:
+                next_at += 1.0 / cfg.rate
+                await asyncio.sleep(max(next_at - time.monotonic(), 0))
+                while clock() >= next_roll:
+                    roll(next_roll)
+                    next_roll += cfg.step
+                if len(in_flight) >= cfg.max_in_flight:
+                    state.monitor.record(clock(), "dropped", 0.0, ok=False)
+                    continue
+                rec = _Recorder(state.monitor, clock, cfg.scenarios[state.cycles % len(cfg.scenarios)])
+                state.cycles += 1
+                t = asyncio.create_task(_scenario(clients, rec, cfg, content))
+                in_flight.add(t)
+                t.add_done_callback(in_flight.discard)
+            if in_flight:
+                await asyncio.gather(*in_flight)
+            roll(clock())
+            state.finished = True
+        except asyncio.CancelledError:
+            state.interrupted = True
+            raise
+        finally:
+            for t in in_flight:
+                t.cancel()
+            state.elapsed = clock()
+            if checkpoint:
+                save_checkpoint(checkpoint, state)
+
+def run_soak(
+    cfg: SoakConfig,
+    base_url: str,
+    headers: dict,
+    checkpoint: Optional[str] = None,
+    resume: bool = False,
+    pool: Optional[ClientPool] = None,
+    on_window: Optional[Callable[[dict, List[Alert]], None]] = None,
+) -> SoakState:
+    """
+    Runs the soak for cfg.duration seconds of wall time in total. With
+    resume=True and an unfinished checkpoint the run continues from its
+    elapsed time with the windows, baselines and alerts it already had.
+    Ctrl+C leaves an `interrupted` checkpoint behind.
+    """
+    state = None
+    if resume and checkpoint and os.path.exists(checkpoint):
+        state = load_checkpoint(checkpoint)
+        if state.finished:
+            return state
+        state.interrupted = False  # пороги и базовая линия — из чекпоинта, `cfg` не применяется
+    if state is None:
+        state = SoakState(config=cfg, base_url=base_url, started_at=time.time(), monitor=DriftMonitor(cfg))
+    try:
+        pool = pool or ClientPool.from_env(base_url, headers, record_timings=False)
+        asyncio.run(_soak(state, pool, checkpoint, on_window))
+    except KeyboardInterrupt:
+        state.interrupted = True
+        if checkpoint:
+            save_checkpoint(checkpoint, state)
+    return state
@@ -0,0 +1,103 @@
+import math
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# -----------------------
+# перцентили
+# -----------------------
+
+def percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    """Linear interpolation between closest ranks; q in [0, 100]."""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = math.floor(pos)
+    hi = math.ceil(pos)
+    if lo == hi:
+        return sorted_values[lo]
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+def latency_summary(values: Iterable[float]) -> dict:
+    vals = sorted(values)
+    if not vals:
+        return {"count": 0}
+    return {
+        "count": len(vals),
+        "mean": sum(vals) / len(vals),
+        "p50": percentile(vals, 50),
+        "p95": percentile(vals, 95),
+        "p99": percentile(vals, 99),
+        "max": vals[-1],
+    }
+
+# -----------------------
+# статистика по стадиям
+# -----------------------
+
+@dataclass
+class StageStats:
+    latencies: List[float] = field(default_factory=list)
+    status_codes: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+
+    @property
+    def count(self) -> int:
+        return len(self.latencies)
+
+    @property
+    def failed(self) -> int:
+        bad = sum(n for code, n in self.status_codes.items() if int(code) >= 400)
+        return bad + sum(self.errors.values())
+
+class LoadStats:
+    """
+    Collects latencies per stage (presign, upload, create_job, job_terminal, flow).
+
+    stats.record("presign", 0.123, status_code=201)
+    stats.record("upload", 1.5, error="ConnectTimeout")
+    stats.summary(duration) -> {stage: {count, p50, p95, p99, error_rate, rps, ...}}
+
+    to_dict()/merge() let worker processes ship their numbers to the parent.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageStats] = defaultdict(StageStats)
+
+    def record(self, stage: str, latency: float, status_code: Optional[int] = None, error: Optional[str] = None) -> None:
+        st = self.stages[stage]
+        st.latencies.append(latency)
+        if error is not None:
+            st.errors[error] += 1
+        elif status_code is not None:
+            st.status_codes[str(status_code)] += 1
+
+    def to_dict(self) -> dict:
+        return {
+            name: {
+                "latencies": st.latencies,
+                "status_codes": dict(st.status_codes),
+                "errors": dict(st.errors),
+            }
+            for name, st in self.stages.items()
+        }
+
+    def merge(self, data: dict) -> None:
+        for name, d in data.items():
+            st = self.stages[name]
+            st.latencies.extend(d["latencies"])
+            st.status_codes.update(d["status_codes"])
+            st.errors.update(d["errors"])
+
+    def summary(self, duration: float) -> dict:
+        out = {}
+        for name, st in self.stages.items():
+            row = latency_summary(st.latencies)
+            row["status_codes"] = dict(st.status_codes)
+            row["errors"] = dict(st.errors)
+            row["error_rate"] = st.failed / st.count if st.count else 0.0
+            row["rps"] = st.count / duration if duration > 0 else 0.0
+            out[name] = row
+        return out
@@ -0,0 +1,373 @@
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+
+from tests.openapi import conforms
+
+# -----------------------
+# потоковая проверка JSON-ответа по схеме
+# -----------------------
+
+_WS = re.compile(rb"[ \t\r\n]*")
+_SCALAR = re.compile(rb"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?|true|false|null")
+_PARTIAL_SCALAR = re.compile(rb"-?[0-9.eE+-]*|t(?:r(?:ue?)?)?|f(?:a(?:l(?:se?)?)?)?|n(?:u(?:ll?)?)?")
+_LITERALS = {b"true": True, b"false": False, b"null": None}
+
+# поля верхнего уровня, которые нужны поллеру без разбора всего тела
+STATUS_FIELDS = ("job_id", "id", "status", "state", "error")
+
+@dataclass
+class Violation:
+    path: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.path}: {self.message}"
+
+@dataclass
+class StreamResult:
+    """
+    captured:   top-level scalars named in `capture` (status, state, ...)
+    preview:    the first `preview_bytes` of the body, for artifacts
+    complete:   the whole body was read; False after an early stop
+    body:       the whole valid body if it fit into `keep_bytes`, else None
+    """
+    violation: Optional[Violation] = None
+    captured: Dict[str, Any] = field(default_factory=dict)
+    preview: str = ""
+    bytes_read: int = 0
+    values: int = 0
+    max_depth: int = 0
+    complete: bool = False
+    body: Optional[bytes] = field(default=None, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.violation is None
+
+    def as_dict(self) -> dict:
+        return {
+            "ok": self.ok,
+            "violation": str(self.violation) if self.violation else None,
+            "captured": self.captured,
+            "bytes_read": self.bytes_read,
+            "values": self.values,
+            "max_depth": self.max_depth,
+            "complete": self.complete,
+            "preview": self.preview,
+        }
+
+def _alternatives(schema: Any) -> List[dict]:
+    """anyOf/oneOf flattened, allOf merged; an unresolved $ref accepts anything."""
+    if not isinstance(schema, dict) or not schema or "$ref" in schema:
+        return [{}]
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            out = [a for s in schema[key] for a in _alternatives(s)]
+            if schema.get("nullable"):
+                out.append({"type": "null"})
+            return out
+    if "allOf" in schema:
+        merged = {"properties": {}, "required": []}
+        for part in schema["allOf"]:
+            for a in _alternatives(part)[:1]:
+                merged["properties"].update(a.get("properties") or {})
+                merged["required"] += a.get("required") or []
+                if a.get("additionalProperties") is False:
+                    merged["additionalProperties"] = False
+        return [merged]
+    return [schema]
+
+def _accepts(schema: dict, kind: str) -> bool:
+    t = schema.get("type")
+    if t is None:
+        return "enum" not in schema and "const" not in schema
+    return kind in (t if isinstance(t, list) else [t])
+
+class _Stop(Exception):
+    pass
+
+class _Frame:
+    __slots__ = ("kind", "alts", "path", "expect", "key", "keys", "count")
+
+    def __init__(self, kind: str, alts: List[dict], path: str):
+        self.kind = kind
+        self.alts = alts
+        self.path = path
+        self.expect = "first"   # first | key | colon | value | comma
+        self.key: Optional[str] = None
+        self.keys: set = set()
+        self.count = 0
+
+class StreamValidator:
+    """
+    Push parser: feed(chunk) as the body arrives, close() at the end.
+    Checks every value against the JSON schema while it streams in and stops
+    at the first violation; nothing but the current path, the keys of open
+    objects and a bounded preview is kept in memory.
+
+    Alternatives (anyOf/oneOf) are narrowed per container: a nested value has
+    to match one of the branches that are still possible for its parent.
+    """
+
+    def __init__(self, schema: Any, capture: Iterable[str] = STATUS_FIELDS, preview_bytes: int = 2048,
+                 keep_bytes: int = 0):
+        self.root = _alternatives(schema)
+        self.capture = set(capture)
+        self.preview_bytes = preview_bytes
+        self.keep_bytes = keep_bytes
+        self.result = StreamResult()
+        self._preview = bytearray()
+        # тело целиком, пока влезает в keep_bytes; None — не храним
+        self._kept: Optional[bytearray] = bytearray() if keep_bytes > 0 else None
+        # непрочитанный хвост тела; съеденное начало удаляется на месте, без копии остатка
+        self._buf = bytearray()
+        self._pos = 0
+        self._scan = 0          # до куда уже искали закрывающую кавычку длинной строки
+        self._stack: List[_Frame] = []
+        self._done = False
+
+    # ---- публичное API ----
+
+    def feed(self, chunk: bytes) -> Optional[Violation]:
+        if self.result.violation is not None:
+            return self.result.violation
+        self.result.bytes_read += len(chunk)
+        if len(self._preview) < self.preview_bytes:
+            self._preview += chunk[:self.preview_bytes - len(self._preview)]
+        if self._kept is not None:
+            if len(self._kept) + len(chunk) > self.keep_bytes:
+                self._kept = None
+            else:
+                self._kept += chunk
+        # внутри длинной строки _pos не двигается: склейка через копию давала бы O(n²)
+        del self._buf[:self._pos]
+        self._buf += chunk
+        self._scan = max(self._scan - self._pos, 0)
+        self._pos = 0
+        self._run(final=False)
+        return self.result.violation
+
+    def close(self) -> StreamResult:
+        if self.result.violation is None:
+            self._run(final=True)
+            if self.result.violation is None and not self._done:
+                self.result.violation = Violation(self._path(), "body ended before the JSON document was complete")
+            self.result.complete = self.result.violation is None
+        if self.result.complete and self._kept is not None:
+            self.result.body = bytes(self._kept)
+        self.result.preview = bytes(self._preview).decode("utf-8", "replace")
+        return self.result
+
+    # ---- токены ----
+
+    def _fail(self, path: str, message: str) -> None:
+        if self.result.violation is None:
+            self.result.violation = Violation(path, message)
+        raise _Stop
+
+    def _run(self, final: bool) -> None:
+        try:
+            while True:
+                self._pos = _WS.match(self._buf, self._pos).end()
+                if self._pos >= len(self._buf):
+                    return
+                if self._done:
+                    self._fail("$", "extra data after the JSON document")
+                if not self._token(final):
+                    return
+        except _Stop:
+            return
+
+    def _string_end(self, start: int) -> int:
+        i = max(start + 1, self._scan)
+        while True:
+            i = self._buf.find(b'"', i)
+            if i < 0:
+                self._scan = len(self._buf)
+                return -1
+            backslashes = 0
+            while self._buf[i - 1 - backslashes] == 0x5C:
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return i
+            i += 1
+
+    def _token(self, final: bool) -> bool:
+        """Consumes one token; False when more data is needed."""
+        buf, pos = self._buf, self._pos
+        c = buf[pos:pos + 1]
+        if c in (b"{", b"}", b"[", b"]", b",", b":"):
+            self._pos = pos + 1
+            self._punct(c)
+            return True
+        if c == b'"':
+            end = self._string_end(pos)
+            if end < 0:
+                if final:
+                    self._fail(self._path(), "unterminated string")
+                return False
+            self._pos, self._scan = end + 1, 0
+            try:
+                value = json.loads(buf[pos:end + 1])
+            except ValueError as e:
+                self._fail(self._path(), f"invalid JSON string: {e}")
+            self._string(value)
+            return True
+        # число или литерал на границе чанка: "12" может оказаться "125", "tr" — "true"
+        if not final and _PARTIAL_SCALAR.fullmatch(buf, pos):
+            return False
+        m = _SCALAR.match(buf, pos)
+        if m is None:
+            self._fail(self._path(), f"invalid JSON at byte {self.result.bytes_read - len(buf) + pos}")
+        self._pos = m.end()
+        raw = bytes(m.group())
+        self._scalar(_LITERALS[raw] if raw in _LITERALS else json.loads(raw))
+        return True
+
+    # ---- структура ----
+
+    def _path(self) -> str:
+        if not self._stack:
+            return "$"
+        f = self._stack[-1]
+        if f.kind == "object":
+            return f"{f.path}.{f.key}" if f.expect == "value" and f.key is not None else f.path
+        return f"{f.path}[{f.count}]"
+
+    def _child_alts(self) -> List[dict]:
+        if not self._stack:
+            return self.root
+        f = self._stack[-1]
+        out: List[dict] = []
+        for a in f.alts:
+            if f.kind == "array":
+                out += _alternatives(a.get("items"))
+            elif f.key in (a.get("properties") or {}):
+                out += _alternatives(a["properties"][f.key])
+            else:
+                extra = a.get("additionalProperties", True)
+                out += _alternatives(extra) if isinstance(extra, dict) else [{}]
+        return out or [{}]
+
+    def _expect_value(self) -> None:
+        if self._done:
+            self._fail("$", "extra data after the JSON document")
+        if self._stack:
+            f = self._stack[-1]
+            if f.kind == "object" and f.expect != "value":
+                self._fail(f.path, "expected a property name")
+            if f.kind == "array" and f.expect not in ("first", "value"):
+                self._fail(f.path, "expected ',' or ']'")
+
+    def _value_done(self) -> None:
+        self.result.values += 1
+        if not self._stack:
+            self._done = True
+            return
+        f = self._stack[-1]
+        if f.kind == "array":
+            f.count += 1
+            for a in f.alts:
+                if "maxItems" not in a or f.count <= a["maxItems"]:
+                    break
+            else:
+                self._fail(f.path, f"more than {f.alts[0]['maxItems']} items")
+        f.expect = "comma"
+
+    def _open(self, kind: str) -> None:
+        self._expect_value()
+        path = self._path()
+        alts = [a for a in self._child_alts() if _accepts(a, kind)]
+        if not alts:
+            self._fail(path, f"unexpected {kind}")
+        self._stack.append(_Frame(kind, alts, path))
+        self.result.max_depth = max(self.result.max_depth, len(self._stack))
+
+    def _close(self, kind: str) -> None:
+        if not self._stack or self._stack[-1].kind != kind:
+            self._fail(self._path(), f"unexpected '{'}' if kind == 'object' else ']'}'")
+        f = self._stack[-1]
+        if f.expect not in ("first", "comma"):
+            self._fail(f.path, "unexpected end of container")
+        if kind == "object":
+            alts = [a for a in f.alts if all(k in f.keys for k in a.get("required") or [])]
+            if not alts:
+                missing = [k for k in f.alts[0].get("required") or [] if k not in f.keys]
+                self._fail(f.path, f"missing required property {missing[0]!r}")
+        else:
+            alts = [a for a in f.alts if f.count >= a.get("minItems", 0)]
+            if not alts:
+                self._fail(f.path, f"fewer than {f.alts[0]['minItems']} items")
+        self._stack.pop()
+        self._value_done()
+
+    def _punct(self, c: bytes) -> None:
+        if c == b"{":
+            self._open("object")
+        elif c == b"[":
+            self._open("array")
+        elif c == b"}":
+            self._close("object")
+        elif c == b"]":
+            self._close("array")
+        else:
+            f = self._stack[-1] if self._stack else None
+            if c == b"," and f is not None and f.expect == "comma":
+                f.expect = "key" if f.kind == "object" else "value"
+            elif c == b":" and f is not None and f.expect == "colon":
+                f.expect = "value"
+            else:
+                self._fail(self._path(), f"unexpected {c.decode()!r}")
+
+    def _string(self, value: str) -> None:
+        f = self._stack[-1] if self._stack else None
+        if f is not None and f.kind == "object" and f.expect in ("first", "key"):
+            alts = [
+                a for a in f.alts
+                if value in (a.get("properties") or {}) or a.get("additionalProperties", True) is not False
+            ]
+            if not alts:
+                self._fail(f"{f.path}.{value}", "property is not allowed by the schema")
+            f.alts, f.key, f.expect = alts, value, "colon"
+            f.keys.add(value)
+            return
+        self._scalar(value)
+
+    def _scalar(self, value: Any) -> None:
+        self._expect_value()
+        path = self._path()
+        if not any(conforms(a, value) for a in self._child_alts()):
+            shown = value if not isinstance(value, str) or len(value) <= 80 else value[:80] + "..."
+            self._fail(path, f"{shown!r} does not match the schema")
+        if len(self._stack) == 1 and self._stack[0].kind == "object" and self._stack[0].key in self.capture:
+            self.result.captured[self._stack[0].key] = value
+        self._value_done()
+
+# -----------------------
+# httpx: тело ответа через валидатор
+# -----------------------
+
+def validate_stream(resp: httpx.Response, schema: Any, **kwargs) -> StreamResult:
+    """
+    For a response opened with client.stream(...): reads the body chunk by
+    chunk and stops reading (closing the response) at the first violation.
+    """
+    v = StreamValidator(schema, **kwargs)
+    for chunk in resp.iter_bytes():
+        if v.feed(chunk) is not None:
+            resp.close()
+            break
+    return v.close()
+
+async def avalidate_stream(resp: httpx.Response, schema: Any, **kwargs) -> StreamResult:
+    """Async counterpart of validate_stream."""
+    v = StreamValidator(schema, **kwargs)
+    async for chunk in resp.aiter_bytes():
+        if v.feed(chunk) is not None:
+            await resp.aclose()
+            break
+    return v.close()
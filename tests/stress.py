@@ -0,0 +1,371 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from tests.client import AsyncClients, ClientPool
+from tests.poller import FAILURE_STATES, SUCCESS_STATES, TERMINAL_STATES
+from tests.schemas import CreateJobResponse, PresignedUploadResponse
+from tests.stats import latency_summary
+from tests.upload import aupload_stream
+
+# -----------------------
+# залп одновременных запросов
+# -----------------------
+
+def stress_levels_from_env() -> List[int]:
+    """STRESS_LEVELS="1,4,16": requests in flight per burst, the first level is the baseline."""
+    raw = os.getenv("STRESS_LEVELS", "1,4,16")
+    levels = sorted({int(x) for x in raw.split(",") if x.strip()})
+    if not levels or levels[0] < 1:
+        raise ValueError(f"STRESS_LEVELS must be positive integers, got {raw!r}")
+    return levels
+
+@dataclass
+class Shot:
+    """One request of a burst; start/end are perf_counter seconds."""
+    index: int
+    start: float
+    end: float
+    response: Optional[httpx.Response] = None
+    error: Optional[str] = None
+
+    @property
+    def latency(self) -> float:
+        return self.end - self.start
+
+    @property
+    def status_code(self):
+        return self.response.status_code if self.response is not None else self.error
+
+async def burst(n: int, send: Callable[[int], Awaitable[httpx.Response]]) -> List[Shot]:
+    """
+    Starts `n` requests together: every task waits on one barrier, so they
+    leave within the same loop iteration instead of trickling out as created.
+    """
+    gate = asyncio.Event()
+
+    async def one(i: int) -> Shot:
+        await gate.wait()
+        t0 = time.perf_counter()
+        try:
+            resp = await send(i)
+        except httpx.TransportError as e:
+            return Shot(i, t0, time.perf_counter(), error=type(e).__name__)
+        return Shot(i, t0, time.perf_counter(), response=resp)
+
+    tasks = [asyncio.ensure_future(one(i)) for i in range(n)]
+    await asyncio.sleep(0)
+    gate.set()
+    return list(await asyncio.gather(*tasks))
+
+# -----------------------
+# отчёт: нарушения + рост латентности по уровням
+# -----------------------
+
+@dataclass
+class LevelResult:
+    concurrency: int
+    latencies: List[float] = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    elapsed: float = 0.0
+
+    def add(self, shots: Sequence[Shot]) -> None:
+        for s in shots:
+            self.latencies.append(s.latency)
+            self.statuses[s.status_code] += 1
+
+@dataclass
+class StressReport:
+    scenario: str
+    levels: List[LevelResult] = field(default_factory=list)
+    violations: List[str] = field(default_factory=list)
+
+    def level(self, concurrency: int) -> LevelResult:
+        res = LevelResult(concurrency)
+        self.levels.append(res)
+        return res
+
+    @property
+    def statuses(self) -> Counter:
+        total = Counter()
+        for lv in self.levels:
+            total.update(lv.statuses)
+        return total
+
+    def growth(self) -> Dict[int, Optional[float]]:
+        """p95 at each level divided by p95 of the first (lowest) level."""
+        base = latency_summary(self.levels[0].latencies).get("p95") if self.levels else None
+        out = {}
+        for lv in self.levels:
+            p95 = latency_summary(lv.latencies).get("p95")
+            out[lv.concurrency] = round(p95 / base, 2) if p95 is not None and base else None
+        return out
+
+    def as_dict(self) -> dict:
+        growth = self.growth()
+        return {
+            "scenario": self.scenario,
+            "levels": [
+                {
+                    "concurrency": lv.concurrency,
+                    "elapsed_s": round(lv.elapsed, 4),
+                    "statuses": {str(k): v for k, v in sorted(lv.statuses.items(), key=lambda x: str(x[0]))},
+                    "latency": latency_summary(lv.latencies),
+                    "p95_growth": growth[lv.concurrency],
+                }
+                for lv in self.levels
+            ],
+            "violations": self.violations,
+        }
+
+    def growth_line(self) -> str:
+        parts = []
+        for lv in self.levels:
+            s = latency_summary(lv.latencies)
+            if s["count"]:
+                parts.append(f"x{lv.concurrency}: p50={s['p50'] * 1000:.1f}ms p95={s['p95'] * 1000:.1f}ms")
+        return f"{self.scenario}: " + ", ".join(parts)
+
+def _server_errors(shots: Sequence[Shot]) -> List[str]:
+    return [f"request #{s.index}: {s.status_code}" for s in shots
+            if s.error is not None or s.response.status_code >= 500]
+
+def _ok(shots: Sequence[Shot]) -> List[Shot]:
+    return [s for s in shots if s.response is not None and s.response.status_code in (200, 201)]
+
+def _duplicates(values: Sequence[str]) -> Dict[str, int]:
+    return {v: n for v, n in Counter(values).items() if n > 1}
+
+# -----------------------
+# сценарии
+# -----------------------
+
+async def upload_objects(clients: AsyncClients, n: int, content: bytes = b"\xFF\xD8\xFF\xD9") -> List[str]:
+    """n tiny objects in storage, returned as gs:// urls jobs can point at."""
+    async def one(i: int) -> str:
+        pres = await clients.api.post("/uploads/presigned",
+                                      json={"filename": f"stress-{i}.jpg", "content_type": "image/jpeg"})
+        pres.raise_for_status()
+        data = PresignedUploadResponse.model_validate(pres.json())
+        up = await aupload_stream(clients.storage(str(data.upload_url)), data.method, str(data.upload_url),
+                                  content, "image/jpeg")
+        up.response.raise_for_status()
+        return f"gs://{data.bucket}/{data.key}"
+
+    return list(await asyncio.gather(*(one(i) for i in range(n))))
+
+def _job_ids(shots: Sequence[Shot], report: StressReport) -> List[str]:
+    ids = []
+    for s in _ok(shots):
+        try:
+            ids.append(CreateJobResponse.model_validate(s.response.json()).resolved_id())
+        except ValueError as e:
+            report.violations.append(f"request #{s.index}: unreadable job body ({e})")
+    return ids
+
+async def _readable(client: httpx.AsyncClient, job_ids: Sequence[str], report: StressReport) -> None:
+    """Read-after-write: a job id the API just returned must already have a status."""
+    resps = await asyncio.gather(*(client.get(f"/jobs/{jid}/status") for jid in job_ids))
+    for jid, r in zip(job_ids, resps):
+        if r.status_code == 404:
+            report.violations.append(f"job {jid} was created but its status is 404")
+
+async def create_jobs_same_url(client: httpx.AsyncClient, gcs_url: str, levels: Sequence[int]) -> StressReport:
+    """
+    Bursts of POST /jobs with one gcs_url. The API may deduplicate (every answer
+    carries the same id) or not (all ids differ); a mix means the dedup check
+    lost a race and two jobs now process one object.
+    """
+    report = StressReport("create_jobs_same_url")
+    for n in levels:
+        lv = report.level(n)
+        t0 = time.perf_counter()
+        shots = await burst(n, lambda i: client.post("/jobs", json={"gcs_url": gcs_url}))
+        lv.elapsed = time.perf_counter() - t0
+        lv.add(shots)
+        report.violations += [f"x{n} {e}" for e in _server_errors(shots)]
+        ids = _job_ids(shots, report)
+        distinct = len(set(ids))
+        if 1 < distinct < len(ids):
+            report.violations.append(
+                f"x{n}: {len(ids)} jobs for one gcs_url got {distinct} ids (partial dedup): {_duplicates(ids)}")
+        await _readable(client, sorted(set(ids)), report)
+    return report
+
+async def create_jobs_distinct_urls(client: httpx.AsyncClient, gcs_urls: Sequence[str],
+                                    levels: Sequence[int]) -> StressReport:
+    """
+    Bursts of POST /jobs, one gcs_url per request and none reused between bursts
+    (needs sum(levels) urls): every job must get its own id.
+    """
+    if len(gcs_urls) < sum(levels):
+        raise ValueError(f"need {sum(levels)} gcs_urls for levels {list(levels)}, got {len(gcs_urls)}")
+    report = StressReport("create_jobs_distinct_urls")
+    seen: Dict[str, int] = {}
+    offset = 0
+    for n in levels:
+        lv = report.level(n)
+        urls, offset = gcs_urls[offset:offset + n], offset + n
+        t0 = time.perf_counter()
+        shots = await burst(n, lambda i: client.post("/jobs", json={"gcs_url": urls[i]}))
+        lv.elapsed = time.perf_counter() - t0
+        lv.add(shots)
+        report.violations += [f"x{n} {e}" for e in _server_errors(shots)]
+        ids = _job_ids(shots, report)
+        dup = _duplicates(ids)
+        if dup:
+            report.violations.append(f"x{n}: different gcs_urls got the same job id: {dup}")
+        # и между залпами: id не переиспользуются
+        reused = [jid for jid in set(ids) if jid in seen]
+        if reused:
+            report.violations.append(f"x{n}: job ids already returned at x{seen[reused[0]]}: {reused[:5]}")
+        seen.update({jid: n for jid in ids})
+        await _readable(client, sorted(set(ids)), report)
+    return report
+
+def state_rank(state: str) -> Optional[int]:
+    """queued < processing < terminal; None for states this suite does not know."""
+    if state in TERMINAL_STATES:
+        return 2
+    if state in ("queued", "pending", "created", "accepted"):
+        return 0
+    if state in ("processing", "running", "in_progress", "started"):
+        return 1
+    return None
+
+@dataclass
+class StatusRead:
+    reader: int
+    start: float
+    end: float
+    status_code: int
+    state: str = ""
+    job_id: Optional[str] = None
+
+def check_reads(job_id: str, reads: Sequence[StatusRead]) -> List[str]:
+    """
+    Concurrent readers must see one history: a read that started after another
+    one finished never shows an earlier state, the body is about the job asked
+    for, and there is at most one terminal state (a job cannot both fail and succeed).
+    """
+    problems = []
+    ok = [r for r in reads if r.status_code == 200]
+    for r in ok:
+        if r.job_id is not None and r.job_id != job_id:
+            problems.append(f"reader {r.reader} asked for {job_id} and got the status of {r.job_id}")
+    terminal = {r.state for r in ok if r.state in TERMINAL_STATES}
+    if terminal & SUCCESS_STATES and terminal & FAILURE_STATES:
+        problems.append(f"job {job_id} reported as both {sorted(terminal)}")
+
+    by_end = sorted((r for r in ok if state_rank(r.state) is not None), key=lambda r: r.end)
+    best: Optional[StatusRead] = None   # самое «позднее» состояние среди уже завершённых чтений
+    i = 0
+    for r in sorted(by_end, key=lambda r: r.start):
+        while i < len(by_end) and by_end[i].end <= r.start:
+            if best is None or state_rank(by_end[i].state) > state_rank(best.state):
+                best = by_end[i]
+            i += 1
+        if best is not None and state_rank(r.state) < state_rank(best.state):
+            problems.append(
+                f"job {job_id}: reader {r.reader} saw {r.state!r} after reader {best.reader} had already seen {best.state!r}")
+            break
+    return problems
+
+async def read_status_concurrently(client: httpx.AsyncClient, job_id: str, levels: Sequence[int],
+                                   timeout: float = 30.0, interval: float = 0.05) -> StressReport:
+    """
+    `n` readers poll one job at once until each sees a terminal state; repeated
+    for every level on a fresh job is too costly, so levels share the job and
+    later levels read the settled terminal state (still a valid contention check).
+    """
+    report = StressReport("read_status_concurrently")
+    for n in levels:
+        lv = report.level(n)
+        reads: List[StatusRead] = []
+        deadline = time.monotonic() + timeout
+
+        async def reader(k: int) -> None:
+            while True:
+                t0 = time.perf_counter()
+                try:
+                    r = await client.get(f"/jobs/{job_id}/status")
+                except httpx.TransportError as e:
+                    lv.latencies.append(time.perf_counter() - t0)
+                    lv.statuses[type(e).__name__] += 1
+                    return
+                t1 = time.perf_counter()
+                lv.latencies.append(t1 - t0)
+                lv.statuses[r.status_code] += 1
+                read = StatusRead(k, t0, t1, r.status_code)
+                if r.status_code == 200:
+                    body = r.json()
+                    read.state = str(body.get("status") or body.get("state") or "").lower()
+                    read.job_id = body.get("job_id") or body.get("id")
+                reads.append(read)
+                if read.state in TERMINAL_STATES or r.status_code not in (200, 429) or time.monotonic() > deadline:
+                    return
+                await asyncio.sleep(interval)
+
+        t0 = time.perf_counter()
+        gate = asyncio.Event()
+
+        async def gated(k: int) -> None:
+            await gate.wait()
+            await reader(k)
+
+        tasks = [asyncio.ensure_future(gated(k)) for k in range(n)]
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(*tasks)
+        lv.elapsed = time.perf_counter() - t0
+
+        report.violations += [f"x{n}: {p}" for p in check_reads(job_id, reads)]
+        report.violations += [f"x{n}: status {code} x{cnt}" for code, cnt in lv.statuses.items()
+                              if not isinstance(code, int) or code >= 500]
+        if not any(r.state in TERMINAL_STATES for r in reads):
+            report.violations.append(f"x{n}: job {job_id} not terminal within {timeout:g}s")
+    return report
+
+async def presign_same_filename(client: httpx.AsyncClient, filename: str, levels: Sequence[int]) -> StressReport:
+    """Bursts of presign for one filename: each must get its own key and upload_url, or uploads overwrite each other."""
+    report = StressReport("presign_same_filename")
+    keys: Dict[Tuple[str, str], int] = {}
+    for n in levels:
+        lv = report.level(n)
+        t0 = time.perf_counter()
+        shots = await burst(n, lambda i: client.post(
+            "/uploads/presigned", json={"filename": filename, "content_type": "image/jpeg"}))
+        lv.elapsed = time.perf_counter() - t0
+        lv.add(shots)
+        report.violations += [f"x{n} {e}" for e in _server_errors(shots)]
+        got = []
+        for s in _ok(shots):
+            try:
+                got.append(PresignedUploadResponse.model_validate(s.response.json()))
+            except ValueError as e:
+                report.violations.append(f"x{n} request #{s.index}: unreadable presign body ({e})")
+        objects = [(p.bucket, p.key) for p in got]
+        dup = _duplicates([f"{b}/{k}" for b, k in objects])
+        if dup:
+            report.violations.append(f"x{n}: presigns for {filename!r} collided on keys {dup}")
+        dup_urls = _duplicates([str(p.upload_url) for p in got])
+        if dup_urls and not dup:
+            report.violations.append(f"x{n}: different keys share an upload_url: {list(dup_urls)[:3]}")
+        reused = [o for o in set(objects) if o in keys]
+        if reused:
+            report.violations.append(f"x{n}: keys already handed out at x{keys[reused[0]]}: {reused[:3]}")
+        keys.update({o: n for o in objects})
+    return report
+
+def run_stress(pool: ClientPool, scenario: Callable[[AsyncClients], Awaitable]):
+    """Sync entry point: one event loop, the pool's async API + storage clients."""
+    async def run():
+        async with pool.async_clients() as clients:
+            return await scenario(clients)
+
+    return asyncio.run(run())
@@ -0,0 +1,55 @@
+import asyncio
+import contextvars
+
+import pytest
+
+from tests.aio import BackgroundLoop
+from tests.artifacts import CURRENT_TEST, current_artifacts
+
+@pytest.fixture
+def loop():
+    bg = BackgroundLoop(name="test-loop")
+    yield bg
+    bg.close()
+
+def test_run_returns_results_and_reraises_outcomes(loop):
+    async def body(i):
+        await asyncio.sleep(0.01)
+        if i == 1:
+            assert i == 0, "boom"
+        if i == 2:
+            pytest.skip("not here")
+        return i
+
+    assert loop.run(body(0)) == 0
+    with pytest.raises(AssertionError, match="boom"):
+        loop.run(body(1))
+    with pytest.raises(pytest.skip.Exception, match="not here"):
+        loop.run(body(2))
+
+def test_context_set_in_a_coroutine_stays_there(loop):
+    var = contextvars.ContextVar("owner", default=None)
+
+    async def body(name):
+        var.set(name)
+        await asyncio.sleep(0.01)
+        return var.get()
+
+    futures = [loop.submit(body(name)) for name in "abcd"]
+    assert [f.result() for f in futures] == list("abcd")
+    assert var.get() is None
+
+def test_close_cancels_what_is_still_running():
+    bg = BackgroundLoop(name="test-loop")
+    fut = bg.submit(asyncio.sleep(60))
+    bg.close()
+    assert fut.cancelled()
+    assert bg.loop.is_closed()
+
+@pytest.mark.parametrize("n", range(2))
+async def test_async_test_sees_its_own_item_and_artifacts(artifacts, n):
+    """Runs on the shared loop's thread; helpers still find this test's artifacts."""
+    await asyncio.sleep(0)
+    assert artifacts.nodeid.endswith(f"[{n}]")
+    assert CURRENT_TEST.get().nodeid == artifacts.nodeid
+    assert current_artifacts() is artifacts
@@ -1,11 +1,11 @@
-import time
+import os
 import pytest
-import httpx
 
-from tests.utils import assert_status, log_response
-from tests.schemas import (
-    HealthResponse, PresignedUploadResponse, CreateJobResponse, JobStatusResponse
-)
+from tests.utils import assert_status, log, log_response
+from tests.schemas import HealthResponse, PresignedUploadResponse, CreateJobResponse
+from tests.poller import SUCCESS_STATES
+from tests.tracing import span
+from tests.upload import UPLOAD_METHODS, upload_stream
 
 def _make_dummy_jpg_bytes() -> bytes:
     return b"\xFF\xD8\xFF\xD9"  # minimal valid JPEG
@@ -24,7 +24,17 @@ def test_ready_returns_200_or_503(client):
     r = client.get("/ready")
     assert_status(r, {200, 503}, "ready")
 
-def test_uploads_presigned_returns_contract_shape_on_success(client):
+# отдельно от проверок живости выше: без /openapi.json они должны проходить
+@pytest.mark.parametrize("path, expected", [("/health", {200}), ("/ready", {200, 503})])
+def test_health_and_ready_bodies_match_the_spec(client, contract, path, expected):
+    """JSON bodies of /health and /ready match their schemas in /openapi.json, where the spec has them."""
+    r = client.get(path)
+    assert_status(r, expected, path.strip("/"))
+    if "application/json" in r.headers.get("content-type", ""):
+        contract.validate(r)
+
+@pytest.mark.requires("uploads")
+def test_uploads_presigned_returns_contract_shape_on_success(client, contract):
     """
     When presigned upload works (200/201), response must include
     bucket/key/upload_url/method/expires_in.
@@ -38,18 +48,22 @@ def test_uploads_presigned_returns_contract_shape_on_success(client):
         raise AssertionError("POST /uploads/presigned returned 422: payload does not match API schema")
 
     assert_status(r, {200, 201}, "presigned_success")
+    contract.validate(r)
     PresignedUploadResponse.model_validate(r.json())
 
+@pytest.mark.requires("uploads", "jobs", "auth")
 @pytest.mark.e2e
-def test_e2e_upload_then_create_job_then_poll_status_until_terminal(client):
+def test_e2e_upload_then_create_job_then_poll_status_until_terminal(client, storage_client, job_poller, contract):
     """
     E2E flow:
     1) get presigned upload URL
     2) upload dummy file
     3) create job with gs://bucket/key as gcs_url
     4) poll /status until terminal state or timeout
+    Each step is a span of the test trace (waterfall in report.html).
     """
-    pres = client.post("/uploads/presigned", json={"filename": "test.jpg", "content_type": "image/jpeg"})
+    with span("presign"):
+        pres = client.post("/uploads/presigned", json={"filename": "test.jpg", "content_type": "image/jpeg"})
 
     if pres.status_code in (401, 403):
         pytest.skip("uploads/presigned requires auth; set API_TOKEN in .env")
@@ -58,6 +72,7 @@ def test_e2e_upload_then_create_job_then_poll_status_until_terminal(client):
         raise AssertionError("Need correct payload for /uploads/presigned")
 
     assert_status(pres, {200, 201}, "presigned")
+    contract.validate(pres)
     pres_data = PresignedUploadResponse.model_validate(pres.json())
 
     # Upload file to upload_url
@@ -65,13 +80,11 @@ def test_e2e_upload_then_create_job_then_poll_status_until_terminal(client):
     method = pres_data.method.upper()
     headers = {"Content-Type": "image/jpeg"}
 
-    with httpx.Client(timeout=60, follow_redirects=True) as up:
-        if method == "PUT":
-            up_res = up.put(str(pres_data.upload_url), content=jpg, headers=headers)
-        elif method == "POST":
-            up_res = up.post(str(pres_data.upload_url), content=jpg, headers=headers)
-        else:
-            raise AssertionError(f"Unsupported upload method: {method}")
+    upload_url = str(pres_data.upload_url)
+    if method not in UPLOAD_METHODS:
+        raise AssertionError(f"Unsupported upload method: {method}")
+    with span("upload"):
+        up_res = upload_stream(storage_client(upload_url), method, upload_url, jpg, headers["Content-Type"]).response
 
     if up_res.status_code not in (200, 201, 204):
         # log upload response for debugging
@@ -80,29 +93,57 @@ def test_e2e_upload_then_create_job_then_poll_status_until_terminal(client):
 
     gcs_url = f"gs://{pres_data.bucket}/{pres_data.key}"
 
-    job = client.post("/jobs", json={"gcs_url": gcs_url})
+    with span("create_job"):
+        job = client.post("/jobs", json={"gcs_url": gcs_url})
     if job.status_code in (401, 403):
         pytest.skip("POST /jobs requires auth; set API_TOKEN in .env")
     assert_status(job, {200, 201}, "create_job")
+    contract.validate(job)
 
     job_data = CreateJobResponse.model_validate(job.json())
     job_id = job_data.resolved_id()
 
-    deadline = time.time() + 30
-    last = None
-    while time.time() < deadline:
-        s = client.get(f"/jobs/{job_id}/status")
-        if s.status_code in (401, 403):
-            pytest.skip("GET /jobs/{id}/status requires auth; set API_TOKEN in .env")
-        assert_status(s, {200}, "job_status")
-        last = JobStatusResponse.model_validate(s.json())
+    result = job_poller([job_id])[job_id]
+    if result.last_status_code in (401, 403):
+        pytest.skip("GET /jobs/{id}/status requires auth; set API_TOKEN in .env")
+    assert result.last is not None, f"No status for job {job_id}: {result.error}"
+    contract.validate(client.get(f"/jobs/{job_id}/status"))
+
+@pytest.mark.requires("uploads", "jobs", "auth")
+@pytest.mark.e2e
+def test_e2e_many_jobs_are_polled_concurrently_until_terminal(client, storage_client, job_poller):
+    """
+    E2E_JOB_COUNT jobs from one uploaded file are watched by a single poller;
+    each must reach a terminal state, time-to-terminal is logged per job.
+    """
+    count = int(os.getenv("E2E_JOB_COUNT", "5"))
+
+    pres = client.post("/uploads/presigned", json={"filename": "test.jpg", "content_type": "image/jpeg"})
+    if pres.status_code in (401, 403):
+        pytest.skip("uploads/presigned requires auth; set API_TOKEN in .env")
+    assert_status(pres, {200, 201}, "presigned")
+    pres_data = PresignedUploadResponse.model_validate(pres.json())
+
+    upload_url = str(pres_data.upload_url)
+    up_res = upload_stream(storage_client(upload_url), pres_data.method, upload_url,
+                           _make_dummy_jpg_bytes(), "image/jpeg").response
+    assert up_res.status_code in (200, 201, 204)
+
+    gcs_url = f"gs://{pres_data.bucket}/{pres_data.key}"
+    job_ids = []
+    for _ in range(count):
+        job = client.post("/jobs", json={"gcs_url": gcs_url})
+        if job.status_code in (401, 403):
+            pytest.skip("POST /jobs requires auth; set API_TOKEN in .env")
+        assert_status(job, {200, 201}, "create_job")
+        job_ids.append(CreateJobResponse.model_validate(job.json()).resolved_id())
 
-        st = (last.status or last.state or "").lower()
-        if st in ("done", "completed", "finished", "success", "failed", "error"):
-            break
-        time.sleep(1)
+    results = job_poller(job_ids, timeout=float(os.getenv("JOB_POLL_TIMEOUT", "60")))
+    for r in results.values():
+        log.info("job %s: state=%s polls=%s time_to_terminal=%s", r.job_id, r.state, r.polls, r.time_to_terminal)
 
-    assert last is not None
+    not_terminal = [r.as_dict() for r in results.values() if not r.terminal]
+    assert not not_terminal, f"Jobs did not reach a terminal state: {not_terminal}"
 
 # ---------------------------
 # Negative tests (минимум 6)
@@ -113,6 +154,7 @@ def test_neg_presigned_missing_filename_returns_422_or_400(client):
     r = client.post("/uploads/presigned", json={"content_type": "image/jpeg"})
     assert r.status_code in (400, 401, 403, 422)
 
+@pytest.mark.requires("uploads")
 def test_presigned_missing_content_type_is_handled(client):
     """If content_type is optional, API should still succeed and return valid presigned response."""
     r = client.post("/uploads/presigned", json={"filename": "x.jpg"})
@@ -147,11 +189,14 @@ def test_neg_jobs_gcs_url_wrong_type_returns_422_or_400(client):
     r = client.post("/jobs", json={"gcs_url": 123})
     assert r.status_code in (400, 401, 403, 422)
 
-def test_neg_status_unknown_job_id_returns_404_or_422_or_400(client):
+def test_neg_status_unknown_job_id_returns_404_or_422_or_400(client, contract):
     """Non-existent job_id should not return 200."""
     r = client.get("/jobs/this-job-does-not-exist/status")
     assert r.status_code in (400, 401, 403, 404, 422)
+    if "application/json" in r.headers.get("content-type", ""):
+        contract.validate(r)
 
+@pytest.mark.requires("uploads")
 def test_presigned_empty_filename_is_handled_safely(client):
     """
     If API accepts empty filename (200/201), it must still return a usable presigned contract.
@@ -170,6 +215,7 @@ def test_presigned_empty_filename_is_handled_safely(client):
     else:
         assert r.status_code in (400, 422)
 
+@pytest.mark.requires("uploads")
 def test_neg_presigned_filename_with_path_traversal_returns_4xx_or_sanitizes(client):
     """
     Path traversal like ../ should be rejected OR sanitized.
@@ -186,6 +232,7 @@ def test_neg_presigned_filename_with_path_traversal_returns_4xx_or_sanitizes(cli
     else:
         assert r.status_code in (400, 422)
 
+@pytest.mark.requires("jobs")
 def test_jobs_empty_gcs_url_does_not_succeed_silently(client):
     """
     If API accepts empty gcs_url (200/201), it must not immediately report a successful completion.
@@ -208,6 +255,6 @@ def test_jobs_empty_gcs_url_does_not_succeed_silently(client):
         assert sresp.status_code == 200
         st = (sresp.json().get("status") or sresp.json().get("state") or "").lower()
 
-        assert st not in ("done", "completed", "finished", "success"), f"Empty gcs_url produced successful status: {st}"
+        assert st not in SUCCESS_STATES, f"Empty gcs_url produced successful status: {st}"
     else:
         assert r.status_code in (400, 422)
@@ -0,0 +1,79 @@
+import gzip
+import json
+import os
+
+from tests.artifacts import ArtifactLimits, ArtifactSpool, clear_spools, merge_spools, read_ref
+
+LIMITS = ArtifactLimits(inline_bytes=100, max_bytes=1000, run_bytes=10_000, preview_chars=20)
+
+def _spool(tmp_path, worker="gw0", limits=LIMITS) -> ArtifactSpool:
+    return ArtifactSpool(str(tmp_path), worker, limits)
+
+def _blob(tmp_path, entry) -> bytes:
+    with gzip.open(os.path.join(tmp_path, entry["blob"]), "rb") as f:
+        return f.read()
+
+def test_small_artifacts_are_inline_and_refs_read_back(tmp_path):
+    spool = _spool(tmp_path)
+    refs = [spool.write("t::a", "json", "meta", {"status": 200}), spool.write("t::a", "text", "note", "hello")]
+    spool.close()
+    entries = [read_ref(str(tmp_path), r) for r in refs]
+    assert entries[0] == {"nodeid": "t::a", "name": "meta", "kind": "json", "payload": {"status": 200},
+                          "size": len(json.dumps({"status": 200}, indent=2))}
+    assert entries[1]["payload"] == "hello" and entries[1]["size"] == 5
+
+def test_big_artifacts_become_blobs_and_oversized_ones_are_cut(tmp_path):
+    spool = _spool(tmp_path)
+    big = spool._entry("text", "x" * 500)
+    assert big["kind"] == "blob" and big["format"] == "txt" and big["size"] == 500
+    assert big["preview"] == "x" * 20 and _blob(tmp_path, big) == b"x" * 500
+
+    huge = spool._entry("json", {"data": "y" * 5000})
+    # обрезанный JSON уже не JSON: хранится текстом с пометкой
+    assert huge["truncated"] and huge["format"] == "txt" and huge["size"] > 5000
+    raw = _blob(tmp_path, huge)
+    assert raw.startswith(b"{") and raw.endswith(f"of {huge['size']} bytes]".encode())
+    assert len(raw) < 1100
+
+def test_identical_blobs_are_stored_once_across_workers(tmp_path):
+    a, b = _spool(tmp_path, "gw0"), _spool(tmp_path, "gw1")
+    first, second = a._entry("html", "<p>" + "z" * 300 + "</p>"), b._entry("html", "<p>" + "z" * 300 + "</p>")
+    assert first["blob"] == second["blob"] and first["format"] == "html"
+    assert len(os.listdir(tmp_path / "blobs")) == 1
+    # второй воркер блоб не писал: бюджет не тратится
+    assert a.stored_bytes > 0 and b.stored_bytes == 0
+
+def test_run_budget_drops_what_does_not_fit(tmp_path):
+    spool = _spool(tmp_path, limits=ArtifactLimits(inline_bytes=100, max_bytes=1000, run_bytes=100))
+    assert spool._entry("text", "a" * 90)["kind"] == "text"
+    assert spool._entry("text", "b" * 90) == {"kind": "dropped", "size": 90}
+    # блоб проверяет только остаток до записи: пишется целиком и исчерпывает бюджет
+    assert spool._entry("text", "c" * 400)["kind"] == "blob"
+    assert spool._entry("text", "d" * 400) == {"kind": "dropped", "size": 400}
+    assert spool.dropped == 2
+
+def test_budget_is_split_between_xdist_workers(monkeypatch):
+    monkeypatch.setenv("ARTIFACT_RUN_BYTES", "1000")
+    monkeypatch.setenv("PYTEST_XDIST_WORKER_COUNT", "4")
+    assert ArtifactLimits.from_env().run_bytes == 250
+
+def test_merge_orders_by_test_and_keeps_order_within_a_test(tmp_path):
+    a, b = _spool(tmp_path, "gw0"), _spool(tmp_path, "gw1")
+    a.write("t::b", "text", "1", "b1")
+    b.write("t::a", "text", "1", "a1")
+    a.write("t::b", "text", "2", "b2")
+    b.write("t::a", "text", "2", "a2")
+    b._entry("text", "w" * 500)
+    a.close()
+    b.close()
+
+    out = tmp_path / "out" / "artifacts.jsonl"
+    assert merge_spools(str(tmp_path), str(out)) == 4
+    lines = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    assert [e["payload"] for e in lines] == ["a1", "a2", "b1", "b2"]
+
+    clear_spools(str(tmp_path))
+    assert not list(tmp_path.glob("*.jsonl")) and os.listdir(tmp_path / "blobs")
+    clear_spools(str(tmp_path), blobs=True)
+    assert not (tmp_path / "blobs").exists()
+    assert merge_spools(str(tmp_path), str(tmp_path / "empty.jsonl")) == 0
@@ -0,0 +1,92 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from tests.artifacts import CURRENT_TEST
+from tests.cassette import Cassette, CassetteMiss, RecordingTransport, ReplayTransport
+
+API = "https://api.test"
+
+def _server(request: httpx.Request) -> httpx.Response:
+    if request.method == "HEAD":
+        return httpx.Response(200, headers={"Content-Length": "1234", "ETag": '"abc"'})
+    if request.method == "PUT":
+        return httpx.Response(200, headers={"ETag": '"%d"' % len(request.content)})
+    if request.url.path == "/uploads/presigned":
+        url = "https://storage.test/b/k?X-Goog-Signature=deadbeef&X-Goog-Expires=900"
+        return httpx.Response(200, json={"upload_url": url})
+    if request.url.path == "/jobs/j1/status":
+        _server.polls += 1
+        return httpx.Response(200, json={"status": "done" if _server.polls > 1 else "queued"})
+    return httpx.Response(200, json={"echo": json.loads(request.content or b"null"), "path": request.url.path})
+
+def _record(tmp_path, calls) -> Cassette:
+    _server.polls = 0
+    cassette = Cassette(str(tmp_path / "c.jsonl.gz"))
+    transport = RecordingTransport(httpx.MockTransport(_server), cassette)
+    with httpx.Client(base_url=API, transport=transport, headers={"Authorization": "Bearer secret"}) as c:
+        calls(c)
+    cassette.save()
+    return Cassette(cassette.path).load()
+
+def _replay(cassette: Cassette, base_url: str = "https://other-stand.test") -> httpx.Client:
+    return httpx.Client(base_url=base_url, transport=ReplayTransport(cassette))
+
+def test_replay_matches_by_method_path_and_canonical_json(tmp_path):
+    cassette = _record(tmp_path, lambda c: c.post("/jobs", json={"gcs_url": "gs://b/k", "lang": "en"}))
+    # другой хост, другой порядок ключей и пробелы — тот же запрос
+    body = b'{ "lang": "en",  "gcs_url": "gs://b/k" }'
+    with _replay(cassette) as c:
+        r = c.post("/jobs", content=body, headers={"Content-Type": "application/json"})
+    assert r.json() == {"echo": {"gcs_url": "gs://b/k", "lang": "en"}, "path": "/jobs"}
+    assert cassette.entries[0]["request_headers"]["authorization"] == "REDACTED"
+
+def test_miss_raises_and_is_reported(tmp_path):
+    cassette = _record(tmp_path, lambda c: c.post("/jobs", json={"gcs_url": "gs://b/k"}))
+    with _replay(cassette) as c, pytest.raises(CassetteMiss, match="POST /jobs"):
+        c.post("/jobs", json={"gcs_url": "gs://b/other"})
+    assert cassette.unmatched == [{"method": "POST", "path": "/jobs", "body_key": '{"gcs_url":"gs://b/other"}'}]
+
+def test_repeated_requests_replay_in_order_and_the_last_answer_sticks(tmp_path):
+    cassette = _record(tmp_path, lambda c: [c.get("/jobs/j1/status") for _ in range(2)])
+    with _replay(cassette) as c:
+        assert [c.get("/jobs/j1/status").json()["status"] for _ in range(3)] == ["queued", "done", "done"]
+
+def test_signatures_are_scrubbed_from_urls_and_bodies(tmp_path):
+    cassette = _record(tmp_path, lambda c: c.post("/uploads/presigned", json={"filename": "a.jpg"}))
+    (entry,) = cassette.entries
+    assert "deadbeef" not in entry["text"] and "X-Goog-Signature=REDACTED" in entry["text"]
+
+def test_streamed_body_is_keyed_before_the_transport_reads_it(tmp_path):
+    """MockTransport reads the request body; the key must still be the one replay computes."""
+    put = lambda c: c.put("https://storage.test/b/k", content=iter([b"part1", b"part2"]))
+    cassette = _record(tmp_path, lambda c: put(c))
+    assert cassette.entries[0]["body_key"].startswith("stream:")
+    with _replay(cassette) as c:
+        assert put(c).status_code == 200
+
+def test_head_keeps_content_length(tmp_path):
+    cassette = _record(tmp_path, lambda c: c.head("https://storage.test/b/k"))
+    with _replay(cassette) as c:
+        r = c.head("https://storage.test/b/k")
+    assert r.headers["content-length"] == "1234" and r.headers["etag"] == '"abc"'
+
+def test_replay_prefers_the_exchange_of_the_recording_test(tmp_path):
+    def as_test(nodeid, fn):
+        token = CURRENT_TEST.set(SimpleNamespace(nodeid=nodeid))
+        try:
+            return fn()
+        finally:
+            CURRENT_TEST.reset(token)
+
+    def calls(c):
+        as_test("test_a", lambda: c.get("/jobs/j1/status"))
+        as_test("test_b", lambda: c.get("/jobs/j1/status"))
+
+    cassette = _record(tmp_path, calls)
+    with _replay(cassette) as c:
+        # test_b идёт первым (другой воркер xdist), но получает свой ответ
+        assert as_test("test_b", lambda: c.get("/jobs/j1/status")).json()["status"] == "done"
+        assert as_test("test_a", lambda: c.get("/jobs/j1/status")).json()["status"] == "queued"
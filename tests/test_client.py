@@ -0,0 +1,48 @@
+import httpx
+
+from tests.client import ClientPool, ConnectionStats
+
+def _pool(handler) -> ClientPool:
+    return ClientPool("https://api.test", {}, transport=httpx.MockTransport(handler))
+
+def test_reuse_is_unknown_without_trace_events():
+    """Fakes and cassettes send no trace events: no 100% reuse, no bytes=0."""
+    pool = _pool(lambda request: httpx.Response(200, json={"ok": True}))
+    try:
+        for _ in range(3):
+            pool.api.get("/health")
+    finally:
+        pool.close()
+    stats = pool.stats()["api"].as_dict()
+    assert stats == {"requests": 3, "new_connections": 0, "traced": 0, "reused": None, "reuse_ratio": None}
+    (row,) = pool.timings.summary().values()
+    assert row["count"] == 3 and row["bytes_received"] is None
+
+def test_reuse_counts_traced_requests_only():
+    opened = []
+
+    def handler(request):
+        # первый запрос открывает соединение, остальные идут по нему
+        trace = request.extensions["trace"]
+        if not opened:
+            trace("connection.connect_tcp.started", {})
+            trace("connection.connect_tcp.complete", {})
+            opened.append(request)
+        trace("http11.send_request_headers.started", {})
+        trace("http11.send_request_headers.complete", {})
+        return httpx.Response(200)
+
+    pool = _pool(handler)
+    try:
+        for _ in range(4):
+            pool.api.get("/health")
+    finally:
+        pool.close()
+    stats = pool.stats()["api"]
+    assert (stats.traced, stats.new_connections, stats.reused) == (4, 1, 3)
+    assert stats.reuse_ratio == 0.75
+
+    merged = ConnectionStats()
+    merged.merge(stats.as_dict())
+    merged.merge(ConnectionStats(requests=2).as_dict())
+    assert (merged.requests, merged.traced, merged.reused) == (6, 4, 3)
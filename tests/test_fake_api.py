@@ -0,0 +1,156 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tests.fake_api import FAKE_STORAGE_ORIGIN, FakeStudioAPI, Faults, fake_api_from_env
+from tests.utils import is_cloudflare_challenge
+
+API = "https://api.test"
+CHUNK = 256 * 1024
+
+def _client(api: FakeStudioAPI) -> httpx.Client:
+    return httpx.Client(base_url=API, transport=api.transport())
+
+def _upload(c: httpx.Client, data: bytes = b"abc") -> dict:
+    pres = c.post("/uploads/presigned", json={"filename": "a.wav", "content_type": "audio/wav"}).json()
+    assert c.put(pres["upload_url"], content=data).status_code == 200
+    return pres
+
+# -----------------------
+# fault injection
+# -----------------------
+
+@pytest.mark.parametrize("faults, status", [
+    (Faults(rate_429=1.0, retry_after=3), 429),
+    (Faults(rate_503=1.0), 503),
+    (Faults(rate_waf=1.0), 403),
+])
+def test_faults_answer_before_routing(faults, status):
+    with _client(FakeStudioAPI(faults=faults)) as c:
+        r = c.get("/health")
+    assert r.status_code == status
+    if status == 429:
+        assert r.headers["retry-after"] == "3"
+    if status == 403:
+        assert is_cloudflare_challenge(r)
+
+def test_fault_rates_add_up_and_zero_means_never():
+    api = FakeStudioAPI(faults=Faults(rate_429=0.3, rate_503=0.3))
+    with _client(api) as c:
+        codes = [c.get("/health").status_code for _ in range(400)]
+    assert {200, 429, 503} == set(codes)
+    assert 80 < codes.count(429) < 160 and 80 < codes.count(503) < 160
+    with _client(FakeStudioAPI()) as c:
+        assert all(c.get("/health").status_code == 200 for _ in range(50))
+
+def test_faults_and_options_from_env(monkeypatch):
+    for name, value in {"FAKE_API_429": "0.1", "FAKE_API_503": "0.2", "FAKE_API_WAF": "0.3",
+                        "FAKE_API_LATENCY": "0.05", "FAKE_API_READY": "0", "FAKE_API_PROCESSING_DELAY": "1.5"}.items():
+        monkeypatch.setenv(name, value)
+    api = fake_api_from_env()
+    assert api.faults == Faults(latency=0.05, rate_429=0.1, rate_503=0.2, rate_waf=0.3)
+    assert not api.ready and api.processing_delay == 1.5
+    with _client(api) as c:
+        api.faults = Faults(latency=0.05)
+        t0 = time.perf_counter()
+        assert c.get("/ready").status_code == 503
+    assert time.perf_counter() - t0 >= 0.05
+
+def test_async_transport_and_gateway_headers():
+    async def run():
+        async with httpx.AsyncClient(base_url=API, transport=FakeStudioAPI().transport()) as c:
+            return await c.get("/health", headers={"X-Request-ID": "req-1"})
+
+    r = asyncio.run(run())
+    assert r.json() == {"status": "ok"} and r.headers["x-request-id"] == "req-1"
+    assert r.headers["server-timing"].startswith("app;dur=")
+
+# -----------------------
+# джобы
+# -----------------------
+
+def test_job_goes_queued_processing_done():
+    api = FakeStudioAPI(processing_delay=0.6, result_segments=2)
+    with _client(api) as c:
+        pres = _upload(c)
+        job = c.post("/jobs", json={"gcs_url": f"gs://{pres['bucket']}/{pres['key']}"})
+        assert job.status_code == 201 and job.json()["status"] == "queued"
+        status = lambda: c.get(f"/jobs/{job.json()['job_id']}/status").json()
+        assert status()["status"] == "queued"
+        time.sleep(0.35)
+        assert status()["status"] == "processing"
+        time.sleep(0.3)
+        done = status()
+    assert done["status"] == "done" and len(done["result"]["segments"]) == 2
+
+def test_job_on_a_missing_object_fails_and_bad_input_is_422():
+    with _client(FakeStudioAPI(processing_delay=0)) as c:
+        job = c.post("/jobs", json={"gcs_url": "gs://fake-uploads/never-uploaded"}).json()
+        assert c.get(f"/jobs/{job['job_id']}/status").json()["status"] == "failed"
+        assert c.post("/jobs", json={}).status_code == 422
+        assert c.post("/jobs", json={"gcs_url": 42}).status_code == 422
+        assert c.post("/jobs", json={"gcs_url": "https://x"}).status_code == 422
+        assert c.get("/jobs/nope/status").status_code == 404
+
+def test_presign_keeps_only_a_safe_basename():
+    with _client(FakeStudioAPI()) as c:
+        key = c.post("/uploads/presigned", json={"filename": "../../etc/.passwd\x00"}).json()["key"]
+        assert key.startswith("uploads/") and key.endswith("/passwd")
+        assert c.post("/uploads/presigned", json={"filename": "a" * 256}).status_code == 422
+
+# -----------------------
+# GCS resumable-сессия
+# -----------------------
+
+def _session(c: httpx.Client, pres: dict) -> str:
+    r = c.post(pres["upload_url"], headers={"x-goog-resumable": "start"})
+    assert r.status_code == 201
+    return r.headers["location"]
+
+def _chunk(c: httpx.Client, url: str, data: bytes, start: int, total: int) -> httpx.Response:
+    rng = f"bytes {start}-{start + len(data) - 1}/{total}"
+    return c.put(url, content=data, headers={"Content-Range": rng})
+
+def test_resumable_session_persists_chunks_and_reports_progress():
+    api = FakeStudioAPI()
+    blob = bytes(range(256)) * (CHUNK * 2 // 256) + b"tail"
+    with _client(api) as c:
+        pres = c.post("/uploads/presigned", json={"filename": "big.bin"}).json()
+        url = _session(c, pres)
+        status = lambda: c.put(url, headers={"Content-Range": f"bytes */{len(blob)}"})
+        # до первого куска Range нет
+        assert status().status_code == 308 and "range" not in status().headers
+        r = _chunk(c, url, blob[:CHUNK], 0, len(blob))
+        assert r.status_code == 308 and r.headers["range"] == f"bytes=0-{CHUNK - 1}"
+        # повтор уже сохранённого куска (ответ потерялся) не ломает сессию
+        assert _chunk(c, url, blob[:CHUNK], 0, len(blob)).headers["range"] == f"bytes=0-{CHUNK - 1}"
+        assert _chunk(c, url, blob[CHUNK:], CHUNK, len(blob)).status_code == 200
+        assert status().status_code == 200
+        head = c.head(pres["upload_url"])
+    assert api.objects[(pres["bucket"], pres["key"])] == blob
+    assert head.headers["content-length"] == str(len(blob))
+
+def test_resumable_session_rejects_gaps_misaligned_chunks_and_bad_ranges():
+    with _client(FakeStudioAPI()) as c:
+        url = _session(c, c.post("/uploads/presigned", json={"filename": "x.bin"}).json())
+        total = CHUNK * 3
+        # кусок после дыры
+        assert _chunk(c, url, b"x" * CHUNK, CHUNK, total).status_code == 400
+        # не последний кусок не кратен 256 KiB
+        assert _chunk(c, url, b"x" * 1000, 0, total).status_code == 400
+        # Content-Range не совпадает с телом
+        bad = c.put(url, content=b"xy", headers={"Content-Range": f"bytes 0-9/{total}"})
+        assert bad.status_code == 400
+        assert c.put(url, content=b"", headers={"Content-Range": "garbage"}).status_code == 400
+        missing = str(httpx.URL(url).copy_with(query=b"upload_id=nope"))
+        assert c.put(missing, content=b"x", headers={"Content-Range": "bytes 0-0/1"}).status_code == 404
+
+def test_single_put_and_head_of_the_fake_store():
+    api = FakeStudioAPI()
+    with _client(api) as c:
+        pres = _upload(c, b"hello")
+        head = c.head(pres["upload_url"])
+        assert head.status_code == 200 and head.headers["x-goog-stored-content-length"] == "5"
+        assert c.get(f"{FAKE_STORAGE_ORIGIN}/{pres['bucket']}/missing").status_code == 404
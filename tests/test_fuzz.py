@@ -0,0 +1,105 @@
+import asyncio
+import os
+import random
+
+import httpx
+import pytest
+
+from tests.cassette import Cassette, CassetteMiss, ReplayTransport
+from tests.fake_api import OPENAPI_SPEC
+from tests.fuzz import (
+    Fuzzer, classify, fuzz_operations_from_env, fuzz_seed_from_env, load_regressions, run_fuzz,
+    save_regressions, save_regressions_enabled,
+)
+from tests.openapi import SpecIndex, conforms
+
+REGRESSIONS = load_regressions()
+# пустой файл — явный skip с причиной, а не "empty parameter set" в каждом прогоне -m fuzz
+REGRESSION_CASES = [
+    pytest.param(c, id=f"{c['kind']}-{c['method']}-{c['path']}-{i}") for i, c in enumerate(REGRESSIONS)
+] or [pytest.param(None, id="none", marks=pytest.mark.skip(reason="no saved fuzz regressions yet"))]
+
+@pytest.mark.requires("uploads", "jobs")
+@pytest.mark.fuzz
+def test_fuzz_presigned_and_jobs_from_request_schemas(http_pool, openapi, artifacts):
+    """
+    FUZZ_CASES bodies per operation (valid and invalid, generated from the
+    request schemas) go out FUZZ_CONCURRENCY at a time. 5xx, 2xx on a body
+    that violates the schema, unsanitized `key` and transport errors fail the
+    test; each is shrunk to a minimal body, which FUZZ_SAVE_REGRESSIONS=1
+    appends to the regression file. Opt-in: `pytest -m fuzz`.
+    """
+    operations = [op for op in fuzz_operations_from_env() if openapi.request_schema(*op) is not None]
+    if not operations:
+        pytest.skip("no JSON request schemas for FUZZ_OPERATIONS in /openapi.json")
+
+    report = run_fuzz(
+        http_pool, openapi, operations,
+        cases=int(os.getenv("FUZZ_CASES", "200")),
+        concurrency=int(os.getenv("FUZZ_CONCURRENCY", "20")),
+        seed=fuzz_seed_from_env(),
+    )
+    artifacts.add_kv("fuzz_report", report.as_dict())
+
+    statuses = {k for k in report.statuses if isinstance(k, int)}
+    if statuses and statuses <= {401, 403}:
+        pytest.skip("fuzzed endpoints require auth; set API_TOKEN in .env")
+
+    saved = f", {save_regressions(report.bugs)} new regression case(s) saved" if save_regressions_enabled() else ""
+    assert not report.bugs, (
+        f"fuzzing (seed={report.seed}) found {len(report.bugs)} bug(s){saved}: "
+        + "; ".join(f"{b.kind} {b.method} {b.path} {b.payload!r}" for b in report.bugs)
+    )
+
+@pytest.mark.requires("uploads", "jobs")
+@pytest.mark.fuzz
+@pytest.mark.parametrize("case", REGRESSION_CASES)
+def test_fuzz_regression_is_fixed(client, openapi, case):
+    """A minimal reproducer saved by the fuzzer must no longer reproduce its bug."""
+    r = client.request(case["method"], case["path"], json=case["payload"])
+    if r.status_code in (401, 403):
+        pytest.skip("fuzzed endpoint requires auth; set API_TOKEN in .env")
+    schema = openapi.request_schema(case["method"], case["path"])
+    found = classify(r, conforms(schema, case["payload"]))
+    assert not found or found[0] != case["kind"], f"still reproduces: {found[1]} (payload {case['payload']!r})"
+
+def test_cassette_miss_is_not_a_transport_error_finding(tmp_path):
+    """A request missing from the cassette aborts the run instead of becoming a finding."""
+    async def run():
+        transport = ReplayTransport(Cassette(str(tmp_path / "empty.jsonl.gz")))
+        async with httpx.AsyncClient(base_url="https://api.test", transport=transport) as c:
+            return await Fuzzer(c, index=None).send("POST", "/jobs", {"gcs_url": "gs://b/k"})
+
+    with pytest.raises(CassetteMiss):
+        asyncio.run(run())
+
+def test_default_seed_is_fixed(monkeypatch):
+    monkeypatch.delenv("FUZZ_SEED", raising=False)
+    assert fuzz_seed_from_env() == fuzz_seed_from_env() == 0
+    monkeypatch.setenv("FUZZ_SEED", "42")
+    assert fuzz_seed_from_env() == 42
+
+def test_regressions_are_saved_only_on_request(monkeypatch):
+    monkeypatch.delenv("FUZZ_SAVE_REGRESSIONS", raising=False)
+    assert not save_regressions_enabled()
+    monkeypatch.setenv("FUZZ_SAVE_REGRESSIONS", "1")
+    assert save_regressions_enabled()
+
+def test_findings_do_not_depend_on_the_order_answers_arrive():
+    """Same seed, different response timing: the same cases are shrunk and reported."""
+    def run(timing_seed: int):
+        jitter = random.Random(timing_seed)
+
+        async def handler(request):
+            await asyncio.sleep(jitter.random() / 200)
+            return httpx.Response(500 if len(request.content) % 3 == 0 else 400)
+
+        async def go():
+            async with httpx.AsyncClient(base_url="https://api.test", transport=httpx.MockTransport(handler)) as c:
+                return await Fuzzer(c, SpecIndex(OPENAPI_SPEC), concurrency=10, seed=7).run([("POST", "/jobs")], cases=30)
+
+        report = asyncio.run(go())
+        return [(f.kind, f.original, f.payload) for f in report.bugs]
+
+    first = run(0)
+    assert first and all(run(t) == first for t in (1, 2, 3))
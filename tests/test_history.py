@@ -0,0 +1,58 @@
+import random
+
+import pytest
+
+from tests.history import (
+    CompareSettings, PerfSamples, compare_run, connect, history_enabled, mann_whitney_u, save_run,
+)
+
+def _run(conn, latency, throughput, seed):
+    rng = random.Random(seed)
+    s = PerfSamples()
+    for _ in range(30):
+        s.add("latency", "POST /jobs", latency * rng.uniform(0.9, 1.1))
+        s.add("upload_throughput", "PUT https://storage.test <1MiB", throughput * rng.uniform(0.9, 1.1))
+    return save_run(conn, "c0ffee", "https://api.test", s)
+
+def test_mann_whitney_u_is_one_sided():
+    a = [1.0, 1.1, 1.2, 0.9, 1.05, 0.95, 1.0, 1.1]
+    slower = [v * 1.5 for v in a]
+    assert mann_whitney_u(a, slower) < 0.01
+    assert mann_whitney_u(slower, a) > 0.99
+    assert 0.2 < mann_whitney_u(a, list(a)) < 0.8
+
+def test_slower_latency_and_lower_throughput_are_regressions(tmp_path):
+    conn = connect(str(tmp_path / "history.sqlite"))
+    for seed in range(3):
+        _run(conn, latency=0.100, throughput=50.0, seed=seed)
+    run_id = _run(conn, latency=0.150, throughput=30.0, seed=99)
+
+    by_metric = {c.metric: c for c in compare_run(conn, run_id, CompareSettings(threshold=0.2))}
+    assert by_metric["latency"].regression
+    assert by_metric["latency"].change == pytest.approx(0.5, abs=0.1)
+    assert by_metric["upload_throughput"].regression
+    assert by_metric["upload_throughput"].change == pytest.approx(0.4, abs=0.1)
+
+def test_improvement_and_noise_are_not_regressions(tmp_path):
+    conn = connect(str(tmp_path / "history.sqlite"))
+    for seed in range(3):
+        _run(conn, latency=0.100, throughput=50.0, seed=seed)
+    faster = _run(conn, latency=0.050, throughput=80.0, seed=7)
+    assert not any(c.regression for c in compare_run(conn, faster))
+    same = _run(conn, latency=0.100, throughput=50.0, seed=8)
+    assert not any(c.regression for c in compare_run(conn, same))
+
+def test_baseline_is_per_base_url_and_needs_min_samples(tmp_path):
+    conn = connect(str(tmp_path / "history.sqlite"))
+    _run(conn, latency=0.100, throughput=50.0, seed=1)
+    other = PerfSamples()
+    for _ in range(30):
+        other.add("latency", "POST /jobs", 1.0)
+    run_id = save_run(conn, "c0ffee", "https://staging.test", other)
+    assert compare_run(conn, run_id) == []
+
+def test_history_is_recorded_only_on_request(monkeypatch):
+    monkeypatch.delenv("PERF_HISTORY", raising=False)
+    assert not history_enabled()
+    monkeypatch.setenv("PERF_HISTORY", "1")
+    assert history_enabled()
@@ -0,0 +1,89 @@
+import copy
+
+import pytest
+
+from tests.fake_api import OPENAPI_SPEC
+from tests.impact import (
+    COVERAGE_KEY, Selection, coverage_enabled, diff_specs, load_index, record_request, save_index, select,
+    shared_setup,
+)
+from tests.openapi import SpecIndex
+
+INDEX = {
+    "tests/test_a.py::test_status": ["GET /jobs/{id}/status", "POST /jobs"],
+    "tests/test_a.py::test_presign": ["POST /uploads/presigned"],
+    "tests/test_b.py::test_probe": ["GET /jobs/preflight-probe/status"],
+    "tests/test_media.py::test_offline": [],
+}
+
+def _edited(edit) -> SpecIndex:
+    spec = copy.deepcopy(OPENAPI_SPEC)
+    edit(spec)
+    return SpecIndex(spec)
+
+def test_cosmetic_edits_are_not_changes():
+    def edit(spec):
+        spec["paths"]["/jobs"]["post"]["summary"] = "Create a job"
+        spec["components"]["schemas"]["Segment"]["description"] = "One piece of the transcript"
+    assert diff_specs(SpecIndex(OPENAPI_SPEC), _edited(edit)) == []
+
+def test_component_schema_change_marks_every_operation_using_it():
+    def edit(spec):
+        spec["components"]["schemas"]["Segment"]["properties"]["speaker"] = {"type": "string"}
+    changes = diff_specs(SpecIndex(OPENAPI_SPEC), _edited(edit))
+    assert [str(c) for c in changes] == ["GET /jobs/{job_id}/status: responses (200)"]
+
+def test_parameters_requests_and_added_operations():
+    def edit(spec):
+        spec["paths"]["/jobs/{job_id}/status"]["get"]["parameters"].append(
+            {"name": "verbose", "in": "query", "schema": {"type": "boolean"}})
+        spec["components"]["schemas"]["CreateJobRequest"]["required"] = ["gcs_url", "language"]
+        spec["paths"]["/jobs/{job_id}"] = {"delete": {"responses": {"204": {"description": "Deleted"}}}}
+        del spec["paths"]["/ready"]
+    changes = {str(c) for c in diff_specs(SpecIndex(OPENAPI_SPEC), _edited(edit))}
+    assert changes == {
+        "GET /jobs/{job_id}/status: parameters (query:verbose)",
+        "POST /jobs: request",
+        "DELETE /jobs/{job_id}: added",
+        "GET /ready: removed",
+    }
+
+def test_selection_maps_recorded_paths_to_changed_operations():
+    def edit(spec):
+        spec["components"]["schemas"]["JobStatusResponse"]["properties"]["progress"] = {"type": "number"}
+    sel = select(SpecIndex(OPENAPI_SPEC), _edited(edit), INDEX)
+    assert not sel.full
+    assert sel.selected == ["tests/test_a.py::test_status", "tests/test_b.py::test_probe"]
+    assert sel.keeps("tests/test_a.py::test_status", smoke=False)
+    assert not sel.keeps("tests/test_a.py::test_presign", smoke=False)
+    assert not sel.keeps("tests/test_media.py::test_offline", smoke=False)
+    assert sel.keeps("tests/test_a.py::test_presign", smoke=True)
+    assert sel.keeps("tests/test_new.py::test_not_in_index", smoke=False)
+    assert Selection.from_dict(sel.as_dict()) == sel
+
+def test_without_baseline_or_index_everything_runs(tmp_path):
+    assert select(None, SpecIndex(OPENAPI_SPEC), INDEX).full
+    assert select(SpecIndex(OPENAPI_SPEC), SpecIndex(OPENAPI_SPEC), {}).full
+    path = str(tmp_path / "coverage.json")
+    save_index(INDEX, path)
+    save_index({"tests/test_a.py::test_presign": ["GET /health"]}, path)
+    assert load_index(path) == {**INDEX, "tests/test_a.py::test_presign": ["GET /health"]}
+
+API = "https://api.test"
+
+@pytest.fixture(scope="module")
+def module_probe():
+    record_request("GET", f"{API}/ready", API)
+
+def test_shared_setup_requests_are_not_attributed(request, module_probe):
+    """Module/session fixtures and preflight run once for everyone: not this test's coverage."""
+    record_request("GET", f"{API}/jobs/123/status", API)
+    with shared_setup():
+        record_request("GET", f"{API}/health", API)
+    assert request.config.stash[COVERAGE_KEY].endpoints[request.node.nodeid] == {"GET /jobs/{id}/status"}
+
+def test_index_is_written_only_on_request(monkeypatch):
+    monkeypatch.delenv("IMPACT_RECORD", raising=False)
+    assert not coverage_enabled()
+    monkeypatch.setenv("IMPACT_RECORD", "1")
+    assert coverage_enabled()
@@ -0,0 +1,57 @@
+import pytest
+
+from tests.load import LoadConfig
+from tests.stats import LoadStats, latency_summary, percentile
+
+@pytest.mark.parametrize("users,processes,expected", [
+    (5, 2, [3, 2]),
+    (3, 2, [2, 1]),
+    (1, 4, [1]),
+    (8, 4, [2, 2, 2, 2]),
+])
+def test_closed_split_keeps_the_total_number_of_users(users, processes, expected):
+    parts = LoadConfig(mode="closed", users=users, processes=processes).split()
+    assert [p.users for p in parts] == expected
+    assert all(p.processes == 1 for p in parts)
+
+def test_open_split_divides_the_rate():
+    parts = LoadConfig(mode="open", rate=10.0, processes=4).split()
+    assert len(parts) == 4
+    assert sum(p.rate for p in parts) == pytest.approx(10.0)
+
+def test_single_process_is_one_share():
+    (part,) = LoadConfig(mode="closed", users=3).split()
+    assert part.users == 3
+
+def test_percentile_interpolates_between_ranks():
+    vals = [1.0, 2.0, 3.0, 4.0]
+    assert percentile([], 50) is None
+    assert percentile([7.0], 99) == 7.0
+    assert percentile(vals, 0) == 1.0
+    assert percentile(vals, 100) == 4.0
+    assert percentile(vals, 50) == pytest.approx(2.5)
+    assert percentile(vals, 95) == pytest.approx(3.85)
+
+def test_latency_summary():
+    assert latency_summary([]) == {"count": 0}
+    s = latency_summary([3.0, 1.0, 2.0])
+    assert s["count"] == 3 and s["mean"] == pytest.approx(2.0) and s["p50"] == 2.0 and s["max"] == 3.0
+
+def test_merge_adds_worker_stats():
+    a, b = LoadStats(), LoadStats()
+    a.record("presign", 0.1, status_code=200)
+    a.record("upload", 0.5, error="ConnectTimeout")
+    b.record("presign", 0.3, status_code=500)
+    b.record("presign", 0.2, status_code=200)
+
+    total = LoadStats()
+    for part in (a, b):
+        total.merge(part.to_dict())
+    presign = total.stages["presign"]
+    assert sorted(presign.latencies) == [0.1, 0.2, 0.3]
+    assert presign.status_codes == {"200": 2, "500": 1} and presign.failed == 1
+    assert total.stages["upload"].errors == {"ConnectTimeout": 1}
+
+    summary = total.summary(duration=2.0)
+    assert summary["presign"]["error_rate"] == pytest.approx(1 / 3)
+    assert summary["presign"]["rps"] == pytest.approx(1.5)
@@ -0,0 +1,101 @@
+import io
+import os
+import struct
+import wave
+import zipfile
+
+import pytest
+
+from tests.media import MediaFile, parse_corpus, parse_size
+
+@pytest.fixture(autouse=True)
+def _media_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("MEDIA_CACHE_DIR", str(tmp_path / "media"))
+
+def _read(m: MediaFile) -> bytes:
+    with open(m, "rb") as f:
+        return f.read()
+
+@pytest.mark.parametrize("kind", ["mp4", "mp3", "wav", "pdf", "zip", "jpeg"])
+@pytest.mark.parametrize("size", [20_000, 300_001])
+def test_generated_file_has_exact_size(kind, size):
+    m = MediaFile(kind, size=size)
+    assert os.path.getsize(m) == size
+
+def test_wav_and_mp3_follow_duration():
+    with wave.open(MediaFile("wav", duration=2.5).path) as w:
+        assert w.getnframes() / w.getframerate() == pytest.approx(2.5)
+    raw = _read(MediaFile("mp3", duration=3))
+    tag_len = 10 + int.from_bytes(raw[6:10], "big")
+    assert raw[tag_len:tag_len + 2] == b"\xff\xfb"
+    assert (len(raw) - tag_len) // 417 == pytest.approx(3 * 44100 / 1152, abs=1)
+
+def test_containers_are_structurally_valid():
+    with zipfile.ZipFile(MediaFile("zip", size=50_000).path) as z:
+        assert z.testzip() is None and z.namelist() == ["payload.bin"]
+
+    raw = _read(MediaFile("mp4", size=100_000, duration=4))
+    boxes, pos = [], 0
+    while pos < len(raw):
+        size, kind = struct.unpack(">I4s", raw[pos:pos + 8])
+        boxes.append(kind)
+        pos += size
+    assert boxes == [b"ftyp", b"moov", b"mdat"] and pos == len(raw)
+    mvhd = raw.index(b"mvhd")
+    assert struct.unpack(">II", raw[mvhd + 16:mvhd + 24]) == (1000, 4000)
+
+    pdf = _read(MediaFile("pdf", size=70_000))
+    xref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n") and pdf[xref:xref + 4] == b"xref"
+    offset = int(pdf[xref:].split(b"\n")[3][:10])   # объект 1
+    assert pdf[offset:offset + 7] == b"1 0 obj"
+
+    jpeg = _read(MediaFile("jpeg", size=200_000))
+    assert jpeg[:2] == b"\xff\xd8" and jpeg[-2:] == b"\xff\xd9"
+    stream = io.BytesIO(jpeg[2:])
+    markers = []
+    while True:
+        marker, length = struct.unpack(">xBH", stream.read(4))
+        markers.append(marker)
+        if marker == 0xDA:
+            break
+        stream.seek(length - 2, io.SEEK_CUR)
+    assert markers[:4] == [0xE0, 0xDB, 0xC0, 0xC4] and 0xFE in markers
+
+def test_cache_is_keyed_by_parameters(tmp_path):
+    a = MediaFile("zip", size=10_000)
+    path = a.path
+    mtime = os.stat(path).st_mtime_ns
+    assert MediaFile("zip", size=10_000).path == path and os.stat(path).st_mtime_ns == mtime
+    assert MediaFile("zip", size=10_000, seed=1).path != path
+    assert _read(MediaFile("zip", size=10_000, seed=1)) != _read(a)
+    assert os.path.dirname(path) == str(tmp_path / "media")
+    assert not [n for n in os.listdir(tmp_path / "media") if n.endswith(".tmp")]
+
+def test_corpus_spec_parsing():
+    assert parse_size("8MiB") == 8 * 1024 * 1024 and parse_size("512kb") == 512 * 1024
+    assert parse_corpus("mp4:8MiB, wav:30s ,mp3:5s:1MiB") == [
+        MediaFile("mp4", size=8 * 1024 * 1024),
+        MediaFile("wav", duration=30.0),
+        MediaFile("mp3", size=1024 * 1024, duration=5.0),
+    ]
+    with pytest.raises(ValueError):
+        MediaFile("gif")
+    with pytest.raises(ValueError):
+        MediaFile("wav", size=10).path
+
+def test_size_and_duration_together():
+    """mp3 pads to the size and keeps the duration; a size that cannot hold it is an error, not a shorter file."""
+    raw = _read(MediaFile("mp3", size=1024 * 1024, duration=5))
+    tag_len = 10 + sum(b << (7 * (3 - i)) for i, b in enumerate(raw[6:10]))   # syncsafe
+    assert raw[tag_len:tag_len + 2] == b"\xff\xfb"
+    assert len(raw) == 1024 * 1024
+    assert (len(raw) - tag_len) // 417 == pytest.approx(5 * 44100 / 1152, abs=1)
+    with pytest.raises(ValueError, match="contradict"):
+        MediaFile("mp3", size=10 * 1024, duration=5).path
+
+    assert os.path.getsize(MediaFile("wav", size=44 + 8000, duration=1)) == 44 + 8000
+    with pytest.raises(ValueError, match="a 2s file is exactly 16044 bytes"):
+        MediaFile("wav", size=8044, duration=2).path
+    with pytest.raises(ValueError, match="pdf has no duration"):
+        parse_corpus("pdf:64KiB:2s")
@@ -0,0 +1,65 @@
+import asyncio
+import re
+
+import httpx
+
+from tests.client import ClientPool
+from tests.fake_api import FakeStudioAPI, Faults
+from tests.monitor import Monitor, MonitorConfig, Registry, serve_metrics
+
+def _monitor(api: FakeStudioAPI, **cfg) -> Monitor:
+    pool = ClientPool("https://api.test", {}, transport=api.transport(), record_timings=False)
+    return Monitor(MonitorConfig(interval=0.01, job_timeout=5, **cfg), pool)
+
+def test_registry_renders_prometheus_text():
+    reg = Registry()
+    reg.describe("checks_total", "counter", "Synthetic checks by outcome")
+    reg.inc("checks_total", check="health", result="success")
+    reg.inc("checks_total", check="health", result="success")
+    reg.set("check_up", 0, check='we"ird')
+    reg.observe("check_duration_seconds", 0.02, check="health")
+    reg.observe("check_duration_seconds", 7.0, check="health")
+    text = reg.render()
+    assert "# HELP api_monitor_checks_total Synthetic checks by outcome\n# TYPE api_monitor_checks_total counter" in text
+    assert 'api_monitor_checks_total{check="health",result="success"} 2\n' in text
+    assert 'api_monitor_check_up{check="we\\"ird"} 0\n' in text
+    assert 'api_monitor_check_duration_seconds_bucket{check="health",le="0.025"} 1\n' in text
+    assert 'api_monitor_check_duration_seconds_bucket{check="health",le="10"} 2\n' in text
+    assert 'api_monitor_check_duration_seconds_bucket{check="health",le="+Inf"} 2\n' in text
+    assert 'api_monitor_check_duration_seconds_count{check="health"} 2\n' in text
+
+def test_cycles_share_one_pool_and_run_the_job_check_once_per_interval():
+    api = FakeStudioAPI(processing_delay=0.05)
+    m = _monitor(api, job_interval=60)
+    asyncio.run(m.run(cycles=5))
+    reg = m.registry
+    for check in ("health", "ready", "presign"):
+        assert reg.value("checks_total", check=check, result="success") == 5
+        assert reg.value("check_up", check=check) == 1
+    assert reg.value("checks_total", check="job", result="success") == 1
+    assert reg.value("job_time_to_terminal_seconds") >= 0.05
+    assert reg.value("request_duration_seconds", stage="upload") == 1   # presign не грузит, job — один раз
+    assert reg.value("http_requests_total", pool="api-async") >= 5 * 3
+
+def test_failures_are_counted_by_reason():
+    api = FakeStudioAPI(faults=Faults(rate_503=1.0))
+    m = _monitor(api, checks=("health", "presign"))
+    asyncio.run(m.run(cycles=2))
+    reg = m.registry
+    assert reg.value("checks_total", check="health", result="failure") == 2
+    assert reg.value("check_up", check="presign") == 0
+    assert reg.value("check_failures_total", check="presign", reason="presign_503") == 2
+    assert reg.value("last_success_timestamp_seconds", check="health") is None
+
+def test_metrics_endpoint():
+    reg = Registry()
+    reg.inc("checks_total", check="health", result="success")
+    server = serve_metrics(reg, "127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        r = httpx.get(f"{url}/metrics")
+        assert r.status_code == 200 and r.headers["content-type"].startswith("text/plain; version=0.0.4")
+        assert re.search(r'^api_monitor_checks_total\{check="health",result="success"\} 1$', r.text, re.M)
+        assert httpx.get(f"{url}/other").status_code == 404
+    finally:
+        server.shutdown()
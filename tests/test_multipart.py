@@ -0,0 +1,83 @@
+import httpx
+import pytest
+
+from tests.client import ClientPool
+from tests.fake_api import FakeStudioAPI
+from tests.multipart import CHUNK_ALIGNMENT, UploadSession, content_range, persisted_bytes, upload_resumable
+from tests.poller import Backoff
+from tests.upload import iter_pattern
+
+NO_WAIT = Backoff(initial=0.0, max_delay=0.0, jitter=0.0)
+
+def _source(size: int) -> bytes:
+    return b"".join(iter_pattern(size))
+
+def _upload(api: FakeStudioAPI, size: int, part_size: int, **kwargs):
+    pool = ClientPool("https://api.test", {}, transport=api.transport())
+    try:
+        pres = pool.api.post("/uploads/presigned", json={"filename": "r.bin"}).json()
+        session = UploadSession.create(pres["upload_url"], size, part_size=part_size)
+        src = _source(size)
+        return api, session, upload_resumable(pool, session, src, backoff=NO_WAIT, **kwargs), src
+    finally:
+        pool.close()
+
+def test_content_range_and_persisted_bytes():
+    assert content_range(0, 10, 100) == "bytes 0-9/100"
+    assert content_range(5, 0, 100) == "bytes */100"
+    assert persisted_bytes(httpx.Response(308, headers={"Range": "bytes=0-262143"})) == CHUNK_ALIGNMENT
+    assert persisted_bytes(httpx.Response(308)) == 0
+
+def test_part_size_must_be_aligned():
+    with pytest.raises(ValueError, match="multiple of 262144"):
+        UploadSession.create("https://storage.fake.local/b/k", 10, part_size=1000)
+
+def test_chunks_are_sequential_and_object_is_verified():
+    api, session, result, src = _upload(FakeStudioAPI(), 3 * CHUNK_ALIGNMENT + 10, CHUNK_ALIGNMENT)
+    assert result.error is None and result.uploaded_chunks == 4 and session.finished
+    assert result.verified and result.remote_size == len(src)
+    assert api.objects[next(iter(api.objects))] == src
+
+class _Flaky(FakeStudioAPI):
+    """The second chunk PUT fails with 503 once."""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = 0
+
+    def _resumable_chunk(self, upload_id, content_range, data):
+        if data:
+            self.chunks += 1
+            if self.chunks == 2:
+                return httpx.Response(503)
+        return super()._resumable_chunk(upload_id, content_range, data)
+
+def test_failed_chunk_asks_the_session_and_continues():
+    _, session, result, src = _upload(_Flaky(), 3 * CHUNK_ALIGNMENT, CHUNK_ALIGNMENT)
+    assert result.retried_chunks == 1 and result.uploaded_chunks == 3
+    assert session.finished and result.verified
+
+class _Stingy(FakeStudioAPI):
+    """Persists only the first 256 KiB of every chunk, as GCS may."""
+
+    def _resumable_chunk(self, upload_id, content_range, data):
+        if len(data) > CHUNK_ALIGNMENT:
+            start = int(content_range.split()[1].split("-")[0])
+            total = content_range.rsplit("/", 1)[1]
+            data = data[:CHUNK_ALIGNMENT]
+            content_range = f"bytes {start}-{start + len(data) - 1}/{total}"
+        return super()._resumable_chunk(upload_id, content_range, data)
+
+def test_next_chunk_starts_where_the_session_stopped():
+    _, session, result, src = _upload(_Stingy(), 4 * CHUNK_ALIGNMENT, 2 * CHUNK_ALIGNMENT)
+    assert result.uploaded_chunks == 4 and session.finished and result.verified
+
+def test_expired_session_is_an_error():
+    api, session, first, _ = _upload(FakeStudioAPI(), 2 * CHUNK_ALIGNMENT, CHUNK_ALIGNMENT, max_chunks=1)
+    api.uploads.clear()
+    pool = ClientPool("https://api.test", {}, transport=api.transport())
+    try:
+        second = upload_resumable(pool, session, _source(session.size), backoff=NO_WAIT)
+    finally:
+        pool.close()
+    assert second.error == "status: 404" and not session.finished
@@ -0,0 +1,90 @@
+import httpx
+import pytest
+
+from tests.fake_api import OPENAPI_SPEC
+from tests.openapi import fetch_spec, load_spec
+
+class _SpecServer:
+    """/openapi.json with an ETag and/or Last-Modified validator; remembers what each request sent."""
+
+    def __init__(self, etag=True, last_modified=False):
+        self.version = 1
+        self.etag, self.last_modified = etag, last_modified
+        self.seen = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        headers, expected = {}, {}
+        if self.etag:
+            headers["ETag"] = expected["if-none-match"] = f'"v{self.version}"'
+        if self.last_modified:
+            headers["Last-Modified"] = expected["if-modified-since"] = f"Mon, 0{self.version} Jan 2024 00:00:00 GMT"
+        sent = {k: request.headers[k] for k in ("if-none-match", "if-modified-since") if k in request.headers}
+        self.seen.append(sent)
+        if sent and sent == expected:
+            return httpx.Response(304, headers=headers)
+        return httpx.Response(200, json={**OPENAPI_SPEC, "info": {"version": str(self.version)}}, headers=headers)
+
+    def client(self) -> httpx.Client:
+        return httpx.Client(base_url="https://api.test", transport=httpx.MockTransport(self))
+
+def test_second_fetch_revalidates_and_reads_the_cache_on_304(tmp_path):
+    server = _SpecServer()
+    with server.client() as c:
+        spec, cached = fetch_spec(c, "k", str(tmp_path))
+        assert not cached and server.seen[-1] == {}
+        again, cached = fetch_spec(c, "k", str(tmp_path))
+    assert cached and again == spec
+    assert server.seen[-1] == {"if-none-match": '"v1"'}
+
+def test_changed_spec_replaces_the_cache(tmp_path):
+    server = _SpecServer()
+    with server.client() as c:
+        fetch_spec(c, "k", str(tmp_path))
+        server.version = 2
+        spec, cached = fetch_spec(c, "k", str(tmp_path))
+        assert not cached and spec["info"]["version"] == "2"
+        _, cached = fetch_spec(c, "k", str(tmp_path))
+    assert cached and server.seen[-1] == {"if-none-match": '"v2"'}
+
+def test_last_modified_is_used_without_an_etag(tmp_path):
+    server = _SpecServer(etag=False, last_modified=True)
+    with server.client() as c:
+        fetch_spec(c, "k", str(tmp_path))
+        _, cached = fetch_spec(c, "k", str(tmp_path))
+    assert cached and server.seen[-1] == {"if-modified-since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+def test_no_conditional_request_without_a_usable_cache(tmp_path):
+    server = _SpecServer()
+    with server.client() as c:
+        fetch_spec(c, "k", str(tmp_path))
+        # conditional=False (запись кассеты): всегда полный ответ
+        _, cached = fetch_spec(c, "k", str(tmp_path), conditional=False)
+        assert not cached and server.seen[-1] == {}
+        # meta без самой спеки: 304 было бы нечем обслужить
+        for p in tmp_path.iterdir():
+            if not p.name.endswith(".meta.json"):
+                p.unlink()
+        _, cached = fetch_spec(c, "k", str(tmp_path))
+        assert not cached and server.seen[-1] == {}
+        # другой ключ (другой стенд) — свой кеш
+        _, cached = fetch_spec(c, "other", str(tmp_path))
+    assert not cached and server.seen[-1] == {}
+
+def test_errors_are_not_cached(tmp_path):
+    client = httpx.Client(base_url="https://api.test", transport=httpx.MockTransport(lambda r: httpx.Response(503)))
+    with client, pytest.raises(httpx.HTTPStatusError):
+        fetch_spec(client, "k", str(tmp_path))
+    assert not list(tmp_path.iterdir())
+
+def test_load_spec_keeps_the_index_while_the_spec_is_unchanged(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAPI_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr("tests.openapi._MEMO", {})
+    server = _SpecServer()
+    with server.client() as c:
+        first = load_spec("https://api.test", client=c, cache_key="test_openapi:memo")
+        assert load_spec("https://api.test", client=c, cache_key="test_openapi:memo") is first
+        assert len(server.seen) == 1  # без revalidate — ни одного запроса
+        assert load_spec("https://api.test", client=c, cache_key="test_openapi:memo", revalidate=True) is first
+        server.version = 2
+        changed = load_spec("https://api.test", client=c, cache_key="test_openapi:memo", revalidate=True)
+    assert changed is not first and changed.spec["info"]["version"] == "2"
@@ -0,0 +1,73 @@
+import asyncio
+import itertools
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from tests.poller import JobPoller
+from tests.ratelimit import Backoff, retry_after_seconds
+
+def test_backoff_grows_caps_and_jitters():
+    exact = Backoff(initial=0.1, factor=2.0, max_delay=0.5, jitter=0.0)
+    assert [exact.delay(n) for n in range(5)] == pytest.approx([0.1, 0.2, 0.4, 0.5, 0.5])
+    jittered = Backoff(initial=1.0, jitter=0.2)
+    assert all(0.8 <= jittered.delay(0) <= 1.2 for _ in range(100))
+
+def test_retry_after_seconds_and_http_date():
+    resp = lambda value: httpx.Response(503, headers={"Retry-After": value} if value else None)
+    assert retry_after_seconds(resp("7")) == 7.0
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert retry_after_seconds(resp(later)) == pytest.approx(30, abs=2)
+    earlier = format_datetime(datetime.now(timezone.utc) - timedelta(seconds=30), usegmt=True)
+    assert retry_after_seconds(resp(earlier)) == 0.0
+    assert retry_after_seconds(resp("soon")) is None and retry_after_seconds(resp(None)) is None
+
+_REAL_SLEEP = asyncio.sleep
+
+def _poll(script, monkeypatch, wait=False, **kwargs):
+    """
+    Runs a JobPoller over scripted (status, headers, body) answers; returns the
+    result and the delays it asked for. The delays are not slept unless `wait`.
+    """
+    answers = iter(script)
+    slept = []
+
+    async def fake_sleep(delay):
+        slept.append(round(delay, 3))
+        await _REAL_SLEEP(delay if wait else 0)
+
+    def handler(request):
+        status, headers, body = next(answers)
+        return httpx.Response(status, headers=headers, json=body)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+
+    async def run():
+        async with httpx.AsyncClient(base_url="https://api.test", transport=httpx.MockTransport(handler)) as c:
+            poller = JobPoller(c, backoff=Backoff(initial=0.1, max_delay=1.0, jitter=0.0), **kwargs)
+            return (await poller.wait(["j1"]))["j1"]
+
+    return asyncio.run(run()), slept
+
+def test_delay_grows_while_the_state_stays_and_resets_when_it_moves(monkeypatch):
+    state = lambda s: (200, None, {"job_id": "j1", "status": s})
+    res, slept = _poll([state("queued"), state("queued"), state("queued"), state("processing"), state("done")],
+                       monkeypatch, timeout=60)
+    assert res.succeeded and res.polls == 5
+    assert res.states_seen == ["queued", "processing", "done"]
+    assert slept == [0.1, 0.2, 0.4, 0.1]
+
+def test_retry_after_overrides_backoff_and_errors_stop_the_watch(monkeypatch):
+    res, slept = _poll([(503, {"Retry-After": "3"}, {}), (429, None, {}), (200, None, {"status": "done"})],
+                       monkeypatch, timeout=60)
+    assert res.succeeded and slept == [3.0, 0.2]
+
+    res, _ = _poll([(404, None, {"detail": "no such job"})], monkeypatch)
+    assert res.error == "unexpected status 404" and res.polls == 1
+
+def test_sleep_is_cut_to_the_deadline(monkeypatch):
+    res, slept = _poll(itertools.repeat((503, {"Retry-After": "120"}, {})), monkeypatch, wait=True, timeout=0.3)
+    assert res.error == "timeout after 0.3s" and not res.terminal
+    assert len(slept) == 1 and slept[0] <= 0.3
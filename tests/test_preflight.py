@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from tests.preflight import Probe, Verdict, evaluate, load_cached, preflight_cache_key, save_cached
+
+def _probes(health=200, ready=200, auth=404, waf=False, error=None):
+    return {
+        "health": Probe("health", "GET", "/health", status_code=None if error else health, error=error),
+        "ready": Probe("ready", "GET", "/ready", status_code=ready),
+        "auth": Probe("auth", "GET", "/jobs/preflight-probe/status", status_code=auth, waf=waf),
+    }
+
+def test_healthy_stand_blocks_nothing():
+    assert evaluate(_probes(), has_token=True) == {}
+
+@pytest.mark.parametrize("probes, reason", [
+    (_probes(waf=True, auth=403), "blocked by Cloudflare/WAF"),
+    (_probes(health=502), "stand is down (GET /health -> HTTP 502)"),
+    (_probes(error="ConnectTimeout"), "stand is down (GET /health -> ConnectTimeout)"),
+])
+def test_api_blocked_takes_everything_down(probes, reason):
+    blocked = evaluate(probes, has_token=True)
+    assert list(blocked) == ["api"] and reason in blocked["api"]
+    verdict = Verdict("https://api.test", 0.0, list(probes.values()), blocked)
+    assert verdict.reason_for(["uploads"]).startswith("api unavailable")
+
+def test_not_ready_blocks_uploads_and_jobs_only():
+    blocked = evaluate(_probes(ready=503), has_token=True)
+    assert set(blocked) == {"uploads", "jobs"}
+    verdict = Verdict("https://api.test", 0.0, [], blocked)
+    assert verdict.reason_for(["auth"]) is None
+    assert verdict.reason_for(["auth", "jobs"]).startswith("jobs unavailable: stand is not ready")
+
+@pytest.mark.parametrize("has_token, text", [(True, "API_TOKEN rejected"), (False, "API_TOKEN is not set")])
+def test_auth_rejection_depends_on_token(has_token, text):
+    assert evaluate(_probes(auth=401), has_token=has_token) == {"auth": f"{text} (GET /jobs/preflight-probe/status -> HTTP 401)"}
+
+def test_cache_key_separates_token_and_mode():
+    keys = {
+        preflight_cache_key("https://api.test", None, fake=False),
+        preflight_cache_key("https://api.test", "old", fake=False),
+        preflight_cache_key("https://api.test", "new", fake=False),
+        preflight_cache_key("https://api.test", "new", fake=True),
+    }
+    assert len(keys) == 4
+    assert all("old" not in k and "new" not in k for k in keys)
+
+def test_cached_verdict_is_per_key_and_expires(tmp_path, monkeypatch):
+    monkeypatch.setenv("PREFLIGHT_CACHE_DIR", str(tmp_path))
+    rejected = preflight_cache_key("https://api.test", "old", fake=False)
+    verdict = Verdict("https://api.test", time.time(), [Probe("auth", "GET", "/x", status_code=401)],
+                      {"auth": "API_TOKEN rejected"})
+    save_cached(rejected, verdict)
+
+    assert load_cached(rejected, ttl=60).as_dict() == verdict.as_dict()
+    # новый токен проверяется заново, а не наследует "rejected"
+    assert load_cached(preflight_cache_key("https://api.test", "new", fake=False), ttl=60) is None
+
+    verdict.checked_at -= 120
+    save_cached(rejected, verdict)
+    assert load_cached(rejected, ttl=60) is None
+
+def test_broken_cache_file_is_a_miss(tmp_path, monkeypatch):
+    monkeypatch.setenv("PREFLIGHT_CACHE_DIR", str(tmp_path))
+    key = preflight_cache_key("https://api.test", None, fake=True)
+    save_cached(key, Verdict("https://api.test", time.time()))
+    (path,) = tmp_path.iterdir()
+    path.write_text("{not json", encoding="utf-8")
+    assert load_cached(key, ttl=60) is None
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import threading
+import time
+
+import httpx
+import pytest
+
+from tests.ratelimit import Budget, RateLimitedTransport, RateLimiter, SharedBucket
+
+API = "https://api.test"
+
+def _script(*responses):
+    """MockTransport answering with the given responses in order (the last one repeats)."""
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request)
+        r = responses[min(len(sent), len(responses)) - 1]
+        return httpx.Response(r[0], headers=r[1] if len(r) > 1 else None, json={})
+
+    return httpx.MockTransport(handler), sent
+
+def _client(limiter: RateLimiter, transport) -> httpx.Client:
+    return httpx.Client(base_url=API, transport=RateLimitedTransport(transport, limiter))
+
+def test_token_bucket_spaces_requests_after_burst(tmp_path):
+    limiter = RateLimiter(API, Budget(rate=20, burst=2), None, directory=str(tmp_path))
+    transport, sent = _script((200,))
+    t0 = time.perf_counter()
+    with _client(limiter, transport) as c:
+        for _ in range(6):
+            c.get("/health")
+    elapsed = time.perf_counter() - t0
+    # 2 из burst сразу, ещё 4 по 50ms
+    assert elapsed >= 0.18
+    st = limiter.stats_dict()[API]
+    assert st["requests"] == 6 and st["delayed"] == 4
+
+def test_budget_is_shared_between_limiters_through_state_file(tmp_path):
+    # два лимитера = два процесса (xdist-воркеры) с общим файлом состояния
+    a = RateLimiter(API, Budget(rate=10, burst=1), None, directory=str(tmp_path))
+    b = RateLimiter(API, Budget(rate=10, burst=1), None, directory=str(tmp_path))
+    assert a.before(API) == 0
+    assert b.before(API) == pytest.approx(0.1, abs=0.02)
+
+def test_429_is_retried_after_retry_after_and_slows_the_bucket(tmp_path):
+    limiter = RateLimiter(API, Budget(rate=50, burst=5), None, directory=str(tmp_path))
+    transport, sent = _script((429, {"Retry-After": "0"}), (200,))
+    with _client(limiter, transport) as c:
+        r = c.post("/jobs", json={"gcs_url": "gs://b/k"})
+    assert r.status_code == 200 and len(sent) == 2
+    st = limiter.stats_dict()[API]
+    # повтор не считается новым запросом
+    assert st["requests"] == 1 and st["throttled_429"] == 1 and st["retries"] == 1
+    with open(limiter.bucket(API).path, encoding="utf-8") as f:
+        assert json.load(f)["rate"] == pytest.approx(25, abs=1)
+
+def test_429_gives_up_after_configured_retries(tmp_path):
+    limiter = RateLimiter(API, None, None, retries=2, directory=str(tmp_path))
+    transport, sent = _script((429, {"Retry-After": "0"}))
+    with _client(limiter, transport) as c:
+        r = c.get("/health")
+    assert r.status_code == 429 and len(sent) == 3
+    st = limiter.stats_dict()[API]
+    assert st["requests"] == 1 and st["retries"] == 2
+
+def test_streamed_upload_body_is_not_replayed(tmp_path):
+    limiter = RateLimiter(API, None, Budget(rate=100, burst=10), directory=str(tmp_path))
+    transport, sent = _script((429, {"Retry-After": "0"}), (200,))
+    with _client(limiter, transport) as c:
+        r = c.put("https://storage.test/bucket/key", content=iter([b"part1", b"part2"]))
+    assert r.status_code == 429 and len(sent) == 1
+    st = limiter.stats_dict()["https://storage.test"]
+    assert st["throttled_429"] == 1 and st["retries"] == 0
+
+def test_waf_challenge_halves_rate_without_retry(tmp_path):
+    limiter = RateLimiter(API, Budget(rate=8, burst=1, min_rate=1), None, directory=str(tmp_path))
+    transport, sent = _script((403, {"cf-mitigated": "challenge"}))
+    with _client(limiter, transport) as c:
+        assert c.get("/health").status_code == 403
+    assert len(sent) == 1 and limiter.stats_dict()[API]["waf_challenges"] == 1
+
+    bucket = SharedBucket(API, limiter.api, str(tmp_path))
+    with bucket._locked() as state:
+        assert bucket._rate(state, state["throttled_at"]) == 4
+
+def test_waf_challenge_in_a_streamed_body_is_detected(tmp_path):
+    """No cf-mitigated header: only the HTML says it is a challenge, and the body is not read yet."""
+    limiter = RateLimiter(API, Budget(rate=8, burst=1), None, directory=str(tmp_path))
+
+    def handler(request):
+        return httpx.Response(403, headers={"Content-Type": "text/html"},
+                              content=iter([b"<title>Just a moment...</title>"]))
+
+    with _client(limiter, httpx.MockTransport(handler)) as c:
+        r = c.get("/health")
+    assert r.status_code == 403 and "Just a moment" in r.text
+    assert limiter.stats_dict()[API]["waf_challenges"] == 1
+
+def test_async_path_keeps_flock_off_the_event_loop(tmp_path, monkeypatch):
+    limiter = RateLimiter(API, Budget(rate=50, burst=5), None, directory=str(tmp_path))
+    threads = []
+    for name in ("acquire", "throttled"):
+        original = getattr(SharedBucket, name)
+
+        def spy(self, *args, _original=original):
+            threads.append(threading.current_thread())
+            return _original(self, *args)
+
+        monkeypatch.setattr(SharedBucket, name, spy)
+    transport, sent = _script((429, {"Retry-After": "0"}), (200,))
+
+    async def run():
+        async with httpx.AsyncClient(base_url=API, transport=RateLimitedTransport(transport, limiter)) as c:
+            return await c.get("/health")
+
+    assert asyncio.run(run()).status_code == 200 and len(sent) == 2
+    # acquire, throttled, acquire — все вне потока event loop
+    assert len(threads) == 3 and threading.main_thread() not in threads
+    assert limiter.stats_dict()[API]["requests"] == 1
+
+def test_429_is_retried_without_any_budget(tmp_path, monkeypatch):
+    for name in ("RATE_LIMIT_API", "RATE_LIMIT_STORAGE", "RATE_LIMIT_RETRIES"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("RATE_LIMIT_STATE_DIR", str(tmp_path))
+    limiter = RateLimiter.from_env(API)
+    assert limiter.api is None and limiter.storage is None and limiter.retries == 3
+    transport, sent = _script((429, {"Retry-After": "0"}), (200,))
+    with _client(limiter, transport) as c:
+        assert c.get("/health").status_code == 200
+    assert len(sent) == 2 and not list(tmp_path.iterdir())  # без бюджета файла состояния нет
+
+    monkeypatch.setenv("RATE_LIMIT_RETRIES", "0")
+    assert RateLimiter.from_env(API).retries == 0
+
+def test_retry_after_is_jittered_upwards(tmp_path):
+    limiter = RateLimiter(API, Budget(rate=50, burst=5), None, retries=1000, directory=str(tmp_path))
+    resp = httpx.Response(429, headers={"Retry-After": "10"})
+    delays = [limiter.after(API, resp, attempt=0) for _ in range(50)]
+    assert all(10 <= d <= 12 for d in delays) and len(set(delays)) > 1
+    # остальные запросы ждут blocked_until тоже вразброс, а не до одной и той же секунды
+    waits = [limiter.bucket(API).acquire() for _ in range(20)]
+    assert all(9 <= w <= 12 for w in waits) and len(set(waits)) > 1
@@ -1,9 +1,24 @@
+import pytest
+
+from tests.openapi import load_spec
+
+pytestmark = pytest.mark.smoke
+
 def test_docs_available(client):
     r = client.get("/docs")
     assert r.status_code == 200
 
-def test_openapi_available(client):
-    r = client.get("/openapi.json")
-    assert r.status_code == 200
-    data = r.json()
-    assert "paths" in data
+def test_openapi_available(client, base_url, openapi_cache_key):
+    # условный GET: 304 против кеша тоже значит, что спека доступна
+    index = load_spec(base_url, client=client, cache_key=openapi_cache_key, revalidate=True)
+    assert "paths" in index.spec
+
+def test_openapi_response_schemas_have_validators(openapi, contract):
+    """Every JSON response schema in the spec compiles into a validator."""
+    expected = {
+        (method, path, int(status))
+        for (method, path), op in openapi.operations.items()
+        for status, resp in (op.get("responses") or {}).items()
+        if str(status).isdigit() and openapi.response_schema(method, path, int(status)) is not None
+    }
+    assert expected <= set(contract.responses)
@@ -0,0 +1,64 @@
+import random
+from dataclasses import replace
+
+from tests.client import ClientPool
+from tests.fake_api import FakeStudioAPI
+from tests.soak import DriftMonitor, SoakConfig, load_checkpoint, run_soak, save_checkpoint, summary_dataset
+
+def _soak(m: DriftMonitor, end: int, stage: str, latency, ok=lambda t: True):
+    """One sample per second, roll() every cfg.step seconds; returns the alerts fired."""
+    rng = random.Random(0)
+    fired = []
+    for t in range(end):
+        m.record(t, stage, latency(t) * rng.uniform(0.95, 1.05), ok(t))
+        if (t + 1) % m.cfg.step == 0:
+            fired += m.roll(t + 1)
+    return fired
+
+def test_latency_drift_alerts_once_against_the_baseline():
+    cfg = SoakConfig(window=60, step=30, baseline_windows=2, drift_threshold=0.5)
+    m = DriftMonitor(cfg)
+    fired = _soak(m, 300, "presign", lambda t: 0.100 if t < 180 else 0.200)
+    assert [a.kind for a in fired] == ["latency_drift"]
+    assert m.baseline["presign"] < 0.11 and fired[0].value > 0.18
+    assert m.windows[-1]["stages"]["presign"]["count"] == 60
+
+def test_error_burst_and_recovery_fire_again():
+    m = DriftMonitor(SoakConfig(window=10, step=10, error_burst=3, error_rate=0.2))
+    bad = lambda t: not (10 <= t < 20 or 40 <= t < 50)
+    fired = _soak(m, 60, "upload", lambda t: 0.05, ok=bad)
+    assert [(a.kind, a.at) for a in fired] == [("error_burst", 20), ("error_burst", 50)]
+
+def test_job_time_to_terminal_trend():
+    cfg = SoakConfig(window=60, step=60, baseline_windows=2, trend_threshold=0.3)
+    m = DriftMonitor(cfg)
+    fired = _soak(m, 600, "job_terminal", lambda t: 1.0 + t / 300)
+    assert [a.kind for a in fired if a.kind == "job_trend"] == ["job_trend"]
+    assert m.windows[-1]["job_trend"]["slope_s_per_hour"] > 10
+
+def test_checkpoint_resume_and_summary(tmp_path):
+    checkpoint = str(tmp_path / "soak.json")
+    cfg = SoakConfig(duration=1.2, rate=40, window=0.4, step=0.2, size=2048, poll_timeout=5)
+
+    def pool():
+        api = FakeStudioAPI(processing_delay=0.0)
+        return ClientPool("https://api.test", {}, transport=api.transport())
+
+    first = run_soak(replace(cfg, duration=0.6), "https://api.test", {},
+                     checkpoint=checkpoint, pool=pool())
+    saved = load_checkpoint(checkpoint)
+    assert saved.finished and saved.elapsed >= 0.6 and saved.monitor.windows
+
+    # незавершённый чекпоинт продолжается с того же места
+    saved.finished = False
+    saved.config = cfg
+    saved.monitor.cfg = cfg
+    save_checkpoint(checkpoint, saved)
+    resumed = run_soak(cfg, "https://api.test", {}, checkpoint=checkpoint, resume=True, pool=pool())
+    assert resumed.finished and resumed.elapsed >= 1.2
+    assert resumed.cycles > first.cycles and len(resumed.monitor.windows) > len(first.monitor.windows)
+
+    data = summary_dataset(resumed)
+    assert len(data["t"]) == len(data["series"]["presign.p95"]) and data["t"] == sorted(data["t"])
+    assert {"health", "presign", "upload", "job_terminal"} <= set(data["totals"])
+    assert not any(c.get("errors") for c in data["totals"].values())
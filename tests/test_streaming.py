@@ -0,0 +1,116 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from tests.fake_api import OPENAPI_SPEC, FakeStudioAPI
+from tests.openapi import SpecIndex
+from tests.poller import JobPoller
+from tests.streaming import StreamValidator, validate_stream
+
+STATUS_SCHEMA = SpecIndex(OPENAPI_SPEC).response_schema("GET", "/jobs/{job_id}/status", 200)
+
+def _status(segments: int, **overrides) -> bytes:
+    body = {
+        "job_id": "j1",
+        "status": "done",
+        "result": {"segments": [{"start": float(i), "end": i + 1.0, "text": f"s{i}"} for i in range(segments)]},
+        **overrides,
+    }
+    return json.dumps(body).encode()
+
+def _validate(raw: bytes, chunk: int, **kwargs):
+    v = StreamValidator(STATUS_SCHEMA, **kwargs)
+    for i in range(0, len(raw), chunk):
+        if v.feed(raw[i:i + chunk]) is not None:
+            break
+    return v.close()
+
+@pytest.mark.parametrize("chunk", [1, 7, 4096])
+def test_valid_body_in_any_chunking(chunk):
+    raw = _status(50)
+    res = _validate(raw, chunk)
+    assert res.ok and res.complete, res.violation
+    assert res.captured == {"job_id": "j1", "status": "done"}
+    assert res.bytes_read == len(raw)
+
+def test_violation_stops_reading_early():
+    raw = b'{"job_id": "j1", "status": "exploded", ' + _status(20000)[1:]
+    res = _validate(raw, 1024)
+    assert not res.ok and not res.complete
+    assert res.violation.path == "$.status"
+    assert res.bytes_read < 2048 < len(raw)
+
+def test_nested_violation_has_a_path():
+    segments = [{"start": 0.0, "end": 1.0, "text": "a"}, {"start": -1, "end": 2.0, "text": "b"}]
+    raw = json.dumps({"job_id": "j1", "status": "done", "result": {"segments": segments}}).encode()
+    res = _validate(raw, 16)
+    assert str(res.violation) == "$.result.segments[1].start: -1 does not match the schema"
+
+def test_missing_required_and_wrong_container_type():
+    assert "missing required property 'status'" in str(_validate(b'{"job_id": "j1"}', 4).violation)
+    res = _validate(b'{"job_id": "j1", "status": "done", "result": [1, 2]}', 4)
+    assert str(res.violation) == "$.result: unexpected array"
+
+@pytest.mark.parametrize("raw", [b'{"job_id": "j1", "status": "done"', b'{"job_id": "j1",, }', b'{"job_id": tru}', b"{} {}"])
+def test_malformed_json_is_a_violation(raw):
+    assert not _validate(raw, 3).ok
+
+def test_preview_is_bounded():
+    res = _validate(_status(5000), 512, preview_bytes=300)
+    assert res.ok and len(res.preview) == 300 and res.bytes_read > 100_000
+
+def test_long_string_is_buffered_in_place():
+    raw = _status(1, error="x" * 2_000_000)
+    v = StreamValidator(STATUS_SCHEMA)
+    buf = v._buf
+    for i in range(0, len(raw), 1024):
+        assert v.feed(raw[i:i + 1024]) is None
+        # строка ещё не закрыта: хвост дописывается в тот же буфер, а не склеивается заново
+        assert v._buf is buf
+    res = v.close()
+    assert res.ok and res.complete and res.bytes_read == len(raw)
+
+def test_validate_stream_closes_the_response_early():
+    raw = b'{"job_id": 1' + b" " * 1_000_000 + b"}"
+    transport = httpx.MockTransport(lambda r: httpx.Response(200, content=iter([raw[i:i + 4096] for i in range(0, len(raw), 4096)])))
+    with httpx.Client(transport=transport) as c, c.stream("GET", "https://api.test/jobs/j1/status") as resp:
+        res = validate_stream(resp, STATUS_SCHEMA)
+    assert str(res.violation) == "$.job_id: 1 does not match the schema"
+    assert res.bytes_read == 4096
+
+def test_poller_keeps_only_status_fields_of_a_large_result():
+    api = FakeStudioAPI(processing_delay=0.0, result_segments=20000)
+    api.objects[("b", "k")] = b"x"
+
+    async def run():
+        async with httpx.AsyncClient(base_url="https://api.test", transport=api.transport()) as c:
+            job_id = (await c.post("/jobs", json={"gcs_url": "gs://b/k"})).json()["job_id"]
+            return (await JobPoller(c, schema=STATUS_SCHEMA, timeout=5).wait([job_id]))[job_id]
+
+    res = asyncio.run(run())
+    assert res.succeeded, res.error
+    assert res.last.result is None and res.last.status == "done"
+    assert res.last_body.bytes_read > 1_000_000 and len(res.last_body.preview) == 2048
+
+def test_poller_keeps_a_small_terminal_result():
+    api = FakeStudioAPI(processing_delay=0.0, result_segments=3)
+    api.objects[("b", "k")] = b"x"
+
+    async def run(**kwargs):
+        async with httpx.AsyncClient(base_url="https://api.test", transport=api.transport()) as c:
+            job_id = (await c.post("/jobs", json={"gcs_url": "gs://b/k"})).json()["job_id"]
+            return (await JobPoller(c, schema=STATUS_SCHEMA, timeout=5, **kwargs).wait([job_id]))[job_id]
+
+    res = asyncio.run(run())
+    assert res.succeeded, res.error
+    assert [s["start"] for s in res.last.result["segments"]] == [0.0, 1.0, 2.0]
+    assert res.last_body.body is None
+    assert asyncio.run(run(result_bytes=0)).last.result is None
+
+def test_body_is_kept_only_up_to_keep_bytes():
+    raw = _status(3)
+    assert _validate(raw, 16, keep_bytes=len(raw)).body == raw
+    assert _validate(raw, 16, keep_bytes=len(raw) - 1).body is None
+    assert _validate(b'{"job_id": 1}', 4, keep_bytes=1024).body is None
@@ -0,0 +1,100 @@
+import json
+
+import httpx
+import pytest
+
+from tests.client import ClientPool
+from tests.fake_api import FakeStudioAPI
+from tests.stress import (
+    StatusRead, StressReport, check_reads, create_jobs_distinct_urls, create_jobs_same_url, presign_same_filename,
+    read_status_concurrently, run_stress, stress_levels_from_env, upload_objects,
+)
+from tests.schemas import CreateJobResponse
+from tests.utils import log
+
+# сценарии создают настоящие объекты и задания: только `pytest -m stress`
+LEVELS = stress_levels_from_env()
+
+def _check(report: StressReport, artifacts) -> None:
+    artifacts.add_kv(f"stress_{report.scenario}", report.as_dict())
+    log.info("%s", report.growth_line())
+    statuses = {k for k in report.statuses if isinstance(k, int)}
+    if statuses and statuses <= {401, 403}:
+        pytest.skip(f"{report.scenario} requires auth; set API_TOKEN in .env")
+    assert not report.violations, f"{report.scenario}: " + "; ".join(report.violations[:10])
+
+@pytest.mark.requires("uploads", "jobs", "auth")
+@pytest.mark.stress
+def test_stress_create_jobs_for_one_gcs_url(http_pool, artifacts):
+    """STRESS_LEVELS bursts of POST /jobs for the same object: no 5xx, ids all equal or all distinct, each readable."""
+    async def scenario(clients):
+        (gcs_url,) = await upload_objects(clients, 1)
+        return await create_jobs_same_url(clients.api, gcs_url, LEVELS)
+
+    _check(run_stress(http_pool, scenario), artifacts)
+
+@pytest.mark.requires("uploads", "jobs", "auth")
+@pytest.mark.stress
+def test_stress_create_jobs_for_distinct_gcs_urls(http_pool, artifacts):
+    """Bursts of POST /jobs, one object per request: no duplicate or reused job ids."""
+    async def scenario(clients):
+        urls = await upload_objects(clients, sum(LEVELS))
+        return await create_jobs_distinct_urls(clients.api, urls, LEVELS)
+
+    _check(run_stress(http_pool, scenario), artifacts)
+
+@pytest.mark.requires("uploads", "jobs", "auth")
+@pytest.mark.stress
+def test_stress_concurrent_status_readers_see_one_history(http_pool, artifacts):
+    """Readers of one job never see its state go backwards or two different terminal states."""
+    async def scenario(clients):
+        (gcs_url,) = await upload_objects(clients, 1)
+        job = await clients.api.post("/jobs", json={"gcs_url": gcs_url})
+        if job.status_code in (401, 403):
+            pytest.skip("POST /jobs requires auth; set API_TOKEN in .env")
+        job_id = CreateJobResponse.model_validate(job.json()).resolved_id()
+        return await read_status_concurrently(clients.api, job_id, LEVELS)
+
+    _check(run_stress(http_pool, scenario), artifacts)
+
+@pytest.mark.requires("uploads")
+@pytest.mark.stress
+def test_stress_presign_one_filename(http_pool, artifacts):
+    """Bursts of presign for the same filename: every answer has its own key and upload_url."""
+    _check(run_stress(http_pool, lambda clients: presign_same_filename(clients.api, "stress.jpg", LEVELS)), artifacts)
+
+def test_check_reads_flags_state_going_backwards():
+    reads = [
+        StatusRead(0, 0.0, 0.1, 200, "processing", "j1"),
+        StatusRead(1, 0.05, 0.15, 200, "queued", "j1"),   # перекрывается с первым — допустимо
+        StatusRead(2, 0.2, 0.3, 200, "done", "j1"),
+        StatusRead(3, 0.35, 0.4, 200, "processing", "j1"),
+    ]
+    assert check_reads("j1", reads[:3]) == []
+    (problem,) = check_reads("j1", reads)
+    assert "reader 3 saw 'processing' after reader 2 had already seen 'done'" in problem
+
+    mixed = [StatusRead(0, 0.0, 0.1, 200, "done", "j1"), StatusRead(1, 0.0, 0.1, 200, "failed", "j2")]
+    problems = check_reads("j1", mixed)
+    assert any("got the status of j2" in p for p in problems)
+    assert any("both ['done', 'failed']" in p for p in problems)
+
+class _RacyPresign(FakeStudioAPI):
+    """Key from the filename only: the bug the presign scenario is there to catch."""
+
+    def _presign(self, request):
+        resp = super()._presign(request)
+        data = resp.json()
+        data["key"] = "uploads/" + data["key"].rsplit("/", 1)[-1]
+        return httpx.Response(resp.status_code, json=data)
+
+def test_presign_scenario_reports_key_collisions():
+    pool = ClientPool("https://api.test", {}, transport=_RacyPresign().transport())
+    try:
+        report = run_stress(pool, lambda clients: presign_same_filename(clients.api, "a.jpg", [1, 3]))
+    finally:
+        pool.close()
+    assert [lv.concurrency for lv in report.levels] == [1, 3]
+    assert any("collided on keys {'fake-uploads/uploads/a.jpg': 3}" in v for v in report.violations), report.violations
+    assert any("keys already handed out at x1" in v for v in report.violations)
+    assert json.dumps(report.as_dict())
@@ -0,0 +1,94 @@
+import httpx
+import pytest
+
+from tests.fake_api import OPENAPI_SPEC
+from tests.openapi import SpecIndex
+from tests.timing import EndpointTimings, RequestTiming, endpoint_key, template_key
+
+def _feed(timing: RequestTiming, events):
+    for event, now in events:
+        timing.on_event(event, now)
+
+FRESH = [
+    ("connection.connect_tcp.started", 1.00), ("connection.connect_tcp.complete", 1.02),
+    ("connection.start_tls.started", 1.02), ("connection.start_tls.complete", 1.05),
+    ("http11.send_request_headers.started", 1.05), ("http11.send_request_headers.complete", 1.06),
+    ("http11.send_request_body.started", 1.06), ("http11.send_request_body.complete", 1.08),
+    ("http11.receive_response_headers.started", 1.08), ("http11.receive_response_headers.complete", 1.20),
+    ("http11.receive_response_body.started", 1.20), ("http11.receive_response_body.complete", 1.50),
+]
+
+def test_phases_from_trace_events():
+    t = RequestTiming(started=1.0)
+    _feed(t, FRESH)
+    t.finish(1.5)
+    assert t.traced and t.new_connection
+    # заголовки и тело запроса складываются в одну фазу send
+    assert t.phases == pytest.approx({"connect": 0.02, "tls": 0.03, "send": 0.03, "ttfb": 0.12, "transfer": 0.30})
+    assert t.as_dict()["total_ms"] == 500.0 and t.as_dict()["ttfb_ms"] == 120.0
+
+def test_pooled_connection_has_no_connect_or_tls():
+    t = RequestTiming(started=2.0)
+    _feed(t, [e for e in FRESH if "connection." not in e[0]])
+    t.finish(2.5)
+    assert not t.new_connection
+    assert t.as_dict()["connect_ms"] is None and t.as_dict()["tls_ms"] is None
+
+def test_unknown_and_unmatched_events_are_ignored():
+    t = RequestTiming(started=0.0)
+    _feed(t, [
+        ("http2.send_connection_init.started", 0.1), ("http2.send_connection_init.complete", 0.2),
+        ("http11.receive_response_body.complete", 0.3),  # без started
+        ("http11.receive_response_headers.started", 0.4), ("http11.receive_response_headers.failed", 0.6),
+    ])
+    # failed закрывает фазу так же, как complete: время до ошибки тоже ожидание
+    assert t.traced and t.phases == pytest.approx({"ttfb": 0.2})
+
+def test_bytes_are_read_only_for_traced_requests():
+    resp = httpx.Response(200, content=b"x" * 10)
+    traced, untraced = RequestTiming(started=0.0), RequestTiming(started=0.0)
+    traced.on_event("http11.receive_response_body.started", 0.1)
+    for t in (traced, untraced):
+        t.attach(resp)
+        t.finish(0.2)
+    assert traced.bytes_received == resp.num_bytes_downloaded
+    assert untraced.bytes_received is None
+
+def test_endpoint_keys_collapse_ids_and_storage_hosts():
+    api = "https://api.test"
+    assert endpoint_key("GET", f"{api}/jobs/3f2a9c1e77d0/status", api) == "GET /jobs/{id}/status"
+    assert endpoint_key("GET", f"{api}/jobs/123e4567-e89b-12d3-a456-426614174000", api) == "GET /jobs/{id}"
+    assert endpoint_key("POST", f"{api}/uploads/presigned", api) == "POST /uploads/presigned"
+    assert endpoint_key("PUT", "https://storage.test/bucket/uploads/a.jpg?sig=1", api) == "PUT https://storage.test"
+
+def test_spec_templates_collapse_ids_the_regex_misses():
+    match = SpecIndex(OPENAPI_SPEC).match
+    assert template_key("GET /jobs/this-job-does-not-exist/status", match) == "GET /jobs/{id}/status"
+    assert template_key("GET /jobs/{id}/status", match) == "GET /jobs/{id}/status"
+    assert template_key("GET /not/in/spec", match) == "GET /not/in/spec"
+    assert template_key("PUT https://storage.test", match) == "PUT https://storage.test"
+
+    timings = EndpointTimings()
+    done = lambda: RequestTiming(started=0.0, finished=0.1)
+    timings.add("GET /jobs/preflight-probe/status", done())
+    # спека загружена позже первых запросов: уже собранное переключается тоже
+    timings.use_templates(match)
+    timings.add("GET /jobs/this-job-does-not-exist/status", done())
+    timings.add("GET /jobs/{id}/status", done())
+    assert {k: len(v) for k, v in timings.endpoints().items()} == {"GET /jobs/{id}/status": 3}
+
+def test_roll_up_survives_the_trip_through_workers():
+    worker = EndpointTimings()
+    for total in (0.1, 0.2, 0.3):
+        t = RequestTiming(started=0.0)
+        _feed(t, FRESH[:2] if total == 0.1 else [])
+        t.finish(total)
+        worker.add("GET /health", t)
+    worker.add("GET /health", RequestTiming(started=0.0))  # не закончен: в выгрузку не идёт
+
+    controller = EndpointTimings()
+    controller.merge(worker.to_dict())
+    row = controller.summary()["GET /health"]
+    assert row["count"] == 3 and row["new_connections"] == 1
+    assert row["total"]["p50"] == pytest.approx(0.2)
+    assert row["connect"]["mean"] == pytest.approx(0.02)
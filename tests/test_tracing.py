@@ -0,0 +1,106 @@
+import asyncio
+import contextvars
+import json
+
+from tests.client import ClientPool
+from tests.fake_api import FakeStudioAPI, FakeTransport
+from tests.flow import run_upload_flow
+from tests.stats import LoadStats
+from tests.tracing import (
+    CURRENT_TRACE, Trace, clear_traces, export_trace, parse_server_timing, span, start_trace, to_chrome_trace, waterfall_html,
+)
+
+class _Capture(FakeTransport):
+    def __init__(self, api):
+        super().__init__(api)
+        self.sent = []
+
+    def _serve(self, request):
+        self.sent.append(request.headers)
+        return super()._serve(request)
+
+def _flow_trace(transport=None) -> Trace:
+    transport = transport or FakeStudioAPI(processing_delay=0.02).transport()
+    pool = ClientPool("https://api.test", {}, transport=transport)
+
+    async def run():
+        async with pool.async_clients() as clients:
+            await run_upload_flow(clients, LoadStats(), b"\xFF\xD8\xFF\xD9", poll_timeout=5)
+
+    try:
+        with start_trace("flow-test") as trace:
+            asyncio.run(run())
+        return trace
+    finally:
+        pool.close()
+
+def test_parse_server_timing():
+    assert parse_server_timing('db;dur=53.2;desc="Database, primary", cache;desc=hit, total;dur=120') == [
+        ("db", 53.2, "Database, primary"), ("cache", None, "hit"), ("total", 120.0, None),
+    ]
+    assert parse_server_timing("") == []
+    assert parse_server_timing("app;dur=abc") == [("app", None, None)]
+
+def test_every_request_of_a_flow_carries_the_trace_and_a_request_id():
+    transport = _Capture(FakeStudioAPI(processing_delay=0.02))
+    trace = _flow_trace(transport)
+    http = trace.http_spans
+    assert len(http) == len(transport.sent) >= 5
+    for s, headers in zip(http, transport.sent):
+        assert headers["traceparent"] == f"00-{trace.trace_id}-{s.span_id}-01"
+        assert headers["x-request-id"] == s.attrs["request_id"]
+        assert s.end is not None and "status_code" in s.attrs
+    assert len({s.attrs["request_id"] for s in http}) == len(http)
+    api = [s for s in http if "server_request_id" in s.attrs]
+    assert len(api) == len(http) - 1  # кроме PUT в хранилище
+    assert all(s.attrs["server_request_id"] == s.attrs["request_id"] for s in api)
+
+def test_tree_nests_stages_requests_and_server_timing():
+    tree = _flow_trace().tree()
+    flow = tree["children"][0]
+    assert flow["name"] == "flow"
+    assert [c["name"] for c in flow["children"]] == ["presign", "upload", "create_job", "poll_jobs"]
+    presign = flow["children"][0]
+    (req,) = presign["children"]
+    assert req["kind"] == "http" and req["name"] == "POST /uploads/presigned"
+    (app,) = req["children"]
+    assert app["kind"] == "server" and app["name"] == "app"
+    assert req["offset_ms"] <= app["offset_ms"] and app["duration_ms"] <= req["duration_ms"]
+    poll = flow["children"][3]["children"][0]
+    assert poll["name"] == "poll" and len(poll["children"]) == poll["attrs"]["polls"] >= 2
+    offsets = [c["offset_ms"] for c in flow["children"]]
+    assert offsets == sorted(offsets)
+
+def test_exports(tmp_path):
+    with start_trace("tests/test_x.py::test_[a b]") as trace:
+        with span("outer"):
+            with span("inner", kind="http"):
+                pass
+    chrome = to_chrome_trace(trace)
+    events = {e["name"]: e for e in chrome["traceEvents"] if e["ph"] == "X"}
+    assert set(events) == {"tests/test_x.py::test_[a b]", "outer", "inner"}
+    assert events["inner"]["args"]["parent_id"] == events["outer"]["args"]["span_id"]
+    assert events["inner"]["ts"] >= events["outer"]["ts"]
+    assert chrome["otherData"]["trace_id"] == trace.trace_id and len(trace.trace_id) == 32
+
+    path = export_trace(trace, str(tmp_path))
+    assert path.endswith("tests_test_x.py_test__a_b.trace.json")
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["traceEvents"]
+
+    page = waterfall_html(trace)
+    assert trace.trace_id in page and page.count("<tr>") == 4
+
+    (tmp_path / "timings.json").write_text("{}")
+    clear_traces(str(tmp_path))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["timings.json"]
+
+def test_span_without_trace_starts_one():
+    def loadgen():
+        # снаружи pytest (loadgen, soak) трейса теста нет
+        assert CURRENT_TRACE.get() is None
+        with span("loadgen-flow") as root:
+            assert CURRENT_TRACE.get().root is root and root.kind == "flow"
+        assert CURRENT_TRACE.get() is None and root.end is not None
+
+    contextvars.Context().run(loadgen)
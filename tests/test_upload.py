@@ -0,0 +1,156 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import tests.upload as upload
+from tests.fake_api import FakeStudioAPI
+from tests.upload import _Meter, aupload_stream, iter_pattern, upload_stream
+
+API = "https://api.test"
+CHUNK = 64 * 1024
+
+class _Drain(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """Reads the body chunk by chunk like a socket would and remembers what it saw."""
+
+    def __init__(self, delay: float = 0.0, on_chunk=None):
+        self.delay = delay
+        self.on_chunk = on_chunk or (lambda chunk: None)
+        self.headers = None
+        self.sizes = []
+
+    def _take(self, chunk: bytes) -> None:
+        self.on_chunk(chunk)
+        self.sizes.append(len(chunk))
+
+    def handle_request(self, request):
+        self.headers = request.headers
+        for chunk in request.stream:
+            self._take(chunk)
+            time.sleep(self.delay)
+        return httpx.Response(200)
+
+    async def handle_async_request(self, request):
+        self.headers = request.headers
+        async for chunk in request.stream:
+            self._take(chunk)
+            await asyncio.sleep(self.delay)
+        return httpx.Response(200)
+
+def _presign(c: httpx.Client) -> dict:
+    return c.post("/uploads/presigned", json={"filename": "u.bin"}).json()
+
+# -----------------------
+# _Meter
+# -----------------------
+
+def test_meter_counts_bytes_and_gaps_above_the_threshold(monkeypatch):
+    clock = iter([0.0, 0.1, 0.9, 1.0, 2.5])
+    monkeypatch.setattr(upload, "time", SimpleNamespace(perf_counter=lambda: next(clock)))
+    meter = _Meter(stall_threshold=0.5)
+    for chunk in (b"ab", b"c", b"", b"def", b"g"):
+        assert meter.tick(chunk) is chunk
+    # паузы 0.1, 0.8, 0.1, 1.5: в простои попадают только две
+    assert (meter.bytes_sent, meter.chunks, meter.stalls) == (7, 5, 2)
+    assert meter.stall_time == pytest.approx(2.3)
+
+# -----------------------
+# upload_stream / aupload_stream
+# -----------------------
+
+@pytest.mark.parametrize("source", ["bytes", "file", "generator"])
+def test_upload_stream_delivers_every_source_to_the_fake_store(source, tmp_path):
+    api = FakeStudioAPI()
+    data = b"".join(iter_pattern(3 * CHUNK + 17, CHUNK))
+    if source == "file":
+        path = tmp_path / "u.bin"
+        path.write_bytes(data)
+        src, size = str(path), None
+    elif source == "generator":
+        src, size = iter_pattern(len(data), CHUNK), len(data)
+    else:
+        src, size = data, None
+    with httpx.Client(base_url=API, transport=api.transport()) as c:
+        pres = _presign(c)
+        res = upload_stream(c, "put", pres["upload_url"], src, chunk_size=CHUNK, size=size)
+    assert res.response.status_code == 200
+    assert api.objects[(pres["bucket"], pres["key"])] == data
+    assert (res.bytes_sent, res.chunks) == (len(data), 4)
+    assert res.elapsed > 0 and res.as_dict()["bytes_sent"] == len(data)
+
+def test_upload_stream_holds_one_chunk_at_a_time():
+    produced = 0
+
+    def source():
+        nonlocal produced
+        for chunk in iter_pattern(32 * CHUNK, CHUNK):
+            produced += 1
+            yield chunk
+
+    received = []
+    # к моменту, когда транспорт получил i-й чанк, источник отдал ровно i чанков: ничего не копится заранее
+    transport = _Drain(on_chunk=lambda chunk: received.append(produced))
+    with httpx.Client(transport=transport) as c:
+        res = upload_stream(c, "PUT", "https://storage.test/b/k", source(), chunk_size=CHUNK, size=32 * CHUNK)
+    assert received == list(range(1, 33))
+    assert transport.sizes == [CHUNK] * 32
+    assert transport.headers["content-length"] == str(32 * CHUNK)
+    assert res.bytes_sent == 32 * CHUNK
+
+def test_buffer_is_sliced_without_copying_it_whole():
+    buf = bytearray(b"".join(iter_pattern(5 * CHUNK + 1)))
+    transport = _Drain()
+    with httpx.Client(transport=transport) as c:
+        res = upload_stream(c, "POST", "https://storage.test/b/k", memoryview(buf), chunk_size=CHUNK)
+    assert transport.sizes == [CHUNK] * 5 + [1]
+    assert res.chunks == 6 and transport.headers["content-length"] == str(len(buf))
+
+def test_generator_without_size_goes_out_chunked():
+    transport = _Drain()
+    with httpx.Client(transport=transport) as c:
+        upload_stream(c, "PUT", "https://storage.test/b/k", iter_pattern(3 * CHUNK, CHUNK),
+                      content_type="audio/wav", headers={"x-goog-meta-test": "1"})
+    assert "content-length" not in transport.headers
+    assert transport.headers["transfer-encoding"] == "chunked"
+    assert transport.headers["content-type"] == "audio/wav" and transport.headers["x-goog-meta-test"] == "1"
+
+def test_slow_socket_shows_up_as_stalls_and_lower_throughput():
+    transport = _Drain(delay=0.03)
+    with httpx.Client(transport=transport) as c:
+        res = upload_stream(c, "PUT", "https://storage.test/b/k", bytes(4 * CHUNK),
+                            chunk_size=CHUNK, stall_threshold=0.02)
+    assert res.stalls == 3 and res.stall_time >= 0.09
+    assert 0 < res.mb_per_s < 4 * CHUNK / (1024 * 1024) / 0.09
+
+def test_aupload_stream_matches_the_sync_accounting():
+    api = FakeStudioAPI()
+    data = b"".join(iter_pattern(2 * CHUNK + 5))
+
+    async def run():
+        async with httpx.AsyncClient(base_url=API, transport=api.transport()) as c:
+            pres = (await c.post("/uploads/presigned", json={"filename": "u.bin"})).json()
+            return pres, await aupload_stream(c, "PUT", pres["upload_url"], data, chunk_size=CHUNK)
+
+    pres, res = asyncio.run(run())
+    assert res.response.status_code == 200 and api.objects[(pres["bucket"], pres["key"])] == data
+    assert (res.bytes_sent, res.chunks) == (len(data), 3)
+
+def test_aupload_stream_streams_lazily():
+    transport = _Drain(delay=0.01)
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as c:
+            return await aupload_stream(c, "PUT", "https://storage.test/b/k", iter_pattern(4 * CHUNK, CHUNK),
+                                        size=4 * CHUNK, stall_threshold=0.005)
+
+    res = asyncio.run(run())
+    assert transport.sizes == [CHUNK] * 4 and res.stalls == 3
+
+@pytest.mark.parametrize("fn", [upload_stream, aupload_stream])
+def test_unsupported_method_is_rejected_before_sending(fn):
+    with pytest.raises(ValueError, match="Unsupported upload method: GET"):
+        result = fn(None, "get", "https://storage.test/b/k", b"x")
+        if asyncio.iscoroutine(result):
+            asyncio.run(result)
@@ -1,32 +1,38 @@
+import os
 import pytest
-import httpx
 
+from tests.media import MediaFile, corpus_from_env
+from tests.multipart import UploadSession, upload_resumable
+from tests.upload import UPLOAD_METHODS, iter_pattern, source_size, upload_stream
+
+# медиа генерируются корпусом (MEDIA_CORPUS) и кешируются в .cache/media; bin/txt остаются байтами
 SAMPLES = [
-    ("video_mp4", "sample.mp4", "video/mp4", b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 64),
-    ("audio_mp3", "sample.mp3", "audio/mpeg", b"ID3" + b"\x00" * 64),
-    ("audio_wav", "sample.wav", "audio/wav", b"RIFF" + b"\x00" * 64 + b"WAVE"),
-    ("random_pdf", "sample.pdf", "application/pdf", b"%PDF-1.7\n%EOF\n"),
-    ("random_zip", "sample.zip", "application/zip", b"PK\x03\x04" + b"\x00" * 64),
+    (m.label, f"sample.{m.ext}", m.content_type, m) for m in corpus_from_env()
+] + [
     ("random_bin", "sample.bin", "application/octet-stream", b"\xDE\xAD\xBE\xEF" * 16),
     ("random_txt", "sample.txt", "text/plain", b"hello from api-tests\n"),
 ]
 
+@pytest.mark.requires("uploads")
 @pytest.mark.e2e
-@pytest.mark.parametrize("case_id,filename,content_type,content", SAMPLES)
-def test_presigned_upload_attempts_are_logged_in_html_report(client, artifacts, base_url, case_id, filename, content_type, content):
+@pytest.mark.parametrize("case_id,filename,content_type,content", SAMPLES, ids=[s[0] for s in SAMPLES])
+def test_presigned_upload_attempts_are_logged_in_html_report(client, storage_client, artifacts, base_url, case_id, filename, content_type, content):
     """
     Для каждого формата:
     - логируем presigned request + response (meta+body)
     - логируем upload request + response (meta+body_preview)
     - логируем summary (что пытались, чем закончилось)
     """
+    size = source_size(content)
+    head = content.head() if isinstance(content, MediaFile) else content[:16]
     artifacts.add_kv(f"{case_id}_context", {
         "base_url": base_url,
         "case_id": case_id,
         "filename": filename,
         "content_type": content_type,
-        "bytes_len": len(content),
-        "first_bytes_hex": content[:16].hex(),
+        "bytes_len": size,
+        "first_bytes_hex": head.hex(),
+        "cached_file": os.fspath(content) if isinstance(content, MediaFile) else None,
     })
 
     # 1) presigned
@@ -58,23 +64,20 @@ def test_presigned_upload_attempts_are_logged_in_html_report(client, artifacts,
         "upload_url": upload_url,
         "method": method,
         "content_type": content_type,
-        "bytes_len": len(content),
+        "bytes_len": size,
         "bucket": bucket,
         "key": key,
     })
 
     # 3) upload to presigned url
-    with httpx.Client(timeout=60, follow_redirects=True) as up:
-        headers = {"Content-Type": content_type}
-        if method == "PUT":
-            up_res = up.put(upload_url, content=content, headers=headers)
-        elif method == "POST":
-            up_res = up.post(upload_url, content=content, headers=headers)
-        else:
-            artifacts.add_kv(f"{case_id}_summary", {"result": "FAIL_UNSUPPORTED_METHOD", "method": method})
-            raise AssertionError(f"{case_id}: unsupported upload method {method}")
+    if method not in UPLOAD_METHODS:
+        artifacts.add_kv(f"{case_id}_summary", {"result": "FAIL_UNSUPPORTED_METHOD", "method": method})
+        raise AssertionError(f"{case_id}: unsupported upload method {method}")
 
+    up = upload_stream(storage_client(upload_url), method, upload_url, content, content_type)
+    up_res = up.response
     artifacts.add_http(f"{case_id}_upload_response", up_res)
+    artifacts.add_kv(f"{case_id}_upload_stats", up.as_dict())
 
     ok = up_res.status_code in (200, 201, 204)
     artifacts.add_kv(f"{case_id}_summary", {
@@ -85,3 +88,80 @@ def test_presigned_upload_attempts_are_logged_in_html_report(client, artifacts,
     })
 
     assert ok, f"{case_id}: upload failed with {up_res.status_code}"
+
+def _upload_sizes_mb():
+    raw = os.getenv("UPLOAD_SIZES_MB", "1,8")
+    return [int(x) for x in raw.split(",") if x.strip()]
+
+@pytest.mark.requires("uploads")
+@pytest.mark.e2e
+@pytest.mark.parametrize("size_mb", _upload_sizes_mb())
+def test_presigned_upload_streams_large_payload(client, storage_client, artifacts, size_mb):
+    """
+    Upload of UPLOAD_SIZES_MB-sized bodies streamed chunk by chunk
+    (память не растёт с размером), throughput/stalls идут в отчёт.
+    """
+    size = size_mb * 1024 * 1024
+    pres = client.post("/uploads/presigned", json={"filename": f"large_{size_mb}mb.bin",
+                                                   "content_type": "application/octet-stream"})
+    artifacts.add_http(f"{size_mb}mb_presigned_response", pres)
+    if pres.status_code in (401, 403):
+        pytest.skip("uploads/presigned requires auth; set API_TOKEN in .env / GitHub secrets")
+    assert pres.status_code in (200, 201), f"unexpected presigned status {pres.status_code}"
+
+    data = pres.json()
+    upload_url = data["upload_url"]
+    up = upload_stream(
+        storage_client(upload_url),
+        data["method"],
+        upload_url,
+        iter_pattern(size),
+        "application/octet-stream",
+        size=size,
+    )
+    artifacts.add_http(f"{size_mb}mb_upload_response", up.response)
+    artifacts.add_kv(f"{size_mb}mb_upload_stats", up.as_dict())
+
+    assert up.response.status_code in (200, 201, 204), f"upload failed with {up.response.status_code}"
+    assert up.bytes_sent == size
+
+@pytest.mark.requires("uploads")
+@pytest.mark.e2e
+def test_presigned_resumable_upload_resumes_and_verifies(client, http_pool, artifacts, tmp_path):
+    """
+    GCS resumable session: первый заход отправляет половину кусков (имитация
+    обрыва), второй по файлу сессии спрашивает у GCS, сколько байт сохранено
+    (Content-Range: bytes */total), и продолжает с этого места; в конце размер
+    и md5 объекта сверяются с исходником.
+    """
+    size, part_size = 6 * 1024 * 1024, 1024 * 1024
+    src = tmp_path / "resumable.bin"
+    with open(src, "wb") as f:
+        for chunk in iter_pattern(size):
+            f.write(chunk)
+
+    pres = client.post("/uploads/presigned", json={"filename": "resumable.bin",
+                                                   "content_type": "application/octet-stream"})
+    if pres.status_code in (401, 403):
+        pytest.skip("uploads/presigned requires auth; set API_TOKEN in .env / GitHub secrets")
+    assert pres.status_code in (200, 201), f"unexpected presigned status {pres.status_code}"
+    data = pres.json()
+
+    session_path = str(tmp_path / "session.json")
+    session = UploadSession.create(data["upload_url"], size, part_size=part_size, path=session_path)
+    first = upload_resumable(http_pool, session, src, max_chunks=3)
+    artifacts.add_kv("resumable_first_pass", first.as_dict())
+    if session.session_uri is None:
+        # подпись под PUT целиком не разрешает POST с x-goog-resumable: start
+        pytest.skip(f"upload_url does not allow starting a resumable session ({first.error})")
+    assert first.error is None and first.uploaded_chunks == 3 and session.offset == 3 * part_size
+
+    resumed = UploadSession.resume(session_path)
+    second = upload_resumable(http_pool, resumed, src)
+    artifacts.add_kv("resumable_resumed_pass", second.as_dict())
+
+    assert second.resumed_at == 3 * part_size, second.as_dict()
+    assert resumed.finished and second.error is None, second.as_dict()
+    if second.verified is None:
+        pytest.skip("storage reports neither size nor md5 of the object; not verified")
+    assert second.verified, f"uploaded object does not match source: {second.as_dict()}"
@@ -0,0 +1,182 @@
+import re
+import time
+import weakref
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from tests.stats import latency_summary
+
+# -----------------------
+# тайминги одного запроса
+# -----------------------
+
+# httpcore trace events: "<prefix>.<name>.started|complete", prefix = connection/http11/http2
+_PHASES = {
+    "connect_tcp": "connect",        # DNS + TCP connect (httpcore does not split them)
+    "start_tls": "tls",
+    "send_request_headers": "send",
+    "send_request_body": "send",
+    "receive_response_headers": "ttfb",
+    "receive_response_body": "transfer",
+}
+
+@dataclass
+class RequestTiming:
+    """
+    Filled from httpcore trace events while the request runs.
+    All durations are seconds; phases that did not happen stay None
+    (connect/tls are None when a pooled connection was reused).
+    `traced` is False when the transport sent no trace events at all
+    (in-process fakes, MockTransport, cassettes): then only total is known.
+    """
+    started: float = field(default_factory=time.perf_counter)
+    finished: Optional[float] = None
+    phases: Dict[str, float] = field(default_factory=dict)
+    bytes_received: Optional[int] = None
+    traced: bool = False
+    _open: Dict[str, float] = field(default_factory=dict, repr=False)
+    _response: object = field(default=None, repr=False)
+
+    def on_event(self, event: str, now: float) -> None:
+        self.traced = True
+        _, _, name = event.partition(".")
+        step, _, stage = name.rpartition(".")
+        phase = _PHASES.get(step)
+        if phase is None:
+            return
+        if stage == "started":
+            self._open[step] = now
+        elif step in self._open:
+            self.phases[phase] = self.phases.get(phase, 0.0) + now - self._open.pop(step)
+
+    @property
+    def new_connection(self) -> bool:
+        return "connect" in self.phases
+
+    @property
+    def total(self) -> Optional[float]:
+        return None if self.finished is None else self.finished - self.started
+
+    def attach(self, response: httpx.Response) -> None:
+        self._response = weakref.ref(response)
+
+    def finish(self, now: float) -> None:
+        self.finished = now
+        resp = self._response() if self._response is not None else None
+        # без trace-событий finish зовётся до чтения тела: num_bytes_downloaded ещё 0
+        if resp is not None and self.traced:
+            self.bytes_received = resp.num_bytes_downloaded
+
+    def as_dict(self) -> dict:
+        ms = lambda v: None if v is None else round(v * 1000, 2)
+        return {
+            "connect_ms": ms(self.phases.get("connect")),
+            "tls_ms": ms(self.phases.get("tls")),
+            "send_ms": ms(self.phases.get("send")),
+            "ttfb_ms": ms(self.phases.get("ttfb")),
+            "transfer_ms": ms(self.phases.get("transfer")),
+            "total_ms": ms(self.total),
+            "bytes_received": self.bytes_received,
+        }
+
+def timing_of(resp: httpx.Response) -> Optional[RequestTiming]:
+    req = resp.request if resp is not None else None
+    return req.extensions.get("timing") if req is not None else None
+
+# -----------------------
+# агрегация по эндпоинтам
+# -----------------------
+
+_ID_SEGMENT = re.compile(
+    r"^(\d+|[0-9a-fA-F]{8,}|[0-9a-fA-F-]{36}|(?=.*\d)[A-Za-z0-9_-]{16,})$"
+)
+_TEMPLATE_PARAM = re.compile(r"\{[^/]+\}")
+
+# (method, path) -> шаблон пути операции из спеки или None (SpecIndex.match)
+PathMatcher = Callable[[str, str], Optional[str]]
+
+def template_key(key: str, match: PathMatcher) -> str:
+    """
+    "GET /jobs/this-job-does-not-exist/status" -> "GET /jobs/{id}/status" by the
+    spec's path templates: ids the regex above does not recognize. Parameters
+    are still spelled {id}, so the keys stay those of the history and of runs
+    without a spec.
+    """
+    method, _, path = key.partition(" ")
+    template = match(method, path) if path.startswith("/") else None
+    return f"{method} {_TEMPLATE_PARAM.sub('{id}', template)}" if template else key
+
+def endpoint_key(method: str, url: str, api_origin: Optional[str] = None) -> str:
+    """
+    "GET /jobs/3f2a.../status" -> "GET /jobs/{id}/status".
+    Requests to other origins (presigned storage URLs) collapse to the origin:
+    their paths are object keys, not endpoints.
+    """
+    parts = urlsplit(str(url))
+    origin = f"{parts.scheme}://{parts.netloc}"
+    if api_origin is not None and origin != api_origin:
+        return f"{method} {origin}"
+    segs = ["{id}" if _ID_SEGMENT.match(s) else s for s in parts.path.split("/")]
+    return f"{method} {'/'.join(segs) or '/'}"
+
+class EndpointTimings:
+    """
+    Session roll-up: endpoint -> list of RequestTiming.
+    to_dict()/merge() carry the samples of xdist workers to the controller.
+    use_templates() switches keys to the path templates of the spec.
+    """
+
+    def __init__(self):
+        self._by_endpoint: Dict[str, List[RequestTiming]] = defaultdict(list)
+        self._match: Optional[PathMatcher] = None
+
+    def add(self, key: str, timing: RequestTiming) -> None:
+        if self._match is not None:
+            key = template_key(key, self._match)
+        self._by_endpoint[key].append(timing)
+
+    def use_templates(self, match: PathMatcher) -> None:
+        """Keys samples by the spec from now on and re-keys the ones taken before it was loaded."""
+        self._match = match
+        old, self._by_endpoint = self._by_endpoint, defaultdict(list)
+        for key, items in old.items():
+            for t in items:
+                self.add(key, t)
+
+    def endpoints(self) -> Dict[str, List[RequestTiming]]:
+        return dict(self._by_endpoint)
+
+    def to_dict(self) -> Dict[str, List[dict]]:
+        return {
+            key: [
+                {"total": t.total, "phases": t.phases, "bytes_received": t.bytes_received}
+                for t in items if t.total is not None
+            ]
+            for key, items in self._by_endpoint.items()
+        }
+
+    def merge(self, data: Dict[str, List[dict]]) -> None:
+        for key, items in data.items():
+            for d in items:
+                self.add(key, RequestTiming(
+                    started=0.0, finished=d["total"], phases=dict(d["phases"]), bytes_received=d["bytes_received"],
+                ))
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for key, items in sorted(self._by_endpoint.items()):
+            done = [t for t in items if t.total is not None]
+            row = {"count": len(items)}
+            row["total"] = latency_summary(t.total for t in done)
+            for phase in ("connect", "tls", "send", "ttfb", "transfer"):
+                vals = [t.phases[phase] for t in done if phase in t.phases]
+                row[phase] = latency_summary(vals)
+            sizes = [t.bytes_received for t in done if t.bytes_received is not None]
+            row["bytes_received"] = sum(sizes) if sizes else None
+            row["new_connections"] = sum(1 for t in done if t.new_connection)
+            out[key] = row
+        return out
@@ -0,0 +1,307 @@
+import contextvars
+import html
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+# -----------------------
+# трассировка одного прогона: W3C traceparent + X-Request-ID на каждом запросе
+# -----------------------
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+def tracing_enabled() -> bool:
+    return os.getenv("TRACING", "1").strip().lower() not in ("0", "false", "no", "off")
+
+def trace_export_enabled() -> bool:
+    """TRACE_EXPORT=1: a Chrome trace JSON per test that made requests (off by default)."""
+    return os.getenv("TRACE_EXPORT", "0").strip().lower() in ("1", "true", "yes", "on")
+
+def trace_dir(reports_dir: str = "reports") -> str:
+    return os.getenv("TRACE_DIR") or os.path.join(reports_dir, "traces")
+
+# каталог может быть общим (TRACE_DIR=reports): свои файлы узнаём по суффиксу
+TRACE_SUFFIX = ".trace.json"
+
+@dataclass
+class Span:
+    """kind: test | flow | stage | http | server (a Server-Timing entry of the response)."""
+    name: str
+    kind: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    attrs: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+class Trace:
+    """
+    Spans of one flow (a test, or one run_upload_flow outside pytest) under
+    one 128-bit trace id. Times are perf_counter seconds; offsets in tree()
+    and exports are relative to the root span.
+    """
+
+    def __init__(self, name: str, kind: str = "test"):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self.root = self.start_span(name, kind, parent=None)
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span], **attrs) -> Span:
+        span = Span(name, kind, secrets.token_hex(8), parent.span_id if parent else None, time.perf_counter(), attrs=attrs)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    def finish(self) -> None:
+        if self.root.end is not None:
+            return
+        self.root.end = max([time.perf_counter()] + [s.end for s in self.spans if s.end is not None])
+        for s in self.spans:
+            if s.end is None:
+                # запрос оборвался до ответа (таймаут, сброс соединения)
+                s.end = self.root.end
+                s.attrs["incomplete"] = True
+
+    @property
+    def http_spans(self) -> List[Span]:
+        return [s for s in self.spans if s.kind == "http"]
+
+    def tree(self) -> dict:
+        """Nested {name, kind, offset_ms, duration_ms, attrs, children} starting at the root."""
+        children: Dict[Optional[str], List[Span]] = {}
+        for s in self.spans:
+            children.setdefault(s.parent_id, []).append(s)
+        t0 = self.root.start
+
+        def node(s: Span) -> dict:
+            return {
+                "name": s.name,
+                "kind": s.kind,
+                "span_id": s.span_id,
+                "offset_ms": round((s.start - t0) * 1000, 3),
+                "duration_ms": None if s.duration is None else round(s.duration * 1000, 3),
+                "attrs": s.attrs,
+                "children": [node(c) for c in sorted(children.get(s.span_id, []), key=lambda c: c.start)],
+            }
+
+        return {"trace_id": self.trace_id, **node(self.root)}
+
+CURRENT_TRACE: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("api_tests_trace", default=None)
+CURRENT_SPAN: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("api_tests_span", default=None)
+
+@contextmanager
+def use_trace(trace: Trace) -> Iterator[Trace]:
+    """Makes an existing trace current (an async test body on the shared loop); does not finish it."""
+    t_token, s_token = CURRENT_TRACE.set(trace), CURRENT_SPAN.set(trace.root)
+    try:
+        yield trace
+    finally:
+        CURRENT_SPAN.reset(s_token)
+        CURRENT_TRACE.reset(t_token)
+
+@contextmanager
+def start_trace(name: str, kind: str = "test") -> Iterator[Trace]:
+    trace = Trace(name, kind)
+    try:
+        with use_trace(trace):
+            yield trace
+    finally:
+        trace.finish()
+
+@contextmanager
+def span(name: str, kind: str = "stage", **attrs) -> Iterator[Optional[Span]]:
+    """
+    Child of the current span; without an active trace (loadgen, soak, monitor)
+    it starts one, so requests of the flow still share a trace id.
+    """
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        if not tracing_enabled():
+            yield None
+            return
+        with start_trace(name, kind="flow") as t:
+            t.root.attrs.update(attrs)
+            yield t.root
+        return
+    s = trace.start_span(name, kind, CURRENT_SPAN.get(), **attrs)
+    token = CURRENT_SPAN.set(s)
+    try:
+        yield s
+    finally:
+        s.end = time.perf_counter()
+        CURRENT_SPAN.reset(token)
+
+# -----------------------
+# http: заголовки на запросе, Server-Timing из ответа
+# -----------------------
+
+def traceparent(trace_id: str, span_id: str) -> str:
+    return f"00-{trace_id}-{span_id}-01"
+
+def begin_request(request: httpx.Request) -> Optional[Span]:
+    """Opens an http span and adds traceparent / X-Request-ID unless the caller set them."""
+    trace = CURRENT_TRACE.get()
+    if trace is None:
+        return None
+    s = trace.start_span(f"{request.method} {request.url.path}", "http", CURRENT_SPAN.get(),
+                         method=request.method, url=str(request.url))
+    request.headers.setdefault("traceparent", traceparent(trace.trace_id, s.span_id))
+    request.headers.setdefault(REQUEST_ID_HEADER, str(uuid.uuid4()))
+    s.attrs["request_id"] = request.headers[REQUEST_ID_HEADER]
+    request.extensions["span"] = (trace, s)
+    return s
+
+_SERVER_TIMING_ITEM = re.compile(r'\s*([^;,\s]+)((?:\s*;\s*[^;,=\s]+(?:=(?:"[^"]*"|[^;,]*))?)*)\s*(?:,|$)')
+_SERVER_TIMING_PARAM = re.compile(r';\s*([^;,=\s]+)(?:=("[^"]*"|[^;,]*))?')
+
+def parse_server_timing(value: str) -> List[Tuple[str, Optional[float], Optional[str]]]:
+    """'db;dur=53.2;desc="Database", cache;desc=hit' -> [("db", 53.2, "Database"), ("cache", None, "hit")]."""
+    out = []
+    for m in _SERVER_TIMING_ITEM.finditer(value or ""):
+        if not m.group(1):
+            continue
+        params = {k.lower(): (v or "").strip().strip('"') for k, v in _SERVER_TIMING_PARAM.findall(m.group(2))}
+        try:
+            dur = float(params["dur"]) if params.get("dur") else None
+        except ValueError:
+            dur = None
+        out.append((m.group(1), dur, params.get("desc") or None))
+    return out
+
+def record_response(response: httpx.Response) -> None:
+    """
+    Status and server X-Request-ID of the http span; Server-Timing entries become
+    child spans laid out one after another from the moment the request was sent
+    (the header carries durations only).
+    """
+    entry = response.request.extensions.get("span")
+    if entry is None:
+        return
+    trace, s = entry
+    s.attrs["status_code"] = response.status_code
+    server_id = response.headers.get(REQUEST_ID_HEADER)
+    if server_id:
+        s.attrs["server_request_id"] = server_id
+    timing = response.request.extensions.get("timing")
+    phases = timing.phases if timing is not None else {}
+    cursor = s.start + sum(phases.get(p, 0.0) for p in ("connect", "tls", "send"))
+    for name, dur, desc in parse_server_timing(response.headers.get("server-timing", "")):
+        child = trace.start_span(name, "server", s, **({"desc": desc} if desc else {}))
+        child.start = cursor
+        child.end = cursor = cursor + (dur or 0.0) / 1000
+
+def end_request(request: httpx.Request, end: float, phases: Optional[Dict[str, float]] = None) -> None:
+    entry = request.extensions.get("span")
+    if entry is None or entry[1].end is not None:
+        return
+    s = entry[1]
+    s.end = end
+    if phases:
+        s.attrs["phases_ms"] = {k: round(v * 1000, 3) for k, v in phases.items()}
+
+# -----------------------
+# экспорт: Chrome trace JSON и HTML-водопад
+# -----------------------
+
+def _lanes(spans: List[Span]) -> Dict[str, int]:
+    """
+    Thread id per span for the Chrome trace format: spans on one lane must nest
+    or not overlap, so concurrent requests (parallel polling) get lanes of their own.
+    """
+    lanes: List[List[Span]] = []
+    out: Dict[str, int] = {}
+    for s in sorted(spans, key=lambda s: (s.start, -(s.end or s.start))):
+        end = s.end if s.end is not None else s.start
+        for i, stack in enumerate(lanes):
+            while stack and (stack[-1].end or stack[-1].start) <= s.start:
+                stack.pop()
+            if not stack or (stack[-1].end or stack[-1].start) >= end:
+                stack.append(s)
+                out[s.span_id] = i + 1
+                break
+        else:
+            lanes.append([s])
+            out[s.span_id] = len(lanes)
+    return out
+
+def to_chrome_trace(trace: Trace) -> dict:
+    """Trace Event Format: opens in Perfetto (ui.perfetto.dev), chrome://tracing and speedscope."""
+    t0 = trace.root.start
+    lanes = _lanes(trace.spans)
+    events = [{
+        "name": s.name,
+        "cat": s.kind,
+        "ph": "X",
+        "ts": round((s.start - t0) * 1e6, 1),
+        "dur": round(((s.end if s.end is not None else s.start) - s.start) * 1e6, 1),
+        "pid": 1,
+        "tid": lanes[s.span_id],
+        "args": {"span_id": s.span_id, "parent_id": s.parent_id, **s.attrs},
+    } for s in trace.spans]
+    events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": trace.root.name}})
+    return {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"trace_id": trace.trace_id}}
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_")[:150] or "trace"
+
+def export_trace(trace: Trace, directory: str) -> str:
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{_safe_name(trace.root.name)}{TRACE_SUFFIX}")
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(to_chrome_trace(trace), f, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+    return path
+
+def clear_traces(directory: str) -> None:
+    """Removes traces of a previous run; other files in the directory are left alone."""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(TRACE_SUFFIX):
+            os.remove(os.path.join(directory, name))
+
+_COLORS = {"test": "#888", "flow": "#888", "stage": "#5b8def", "http": "#3cb371", "server": "#f0a030"}
+
+def waterfall_html(trace: Trace) -> str:
+    """Self-contained table: one row per span, bar offset and width relative to the whole trace."""
+    total = max((trace.root.duration or 0.0), 1e-9)
+    rows = []
+
+    def walk(node: dict, depth: int) -> None:
+        left = node["offset_ms"] / (total * 1000) * 100
+        width = max((node["duration_ms"] or 0.0) / (total * 1000) * 100, 0.2)
+        status = node["attrs"].get("status_code", "")
+        rows.append(
+            f"<tr><td style='padding-left:{depth * 14}px;white-space:nowrap'>{html.escape(node['name'])}</td>"
+            f"<td>{status}</td><td style='text-align:right'>{node['offset_ms']:.1f}</td>"
+            f"<td style='text-align:right'>{(node['duration_ms'] or 0.0):.1f}</td>"
+            f"<td style='width:60%'><div style='position:relative;height:12px'>"
+            f"<div style='position:absolute;left:{left:.2f}%;width:{width:.2f}%;height:12px;"
+            f"background:{_COLORS.get(node['kind'], '#999')}' title='{html.escape(node['kind'])}'></div>"
+            f"</div></td></tr>"
+        )
+        for c in node["children"]:
+            walk(c, depth + 1)
+
+    walk(trace.tree(), 0)
+    return (
+        f"<div><b>trace {trace.trace_id}</b> ({total * 1000:.1f} ms)"
+        "<table style='width:100%;font:12px monospace;border-collapse:collapse'>"
+        "<tr><th>span</th><th>status</th><th>start ms</th><th>ms</th><th></th></tr>"
+        + "".join(rows) + "</table></div>"
+    )
@@ -0,0 +1,191 @@
+import mmap
+import os
+import time
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Iterable, Iterator, Optional, Union
+from urllib.parse import urlsplit
+
+import httpx
+
+from tests.history import record_sample, size_bucket
+
+# -----------------------
+# потоковая загрузка на presigned URL
+# -----------------------
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+UPLOAD_METHODS = ("PUT", "POST")
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+Source = Union[str, os.PathLike, Buffer, Iterable[bytes]]
+
+@dataclass
+class UploadResult:
+    response: httpx.Response
+    bytes_sent: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    stall_time: float = 0.0
+    stalls: int = 0
+
+    @property
+    def mb_per_s(self) -> float:
+        return self.bytes_sent / (1024 * 1024) / self.elapsed if self.elapsed > 0 else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "status_code": self.response.status_code,
+            "bytes_sent": self.bytes_sent,
+            "chunks": self.chunks,
+            "elapsed_s": round(self.elapsed, 4),
+            "mb_per_s": round(self.mb_per_s, 2),
+            "stall_time_s": round(self.stall_time, 4),
+            "stalls": self.stalls,
+        }
+
+@dataclass
+class _Meter:
+    """
+    Counts what the transport actually pulled from the body iterator.
+    The gap between handing out a chunk and being asked for the next one is
+    the time the socket needed to take it; gaps above `stall_threshold`
+    are counted as stalls.
+    """
+    stall_threshold: float
+    bytes_sent: int = 0
+    chunks: int = 0
+    stall_time: float = 0.0
+    stalls: int = 0
+    _last: Optional[float] = field(default=None, repr=False)
+
+    def tick(self, chunk: bytes) -> bytes:
+        now = time.perf_counter()
+        if self._last is not None:
+            gap = now - self._last
+            if gap > self.stall_threshold:
+                self.stall_time += gap
+                self.stalls += 1
+        self._last = now
+        self.bytes_sent += len(chunk)
+        self.chunks += 1
+        return chunk
+
+# -----------------------
+# источники данных
+# -----------------------
+
+def iter_file(path: Union[str, os.PathLike], chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+def iter_buffer(buf: Buffer, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    # срезы memoryview не копируют весь буфер, в памяти только текущий чанк
+    view = memoryview(buf)
+    for start in range(0, len(view), chunk_size):
+        yield bytes(view[start:start + chunk_size])
+
+def iter_pattern(size: int, chunk_size: int = DEFAULT_CHUNK_SIZE, seed: bytes = b"api-tests") -> Iterator[bytes]:
+    """`size` bytes of a repeating pattern, generated chunk by chunk."""
+    block = (seed * (chunk_size // len(seed) + 1))[:chunk_size]
+    left = size
+    while left > 0:
+        n = min(left, chunk_size)
+        yield block[:n]
+        left -= n
+
+def source_size(source: Source) -> Optional[int]:
+    if isinstance(source, (str, os.PathLike)):
+        return os.stat(source).st_size
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return len(source)
+    return None
+
+def iter_source(source: Source, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[bytes]:
+    if isinstance(source, (str, os.PathLike)):
+        return iter_file(source, chunk_size)
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        return iter_buffer(source, chunk_size)
+    return iter(source)
+
+def _headers(content_type: str, size: Optional[int], extra: Optional[dict]) -> dict:
+    headers = {"Content-Type": content_type}
+    if size is not None:
+        # presigned PUT в GCS/S3 не принимает chunked: длина нужна заранее
+        headers["Content-Length"] = str(size)
+    headers.update(extra or {})
+    return headers
+
+def _check_method(method: str) -> str:
+    method = method.upper()
+    if method not in UPLOAD_METHODS:
+        raise ValueError(f"Unsupported upload method: {method}")
+    return method
+
+# -----------------------
+# загрузка
+# -----------------------
+
+def _record_throughput(method: str, url: str, result: UploadResult) -> None:
+    if result.response.is_success and result.elapsed > 0:
+        parts = urlsplit(url)
+        key = f"{method} {parts.scheme}://{parts.netloc} {size_bucket(result.bytes_sent)}"
+        record_sample("upload_throughput", key, result.mb_per_s)
+
+def upload_stream(
+    client: httpx.Client,
+    method: str,
+    url: str,
+    source: Source,
+    content_type: str = "application/octet-stream",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    size: Optional[int] = None,
+    stall_threshold: float = 0.5,
+    headers: Optional[dict] = None,
+) -> UploadResult:
+    """
+    Streams `source` (file path, bytes/mmap buffer or iterable of chunks) to a
+    presigned URL with constant memory: only one chunk is held at a time.
+    Pass `size` for generators, otherwise the body goes out chunked.
+    """
+    method = _check_method(method)
+    size = source_size(source) if size is None else size
+    meter = _Meter(stall_threshold)
+    body = (meter.tick(c) for c in iter_source(source, chunk_size))
+
+    t0 = time.perf_counter()
+    resp = client.request(method, url, content=body, headers=_headers(content_type, size, headers))
+    elapsed = time.perf_counter() - t0
+    result = UploadResult(resp, meter.bytes_sent, meter.chunks, elapsed, meter.stall_time, meter.stalls)
+    _record_throughput(method, url, result)
+    return result
+
+async def aupload_stream(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    source: Source,
+    content_type: str = "application/octet-stream",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    size: Optional[int] = None,
+    stall_threshold: float = 0.5,
+    headers: Optional[dict] = None,
+) -> UploadResult:
+    """Async counterpart of upload_stream (AsyncClient needs an async body iterator)."""
+    method = _check_method(method)
+    size = source_size(source) if size is None else size
+    meter = _Meter(stall_threshold)
+
+    async def body() -> AsyncIterator[bytes]:
+        for c in iter_source(source, chunk_size):
+            yield meter.tick(c)
+
+    t0 = time.perf_counter()
+    resp = await client.request(method, url, content=body(), headers=_headers(content_type, size, headers))
+    elapsed = time.perf_counter() - t0
+    result = UploadResult(resp, meter.bytes_sent, meter.chunks, elapsed, meter.stall_time, meter.stalls)
+    _record_throughput(method, url, result)
+    return result
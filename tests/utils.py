@@ -2,6 +2,8 @@ import httpx
 import logging
 import pytest
 
+from tests.artifacts import current_artifacts
+
 log = logging.getLogger("api-tests")
 
 def log_response(resp: httpx.Response, label: str = "") -> None:
@@ -34,11 +36,9 @@ def assert_status(resp: httpx.Response, expected: set[int], label: str = "") ->
     if resp.status_code not in expected:
         if is_cloudflare_challenge(resp):
             # ---- ВАЖНО: артефакт в HTML ----
-            item = pytest._current_request.node  # type: ignore
-            artifacts = getattr(item, "_artifacts", None)
+            artifacts = current_artifacts()
             if artifacts is not None:
-                artifacts.append((
-                    "json",
+                artifacts.add_json(
                     f"{label or 'request'}_cloudflare_detected",
                     {
                         "reason": "Blocked by Cloudflare / WAF",
@@ -46,7 +46,12 @@ def assert_status(resp: httpx.Response, expected: set[int], label: str = "") ->
                         "headers": dict(resp.headers),
                         "body_preview": (resp.text[:500] if resp.text else ""),
                     },
-                ))
+                )
             pytest.skip("Blocked by Cloudflare/WAF (cf-mitigated challenge in CI)")
         log_response(resp, label=label or "unexpected_status")
     assert resp.status_code in expected, f"Expected {expected}, got {resp.status_code}"
+
+async def aassert_status(resp: httpx.Response, expected: set[int], label: str = "") -> None:
+    """assert_status for AsyncClient responses: a streamed body is read before it is logged."""
+    await resp.aread()
+    assert_status(resp, expected, label)